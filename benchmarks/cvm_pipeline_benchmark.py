@@ -0,0 +1,280 @@
+'''
+Benchmark of the CVM pipeline over synthetic data.
+
+Generates fake inf_diario_fi and inf_cadastral_fi files (fbpyutils_finance.cvm.synthetic) and measures:
+
+1. read_cvm_history_file stage by stage (metadata, read, expressions, conversions, partitions)
+   for every generated file.
+2. The full CVM catalog flow (update_cvm_catalog + process_pending) against a local HTTP server
+   that serves the files with an Apache-like listing, standing in for dados.cvm.gov.br.
+
+Every stage reports elapsed time, rows/s, MB/s and peak traced Python memory (tracemalloc).
+Stage timings of (1) come from an untraced run; peak memory from a second, traced run.
+Memory of (2) is traced in a single run and covers this process only, not pool workers.
+
+Usage:
+    python benchmarks/cvm_pipeline_benchmark.py --funds 2000 --months 3 --hist-months 2 --workers 4
+'''
+
+import argparse
+import contextlib
+import functools
+import html
+import http.server
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+from tabulate import tabulate
+
+from fbpyutils_finance import cvm
+from fbpyutils_finance.cvm import cvm_client, synthetic
+from fbpyutils_finance.cvm.cvm_client import CVM
+from fbpyutils_finance.cvm.dataset import CVMDatasetWriter
+from fbpyutils_finance.cvm.file_io import read_cvm_csv, compute_cvm_partitions, read_cvm_history_file
+from fbpyutils_finance.cvm.headers import get_cvm_file_metadata
+from fbpyutils_finance.cvm.processing import get_expression_and_converters, get_source_columns, apply_expressions, apply_converters
+
+# --- Constantes ---
+SOURCE_ENCODING = 'iso-8859-1' # Encoding of the files served by CVM
+REMOTE_PATHS = {
+    'URL_IF_REGISTER': 'dados/FI/CAD/DADOS',
+    'URL_IF_REGISTER_HIST': 'dados/FI/CAD/DADOS/HIST',
+    'URL_IF_DAILY': 'dados/FI/DOC/INF_DIARIO/DADOS',
+    'URL_IF_DAILY_HIST': 'dados/FI/DOC/INF_DIARIO/DADOS/HIST',
+}
+
+# --- Funções de Medição ---
+
+def measure(
+    results: List[Dict[str, Any]],
+    stage: str,
+    func: Callable[[], Any],
+    rows: Optional[Callable[[Any], int]] = None,
+    size: int = 0,
+    trace_separately: bool = True,
+    **labels
+) -> Any:
+    """
+    Runs a stage and appends its elapsed time, throughput and peak traced memory to results.
+
+    Args:
+        results (List[Dict[str, Any]]): Result rows to append to.
+        stage (str): Stage name.
+        func (Callable[[], Any]): The stage. Must be repeatable if trace_separately is True.
+        rows (Optional[Callable[[Any], int]], optional): Returns the rows handled, from the stage result.
+        size (int, optional): Bytes handled by the stage, for MB/s. Defaults to 0.
+        trace_separately (bool, optional): Time an untraced run and trace memory in a second run.
+            Defaults to True.
+        **labels: Extra columns of the result row (e.g., file, sub_kind).
+
+    Returns:
+        Any: The result of the (last) stage run.
+    """
+    if trace_separately:
+        start = time.perf_counter()
+        value = func()
+        elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        traced_start = time.perf_counter()
+        value = func()
+        if not trace_separately:
+            elapsed = time.perf_counter() - traced_start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    row_count = rows(value) if rows else 0
+    results.append({
+        **labels,
+        'stage': stage,
+        'seconds': elapsed,
+        'rows': row_count,
+        'rows_per_s': row_count / elapsed if elapsed else None,
+        'mb_per_s': size / 2 ** 20 / elapsed if elapsed and size else None,
+        'peak_mb': peak / 2 ** 20,
+    })
+    return value
+
+
+def benchmark_file_stages(file_path: str, headers_df: pd.DataFrame, results: List[Dict[str, Any]]):
+    """Measures every stage of read_cvm_history_file for one file, then the whole call."""
+    size = os.path.getsize(file_path)
+    labels = {'file': os.path.basename(file_path)}
+
+    kind, sub_kind, header_line, header_hash = measure(results, 'metadata', lambda: get_cvm_file_metadata(file_path), size=size, **labels)
+    labels['sub_kind'] = sub_kind
+    results[-1]['sub_kind'] = sub_kind
+    mappings = headers_df[headers_df['Hash'] == header_hash].to_dict('records')
+    expressions, converters = get_expression_and_converters(mappings)
+
+    usecols = get_source_columns(header_line.split(';'), expressions) or None
+    raw = measure(results, 'read', lambda: read_cvm_csv(file_path, usecols=usecols), rows=len, size=size, **labels)
+    expressed = measure(results, 'expressions', lambda: apply_expressions(raw, expressions=expressions), rows=len, **labels)
+    converted = measure(results, 'conversions', lambda: apply_converters(expressed.copy(), converters), rows=len, **labels)
+    measure(results, 'partitions', lambda: compute_cvm_partitions(converted.copy(), kind, sub_kind, file_path)[0], rows=len, **labels)
+    measure(results, 'read_cvm_history_file', lambda: read_cvm_history_file(file_path, headers_df)[2], rows=len, size=size, **labels)
+
+# --- Funções de Servidor Local ---
+
+class CVMListingHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves a folder with Apache-like directory listings, as parsed by remote.get_url_paths."""
+
+    def list_directory(self, path):
+        lines = []
+        for name in sorted(os.listdir(path)):
+            full_path = os.path.join(path, name)
+            stat = os.stat(full_path)
+            modified = datetime.fromtimestamp(stat.st_mtime).strftime('%d-%b-%Y %H:%M')
+            href, size = (f"{name}/", '-') if os.path.isdir(full_path) else (name, str(stat.st_size))
+            # One element per entry, so every link's parent text holds only its own date and size
+            lines.append(f'<span><a href="{html.escape(href)}">{html.escape(href)}</a>    {modified}    {size}</span>')
+        body = ('<html><head><title>Index</title></head><body><pre>'
+                + '\n'.join(lines) + '</pre></body></html>').encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve_remote_folder(remote_root: str):
+    """Serves remote_root on localhost and points the CVM client URLs to it while active."""
+    handler = functools.partial(CVMListingHandler, directory=remote_root)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    original_urls = {name: getattr(cvm_client, name) for name in REMOTE_PATHS}
+    try:
+        for name, path in REMOTE_PATHS.items():
+            setattr(cvm_client, name, f"{base_url}/{path}")
+        yield base_url
+    finally:
+        for name, url in original_urls.items():
+            setattr(cvm_client, name, url)
+        server.shutdown()
+        server.server_close()
+
+
+def generate_remote_folder(remote_root: str, funds: int, months: List[str], hist_months: List[str], seed: int, headers_df: pd.DataFrame) -> int:
+    """
+    Generates the files served by the local server: current monthly DIARIO_FI CSVs, a yearly
+    zip of history months, the current cad_fi.csv and one history register file.
+
+    Returns:
+        int: Total bytes generated.
+    """
+    daily = os.path.join(remote_root, REMOTE_PATHS['URL_IF_DAILY'])
+    daily_hist = os.path.join(remote_root, REMOTE_PATHS['URL_IF_DAILY_HIST'])
+    register = os.path.join(remote_root, REMOTE_PATHS['URL_IF_REGISTER'])
+    register_hist = os.path.join(remote_root, REMOTE_PATHS['URL_IF_REGISTER_HIST'])
+
+    files = [synthetic.generate_diario_fi(os.path.join(daily, f"inf_diario_fi_{m}.csv"), m, funds, seed, headers_df, encoding=SOURCE_ENCODING)
+             for m in months]
+    files.append(synthetic.generate_cadastral_fi(os.path.join(register, 'cad_fi.csv'), funds, seed, headers_df, encoding=SOURCE_ENCODING))
+    files.append(synthetic.generate_cadastral_fi(os.path.join(register_hist, f"inf_cadastral_fi_{months[0]}01.csv"), funds, seed, headers_df, encoding=SOURCE_ENCODING))
+
+    if hist_months:
+        os.makedirs(daily_hist, exist_ok=True)
+        zip_path = os.path.join(daily_hist, f"inf_diario_fi_{hist_months[0][:4]}.zip")
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for m in hist_months:
+                member = synthetic.generate_diario_fi(os.path.join(daily_hist, f"inf_diario_fi_{m}.csv"), m, funds, seed, headers_df, encoding=SOURCE_ENCODING)
+                zip_file.write(member, os.path.basename(member))
+                os.remove(member)
+        files.append(zip_path)
+    return sum(os.path.getsize(f) for f in files)
+
+
+def benchmark_catalog_flow(work_folder: str, remote_root: str, remote_size: int, headers_df: pd.DataFrame, workers: int, write_dataset: bool, results: List[Dict[str, Any]]):
+    """Measures update_cvm_catalog (listing + downloads) and process_pending against the local server."""
+    client = CVM(headers_df=headers_df,
+                 catalog_db_path=os.path.join(work_folder, 'catalog.db'),
+                 history_folder=os.path.join(work_folder, 'history'),
+                 dataset_folder=os.path.join(work_folder, 'dataset'))
+
+    writer = CVMDatasetWriter(client.DATASET_FOLDER, mode='overwrite') if write_dataset else None
+    processed_rows = []
+
+    def sink(cvm_file, kind, sub_kind, data, partition_cols):
+        processed_rows.append(len(data))
+        if writer is not None:
+            writer(cvm_file, kind, sub_kind, data, partition_cols)
+
+    def process():
+        processed_rows.clear()
+        client.process_pending(workers=workers, sink=sink)
+        return sum(processed_rows)
+
+    with serve_remote_folder(remote_root):
+        measure(results, 'update_cvm_catalog', client.update_cvm_catalog, size=remote_size, trace_separately=False, file='(catalog)')
+    history_size = sum(e.stat().st_size for e in os.scandir(client.HISTORY_FOLDER) if e.is_file())
+    measure(results, 'process_pending', process, rows=lambda n: n, size=history_size, trace_separately=False, file='(catalog)')
+
+# --- Execução ---
+
+def _months(last_month: str, count: int) -> List[str]:
+    """Returns `count` consecutive 'YYYYMM' periods ending at last_month."""
+    end = pd.Period(f"{last_month[:4]}-{last_month[4:]}", freq='M')
+    return [str(p).replace('-', '') for p in pd.period_range(end=end, periods=count, freq='M')]
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--funds', type=int, default=1000, help='Funds per file.')
+    parser.add_argument('--months', type=int, default=2, help='Current monthly DIARIO_FI files.')
+    parser.add_argument('--hist-months', type=int, default=2, help='Months in the zipped DIARIO_FI history file (0 to skip).')
+    parser.add_argument('--last-month', default=(pd.Timestamp.today() - pd.offsets.MonthBegin(1)).strftime('%Y%m'), help='Last current month (YYYYMM).')
+    parser.add_argument('--workers', type=int, default=1, help='process_pending workers.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-dataset', action='store_true', help='Do not write the parquet dataset in process_pending.')
+    parser.add_argument('--work-folder', default=None, help='Folder for generated files (default: a temporary folder).')
+    parser.add_argument('--json', default=None, help='Also write the results to this JSON file.')
+    args = parser.parse_args(argv)
+
+    headers_df = cvm.HEADERS
+    months = _months(args.last_month, args.months + args.hist_months)
+    hist_months, months = months[:args.hist_months], months[args.hist_months:]
+
+    with contextlib.ExitStack() as stack:
+        work_folder = args.work_folder or stack.enter_context(tempfile.TemporaryDirectory(prefix='cvm_benchmark_'))
+        results: List[Dict[str, Any]] = []
+
+        local_folder = os.path.join(work_folder, 'local')
+        local_files = [synthetic.generate_diario_fi(os.path.join(local_folder, f"if_position.inf_diario_fi_{m}.csv"), m, args.funds, args.seed, headers_df)
+                       for m in months]
+        local_files.append(synthetic.generate_cadastral_fi(os.path.join(local_folder, f"if_register.inf_cadastral_fi_{months[-1]}01.csv"), args.funds, args.seed, headers_df))
+        for file_path in local_files:
+            benchmark_file_stages(file_path, headers_df, results)
+
+        remote_root = os.path.join(work_folder, 'remote')
+        remote_size = generate_remote_folder(remote_root, args.funds, months, hist_months, args.seed, headers_df)
+        benchmark_catalog_flow(os.path.join(work_folder, 'client'), remote_root, remote_size, headers_df, args.workers, not args.no_dataset, results)
+
+    report = pd.DataFrame(results)
+    print(tabulate(report.fillna(''), headers='keys', tablefmt='github', showindex=False, floatfmt='.3f'))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, default=str)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+'''
+Benchmark of get_investment_table against its former row-wise implementation.
+
+Generates random portfolios of increasing size and, for each one, times the vectorized
+get_investment_table and the former implementation (DataFrame.apply(axis=1) for the adjusted
+profit/loss and the quantity to buy, in-place changes to the input), checking that both return
+the same table.
+
+Usage:
+    python benchmarks/investment_table_benchmark.py --rows 1000 10000 100000 --repeat 3
+'''
+
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+
+from fbpyutils_finance import get_investment_table
+
+# --- Constantes ---
+RESULT_COLUMNS = ['Ticker', 'Price', 'Quantity', 'Average Price', 'Profit/Loss', 'Investment Value', 'Quantity to Buy']
+
+
+def get_investment_table_apply(df: pd.DataFrame, investment_amount: float) -> pd.DataFrame:
+    """The former row-wise get_investment_table, kept as the benchmark baseline."""
+    def adjust_profit_loss(row):
+        abs_pl = row['Profit/Loss']
+        index = row.name
+        if pd.isna(abs_pl):
+            return np.nan
+        abs_pl = abs(abs_pl)
+        if abs_pl == 0:
+            digits = 0
+        elif 0 < abs_pl < 1:
+            digits = 0
+        else:
+            try:
+                digits = np.floor(np.log10(abs_pl)) + 1
+            except ValueError:
+                return np.nan
+        digits = int(digits)
+        divisor = 10.0 ** digits
+        return (index + 1) + (abs_pl / divisor)
+
+    for col in ['Price', 'Quantity', 'Average Price']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df.dropna(subset=['Price', 'Quantity', 'Average Price'], inplace=True)
+    df['Profit/Loss'] = (df['Price'] - df['Average Price']) * df['Quantity']
+    df.sort_values(by='Profit/Loss', ascending=False, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    df['Adjusted Profit/Loss'] = df.apply(adjust_profit_loss, axis=1)
+    total_profit_loss = df['Adjusted Profit/Loss'].sum()
+    df['Proportion'] = df['Adjusted Profit/Loss'] / total_profit_loss
+    df['Investment Value'] = df['Proportion'] * investment_amount
+    df['Quantity to Buy'] = df.apply(
+        lambda row: row['Investment Value'] / row['Price'] if row['Price'] != 0 else 0,
+        axis=1
+    )
+    return df[RESULT_COLUMNS].copy()
+
+
+def generate_portfolio(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Returns a random portfolio with gains, losses, small and zero profit/loss and zero prices."""
+    rng = np.random.default_rng(seed)
+    average_price = rng.uniform(0.5, 500.0, rows).round(2)
+    price = (average_price * rng.uniform(0.5, 1.5, rows)).round(2)
+    price[rng.random(rows) < 0.01] = 0.0
+    same = rng.random(rows) < 0.01
+    price[same] = average_price[same]
+    return pd.DataFrame({
+        'Ticker': [f"TCK{i:06d}" for i in range(rows)],
+        'Price': price,
+        'Quantity': rng.integers(1, 10_000, rows),
+        'Average Price': average_price,
+    })
+
+
+def _best_time(func: Callable[[], Any], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000], help='Portfolio sizes.')
+    parser.add_argument('--amount', type=float, default=100_000.0, help='Investment amount.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per implementation (best time is reported).')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', default=None, help='Also write the results to this JSON file.')
+    args = parser.parse_args(argv)
+
+    results: List[Dict[str, Any]] = []
+    for rows in args.rows:
+        portfolio = generate_portfolio(rows, args.seed)
+        pd.testing.assert_frame_equal(get_investment_table(portfolio, args.amount),
+                                      get_investment_table_apply(portfolio.copy(), args.amount),
+                                      check_exact=True)
+
+        vectorized = _best_time(lambda: get_investment_table(portfolio, args.amount), args.repeat)
+        row_wise = _best_time(lambda: get_investment_table_apply(portfolio.copy(), args.amount), args.repeat)
+        results.append({
+            'rows': rows,
+            'apply_s': row_wise,
+            'vectorized_s': vectorized,
+            'speedup': row_wise / vectorized if vectorized else None,
+            'rows_per_s': rows / vectorized if vectorized else None,
+        })
+
+    print(tabulate(pd.DataFrame(results), headers='keys', tablefmt='github', showindex=False, floatfmt='.4f'))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, default=str)
+    return results
+
+
+if __name__ == '__main__':
+    main()
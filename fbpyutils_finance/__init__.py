@@ -19,6 +19,9 @@ APP_FOLDER = os.path.dirname(os.path.realpath(__file__))
 
 USER_APP_FOLDER = os.path.sep.join([os.path.expanduser("~"), '.cvm'])
 
+# Appended to the errors of the features that need pyarrow
+PARQUET_EXTRA_HINT = "Install it with the 'parquet' extra: pip install fbpyutils-finance[parquet]"
+
 CERTIFICATES = {
     f.split(os.path.sep)[-1].split('.')[0]: f
     for f in F.find(APP_FOLDER, '*.pem')
@@ -115,6 +118,51 @@ def rate_daily_to_annual(rate: float) -> float:
     return (1 + rate) ** 360 - 1
 
 
+# Length of each period in years, by day count convention
+RATE_CONVENTIONS = {
+    '30/360': {'daily': 1 / 360, 'monthly': 1 / 12, 'annual': 1.0},
+    'business/252': {'daily': 1 / 252, 'monthly': 1 / 12, 'annual': 1.0},
+    'actual/365': {'daily': 1 / 365, 'monthly': 1 / 12, 'annual': 1.0},
+}
+
+
+def convert_rate(rates: Any, from_period: str, to_period: str, convention: str = '30/360') -> Any:
+    """
+    Converts compound interest rates between daily, monthly and annual periods.
+
+    Works on scalars, lists, NumPy arrays and pandas Series (the index is kept), computing
+    expm1(log1p(rate) * n) instead of (1 + rate) ** n - 1 to keep the precision of small rates.
+    With the '30/360' convention the results match the rate_*_to_* functions.
+
+    Args:
+        rates (Any): The rates (e.g., 0.01 for 1%).
+        from_period (str): The period of rates: 'daily', 'monthly' or 'annual'.
+        to_period (str): The period to convert to: 'daily', 'monthly' or 'annual'.
+        convention (str, optional): The day count convention: '30/360' (30 days a month,
+            360 a year), 'business/252' (252 business days a year, as CDI and Selic) or
+            'actual/365' (calendar days). Defaults to '30/360'.
+
+    Returns:
+        Any: The equivalent rates, as a float for scalars, a pandas Series for Series and a
+            NumPy array otherwise.
+
+    Raises:
+        ValueError: If a period or the convention is invalid.
+    """
+    if convention not in RATE_CONVENTIONS:
+        raise ValueError(f"Invalid convention: {convention}. Valid ones: {list(RATE_CONVENTIONS)}")
+    periods = RATE_CONVENTIONS[convention]
+    for period in (from_period, to_period):
+        if period not in periods:
+            raise ValueError(f"Invalid period: {period}. Valid ones: {list(periods)}")
+
+    factor = periods[to_period] / periods[from_period]
+    if isinstance(rates, pd.Series):
+        return np.expm1(np.log1p(rates.astype(float)) * factor)
+    converted = np.expm1(np.log1p(np.asarray(rates, dtype=float)) * factor)
+    return float(converted) if converted.ndim == 0 else converted
+
+
 def stock_return_rate(current: float, previous: Optional[float]) -> Optional[float]:
     """
     Calculates the simple return rate of a stock.
@@ -289,7 +337,8 @@ def get_investment_table(df: pd.DataFrame, investment_amount: float) -> pd.DataF
         investment_amount (float): The total amount to be invested/allocated.
 
     Returns:
-        pd.DataFrame: The original DataFrame with added columns:
+        pd.DataFrame: A new DataFrame (df is not modified), sorted by descending Profit/Loss,
+            with the required columns and:
             'Profit/Loss' (float): Total profit or loss for the asset.
             'Proportion' (float): Normalized weight, representing the investment proportion.
             'Investment Value' (float): Amount to invest in this asset based on proportion.
@@ -298,28 +347,6 @@ def get_investment_table(df: pd.DataFrame, investment_amount: float) -> pd.DataF
     Raises:
         ValueError: If the input DataFrame is missing any of the required columns.
     """
-    def adjust_profit_loss(row):
-        abs_pl = row['Profit/Loss']
-        index = row.name
-        if pd.isna(abs_pl):
-            return np.nan
-        abs_pl = abs(abs_pl)
-
-        if abs_pl == 0:
-            digits = 0
-        elif 0 < abs_pl < 1:
-            digits = 0
-        else:
-            try:
-                digits = np.floor(np.log10(abs_pl)) + 1
-            except ValueError:
-                return np.nan
-        digits = int(digits)
-
-        divisor = 10.0 ** digits
-
-        return (index + 1) + (abs_pl / divisor)
-
     # Define required columns
     required_columns = {'Ticker', 'Price', 'Quantity', 'Average Price'}
 
@@ -328,15 +355,17 @@ def get_investment_table(df: pd.DataFrame, investment_amount: float) -> pd.DataF
     if missing_columns:
         raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
 
+    # Work on a copy, the caller's DataFrame is left untouched
+    df = df.copy()
+
     # Ensure numeric types for calculation columns
     for col in ['Price', 'Quantity', 'Average Price']:
         df[col] = pd.to_numeric(df[col], errors='coerce') # Coerce errors to NaN
 
     # Drop rows with NaN in essential columns after coercion
-    df.dropna(subset=['Price', 'Quantity', 'Average Price'], inplace=True)
+    df = df.dropna(subset=['Price', 'Quantity', 'Average Price'])
 
     if df.empty:
-        # Return empty DataFrame with expected columns if all rows had NaNs
         # Return empty DataFrame with the final expected columns
         final_columns = list(df.columns) + ['Profit/Loss', 'Investment Value', 'Quantity to Buy']
         # Ensure original columns are kept even if df was initially empty
@@ -344,16 +373,20 @@ def get_investment_table(df: pd.DataFrame, investment_amount: float) -> pd.DataF
         # Combine and remove duplicates, maintaining order as much as possible
         all_expected_cols = list(dict.fromkeys(original_cols + final_columns))
         return pd.DataFrame(columns=all_expected_cols)
-    # Calculate Profit/Loss
 
+    # Calculate Profit/Loss
     df['Profit/Loss'] = (df['Price'] - df['Average Price']) * df['Quantity']
 
     # this function sort a dataframe by a column in descent order and reindex from the top to bottom
-    df.sort_values(by='Profit/Loss', ascending=False, inplace=True)
-    df.reset_index(drop=True, inplace=True)
+    df = df.sort_values(by='Profit/Loss', ascending=False)
+    df = df.reset_index(drop=True)
 
-    # Calculate Adjusted Profit/Loss by adding the column 'Profit/Loss' the value of the row index plus 1
-    df['Adjusted Profit/Loss'] = df.apply(adjust_profit_loss, axis=1)
+    # Calculate Adjusted Profit/Loss: the row position plus 1, plus abs(Profit/Loss) scaled below 1
+    # by the power of 10 of its number of integer digits (0 digits when abs(Profit/Loss) < 1)
+    abs_pl = df['Profit/Loss'].abs().to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        digits = np.where(abs_pl >= 1, np.floor(np.log10(abs_pl)) + 1, 0.0)
+    df['Adjusted Profit/Loss'] = (np.arange(len(df)) + 1) + abs_pl / np.power(10.0, digits)
 
     # Calculate Weight 
     total_profit_loss: float = df['Adjusted Profit/Loss'].sum()
@@ -364,11 +397,10 @@ def get_investment_table(df: pd.DataFrame, investment_amount: float) -> pd.DataF
     # Calculate Investment Value (distribute total value according to proportion)
     df['Investment Value'] = df['Proportion'] * investment_amount
 
-    # Calculate Quantity to Buy (handle potential division by zero if Price is 0)
-    df['Quantity to Buy'] = df.apply(
-        lambda row: row['Investment Value'] / row['Price'] if row['Price'] != 0 else 0,
-        axis=1
-    )
+    # Calculate Quantity to Buy (0 if Price is 0)
+    price = df['Price'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['Quantity to Buy'] = np.where(price != 0, df['Investment Value'].to_numpy(dtype=float) / price, 0.0)
 
     return df[['Ticker', 'Price', 'Quantity', 'Average Price', 'Profit/Loss', 'Investment Value', 'Quantity to Buy']].copy()
 
@@ -4,7 +4,7 @@ import os
 import pandas as pd
 from multiprocessing import Pool
 import warnings
-from typing import List, Tuple, Callable, Any, Optional # Added imports
+from typing import List, Tuple, Callable, Any, Optional, Union # Added imports
 
 from fbpyutils import file as FU
 
@@ -12,10 +12,15 @@ from fbpyutils_finance.cei.schemas import \
     process_schema_movimentacao, process_schema_eventos_provisionados, process_schema_negociacao, \
     process_schema_posicao_acoes, process_schema_posicao_emprestimo_ativos, process_schema_posicao_etf, \
     process_schema_posicao_fundos_investimento, process_schema_posicao_tesouro_direto, \
-    process_schema_posicao_renda_fixa
+    process_schema_posicao_renda_fixa, process_posicao_workbooks, POSICAO_SCHEMAS
+from fbpyutils_finance.cei.journal import CEIJournal
+from fbpyutils_finance.cei.dedup import deduplicate_rows
 
 warnings.simplefilter("ignore")
 
+# Target size of the files in one get_cei_data work unit; larger files are processed alone
+_CHUNK_TARGET_BYTES = 4 * 1024 * 1024
+
 _OPERATIONS = (
     ('movimentacao', 'movimentacao-*.xlsx', process_schema_movimentacao, True),
     ('eventos_provisionados', 'eventos-*.xlsx', process_schema_eventos_provisionados, True),
@@ -29,37 +34,84 @@ _OPERATIONS = (
 )
 
 
-def _process_operation(operation: Tuple[str, str, str, Callable]) -> Tuple[str, int, Optional[pd.DataFrame]]:
+def _file_size(input_file: str) -> int:
+    """Returns the size of a file in bytes, or 0 if it cannot be accessed."""
+    try:
+        return os.path.getsize(input_file)
+    except OSError:
+        return 0
+
+
+def _chunk_files(input_files: List[str], target_bytes: int) -> List[Tuple[int, Tuple[str, ...], int]]:
     """
-    Processes a single CEI data operation type.
+    Splits files, keeping their order, into chunks of about target_bytes.
 
-    Finds files matching a pattern, applies a specific processing function (schema processor),
-    and returns the results.
+    Files larger than target_bytes form a chunk of their own; small files are batched so that
+    each work unit carries enough work to amortize its scheduling cost.
 
     Args:
-        operation (Tuple[str, str, str, Callable]): A tuple containing:
-            - op_name (str): The name of the operation (e.g., 'movimentacao').
-            - input_folder (str): The folder containing the CEI Excel files.
-            - input_mask (str): The file pattern to search for (e.g., 'movimentacao-*.xlsx').
-            - processor (Callable): The function responsible for processing the found files
-                                     (expected to return a DataFrame or None).
+        input_files (List[str]): The files, in processing order.
+        target_bytes (int): The target size of a chunk.
 
     Returns:
-        Tuple[str, int, Optional[pd.DataFrame]]: A tuple containing:
-            - op_name (str): The name of the operation.
-            - rows (int): The number of rows in the processed DataFrame (0 if None).
-            - data (Optional[pd.DataFrame]): The processed data as a DataFrame, or None if processing fails or yields no data.
+        List[Tuple[int, Tuple[str, ...], int]]: One (position, files, size) tuple per chunk, where
+            position is the index of the chunk's first file in input_files.
     """
-    op_name, input_folder, input_mask, processor = operation
-    input_files = FU.find(input_folder, input_mask)
-    data = processor(input_files)
-
-    rows = 0 if data is None else len(data)
-
-    return (op_name, rows, data)
+    chunks = []
+    position, files, size = 0, [], 0
+    for i, input_file in enumerate(input_files):
+        file_size = _file_size(input_file)
+        if files and size + file_size > target_bytes:
+            chunks.append((position, tuple(files), size))
+            position, files, size = i, [], 0
+        files.append(input_file)
+        size += file_size
+    if files:
+        chunks.append((position, tuple(files), size))
+    return chunks
+
+
+def _process_work_unit(unit: Tuple[Tuple[str, ...], Optional[Callable], int, Tuple[str, ...], int]) -> List[Tuple[str, int, Optional[pd.DataFrame]]]:
+    """
+    Processes one work unit: a chunk of files for one schema, or for all posicao schemas at once.
 
+    Args:
+        unit (Tuple): A tuple containing:
+            - op_names (Tuple[str, ...]): The operations of the unit (several only for posicao schemas).
+            - processor (Optional[Callable]): The schema processor, or None for posicao schemas
+                                              (processed with process_posicao_workbooks).
+            - position (int): The position of the chunk's first file, used to merge chunks in order.
+            - input_files (Tuple[str, ...]): The files of the chunk.
+            - size (int): The total size of the files, in bytes.
 
-def get_cei_data(input_folder: str, parallelize: bool = True) -> List[Tuple[str, int, Optional[pd.DataFrame]]]:
+    Returns:
+        List[Tuple[str, int, Optional[pd.DataFrame]]]: One (op_name, position, data) tuple per operation.
+    """
+    op_names, processor, position, input_files, _ = unit
+    if processor is None:
+        results = process_posicao_workbooks(list(input_files), op_names)
+        return [(op_name, position, results[op_name]) for op_name in op_names]
+    return [(op_names[0], position, processor(list(input_files)))]
+
+
+def _merge_results(data: Optional[List[pd.DataFrame]]) -> Optional[pd.DataFrame]:
+    """Concatenates the chunk results of one operation, ignoring empty chunks when any has rows."""
+    frames = [frame for frame in data or [] if frame is not None]
+    if not frames:
+        return None
+    non_empty = [frame for frame in frames if not frame.empty]
+    if not non_empty:
+        return frames[0]
+    return non_empty[0] if len(non_empty) == 1 else pd.concat(non_empty, ignore_index=True)
+
+
+def get_cei_data(
+    input_folder: str,
+    parallelize: bool = True,
+    chunk_bytes: int = _CHUNK_TARGET_BYTES,
+    journal: Optional[Union[str, CEIJournal]] = None,
+    deduplicate: bool = True
+) -> List[Tuple[str, int, Optional[pd.DataFrame]]]:
     """
     Retrieves and processes various types of CEI data from Excel files in a specified folder.
 
@@ -67,10 +119,29 @@ def get_cei_data(input_folder: str, parallelize: bool = True) -> List[Tuple[str,
     Excel files (e.g., 'movimentacao-*.xlsx'), and uses specific schema processors
     to parse and consolidate the data into DataFrames. Processing can be parallelized.
 
+    Work is split into (file chunk x schema) units: the files of each operation are grouped into
+    chunks of about chunk_bytes, and the posicao operations sharing a file mask form a single unit
+    per chunk, so each 'posicao-*.xlsx' workbook is opened only once for all of them. Units are
+    scheduled dynamically over all cores, largest first, and their results are concatenated per
+    schema in file order.
+
+    With a journal, the results of files already processed (same size and mtime, or same content)
+    are read from it and only new or changed files are parsed, each file in its own work unit so
+    that its results can be journaled. Files that yield no rows for any of their operations are
+    not journaled, since the schema processors skip the files they fail to read.
+
+    Rows repeated across overlapping exports (e.g. two 'movimentacao' periods sharing some months)
+    are dropped, keeping the rows of the most recent data_referencia (see dedup.deduplicate_rows).
+
     Args:
         input_folder (str): The path to the directory containing the CEI Excel files.
         parallelize (bool, optional): If True, uses multiprocessing to process
-                                      different operation types in parallel. Defaults to True.
+                                      the work units in parallel. Defaults to True.
+        chunk_bytes (int, optional): Target size of the files in one work unit. Defaults to 4 MiB.
+        journal (Optional[Union[str, CEIJournal]], optional): The journal of processed files, or its
+                                                             folder. Defaults to None (no journal).
+        deduplicate (bool, optional): If True, drops the rows repeated across exports of the same
+                                      report type. Defaults to True.
 
     Returns:
         List[Tuple[str, int, Optional[pd.DataFrame]]]: A list of tuples, where each tuple
@@ -80,20 +151,76 @@ def get_cei_data(input_folder: str, parallelize: bool = True) -> List[Tuple[str,
             - data (Optional[pd.DataFrame]): The processed data as a DataFrame, or None.
     """
     PARALLELIZE = parallelize and os.cpu_count()>1
-    operations = []
+    op_names = []
+    operations = {} # (mask, is_posicao) -> (op_names, processor)
 
     for op, mask, processor, enabled in _OPERATIONS:
-        if enabled: 
-            operations.append((op, input_folder, mask, processor,))
-    
-    operations = tuple(operations)
-    
-    if PARALLELIZE:
-        with Pool(os.cpu_count()) as p:
-            data = p.map(_process_operation, operations)
+        if not enabled:
+            continue
+        op_names.append(op)
+        if op in POSICAO_SCHEMAS:
+            operations.setdefault((mask, True), ([], None))[0].append(op)
+        else:
+            operations[(mask, op)] = ([op], processor)
+
+    if isinstance(journal, str):
+        journal = CEIJournal(journal)
+
+    files = {}
+    op_files = {}
+    units = []
+    chunks = {op: [] for op in op_names}
+    for (mask, _), (ops, processor) in operations.items():
+        if mask not in files:
+            files[mask] = FU.find(input_folder, mask)
+        op_files.update({op: files[mask] for op in ops})
+        if journal is None:
+            for position, input_files, size in _chunk_files(files[mask], chunk_bytes):
+                units.append((tuple(ops), processor, position, input_files, size))
+            continue
+        for position, input_file in enumerate(files[mask]):
+            journaled = journal.lookup(input_file, ops)
+            for op, op_data in journaled.items():
+                chunks[op].append((position, op_data))
+            pending = tuple(op for op in ops if op not in journaled)
+            if pending:
+                units.append((pending, processor, position, (input_file,), _file_size(input_file)))
+
+    # Largest units first, so that the small ones fill the gaps at the end
+    units.sort(key=lambda unit: unit[4], reverse=True)
+
+    if PARALLELIZE and len(units) > 1:
+        with Pool(min(os.cpu_count(), len(units))) as p:
+            unit_results = list(p.imap_unordered(_process_work_unit, units, chunksize=1))
     else:
-        data = []
-        for operation in operations:
-            data.append(_process_operation(operation))
-    
+        unit_results = [_process_work_unit(unit) for unit in units]
+
+    # Merge stage: concatenate the chunks of each operation in file order
+    for results in unit_results:
+        # Schema processors report and skip the files they fail to read, so a unit without any
+        # row may hold a failed file: it is not journaled, to be parsed again on the next run
+        parsed = any(op_data is not None and not op_data.empty for _, _, op_data in results)
+        for op, position, op_data in results:
+            chunks[op].append((position, op_data))
+            if journal is not None and parsed:
+                # Journaled units hold a single file, at this position
+                input_file = op_files[op][position]
+                try:
+                    journal.store(input_file, op, op_data)
+                except Exception as e:
+                    print(f"Warning: Could not journal {op} data of {input_file}: {e}")
+
+    data = []
+    for op, mask, processor, enabled in _OPERATIONS:
+        if not enabled:
+            continue
+        merged = _merge_results([frame for _, frame in sorted(chunks[op], key=lambda chunk: chunk[0])])
+        if merged is None and not chunks[op]:
+            # No files for the operation: keep the processor's own empty result
+            merged = processor([])
+        elif deduplicate:
+            merged = deduplicate_rows(merged, snapshot=op in POSICAO_SCHEMAS)
+        rows = 0 if merged is None else len(merged)
+        data.append((op, rows, merged))
+
     return data
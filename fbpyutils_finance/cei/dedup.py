@@ -0,0 +1,81 @@
+'''
+Deduplication of CEI rows repeated across overlapping exports.
+
+Period reports overlap when their periods do (e.g. 'movimentacao-2023-01-01-a-2023-06-30' and
+'movimentacao-2023-03-01-a-2023-12-31'), and the rows of the common months come from both files,
+differing only in their source columns (arquivo_origem, data_referencia). Rows are compared
+through a 64-bit hash of their values, so deduplication is a hash-based drop_duplicates instead of
+comparing every column of every pair of rows.
+
+Identical rows within one export are legitimate (e.g. two equal trades on the same day), so each
+repeated row is numbered within its source, and the n-th copy is deduplicated only against the
+n-th copy of the other sources. For each copy the row of the most recent data_referencia is kept.
+Sources are identified by (arquivo_origem, data_referencia); rows of two exports of the same type
+and the same reference date are never dropped.
+'''
+
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+
+# --- Constantes ---
+DATE_COLUMN = 'data_referencia'
+SOURCE_COLUMNS = ['arquivo_origem', 'data_referencia']
+
+
+def row_hashes(data: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """
+    Returns a 64-bit hash of the values of each row.
+
+    Values are hashed as text, so the same value read with different dtypes gets the same hash.
+
+    Args:
+        data (pd.DataFrame): The rows.
+        columns (List[str]): The columns to hash.
+
+    Returns:
+        np.ndarray: One uint64 hash per row (zeros if there are no columns).
+    """
+    if not columns:
+        return np.zeros(len(data), dtype=np.uint64)
+    return pd.util.hash_pandas_object(data[columns].astype('string'), index=False).to_numpy()
+
+
+def deduplicate_rows(
+    data: Optional[pd.DataFrame],
+    snapshot: bool = False,
+    date_column: str = DATE_COLUMN,
+    source_columns: Optional[List[str]] = None
+) -> Optional[pd.DataFrame]:
+    """
+    Drops the rows of a CEI schema repeated across exports, keeping the most recent data_referencia.
+
+    Args:
+        data (Optional[pd.DataFrame]): The consolidated rows of one schema.
+        snapshot (bool, optional): True for snapshot reports (posicao), whose rows are only
+            duplicates within the same reference date. Defaults to False (period reports).
+        date_column (str, optional): The reference date column. Defaults to 'data_referencia'.
+        source_columns (Optional[List[str]], optional): The columns identifying the source export.
+            Defaults to ['arquivo_origem', 'data_referencia'].
+
+    Returns:
+        Optional[pd.DataFrame]: The deduplicated rows, in their original order. data itself is
+            returned if it has no duplicates or no date_column.
+    """
+    if data is None or data.empty or date_column not in data.columns:
+        return data
+    source_columns = [c for c in (source_columns or SOURCE_COLUMNS) if c in data.columns]
+    value_columns = [c for c in data.columns if c not in source_columns or (snapshot and c == date_column)]
+
+    keys = pd.DataFrame({
+        'row_hash': row_hashes(data, value_columns),
+        'source': row_hashes(data, source_columns),
+        'date': data[date_column].to_numpy(),
+        'position': np.arange(len(data)),
+    })
+    keys['copy'] = keys.groupby(['source', 'row_hash'], sort=False).cumcount()
+
+    latest = keys.sort_values('date', kind='stable', na_position='first').drop_duplicates(['row_hash', 'copy'], keep='last')
+    if len(latest) == len(data):
+        return data
+    return data.iloc[np.sort(latest['position'].to_numpy())].reset_index(drop=True)
@@ -0,0 +1,211 @@
+'''
+Journal of the CEI report files already processed by get_cei_data.
+
+CEI exports never change once downloaded, so each file only has to be parsed once. The journal
+keeps, for every (file, schema) pair, the file signature (path, size, mtime and content hash) in a
+SQLite index and the processed rows in a Parquet file:
+
+    <journal_folder>/journal.db
+    <journal_folder>/<schema>/<path hash>.parquet
+
+A journaled result is reused while the file keeps its size and mtime. When they change, the
+content hash decides: the same content (e.g. a copied file) keeps the result, other content is
+parsed again. Call clear() after upgrading the schema processors to rebuild every result.
+'''
+
+import os
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import datetime
+import pandas as pd
+from typing import Dict, Optional, Sequence, Tuple
+
+import fbpyutils_finance as FI
+
+try:
+    import pyarrow # noqa: F401 - Parquet engine used by pandas
+except ImportError:
+    pyarrow = None # type: ignore
+
+JOURNAL_DB_NAME = 'journal.db'
+JOURNAL_TABLE = 'processed_files'
+HASH_BLOCK_SIZE = 1024 * 1024
+
+FileSignature = Tuple[str, int, int] # (absolute path, size, mtime in ns)
+
+
+def file_signature(path: str) -> FileSignature:
+    """
+    Returns the signature of a file: its absolute path, size and modification time in ns.
+
+    Raises:
+        OSError: If the file cannot be accessed.
+    """
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+def file_content_hash(path: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's content.
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CEIJournal:
+    """
+    Persistent store of the processed rows of each CEI file, per schema.
+
+    lookup() returns the journaled results still valid for a file; store() records a new one.
+    Only the process that owns the journal should use it (get_cei_data workers do not).
+    """
+
+    def __init__(self, journal_folder: Optional[str] = None):
+        """
+        Args:
+            journal_folder (Optional[str], optional): Folder of the journal. Defaults to a
+                'cei_journal' subfolder within USER_APP_FOLDER.
+
+        Raises:
+            ImportError: If no Parquet engine (pyarrow) is available.
+        """
+        if pyarrow is None:
+            raise ImportError(f"The 'pyarrow' library is required to use the CEI journal. {FI.PARQUET_EXTRA_HINT}")
+        self.JOURNAL_FOLDER = journal_folder or os.path.join(FI.USER_APP_FOLDER, 'cei_journal')
+        os.makedirs(self.JOURNAL_FOLDER, exist_ok=True)
+        self.JOURNAL_DB = os.path.join(self.JOURNAL_FOLDER, JOURNAL_DB_NAME)
+        self._connection = sqlite3.connect(self.JOURNAL_DB)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(f'''
+            CREATE TABLE IF NOT EXISTS {JOURNAL_TABLE} (
+                path TEXT NOT NULL,
+                schema TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                rows INTEGER,
+                data_file TEXT,
+                processed_at TEXT NOT NULL,
+                PRIMARY KEY (path, schema)
+            )
+        ''')
+        self._connection.commit()
+        # Content hashes computed in this session, by signature
+        self._hashes: Dict[FileSignature, str] = {}
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """Closes the journal index."""
+        connection, self._connection = getattr(self, '_connection', None), None
+        if connection is not None:
+            connection.close()
+
+    def _content_hash(self, signature: FileSignature) -> str:
+        """Returns the content hash of a file, hashing it at most once per signature."""
+        if signature not in self._hashes:
+            self._hashes[signature] = file_content_hash(signature[0])
+        return self._hashes[signature]
+
+    def _data_file(self, path: str, schema: str) -> str:
+        """Returns the Parquet file of a (file, schema) result, relative to the journal folder."""
+        return os.path.join(schema, hashlib.sha1(path.encode('utf-8')).hexdigest() + '.parquet')
+
+    def lookup(self, input_file: str, schemas: Sequence[str]) -> Dict[str, Optional[pd.DataFrame]]:
+        """
+        Returns the journaled results of a file that are still valid.
+
+        Args:
+            input_file (str): The CEI report file.
+            schemas (Sequence[str]): The schemas (operation names) wanted.
+
+        Returns:
+            Dict[str, Optional[pd.DataFrame]]: The processed data of each schema with a valid
+                result (None if the processor returned None). Schemas to (re)process are absent.
+        """
+        try:
+            signature = file_signature(input_file)
+        except OSError:
+            return {}
+        path, size, mtime_ns = signature
+        entries = self._connection.execute(
+            f'SELECT schema, size, mtime_ns, content_hash, rows, data_file FROM {JOURNAL_TABLE} WHERE path = ?', (path,)
+        ).fetchall()
+
+        results = {}
+        for schema, entry_size, entry_mtime_ns, content_hash, rows, data_file in entries:
+            if schema not in schemas:
+                continue
+            if (entry_size, entry_mtime_ns) != (size, mtime_ns):
+                try:
+                    if self._content_hash(signature) != content_hash:
+                        continue
+                except OSError:
+                    continue
+                # Same content, new mtime (e.g. file copied again): refresh the signature
+                with self._connection:
+                    self._connection.execute(
+                        f'UPDATE {JOURNAL_TABLE} SET size = ?, mtime_ns = ? WHERE path = ? AND schema = ?',
+                        (size, mtime_ns, path, schema))
+            if data_file is None:
+                results[schema] = None
+                continue
+            try:
+                results[schema] = pd.read_parquet(os.path.join(self.JOURNAL_FOLDER, data_file))
+            except Exception as e:
+                print(f"Warning: Could not read journaled {schema} data of {input_file}: {e}. It will be processed again.")
+        return results
+
+    def store(self, input_file: str, schema: str, data: Optional[pd.DataFrame]):
+        """
+        Journals the processed data of a file for a schema, replacing any previous result.
+
+        Args:
+            input_file (str): The CEI report file.
+            schema (str): The schema (operation name).
+            data (Optional[pd.DataFrame]): The processor's result for the file.
+
+        Raises:
+            OSError: If the file cannot be read or the data cannot be written.
+        """
+        signature = file_signature(input_file)
+        path, size, mtime_ns = signature
+        content_hash = self._content_hash(signature)
+
+        data_file = None
+        if data is not None:
+            data_file = self._data_file(path, schema)
+            target = os.path.join(self.JOURNAL_FOLDER, data_file)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temp_file = os.path.join(os.path.dirname(target), f".{uuid.uuid4().hex}.tmp")
+            try:
+                data.reset_index(drop=True).to_parquet(temp_file, index=False)
+                os.replace(temp_file, target)
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+
+        with self._connection:
+            self._connection.execute(
+                f'INSERT OR REPLACE INTO {JOURNAL_TABLE} (path, schema, size, mtime_ns, content_hash, rows, data_file, processed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (path, schema, size, mtime_ns, content_hash, None if data is None else len(data), data_file,
+                 datetime.datetime.now().isoformat(timespec='seconds')))
+
+    def clear(self):
+        """Removes every journaled result."""
+        with self._connection:
+            schemas = [row[0] for row in self._connection.execute(f'SELECT DISTINCT schema FROM {JOURNAL_TABLE}')]
+            self._connection.execute(f'DELETE FROM {JOURNAL_TABLE}')
+        for schema in schemas:
+            shutil.rmtree(os.path.join(self.JOURNAL_FOLDER, schema), ignore_errors=True)
@@ -0,0 +1,221 @@
+'''
+Position and average-cost reconstruction from CEI trades and corporate movements.
+
+build_ledger turns the 'negociacao' (trades) and 'movimentacao' (corporate events) frames of
+get_cei_data into one ledger of signed quantity events per (conta, codigo_produto), and
+replay_positions replays it in date order, producing the position, total cost and average price
+after every event.
+
+Average cost follows the usual Brazilian rules:
+
+    - BUY: adds the quantity and the operation value to the cost.
+    - SELL, FRACTION: removes the quantity; the cost is reduced proportionally, so the average
+      price does not change.
+    - SPLIT (desdobro), BONUS (bonificação): CEI credits the new shares as a quantity; splits add
+      no cost and bonuses add their informed value (if any), lowering the average price.
+    - REVERSE_SPLIT (grupamento): CEI debits the removed shares; the cost is kept.
+
+The replay is vectorized: positions are a grouped cumulative sum of the signed quantities, and
+the cost, the linear recurrence cost_k = a_k * cost_(k-1) + b_k, is solved with grouped
+cumulative products and sums, restarting whenever the position is closed. Stretches whose
+cumulative product underflows (hundreds of partial sells) are solved event by event. A checkpoint
+(the last state of each position) lets a later replay start from it instead of from the first trade.
+'''
+
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+
+# --- Constantes ---
+KEY_COLUMNS = ['conta', 'codigo_produto']
+CHECKPOINT, BUY, SELL, SPLIT, REVERSE_SPLIT, BONUS, FRACTION = (
+    'CHECKPOINT', 'BUY', 'SELL', 'SPLIT', 'REVERSE_SPLIT', 'BONUS', 'FRACTION')
+
+# CEI 'Tipo de Movimentação' (negociacao) and 'Movimentação' (movimentacao) values, lower case
+TRADE_EVENTS = {'compra': BUY, 'venda': SELL}
+MOVEMENT_EVENTS = {
+    'desdobro': SPLIT,
+    'grupamento': REVERSE_SPLIT,
+    'bonificação em ativos': BONUS,
+    'fração em ativos': FRACTION,
+}
+# Quantity sign and order of the events of the same day (corporate events first, then trades)
+EVENT_SIGN = {CHECKPOINT: 1, SPLIT: 1, REVERSE_SPLIT: -1, BONUS: 1, BUY: 1, SELL: -1, FRACTION: -1}
+EVENT_ORDER = {CHECKPOINT: 0, SPLIT: 1, REVERSE_SPLIT: 1, BONUS: 1, BUY: 2, SELL: 3, FRACTION: 4}
+
+LEDGER_COLUMNS = KEY_COLUMNS + ['data', 'evento', 'quantidade', 'valor']
+POSITION_COLUMNS = LEDGER_COLUMNS + ['posicao', 'custo_total', 'preco_medio']
+CHECKPOINT_COLUMNS = KEY_COLUMNS + ['data', 'posicao', 'custo_total']
+
+# Fractional market tickers (e.g. PETR4F) are the same asset as the standard lot ticker
+_FRACTIONAL_TICKER_RE = r'^([A-Z]{4}\d{1,2})F$'
+# Below this cumulative growth, the scan of the cost recurrence underflows (b / growth overflows)
+_MIN_SCAN_GROWTH = 1e-200
+
+
+def _normalize_ticker(codigo_produto: pd.Series) -> pd.Series:
+    """Maps fractional market tickers to their standard lot ticker."""
+    return codigo_produto.astype(str).str.strip().str.replace(_FRACTIONAL_TICKER_RE, r'\1', regex=True)
+
+
+def build_ledger(
+    negociacao: Optional[pd.DataFrame] = None,
+    movimentacao: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """
+    Builds the ledger of position events from CEI trades and movements.
+
+    Args:
+        negociacao (Optional[pd.DataFrame], optional): The 'negociacao' frame of get_cei_data
+            (trades: 'Compra'/'Venda'). Defaults to None.
+        movimentacao (Optional[pd.DataFrame], optional): The 'movimentacao' frame of get_cei_data.
+            Only corporate events changing positions are used (see MOVEMENT_EVENTS); settlements
+            of trades are already in negociacao. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The LEDGER_COLUMNS events (quantidade is unsigned, valor is the operation
+            value), in no particular order.
+    """
+    ledgers = []
+    if negociacao is not None and not negociacao.empty:
+        trades = pd.DataFrame({
+            'conta': negociacao['conta'],
+            'codigo_produto': _normalize_ticker(negociacao['codigo_produto']),
+            'data': pd.to_datetime(negociacao['data_negocio']),
+            'evento': negociacao['movimentacao'].astype(str).str.strip().str.lower().map(TRADE_EVENTS),
+            'quantidade': pd.to_numeric(negociacao['quantidade'], errors='coerce').abs(),
+            'valor': pd.to_numeric(negociacao['valor_operacao'], errors='coerce').abs().fillna(
+                pd.to_numeric(negociacao['quantidade'], errors='coerce').abs() *
+                pd.to_numeric(negociacao['preco_unitario'], errors='coerce')),
+        })
+        ledgers.append(trades)
+    if movimentacao is not None and not movimentacao.empty:
+        movements = pd.DataFrame({
+            'conta': movimentacao['conta'],
+            'codigo_produto': _normalize_ticker(movimentacao['codigo_produto']),
+            'data': pd.to_datetime(movimentacao['data_movimentacao']),
+            'evento': movimentacao['movimentacao'].astype(str).str.strip().str.lower().map(MOVEMENT_EVENTS),
+            'quantidade': pd.to_numeric(movimentacao['quantidade'], errors='coerce').abs(),
+            'valor': pd.to_numeric(movimentacao['valor_operacao'], errors='coerce').abs().fillna(0.0),
+        })
+        ledgers.append(movements)
+
+    if not ledgers:
+        return pd.DataFrame(columns=LEDGER_COLUMNS)
+    ledger = pd.concat(ledgers, ignore_index=True)
+    return ledger.dropna(subset=['data', 'evento', 'quantidade']).reset_index(drop=True)[LEDGER_COLUMNS]
+
+
+def replay_positions(
+    ledger: pd.DataFrame,
+    checkpoint: Optional[pd.DataFrame] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Replays a ledger in date order, computing position and average cost after every event.
+
+    Args:
+        ledger (pd.DataFrame): The events, as returned by build_ledger.
+        checkpoint (Optional[pd.DataFrame], optional): The state to start from, as returned by a
+            previous replay. Ledger events up to the checkpoint date of their position are
+            considered already replayed and are skipped. Defaults to None (replay from scratch).
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]:
+            - The POSITION_COLUMNS time series: one row per replayed event, sorted by position and
+              date, with the position (posicao), its total cost (custo_total) and average price
+              (preco_medio, NaN when the position is not positive).
+            - The new checkpoint (CHECKPOINT_COLUMNS): the last state of every position.
+
+    Raises:
+        ValueError: If the ledger or the checkpoint miss required columns.
+    """
+    missing_cols = [c for c in LEDGER_COLUMNS if c not in ledger.columns]
+    if missing_cols:
+        raise ValueError(f"Ledger must contain the columns: {missing_cols}")
+
+    events = ledger[LEDGER_COLUMNS].assign(data=pd.to_datetime(ledger['data']))
+    if checkpoint is not None and not checkpoint.empty:
+        missing_cols = [c for c in CHECKPOINT_COLUMNS if c not in checkpoint.columns]
+        if missing_cols:
+            raise ValueError(f"Checkpoint must contain the columns: {missing_cols}")
+        seeds = checkpoint[CHECKPOINT_COLUMNS].assign(data=pd.to_datetime(checkpoint['data']))
+        # Skip the events already in the checkpoint
+        last_dates = events[KEY_COLUMNS].merge(seeds[KEY_COLUMNS + ['data']], on=KEY_COLUMNS, how='left')['data']
+        events = events[~(events['data'] <= last_dates.to_numpy())]
+        seeds = pd.DataFrame({
+            'conta': seeds['conta'], 'codigo_produto': seeds['codigo_produto'], 'data': seeds['data'],
+            'evento': CHECKPOINT, 'quantidade': seeds['posicao'], 'valor': seeds['custo_total'],
+        })
+        events = pd.concat([seeds, events], ignore_index=True)
+
+    if events.empty:
+        return pd.DataFrame(columns=POSITION_COLUMNS), pd.DataFrame(columns=CHECKPOINT_COLUMNS)
+
+    events = events.assign(_order=events['evento'].map(EVENT_ORDER), _sequence=np.arange(len(events)))
+    events = events.sort_values(KEY_COLUMNS + ['data', '_order', '_sequence'], kind='stable').reset_index(drop=True)
+
+    evento = events['evento'].to_numpy()
+    quantidade = events['quantidade'].to_numpy(dtype=float)
+    valor = np.nan_to_num(events['valor'].to_numpy(dtype=float))
+    group = events.groupby(KEY_COLUMNS, sort=False).ngroup().to_numpy()
+    first = np.r_[True, group[1:] != group[:-1]]
+
+    # Positions: grouped cumulative sum of the signed quantities
+    signed = quantidade * events['evento'].map(EVENT_SIGN).to_numpy(dtype=float)
+    posicao = pd.Series(signed).groupby(group).cumsum().to_numpy()
+    before = posicao - signed
+
+    # Cost recurrence cost_k = a_k * cost_(k-1) + b_k
+    a = np.ones(len(events))
+    b = np.where(np.isin(evento, [BUY, BONUS, CHECKPOINT]), valor, 0.0)
+    reducing = np.isin(evento, [SELL, FRACTION])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a[reducing] = np.where(before[reducing] > 0, np.clip(posicao[reducing] / before[reducing], 0.0, 1.0), 0.0)
+    # Restart at the first event of each position, at checkpoints and when buying from a non-positive position
+    a[first | (evento == CHECKPOINT) | ((evento == BUY) & (before <= 0))] = 0.0
+
+    # Within a segment (started by a = 0), cost_k = A_k * sum(b_j / A_j), with A the cumulative product of a
+    segment = np.cumsum(a == 0.0)
+    growth = pd.Series(np.where(a == 0.0, 1.0, a)).groupby(segment).cumprod().to_numpy()
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        custo_total = growth * pd.Series(b / growth).groupby(segment).cumsum().to_numpy()
+    # Segments whose growth underflows (e.g. hundreds of partial sells) are replayed event by event.
+    # Each one starts with a = 0, so a single running cost covers all of them in order
+    unstable = pd.Series(growth < _MIN_SCAN_GROWTH).groupby(segment).transform('any').to_numpy()
+    cost = 0.0
+    for k in np.flatnonzero(unstable):
+        cost = a[k] * cost + b[k]
+        custo_total[k] = cost
+    custo_total = np.where(posicao > 0, custo_total, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        preco_medio = np.where(posicao > 0, custo_total / posicao, np.nan)
+
+    series = events[LEDGER_COLUMNS].assign(
+        quantidade=quantidade, valor=events['valor'].astype(float),
+        posicao=posicao, custo_total=custo_total, preco_medio=preco_medio)
+    last = series[np.r_[group[1:] != group[:-1], True]]
+    new_checkpoint = last[CHECKPOINT_COLUMNS].reset_index(drop=True)
+    series = series[series['evento'] != CHECKPOINT].reset_index(drop=True)
+    return series, new_checkpoint
+
+
+def current_positions(series: pd.DataFrame, as_of: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """
+    Returns the open positions at a date, from the time series of replay_positions.
+
+    The result can feed get_investment_table after renaming codigo_produto, posicao and
+    preco_medio to 'Ticker', 'Quantity' and 'Average Price' and adding the current 'Price'.
+
+    Args:
+        series (pd.DataFrame): The time series returned by replay_positions.
+        as_of (Optional[pd.Timestamp], optional): The date. Defaults to None (last event).
+
+    Returns:
+        pd.DataFrame: conta, codigo_produto, posicao, custo_total and preco_medio of every position
+            with a positive quantity.
+    """
+    if as_of is not None:
+        series = series[series['data'] <= pd.Timestamp(as_of)]
+    last = series.drop_duplicates(KEY_COLUMNS, keep='last')
+    last = last[last['posicao'] > 0]
+    return last[KEY_COLUMNS + ['posicao', 'custo_total', 'preco_medio']].reset_index(drop=True)
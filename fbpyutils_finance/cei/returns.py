@@ -0,0 +1,188 @@
+'''
+Money-weighted returns (XIRR) of CEI positions.
+
+build_cash_flows turns the 'negociacao' and 'movimentacao' frames of get_cei_data, plus the
+terminal (market) value of each position, into the investor cash flows of each
+(conta, codigo_produto): buys are outflows, sells, income and the terminal value are inflows.
+
+xirr solves the internal rate of return of thousands of groups at once. The flows are laid out
+in a padded (groups x flows) array, and all groups are iterated together with a Newton step
+safeguarded by bisection: every group keeps a bracket where its net present value changes sign,
+and a Newton step that leaves the bracket is replaced by the bracket midpoint. The unknown is
+the log growth per year of 360 days, so the result is consistent with rate_daily_to_annual:
+
+    taxa_anual = rate_daily_to_annual(taxa_diaria)
+'''
+
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+
+import fbpyutils_finance as FI
+from fbpyutils_finance.cei.portfolio import KEY_COLUMNS, TRADE_EVENTS, BUY, _normalize_ticker
+
+# --- Constantes ---
+CASH_FLOW_COLUMNS = KEY_COLUMNS + ['data', 'valor']
+# Cash credits of movimentacao, lower case
+INCOME_EVENTS = {
+    'dividendo',
+    'juros sobre capital próprio',
+    'rendimento',
+    'amortização',
+    'leilão de fração',
+}
+DAYS_PER_YEAR = 360
+# Bracket of the annual log growth: from -99.9999% to 10^6 % a year
+LOG_GROWTH_BOUNDS = (np.log1p(-0.999999), np.log1p(1e4))
+
+
+def build_cash_flows(
+    negociacao: Optional[pd.DataFrame] = None,
+    movimentacao: Optional[pd.DataFrame] = None,
+    terminal_values: Optional[pd.DataFrame] = None,
+    as_of: Optional[pd.Timestamp] = None
+) -> pd.DataFrame:
+    """
+    Builds the investor cash flows of each position.
+
+    Args:
+        negociacao (Optional[pd.DataFrame], optional): The 'negociacao' frame of get_cei_data.
+            Buys are negative flows, sells positive ones. Defaults to None.
+        movimentacao (Optional[pd.DataFrame], optional): The 'movimentacao' frame of get_cei_data.
+            Cash credits (see INCOME_EVENTS) are positive flows. Defaults to None.
+        terminal_values (Optional[pd.DataFrame], optional): The value of the open positions at
+            as_of, with columns conta, codigo_produto and valor (e.g. current_positions times
+            the market price). Defaults to None.
+        as_of (Optional[pd.Timestamp], optional): The date of the terminal values. Defaults to
+            None (the date of the last flow).
+
+    Returns:
+        pd.DataFrame: The CASH_FLOW_COLUMNS flows, in no particular order.
+    """
+    flows = []
+    if negociacao is not None and not negociacao.empty:
+        evento = negociacao['movimentacao'].astype(str).str.strip().str.lower().map(TRADE_EVENTS)
+        quantidade = pd.to_numeric(negociacao['quantidade'], errors='coerce').abs()
+        valor = pd.to_numeric(negociacao['valor_operacao'], errors='coerce').abs().fillna(
+            quantidade * pd.to_numeric(negociacao['preco_unitario'], errors='coerce'))
+        flows.append(pd.DataFrame({
+            'conta': negociacao['conta'],
+            'codigo_produto': _normalize_ticker(negociacao['codigo_produto']),
+            'data': pd.to_datetime(negociacao['data_negocio']),
+            'valor': valor.where(evento != BUY, -valor).where(evento.notna()),
+        }))
+    if movimentacao is not None and not movimentacao.empty:
+        income = movimentacao['movimentacao'].astype(str).str.strip().str.lower().isin(INCOME_EVENTS)
+        flows.append(pd.DataFrame({
+            'conta': movimentacao['conta'],
+            'codigo_produto': _normalize_ticker(movimentacao['codigo_produto']),
+            'data': pd.to_datetime(movimentacao['data_movimentacao']),
+            'valor': pd.to_numeric(movimentacao['valor_operacao'], errors='coerce').abs().where(income),
+        }))
+    flows = [f.dropna(subset=['data', 'valor']) for f in flows]
+
+    if terminal_values is not None and not terminal_values.empty:
+        if as_of is None:
+            as_of = max((f['data'].max() for f in flows if not f.empty), default=pd.NaT)
+        if pd.isna(as_of):
+            raise ValueError("as_of is required when there are no other cash flows")
+        flows.append(pd.DataFrame({
+            'conta': terminal_values['conta'],
+            'codigo_produto': _normalize_ticker(terminal_values['codigo_produto']),
+            'data': pd.Timestamp(as_of),
+            'valor': pd.to_numeric(terminal_values['valor'], errors='coerce'),
+        }))
+
+    if not flows:
+        return pd.DataFrame(columns=CASH_FLOW_COLUMNS)
+    return pd.concat(flows, ignore_index=True)[CASH_FLOW_COLUMNS]
+
+
+def _npv(log_growth: np.ndarray, years: np.ndarray, values: np.ndarray):
+    """Returns the net present value of each group and its derivative on the annual log growth."""
+    with np.errstate(over='ignore', invalid='ignore'):
+        discounted = values * np.exp(-log_growth[:, None] * years)
+        return discounted.sum(axis=1), -(discounted * years).sum(axis=1)
+
+
+def xirr(
+    flows: pd.DataFrame,
+    group_columns: Optional[List[str]] = None,
+    tol: float = 1e-10,
+    max_iter: int = 100
+) -> pd.DataFrame:
+    """
+    Computes the internal rate of return of the cash flows of each group.
+
+    The flows of all groups are solved together by a vectorized Newton/bisection iteration.
+
+    Args:
+        flows (pd.DataFrame): The flows, with the group columns, data and valor (negative for
+            investments, positive for returns), as returned by build_cash_flows.
+        group_columns (Optional[List[str]], optional): The columns defining each group.
+            Defaults to ['conta', 'codigo_produto'].
+        tol (float, optional): The tolerance on the annual log growth. Defaults to 1e-10.
+        max_iter (int, optional): The maximum number of iterations. Defaults to 100.
+
+    Returns:
+        pd.DataFrame: One row per group, in order of first appearance in flows, with its
+            columns, taxa_diaria (the daily rate) and taxa_anual (rate_daily_to_annual of it).
+            Rates are NaN for groups whose flows do not change sign or whose rate is outside
+            -99.9999% to 10^6 % a year.
+
+    Raises:
+        ValueError: If flows misses required columns.
+    """
+    group_columns = list(group_columns or KEY_COLUMNS)
+    missing_cols = [c for c in group_columns + ['data', 'valor'] if c not in flows.columns]
+    if missing_cols:
+        raise ValueError(f"Cash flows must contain the columns: {missing_cols}")
+
+    # Rows without a group key are left out, as groupby does
+    flows = flows.dropna(subset=group_columns + ['data', 'valor'])
+    # Groups keep their order of first appearance; flows are sorted by date within each group
+    first_appearance = flows.groupby(group_columns, sort=False).ngroup()
+    flows = flows.assign(data=pd.to_datetime(flows['data']), _group=first_appearance)
+    flows = flows.sort_values(['_group', 'data'], kind='stable')
+    grouped = flows.groupby(group_columns, sort=False)
+    groups = grouped.size().reset_index()[group_columns]
+    if groups.empty:
+        return groups.assign(taxa_diaria=np.nan, taxa_anual=np.nan)
+
+    # Padded (groups x flows) arrays of the flow values and their time in years from the first flow
+    group = grouped.ngroup().to_numpy()
+    position = grouped.cumcount().to_numpy()
+    days = (flows['data'] - grouped['data'].transform('min')).dt.days.to_numpy()
+    values = np.zeros((len(groups), position.max() + 1))
+    years = np.zeros_like(values)
+    values[group, position] = flows['valor'].to_numpy(dtype=float)
+    years[group, position] = days / DAYS_PER_YEAR
+
+    lo = np.full(len(groups), LOG_GROWTH_BOUNDS[0])
+    hi = np.full(len(groups), LOG_GROWTH_BOUNDS[1])
+    f_lo, _ = _npv(lo, years, values)
+    f_hi, _ = _npv(hi, years, values)
+    active = np.isfinite(f_lo) & np.isfinite(f_hi) & (np.sign(f_lo) * np.sign(f_hi) < 0)
+
+    solution = np.full(len(groups), np.nan)
+    y = np.zeros(len(groups))
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        f, df = _npv(y, years, values)
+        # Keep the bracket [lo, hi] around the sign change
+        below = np.sign(f) == np.sign(f_lo)
+        lo, f_lo = np.where(active & below, y, lo), np.where(active & below, f, f_lo)
+        hi = np.where(active & ~below, y, hi)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = y - f / df
+        inside = np.isfinite(newton) & (newton > np.minimum(lo, hi)) & (newton < np.maximum(lo, hi))
+        step = np.where(inside, newton, (lo + hi) / 2)
+
+        done = active & ((np.abs(step - y) < tol) | (f == 0))
+        solution[done] = np.where(f[done] == 0, y[done], step[done])
+        active &= ~done
+        y = np.where(active, step, y)
+
+    taxa_diaria = np.expm1(solution / DAYS_PER_YEAR)
+    return groups.assign(taxa_diaria=taxa_diaria, taxa_anual=FI.rate_daily_to_annual(taxa_diaria))
@@ -14,6 +14,7 @@ from .posicao_etf import process_schema_posicao_etf
 from .posicao_fundos_investimento import process_schema_posicao_fundos_investimento
 from .posicao_tesouro_direto import process_schema_posicao_tesouro_direto
 from .posicao_renda_fixa import process_schema_posicao_renda_fixa
+from .posicao import process_posicao_workbooks, POSICAO_SCHEMAS
 
 # Define __all__ to control what `from fbpyutils_finance.cei.schemas import *` imports
 __all__ = [
@@ -26,6 +27,8 @@ __all__ = [
     "process_schema_posicao_fundos_investimento",
     "process_schema_posicao_tesouro_direto",
     "process_schema_posicao_renda_fixa",
+    "process_posicao_workbooks",
+    "POSICAO_SCHEMAS",
 ]
 
 # Note: The utility functions (_deal_double_spaces, _extract_file_info, etc.)
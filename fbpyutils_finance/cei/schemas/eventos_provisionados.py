@@ -3,14 +3,13 @@ import pandas as pd
 from typing import List, Optional
 from datetime import date
 
-from fbpyutils import xlsx as XL
 from .utils import (
-    _str_to_date,
-    _tuple_as_str,
-    deal_double_spaces,
+    _series_str_to_date,
+    deal_double_spaces_series,
     extract_file_info,
-    extract_product_id,
+    extract_product_id_series,
 )
+from .xlsx_reader import read_sheet_frame
 
 
 def process_schema_eventos_provisionados(input_files: List[str]) -> Optional[pd.DataFrame]:
@@ -56,17 +55,12 @@ def process_schema_eventos_provisionados(input_files: List[str]) -> Optional[pd.
                  print(f"Warning: Skipping file {schema_file} as it doesn't appear to be an 'eventos' type.")
                  continue
 
-            xl_obj = XL.ExcelWorkbook(schema_file)
-            xl_table = _tuple_as_str(tuple(xl_obj.read_sheet_by_index(0)))
+            xl_dataframe = read_sheet_frame(schema_file, 0)
 
-            if not xl_table or len(xl_table) < 2:
+            if xl_dataframe.empty:
                 print(f"Warning: Skipping file {schema_file} as it contains no data or header.")
                 continue
 
-            header = xl_table[0]
-            data = xl_table[1:]
-            xl_dataframe = pd.DataFrame(data, columns=header)
-
             # Filter out total rows before processing
             if 'Preço unitário' in xl_dataframe.columns:
                  xl_dataframe = xl_dataframe[xl_dataframe['Preço unitário'] != 'Total líquido'].copy()
@@ -99,14 +93,14 @@ def process_schema_eventos_provisionados(input_files: List[str]) -> Optional[pd.
             if 'conta_raw' not in xl_dataframe.columns:
                 xl_dataframe['conta'] = '000000000'
             else:
-                xl_dataframe['conta'] = xl_dataframe['conta_raw'].apply(deal_double_spaces)
+                xl_dataframe['conta'] = deal_double_spaces_series(xl_dataframe['conta_raw'])
 
             # Apply transformations
-            xl_dataframe['nome_produto'] = xl_dataframe['nome_produto_raw'].apply(deal_double_spaces)
-            xl_dataframe['codigo_produto'] = xl_dataframe['nome_produto'].apply(extract_product_id)
+            xl_dataframe['nome_produto'] = deal_double_spaces_series(xl_dataframe['nome_produto_raw'])
+            xl_dataframe['codigo_produto'] = extract_product_id_series(xl_dataframe['nome_produto'])
             # 'tipo_produto' and 'tipo_evento' are directly mapped if they exist
-            xl_dataframe['previsao_pagamento'] = pd.to_datetime(xl_dataframe['previsao_pagamento_raw'].apply(_str_to_date), errors='coerce')
-            xl_dataframe['instituicao'] = xl_dataframe['instituicao_raw'].apply(deal_double_spaces)
+            xl_dataframe['previsao_pagamento'] = _series_str_to_date(xl_dataframe['previsao_pagamento_raw'])
+            xl_dataframe['instituicao'] = deal_double_spaces_series(xl_dataframe['instituicao_raw'])
 
             # Convert numeric columns
             xl_dataframe['quantidade'] = pd.to_numeric(xl_dataframe['quantidade_raw'], errors='coerce')
@@ -3,14 +3,13 @@ import pandas as pd
 from typing import List, Optional
 from datetime import date
 
-from fbpyutils import xlsx as XL
 from .utils import (
-    _str_to_date,
-    _tuple_as_str,
-    deal_double_spaces,
+    _series_str_to_date,
+    deal_double_spaces_series,
     extract_file_info,
-    extract_product_id,
+    extract_product_id_series,
 )
+from .xlsx_reader import read_sheet_frame
 
 
 def process_schema_movimentacao(input_files: List[str]) -> Optional[pd.DataFrame]:
@@ -56,18 +55,13 @@ def process_schema_movimentacao(input_files: List[str]) -> Optional[pd.DataFrame
                  print(f"Warning: Skipping file {schema_file} as it doesn't appear to be a 'movimentacao' type.")
                  continue # Skip to the next file
 
-            xl_obj = XL.ExcelWorkbook(schema_file)
             # Assuming the first sheet contains the data
-            xl_table = _tuple_as_str(tuple(xl_obj.read_sheet_by_index(0)))
+            xl_dataframe = read_sheet_frame(schema_file, 0)
 
-            if not xl_table or len(xl_table) < 2: # Check if table has header and at least one data row
+            if xl_dataframe.empty: # Check if table has header and at least one data row
                 print(f"Warning: Skipping file {schema_file} as it contains no data or header.")
                 continue
 
-            header = xl_table[0]
-            data = xl_table[1:]
-            xl_dataframe = pd.DataFrame(data, columns=header)
-
             # --- Data Cleaning and Transformation ---
             # Rename and select columns using a mapping for robustness
             column_mapping = {
@@ -90,15 +84,15 @@ def process_schema_movimentacao(input_files: List[str]) -> Optional[pd.DataFrame
             if 'conta_raw' not in xl_dataframe.columns:
                 xl_dataframe['conta'] = '000000000' # Default account
             else:
-                 xl_dataframe['conta'] = xl_dataframe['conta_raw'].apply(deal_double_spaces)
+                 xl_dataframe['conta'] = deal_double_spaces_series(xl_dataframe['conta_raw'])
 
             # Apply transformations
             xl_dataframe['entrada_saida'] = xl_dataframe['entrada_saida'] # Already correct name
-            xl_dataframe['data_movimentacao'] = pd.to_datetime(xl_dataframe['data_movimentacao_raw'].apply(_str_to_date), errors='coerce')
+            xl_dataframe['data_movimentacao'] = _series_str_to_date(xl_dataframe['data_movimentacao_raw'])
             xl_dataframe['movimentacao'] = xl_dataframe['movimentacao'] # Already correct name
-            xl_dataframe['nome_produto'] = xl_dataframe['nome_produto_raw'].apply(deal_double_spaces)
-            xl_dataframe['codigo_produto'] = xl_dataframe['nome_produto'].apply(extract_product_id)
-            xl_dataframe['instituicao'] = xl_dataframe['instituicao_raw'].apply(deal_double_spaces)
+            xl_dataframe['nome_produto'] = deal_double_spaces_series(xl_dataframe['nome_produto_raw'])
+            xl_dataframe['codigo_produto'] = extract_product_id_series(xl_dataframe['nome_produto'])
+            xl_dataframe['instituicao'] = deal_double_spaces_series(xl_dataframe['instituicao_raw'])
 
             # Convert numeric columns
             xl_dataframe['quantidade'] = pd.to_numeric(xl_dataframe['quantidade_raw'], errors='coerce')
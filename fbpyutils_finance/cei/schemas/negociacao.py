@@ -3,14 +3,13 @@ import pandas as pd
 from typing import List, Optional
 from datetime import date
 
-from fbpyutils import xlsx as XL
 from .utils import (
-    _str_to_date,
-    _tuple_as_str,
-    deal_double_spaces,
+    _series_str_to_date,
+    deal_double_spaces_series,
     extract_file_info,
     # extract_product_id is not used here directly, but kept for consistency if needed later
 )
+from .xlsx_reader import read_sheet_frame
 
 
 def process_schema_negociacao(input_files: List[str]) -> Optional[pd.DataFrame]:
@@ -56,17 +55,12 @@ def process_schema_negociacao(input_files: List[str]) -> Optional[pd.DataFrame]:
                  print(f"Warning: Skipping file {schema_file} as it doesn't appear to be a 'negociacao' type.")
                  continue
 
-            xl_obj = XL.ExcelWorkbook(schema_file)
-            xl_table = _tuple_as_str(tuple(xl_obj.read_sheet_by_index(0)))
+            xl_dataframe = read_sheet_frame(schema_file, 0)
 
-            if not xl_table or len(xl_table) < 2:
+            if xl_dataframe.empty:
                 print(f"Warning: Skipping file {schema_file} as it contains no data or header.")
                 continue
 
-            header = xl_table[0]
-            data = xl_table[1:]
-            xl_dataframe = pd.DataFrame(data, columns=header)
-
             # --- Data Cleaning and Transformation ---
             column_mapping = {
                 'Data do Negócio': 'data_negocio_raw',
@@ -88,13 +82,13 @@ def process_schema_negociacao(input_files: List[str]) -> Optional[pd.DataFrame]:
             if 'conta_raw' not in xl_dataframe.columns:
                 xl_dataframe['conta'] = '000000000'
             else:
-                xl_dataframe['conta'] = xl_dataframe['conta_raw'].apply(deal_double_spaces)
+                xl_dataframe['conta'] = deal_double_spaces_series(xl_dataframe['conta_raw'])
 
             # Apply transformations
-            xl_dataframe['data_negocio'] = pd.to_datetime(xl_dataframe['data_negocio_raw'].apply(_str_to_date), errors='coerce')
+            xl_dataframe['data_negocio'] = _series_str_to_date(xl_dataframe['data_negocio_raw'])
             # 'movimentacao', 'mercado', 'codigo_produto' are directly mapped
-            xl_dataframe['prazo_vencimento'] = pd.to_datetime(xl_dataframe['prazo_vencimento_raw'].apply(_str_to_date), errors='coerce')
-            xl_dataframe['instituicao'] = xl_dataframe['instituicao_raw'].apply(deal_double_spaces)
+            xl_dataframe['prazo_vencimento'] = _series_str_to_date(xl_dataframe['prazo_vencimento_raw'])
+            xl_dataframe['instituicao'] = deal_double_spaces_series(xl_dataframe['instituicao_raw'])
 
             # Convert numeric columns
             xl_dataframe['quantidade'] = pd.to_numeric(xl_dataframe['quantidade_raw'], errors='coerce')
@@ -0,0 +1,125 @@
+# fbpyutils_finance/cei/schemas/posicao.py
+"""
+Single-pass processing of CEI 'Posição' (Position) workbooks.
+
+A 'posicao-*.xlsx' file holds one sheet per kind of position (stocks, ETFs, funds, Tesouro Direto,
+fixed income, asset lending). Instead of each posicao schema processor opening every workbook again,
+process_posicao_workbooks opens each file once, reads the sheets of all requested schemas and sends
+each sheet's data to the transformer of its schema.
+"""
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import (
+    posicao_acoes,
+    posicao_emprestimo_ativos,
+    posicao_etf,
+    posicao_fundos_investimento,
+    posicao_tesouro_direto,
+    posicao_renda_fixa,
+)
+from .utils import extract_file_info
+from .xlsx_reader import read_sheet_frames
+
+# Per schema: (sheets, transformer, fields, first_sheet_only). With first_sheet_only, only the
+# first sheet with data is used (alternative names of the same sheet).
+POSICAO_SCHEMAS: Dict[str, Tuple[List[str], Callable[..., Optional[pd.DataFrame]], List[str], bool]] = {
+    'posicao_acoes': (posicao_acoes.SHEETS, posicao_acoes.transform_sheet, posicao_acoes.FIELDS, False),
+    'posicao_emprestimo_ativos': (posicao_emprestimo_ativos.SHEETS, posicao_emprestimo_ativos.transform_sheet, posicao_emprestimo_ativos.FIELDS, True),
+    'posicao_etf': (posicao_etf.SHEETS, posicao_etf.transform_sheet, posicao_etf.FIELDS, False),
+    'posicao_fundos_investimento': (posicao_fundos_investimento.SHEETS, posicao_fundos_investimento.transform_sheet, posicao_fundos_investimento.FIELDS, False),
+    'posicao_tesouro_direto': (posicao_tesouro_direto.SHEETS, posicao_tesouro_direto.transform_sheet, posicao_tesouro_direto.FIELDS, False),
+    'posicao_renda_fixa': (posicao_renda_fixa.SHEETS, posicao_renda_fixa.transform_sheet, posicao_renda_fixa.FIELDS, False),
+}
+
+
+def process_posicao_workbook(
+    schema_file: str,
+    schemas: Optional[Sequence[str]] = None
+) -> Dict[str, List[pd.DataFrame]]:
+    """
+    Processes the position sheets of one 'Posição' workbook for several schemas in one pass.
+
+    Args:
+        schema_file (str): The path to the 'Posição' Excel file.
+        schemas (Optional[Sequence[str]], optional): The posicao schemas to extract (keys of
+            POSICAO_SCHEMAS). Defaults to None (all).
+
+    Returns:
+        Dict[str, List[pd.DataFrame]]: The frames produced for each requested schema (one per sheet
+            with data; empty list when the schema has no sheet with data in the file).
+
+    Raises:
+        ValueError: If the file name is not a valid CEI file name, or a schema is unknown.
+    """
+    schemas = list(schemas) if schemas is not None else list(POSICAO_SCHEMAS)
+    unknown = [s for s in schemas if s not in POSICAO_SCHEMAS]
+    if unknown:
+        raise ValueError(f"Unknown posicao schemas: {unknown}")
+
+    results: Dict[str, List[pd.DataFrame]] = {schema: [] for schema in schemas}
+    schema_file_name, schema_file_date = extract_file_info(schema_file)
+    if 'posicao' not in schema_file_name:
+        print(f"Warning: Skipping file {schema_file} as it doesn't appear to be a 'posicao' type.")
+        return results
+
+    sheet_names = [xl_sheet for schema in schemas for xl_sheet in POSICAO_SCHEMAS[schema][0]]
+    xl_frames = read_sheet_frames(schema_file, sheet_names)
+
+    for schema in schemas:
+        sheets, transformer, _, first_sheet_only = POSICAO_SCHEMAS[schema]
+        for xl_sheet in sheets:
+            if xl_sheet not in xl_frames:
+                continue
+            xl_dataframe = transformer(xl_frames[xl_sheet], xl_sheet, schema_file, schema_file_name, schema_file_date)
+            if xl_dataframe is None:
+                continue
+            results[schema].append(xl_dataframe)
+            if first_sheet_only:
+                break
+        if not results[schema]:
+            print(f"Info: No '{schema}' sheets ({', '.join(sheets)}) with data found in {schema_file}.")
+
+    return results
+
+
+def process_posicao_workbooks(
+    input_files: List[str],
+    schemas: Optional[Sequence[str]] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Processes 'Posição' workbooks for several posicao schemas, opening each file only once.
+
+    Produces the same frames as calling each process_schema_posicao_* function on the same files.
+
+    Args:
+        input_files (List[str]): A list of paths to the 'Posição' Excel files.
+        schemas (Optional[Sequence[str]], optional): The posicao schemas to extract (keys of
+            POSICAO_SCHEMAS). Defaults to None (all).
+
+    Returns:
+        Dict[str, pd.DataFrame]: The consolidated data of each requested schema. Schemas without
+            data get an empty DataFrame with their columns.
+
+    Raises:
+        ValueError: If a schema is unknown.
+    """
+    schemas = list(schemas) if schemas is not None else list(POSICAO_SCHEMAS)
+    unknown = [s for s in schemas if s not in POSICAO_SCHEMAS]
+    if unknown:
+        raise ValueError(f"Unknown posicao schemas: {unknown}")
+
+    xl_dataframes: Dict[str, List[pd.DataFrame]] = {schema: [] for schema in schemas}
+    for schema_file in input_files or []:
+        try:
+            for schema, frames in process_posicao_workbook(schema_file, schemas).items():
+                xl_dataframes[schema].extend(frames)
+        except ValueError as e:
+            print(f"Error processing file {schema_file}: {e}")
+        except Exception as e:
+            print(f"An unexpected error occurred while processing {schema_file}: {e}")
+
+    return {
+        schema: (pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=POSICAO_SCHEMAS[schema][2]))
+        for schema, frames in xl_dataframes.items()
+    }
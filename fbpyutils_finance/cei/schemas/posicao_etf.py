@@ -3,13 +3,124 @@ import pandas as pd
 from typing import List, Optional
 from datetime import date
 
-from fbpyutils import xlsx as XL, string as SU
+from fbpyutils import string as SU
 from .utils import (
-    _tuple_as_str,
-    deal_double_spaces,
+    deal_double_spaces_series,
     extract_file_info,
     # extract_product_id is not used here
 )
+from .xlsx_reader import read_sheet_frames
+
+FIELDS = [
+    'codigo_produto',
+    'nome_produto',
+    'instituicao',
+    'conta',
+    'codigo_isin',
+    'tipo_produto',
+    'quantidade',
+    'quantidade_disponivel',
+    'quantidade_indisponivel',
+    'motivo',
+    'preco_unitario', # Corresponds to 'Preço de Fechamento'
+    'valor_operacao', # Corresponds to 'Valor Atualizado'
+    'arquivo_origem',
+    'data_referencia'
+]
+
+# Sheets holding ETF positions
+SHEETS = ['ETF']
+
+
+def transform_sheet(
+    xl_dataframe: pd.DataFrame,
+    xl_sheet: str,
+    schema_file: str,
+    schema_file_name: str,
+    schema_file_date: date
+) -> Optional[pd.DataFrame]:
+    """
+    Transforms the rows of a 'ETF' sheet of a 'Posição' file into the schema columns.
+
+    Args:
+        xl_dataframe (pd.DataFrame): The sheet data as stripped strings, with the header row as columns.
+        xl_sheet (str): The sheet name.
+        schema_file (str): The path of the source file (used in messages).
+        schema_file_name (str): The report type extracted from the file name.
+        schema_file_date (date): The reference date extracted from the file name.
+
+    Returns:
+        Optional[pd.DataFrame]: The sheet data with the FIELDS columns, or None if the sheet
+                                has no usable data.
+    """
+    if xl_dataframe.empty:
+        print(f"Warning: Sheet '{xl_sheet}' in {schema_file} contains no data or header.")
+        return None
+
+    if 'Produto' in xl_dataframe.columns:
+        xl_dataframe = xl_dataframe[xl_dataframe['Produto'] != ''].copy()
+    else:
+        print(f"Warning: 'Produto' column not found in sheet '{xl_sheet}' of {schema_file}.")
+        return None
+
+    if xl_dataframe.empty:
+        print(f"Warning: No data left in sheet '{xl_sheet}' of {schema_file} after filtering.")
+        return None
+
+    # --- Data Cleaning and Transformation ---
+    column_mapping = {
+        'Código de Negociação': 'codigo_produto_raw',
+        'Produto': 'nome_produto_raw',
+        'Instituição': 'instituicao_raw',
+        'Conta': 'conta_raw',
+        'Código ISIN / Distribuição': 'codigo_isin',
+        'Tipo': 'tipo_produto',
+        'Quantidade': 'quantidade_raw',
+        'Quantidade Disponível': 'quantidade_disponivel_raw',
+        'Quantidade Indisponível': 'quantidade_indisponivel_raw',
+        'Motivo': 'motivo',
+        'Preço de Fechamento': 'preco_unitario_raw',
+        'Valor Atualizado': 'valor_operacao_raw',
+    }
+
+    rename_dict = {k: v for k, v in column_mapping.items() if k in xl_dataframe.columns}
+    required_raw_cols = ['codigo_produto_raw', 'nome_produto_raw', 'instituicao_raw']
+    if not all(col in rename_dict.values() for col in required_raw_cols):
+         print(f"Warning: Missing one or more essential columns in sheet '{xl_sheet}' of {schema_file}. Skipping sheet.")
+         return None
+
+    xl_dataframe = xl_dataframe[list(rename_dict.keys())].rename(columns=rename_dict)
+
+    # Handle missing 'Conta' column
+    if 'conta_raw' not in xl_dataframe.columns:
+        xl_dataframe['conta'] = '000000000'
+    else:
+        xl_dataframe['conta'] = deal_double_spaces_series(xl_dataframe['conta_raw'])
+
+    # Apply transformations
+    xl_dataframe['codigo_produto'] = deal_double_spaces_series(xl_dataframe['codigo_produto_raw'])
+    xl_dataframe['nome_produto'] = deal_double_spaces_series(xl_dataframe['nome_produto_raw'])
+    xl_dataframe['instituicao'] = deal_double_spaces_series(xl_dataframe['instituicao_raw'])
+    # 'codigo_isin', 'tipo_produto', 'motivo' are directly mapped
+
+    # Convert numeric columns
+    xl_dataframe['quantidade'] = pd.to_numeric(xl_dataframe['quantidade_raw'], errors='coerce')
+    xl_dataframe['quantidade_disponivel'] = pd.to_numeric(xl_dataframe['quantidade_disponivel_raw'], errors='coerce')
+    xl_dataframe['quantidade_indisponivel'] = pd.to_numeric(xl_dataframe['quantidade_indisponivel_raw'], errors='coerce')
+    xl_dataframe['preco_unitario'] = pd.to_numeric(xl_dataframe['preco_unitario_raw'], errors='coerce')
+    xl_dataframe['valor_operacao'] = pd.to_numeric(xl_dataframe['valor_operacao_raw'], errors='coerce')
+
+    # Add metadata
+    normalized_sheet_name = SU.normalize_names([xl_sheet])[0]
+    xl_dataframe['arquivo_origem'] = f'{schema_file_name}_{normalized_sheet_name}'
+    xl_dataframe['data_referencia'] = schema_file_date
+
+    # Ensure all expected columns exist
+    for field in FIELDS:
+        if field not in xl_dataframe.columns:
+            xl_dataframe[field] = None
+
+    return xl_dataframe[FIELDS].copy()
 
 
 def process_schema_posicao_etf(input_files: List[str]) -> Optional[pd.DataFrame]:
@@ -31,24 +142,6 @@ def process_schema_posicao_etf(input_files: List[str]) -> Optional[pd.DataFrame]
         return pd.DataFrame()
 
     xl_dataframes = []
-    fields = [
-        'codigo_produto',
-        'nome_produto',
-        'instituicao',
-        'conta',
-        'codigo_isin',
-        'tipo_produto',
-        'quantidade',
-        'quantidade_disponivel',
-        'quantidade_indisponivel',
-        'motivo',
-        'preco_unitario', # Corresponds to 'Preço de Fechamento'
-        'valor_operacao', # Corresponds to 'Valor Atualizado'
-        'arquivo_origem',
-        'data_referencia'
-    ]
-
-    xl_sheet_to_process = 'ETF'
 
     for schema_file in input_files:
         try:
@@ -58,86 +151,15 @@ def process_schema_posicao_etf(input_files: List[str]) -> Optional[pd.DataFrame]
                  print(f"Warning: Skipping file {schema_file} as it doesn't appear to be a 'posicao' type.")
                  continue
 
-            xl_obj = XL.ExcelWorkbook(schema_file)
-
-            if xl_sheet_to_process in xl_obj.sheet_names:
-                xl_table = _tuple_as_str(tuple(xl_obj.read_sheet(xl_sheet_to_process)))
-
-                if not xl_table or len(xl_table) < 2:
-                    print(f"Warning: Sheet '{xl_sheet_to_process}' in {schema_file} contains no data or header.")
-                    continue # Skip file if sheet is empty
-
-                header = xl_table[0]
-                data = xl_table[1:]
-                xl_dataframe = pd.DataFrame(data, columns=header)
-
-                if 'Produto' in xl_dataframe.columns:
-                    xl_dataframe = xl_dataframe[xl_dataframe['Produto'] != ''].copy()
-                else:
-                    print(f"Warning: 'Produto' column not found in sheet '{xl_sheet_to_process}' of {schema_file}.")
-                    continue # Skip file if essential column is missing
-
-                if xl_dataframe.empty:
-                    print(f"Warning: No data left in sheet '{xl_sheet_to_process}' of {schema_file} after filtering.")
-                    continue
-
-                # --- Data Cleaning and Transformation ---
-                column_mapping = {
-                    'Código de Negociação': 'codigo_produto_raw',
-                    'Produto': 'nome_produto_raw',
-                    'Instituição': 'instituicao_raw',
-                    'Conta': 'conta_raw',
-                    'Código ISIN / Distribuição': 'codigo_isin',
-                    'Tipo': 'tipo_produto',
-                    'Quantidade': 'quantidade_raw',
-                    'Quantidade Disponível': 'quantidade_disponivel_raw',
-                    'Quantidade Indisponível': 'quantidade_indisponivel_raw',
-                    'Motivo': 'motivo',
-                    'Preço de Fechamento': 'preco_unitario_raw',
-                    'Valor Atualizado': 'valor_operacao_raw',
-                }
-
-                rename_dict = {k: v for k, v in column_mapping.items() if k in xl_dataframe.columns}
-                required_raw_cols = ['codigo_produto_raw', 'nome_produto_raw', 'instituicao_raw']
-                if not all(col in rename_dict.values() for col in required_raw_cols):
-                     print(f"Warning: Missing one or more essential columns in sheet '{xl_sheet_to_process}' of {schema_file}. Skipping file.")
-                     continue
-
-                xl_dataframe = xl_dataframe[list(rename_dict.keys())].rename(columns=rename_dict)
-
-                # Handle missing 'Conta' column
-                if 'conta_raw' not in xl_dataframe.columns:
-                    xl_dataframe['conta'] = '000000000'
-                else:
-                    xl_dataframe['conta'] = xl_dataframe['conta_raw'].apply(deal_double_spaces)
-
-                # Apply transformations
-                xl_dataframe['codigo_produto'] = xl_dataframe['codigo_produto_raw'].apply(deal_double_spaces)
-                xl_dataframe['nome_produto'] = xl_dataframe['nome_produto_raw'].apply(deal_double_spaces)
-                xl_dataframe['instituicao'] = xl_dataframe['instituicao_raw'].apply(deal_double_spaces)
-                # 'codigo_isin', 'tipo_produto', 'motivo' are directly mapped
-
-                # Convert numeric columns
-                xl_dataframe['quantidade'] = pd.to_numeric(xl_dataframe['quantidade_raw'], errors='coerce')
-                xl_dataframe['quantidade_disponivel'] = pd.to_numeric(xl_dataframe['quantidade_disponivel_raw'], errors='coerce')
-                xl_dataframe['quantidade_indisponivel'] = pd.to_numeric(xl_dataframe['quantidade_indisponivel_raw'], errors='coerce')
-                xl_dataframe['preco_unitario'] = pd.to_numeric(xl_dataframe['preco_unitario_raw'], errors='coerce')
-                xl_dataframe['valor_operacao'] = pd.to_numeric(xl_dataframe['valor_operacao_raw'], errors='coerce')
-
-                # Add metadata
-                normalized_sheet_name = SU.normalize_names([xl_sheet_to_process])[0]
-                xl_dataframe['arquivo_origem'] = f'{schema_file_name}_{normalized_sheet_name}'
-                xl_dataframe['data_referencia'] = schema_file_date
-
-                # Ensure all expected columns exist
-                for field in fields:
-                    if field not in xl_dataframe.columns:
-                        xl_dataframe[field] = None
-
-                xl_dataframes.append(xl_dataframe[fields].copy())
-            else:
-                print(f"Info: Sheet '{xl_sheet_to_process}' not found in {schema_file}.")
+            xl_sheet = SHEETS[0]
+            xl_frames = read_sheet_frames(schema_file, SHEETS)
 
+            if xl_sheet in xl_frames:
+                xl_dataframe = transform_sheet(xl_frames[xl_sheet], xl_sheet, schema_file, schema_file_name, schema_file_date)
+                if xl_dataframe is not None:
+                    xl_dataframes.append(xl_dataframe)
+            else:
+                print(f"Info: Sheet '{xl_sheet}' not found in {schema_file}.")
 
         except ValueError as e:
             print(f"Error processing file {schema_file}: {e}")
@@ -145,6 +167,6 @@ def process_schema_posicao_etf(input_files: List[str]) -> Optional[pd.DataFrame]
             print(f"An unexpected error occurred while processing {schema_file}: {e}")
 
     if not xl_dataframes:
-        return pd.DataFrame(columns=fields)
+        return pd.DataFrame(columns=FIELDS)
 
     return pd.concat(xl_dataframes, ignore_index=True)
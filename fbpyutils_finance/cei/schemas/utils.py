@@ -4,6 +4,9 @@ import re
 from datetime import date, datetime
 from typing import List, Tuple, Optional, Any, Union, Callable
 
+import numpy as np
+import pandas as pd
+
 # Lambdas for common data conversions in CEI files
 _str_to_date: Callable[[str], Optional[date]] = lambda x: None if x in ['-'] else datetime.strptime(x, '%d/%m/%Y').date()
 _str_to_number: Callable[[Any], Optional[float]] = lambda x: None if x in ['-'] else float(str(x).replace('.','~').replace(',','.').replace('~',''))
@@ -132,3 +135,100 @@ def extract_product_id(product: str, sep: str = '-') -> str:
             return product # Should not happen if product is not empty
 
     return product # Fallback if no parts or other conditions met
+
+
+# Series versions of the conversions above, used by the schema processors on whole columns
+
+_TICKER_PATTERN = r'[A-Z]{4}\d{1,2}'
+
+
+def _series_str_to_date(series: pd.Series, errors: str = 'raise') -> pd.Series:
+    """
+    Converts a Series of 'dd/mm/YYYY' strings to datetime64, like _str_to_date applied per value.
+
+    Args:
+        series (pd.Series): The date strings. '-' means no date.
+        errors (str, optional): 'raise' to fail on invalid dates, as _str_to_date does, or 'coerce'
+                                to turn them into NaT. Defaults to 'raise'.
+
+    Returns:
+        pd.Series: The dates as datetime64 (NaT for '-').
+
+    Raises:
+        ValueError: If errors='raise' and a value is not a valid date.
+    """
+    return pd.to_datetime(series.mask(series == '-'), format='%d/%m/%Y', errors=errors)
+
+
+def _series_str_to_number(series: pd.Series, errors: str = 'raise') -> pd.Series:
+    """
+    Converts a Series of Brazilian formatted numbers ('1.234,56') to float, like _str_to_number applied per value.
+
+    Args:
+        series (pd.Series): The number strings. '-' means no value.
+        errors (str, optional): 'raise' to fail on invalid numbers, as _str_to_number does, or 'coerce'
+                                to turn them into NaN. Defaults to 'raise'.
+
+    Returns:
+        pd.Series: The numbers as float (NaN for '-').
+
+    Raises:
+        ValueError: If errors='raise' and a value is not a valid number.
+    """
+    text = series.astype(str).str.strip().str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    return pd.to_numeric(text.mask(series == '-'), errors=errors).astype(float)
+
+
+def deal_double_spaces_series(series: pd.Series) -> pd.Series:
+    """
+    Collapses runs of spaces into single spaces in every value of a Series, like deal_double_spaces.
+
+    Args:
+        series (pd.Series): The input values (converted to string).
+
+    Returns:
+        pd.Series: The strings with consecutive spaces collapsed.
+    """
+    return series.astype(str).str.replace(r' {2,}', ' ', regex=True)
+
+
+def extract_product_id_series(series: pd.Series, sep: str = '-') -> pd.Series:
+    """
+    Extracts the product identifier of every product description of a Series, like extract_product_id.
+
+    Args:
+        series (pd.Series): The product description strings from the CEI file.
+        sep (str, optional): The separator used between the description and the code. Defaults to '-'.
+
+    Returns:
+        pd.Series: The extracted product identifiers ('' for non-string values).
+    """
+    try:
+        product = series.str.strip()
+    except AttributeError:
+        # No string values at all
+        return pd.Series('', index=series.index, dtype=object)
+    if product.empty:
+        return pd.Series([], index=series.index, dtype=object)
+
+    first = product.str.split(sep, n=1).str[0].str.strip()
+    last = product.str.rsplit(sep, n=1).str[-1].str.strip()
+
+    # Same precedence as extract_product_id: Tesouro names and values without separator are kept,
+    # then a ticker-like (or Futuro) last part, then a ticker-like first part, else the last part
+    conditions = [
+        product.isna().to_numpy(),
+        product.str.contains('Tesouro', regex=False, na=False).to_numpy(),
+        ~product.str.contains(sep, regex=False, na=False).to_numpy(),
+        (last.str.fullmatch(_TICKER_PATTERN, na=False) | product.str.contains('Futuro', regex=False, na=False)).to_numpy(),
+        first.str.fullmatch(_TICKER_PATTERN, na=False).to_numpy(),
+    ]
+    choices = [
+        '',
+        product.to_numpy(dtype=object),
+        product.to_numpy(dtype=object),
+        last.to_numpy(dtype=object),
+        first.to_numpy(dtype=object),
+    ]
+    return pd.Series(np.select(conditions, choices, default=last.to_numpy(dtype=object)), index=series.index, dtype=object)
+
@@ -0,0 +1,389 @@
+# fbpyutils_finance/cei/schemas/xlsx_reader.py
+"""
+Streaming read-only reader for the XLSX reports exported by CEI.
+
+An .xlsx file is a zip archive holding one XML document per sheet. XlsxReader parses the sheet XML
+row by row (iterparse) and appends each cell straight to its column array, so a sheet is never
+materialized as a tuple of row tuples nor copied into a list of string lists before becoming a
+DataFrame. Cell values are converted the way openpyxl does (shared and inline strings, int/float
+numbers, booleans, date formatted numbers), so str(value).strip() of every cell is the same string
+the schema processors got from fbpyutils' ExcelWorkbook.
+
+read_sheet_frame and read_sheet_frames are the entry points used by the schema processors. Files
+that are not zip archives (e.g. legacy .xls) are read through ExcelWorkbook as before.
+"""
+import re
+import zipfile
+import posixpath
+import datetime
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from fbpyutils import xlsx as XL
+from .utils import _tuple_as_str
+
+_WORKBOOK_PART = 'xl/workbook.xml'
+_WORKBOOK_RELS_PART = 'xl/_rels/workbook.xml.rels'
+_SHARED_STRINGS_PART = 'xl/sharedStrings.xml'
+_STYLES_PART = 'xl/styles.xml'
+_RELATIONSHIP_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+# Built-in number formats that openpyxl reads as dates/times
+_BUILTIN_DATE_FORMATS = set(range(14, 23)) | {45, 46, 47}
+_BUILTIN_TIMEDELTA_FORMATS = {46}
+_FORMAT_LITERALS_RE = re.compile(r'"[^"]*"|\[(?!h\]|hh\]|m\]|mm\]|s\]|ss\])[^\]]*\]|\\.|_.', re.IGNORECASE)
+_DATE_FORMAT_RE = re.compile(r'[dmhysDMHYS]')
+_TIMEDELTA_FORMAT_RE = re.compile(r'\[(h+|m+|s+)\]', re.IGNORECASE)
+
+_WINDOWS_EPOCH = datetime.datetime(1899, 12, 30)
+_MAC_EPOCH = datetime.datetime(1904, 1, 1)
+
+_CELL_REF_RE = re.compile(r'([A-Z]+)(\d*)')
+
+SheetKey = Union[int, str]
+
+
+def _local_name(tag: str) -> str:
+    """Returns the tag without its namespace (transitional and strict OOXML use different ones)."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _column_index(cell_ref: str) -> Optional[int]:
+    """Returns the 0-based column index of a cell reference like 'AB12', or None if invalid."""
+    match = _CELL_REF_RE.match(cell_ref or '')
+    if not match:
+        return None
+    index = 0
+    for letter in match.group(1):
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _cast_number(value: str) -> Union[int, float]:
+    """Converts a numeric cell value like openpyxl: float if it has a decimal point or exponent, else int."""
+    if '.' in value or 'E' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+def _from_excel(value: float, epoch: datetime.datetime, as_timedelta: bool) -> Any:
+    """Converts an Excel serial date like openpyxl's from_excel."""
+    if as_timedelta:
+        return datetime.timedelta(milliseconds=round(value * 86400000))
+    day, fraction = divmod(value, 1)
+    diff = datetime.timedelta(milliseconds=round(fraction * 86400000))
+    if 0 <= value < 1 and diff.days == 0:
+        seconds = diff.seconds
+        return datetime.time(seconds // 3600, seconds // 60 % 60, seconds % 60, diff.microseconds)
+    if 0 < value < 60 and epoch == _WINDOWS_EPOCH:
+        # Excel counts the nonexistent 1900-02-29
+        day += 1
+    return epoch + datetime.timedelta(days=day) + diff
+
+
+def _is_date_format(number_format: str) -> bool:
+    """Checks whether a custom number format displays dates or times."""
+    return bool(_DATE_FORMAT_RE.search(_FORMAT_LITERALS_RE.sub('', number_format.split(';')[0])))
+
+
+class XlsxReader:
+    """
+    Read-only, streaming access to the sheets of an .xlsx workbook.
+
+    Only the workbook index, the shared strings and the date styles are loaded up front; sheet
+    rows are parsed lazily. Use it as a context manager, or call close() when done.
+    """
+
+    def __init__(self, xlsx_file: str):
+        """
+        Args:
+            xlsx_file (str): The path to the .xlsx file.
+
+        Raises:
+            ValueError: If the file is not a valid .xlsx workbook.
+        """
+        self.xlsx_file = xlsx_file
+        try:
+            self._zip = zipfile.ZipFile(xlsx_file)
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"{xlsx_file} is not an .xlsx workbook: {e}")
+        try:
+            self._sheets, self._epoch = self._read_workbook()
+            self._date_styles = self._read_date_styles()
+        except (KeyError, ET.ParseError) as e:
+            self._zip.close()
+            raise ValueError(f"Invalid .xlsx workbook {xlsx_file}: {e}")
+        self._shared_strings: Optional[List[str]] = None
+
+    def __enter__(self) -> 'XlsxReader':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the underlying zip archive."""
+        self._zip.close()
+
+    @property
+    def sheet_names(self) -> List[str]:
+        """The sheet names, in workbook order."""
+        return [name for name, _ in self._sheets]
+
+    def _read_workbook(self) -> Tuple[List[Tuple[str, str]], datetime.datetime]:
+        """Reads the sheet names, their XML parts and the date system of the workbook."""
+        targets = {}
+        if _WORKBOOK_RELS_PART in self._zip.namelist():
+            for rel in ET.fromstring(self._zip.read(_WORKBOOK_RELS_PART)):
+                target = rel.get('Target', '')
+                targets[rel.get('Id')] = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+
+        sheets, epoch = [], _WINDOWS_EPOCH
+        for elem in ET.fromstring(self._zip.read(_WORKBOOK_PART)).iter():
+            name = _local_name(elem.tag)
+            if name == 'workbookPr' and elem.get('date1904') in ('1', 'true'):
+                epoch = _MAC_EPOCH
+            elif name == 'sheet':
+                rel_id = elem.get(_RELATIONSHIP_ID) or elem.get('id')
+                part = targets.get(rel_id, f"xl/worksheets/sheet{elem.get('sheetId')}.xml")
+                sheets.append((elem.get('name'), part))
+        return sheets, epoch
+
+    def _read_date_styles(self) -> Dict[int, bool]:
+        """Maps the cell style indexes with a date format to whether they are durations ([h]:mm)."""
+        if _STYLES_PART not in self._zip.namelist():
+            return {}
+        root = ET.fromstring(self._zip.read(_STYLES_PART))
+        custom_formats = {}
+        cell_formats = []
+        for elem in root:
+            name = _local_name(elem.tag)
+            if name == 'numFmts':
+                custom_formats = {int(fmt.get('numFmtId')): fmt.get('formatCode', '') for fmt in elem}
+            elif name == 'cellXfs':
+                cell_formats = [int(xf.get('numFmtId', 0)) for xf in elem]
+
+        date_styles = {}
+        for style, format_id in enumerate(cell_formats):
+            if format_id in custom_formats:
+                number_format = custom_formats[format_id]
+                if _is_date_format(number_format):
+                    date_styles[style] = bool(_TIMEDELTA_FORMAT_RE.search(number_format))
+            elif format_id in _BUILTIN_DATE_FORMATS:
+                date_styles[style] = format_id in _BUILTIN_TIMEDELTA_FORMATS
+        return date_styles
+
+    def _get_shared_strings(self) -> List[str]:
+        """Loads the shared strings table on first use (rich text runs are concatenated)."""
+        if self._shared_strings is None:
+            self._shared_strings = []
+            if _SHARED_STRINGS_PART in self._zip.namelist():
+                with self._zip.open(_SHARED_STRINGS_PART) as source:
+                    for _, elem in ET.iterparse(source):
+                        if _local_name(elem.tag) == 'si':
+                            self._shared_strings.append(self._text(elem))
+                            elem.clear()
+        return self._shared_strings
+
+    @staticmethod
+    def _text(elem: ET.Element) -> str:
+        """Returns the text of a string item (<si> or <is>), ignoring phonetic runs."""
+        parts = []
+        for child in elem:
+            name = _local_name(child.tag)
+            if name == 't':
+                parts.append(child.text or '')
+            elif name == 'r':
+                parts.extend(t.text or '' for t in child if _local_name(t.tag) == 't')
+        return ''.join(parts)
+
+    def _sheet_part(self, sheet: SheetKey) -> str:
+        """Returns the XML part of a sheet given by name or 0-based index."""
+        if isinstance(sheet, int):
+            if not 0 <= sheet < len(self._sheets):
+                raise ValueError(f"Sheet index {sheet} out of range in {self.xlsx_file}.")
+            return self._sheets[sheet][1]
+        for name, part in self._sheets:
+            if name == sheet:
+                return part
+        raise ValueError(f"Sheet '{sheet}' not found in {self.xlsx_file}.")
+
+    def _cell_value(self, cell: ET.Element) -> Any:
+        """Converts a <c> element to its Python value, like openpyxl."""
+        cell_type = cell.get('t', 'n')
+        value = None
+        for child in cell:
+            name = _local_name(child.tag)
+            if name == 'v':
+                value = child.text
+            elif name == 'is':
+                return self._text(child)
+        if value is None:
+            return None
+        if cell_type == 's':
+            return self._get_shared_strings()[int(value)]
+        if cell_type == 'b':
+            return bool(int(value))
+        if cell_type in ('str', 'e', 'inlineStr', 'd'):
+            return value
+        number = _cast_number(value)
+        style = cell.get('s')
+        if style is not None and int(style) in self._date_styles:
+            return _from_excel(number, self._epoch, self._date_styles[int(style)])
+        return number
+
+    def _iter_cells(self, sheet: SheetKey) -> Iterator[Tuple[int, List[Tuple[int, Any]]]]:
+        """Yields (0-based row index, [(0-based column index, value), ...]) for each <row> of a sheet."""
+        part = self._sheet_part(sheet)
+        with self._zip.open(part) as source:
+            row_index = -1
+            for _, elem in ET.iterparse(source):
+                if _local_name(elem.tag) != 'row':
+                    continue
+                row_ref = elem.get('r')
+                row_index = int(row_ref) - 1 if row_ref else row_index + 1
+                cells, col_index = [], -1
+                for cell in elem:
+                    if _local_name(cell.tag) != 'c':
+                        continue
+                    ref_index = _column_index(cell.get('r'))
+                    col_index = ref_index if ref_index is not None else col_index + 1
+                    cells.append((col_index, self._cell_value(cell)))
+                elem.clear()
+                yield row_index, cells
+
+    def iter_rows(self, sheet: SheetKey = 0) -> Iterator[Tuple[Any, ...]]:
+        """
+        Lazily yields the rows of a sheet as tuples of cell values.
+
+        Rows start at the first row of the sheet; missing rows and cells are None, and every row
+        is padded to the width of the widest row seen so far.
+
+        Args:
+            sheet (Union[int, str], optional): The sheet name or 0-based index. Defaults to 0.
+
+        Yields:
+            Tuple[Any, ...]: The cell values of one row.
+
+        Raises:
+            ValueError: If the sheet does not exist.
+        """
+        width, next_row = 0, 0
+        for row_index, cells in self._iter_cells(sheet):
+            if cells:
+                width = max(width, max(col_index for col_index, _ in cells) + 1)
+            for _ in range(next_row, row_index):
+                yield (None,) * width
+            row = [None] * width
+            for col_index, value in cells:
+                row[col_index] = value
+            next_row = row_index + 1
+            yield tuple(row)
+
+    def read_columns(self, sheet: SheetKey = 0) -> List[List[str]]:
+        """
+        Reads a sheet into column arrays of stripped strings, header first in each column.
+
+        Each cell is appended straight to its column, so the rows are never held together as
+        row lists. Values are str(value).strip(), the same strings _tuple_as_str produces from the
+        rows of ExcelWorkbook (missing cells become 'None'). The sheet is rectangular: columns are
+        padded to the same length.
+
+        Args:
+            sheet (Union[int, str], optional): The sheet name or 0-based index. Defaults to 0.
+
+        Returns:
+            List[List[str]]: One list per column, with one entry per row.
+
+        Raises:
+            ValueError: If the sheet does not exist.
+        """
+        columns: List[List[str]] = []
+        rows = 0
+        for row_index, cells in self._iter_cells(sheet):
+            for col_index, value in cells:
+                while col_index >= len(columns):
+                    columns.append(['None'] * rows)
+                column = columns[col_index]
+                if len(column) < row_index:
+                    column.extend(['None'] * (row_index - len(column)))
+                column.append(str(value).strip())
+            rows = row_index + 1
+        for column in columns:
+            if len(column) < rows:
+                column.extend(['None'] * (rows - len(column)))
+        return columns
+
+
+def _columns_to_frame(columns: List[List[str]]) -> pd.DataFrame:
+    """Builds a DataFrame from column arrays whose first entry is the header (duplicate names are kept)."""
+    if not columns:
+        return pd.DataFrame()
+    xl_dataframe = pd.DataFrame({i: column[1:] for i, column in enumerate(columns)})
+    xl_dataframe.columns = [column[0] for column in columns]
+    return xl_dataframe
+
+
+def _rows_to_frame(rows: Any) -> pd.DataFrame:
+    """Builds a DataFrame from ExcelWorkbook rows, header row first."""
+    xl_table = _tuple_as_str(tuple(rows))
+    if not xl_table:
+        return pd.DataFrame()
+    return pd.DataFrame(xl_table[1:], columns=xl_table[0])
+
+
+def read_sheet_frame(schema_file: str, sheet: SheetKey = 0) -> pd.DataFrame:
+    """
+    Reads one sheet of a CEI report into a DataFrame of stripped strings.
+
+    The first row is the header. .xlsx files are streamed with XlsxReader; other files are read
+    with fbpyutils' ExcelWorkbook.
+
+    Args:
+        schema_file (str): The path to the Excel file.
+        sheet (Union[int, str], optional): The sheet name or 0-based index. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: The sheet data (no rows if the sheet has only a header; no columns if it is empty).
+
+    Raises:
+        ValueError: If the sheet does not exist or the file is invalid.
+    """
+    if zipfile.is_zipfile(schema_file):
+        with XlsxReader(schema_file) as reader:
+            return _columns_to_frame(reader.read_columns(sheet))
+    xl_obj = XL.ExcelWorkbook(schema_file)
+    if isinstance(sheet, int):
+        return _rows_to_frame(xl_obj.read_sheet_by_index(sheet))
+    return _rows_to_frame(xl_obj.read_sheet(sheet))
+
+
+def read_sheet_frames(schema_file: str, sheet_names: Sequence[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Opens a CEI report once and reads the requested sheets it contains into DataFrames.
+
+    Args:
+        schema_file (str): The path to the Excel file.
+        sheet_names (Sequence[str]): The sheets to read. Sheets missing from the workbook are ignored.
+
+    Returns:
+        Dict[str, pd.DataFrame]: The data of each sheet found, as in read_sheet_frame.
+
+    Raises:
+        ValueError: If the file is invalid.
+    """
+    if zipfile.is_zipfile(schema_file):
+        with XlsxReader(schema_file) as reader:
+            available = set(reader.sheet_names)
+            return {
+                xl_sheet: _columns_to_frame(reader.read_columns(xl_sheet))
+                for xl_sheet in dict.fromkeys(sheet_names) if xl_sheet in available
+            }
+    xl_obj = XL.ExcelWorkbook(schema_file)
+    available = set(xl_obj.sheet_names)
+    return {
+        xl_sheet: _rows_to_frame(xl_obj.read_sheet(xl_sheet))
+        for xl_sheet in dict.fromkeys(sheet_names) if xl_sheet in available
+    }
@@ -36,33 +36,30 @@ HEADERS_FILE = os.path.join(FI.APP_FOLDER, 'cvm', 'data', 'if_headers_v4.xlsx')
 # Path to the Excel file containing the base mapping templates (used to generate HEADERS_FILE).
 HEADER_MAPPINGS_FILE = os.path.join(FI.APP_FOLDER, 'cvm', 'data', 'if_header_mappings.xlsx')
 
-# --- Load Header Data ---
-# Load header definitions and mappings into pandas DataFrames upon package import.
-# This makes them readily available to the CVM client and processing functions.
-
-HEADERS = None
-HEADER_MAPPINGS = None
-_initialization_error = None
+# Folder for the binary (pickle) caches of the header tables, invalidated when the Excel files change.
+HEADERS_CACHE_FOLDER = os.path.join(FI.USER_APP_FOLDER, 'cache')
 
-try:
-    if not os.path.exists(HEADERS_FILE):
-        _initialization_error = FileNotFoundError(f"CVM Headers File not found at: {HEADERS_FILE}")
-    else:
-        HEADERS = pd.read_excel(HEADERS_FILE, sheet_name='IF_HEADERS')
+# --- Load Header Data ---
+# HEADERS and HEADER_MAPPINGS are loaded on first access (module __getattr__), so importing the
+# package (e.g. only for its converters) or starting a worker process does not parse the Excel files.
 
-    if not os.path.exists(HEADER_MAPPINGS_FILE):
-         # Allow HEADER_MAPPINGS to be missing if only running updates? No, needed for header checks.
-        _initialization_error = FileNotFoundError(f"CVM Header Mappings File not found at: {HEADER_MAPPINGS_FILE}")
-    else:
-        HEADER_MAPPINGS = pd.read_excel(HEADER_MAPPINGS_FILE, sheet_name='IF_HEADERS')
+_LAZY_HEADER_TABLES = {
+    'HEADERS': HEADERS_FILE,
+    'HEADER_MAPPINGS': HEADER_MAPPINGS_FILE,
+}
 
-except Exception as e:
-    _initialization_error = RuntimeError(f"Failed to load CVM header files: {e}")
 
-# Raise error after trying to load both, providing a clear message
-if _initialization_error:
-    print(f"FATAL: Failed to initialize fbpyutils_finance.cvm package: {_initialization_error}")
-    raise _initialization_error
+def __getattr__(name: str):
+    if name in _LAZY_HEADER_TABLES:
+        try:
+            table = load_cvm_headers_table(_LAZY_HEADER_TABLES[name], cache_folder=HEADERS_CACHE_FOLDER)
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Failed to load CVM header files: {e}") from e
+        globals()[name] = table
+        return table
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # --- Public Interface ---
@@ -73,14 +70,24 @@ if _initialization_error:
 from .cvm_client import CVM
 
 # Header management functions
-from .headers import get_cvm_updated_headers, check_cvm_headers_changed, write_cvm_headers_mappings, get_cvm_file_metadata
+from .headers import get_cvm_updated_headers, check_cvm_headers_changed, write_cvm_headers_mappings, get_cvm_file_metadata, load_cvm_headers_table
 
 # File I/O and processing (expose if needed externally)
 from .file_io import read_cvm_history_file
 from .processing import apply_expressions, apply_converters, get_expression_and_converters
+from .dataset import CVMDatasetWriter, CVMDatasetIndex, read_cvm_dataset, read_cvm_fund_series, list_cvm_dataset_partitions
+from .delta import CVMRowFingerprints
+from .loader import CVMDatabaseLoader
+from .catalog import CVMCatalog
+from .register_history import CVMRegisterHistory, compact_register_snapshots, insert_register_snapshot, register_as_of
+from .instrumentation import INSTRUMENTATION, Instrumentation, LoggingSink, MemorySink, collect_cvm_metrics
 
 # Expose the converters module itself
 from . import converters
+# Vectorized fund analytics over DIARIO_FI positions
+from . import analytics
+# Synthetic CVM files for benchmarks and tests
+from . import synthetic
 # Expose utility functions if they are intended for public use
 from .utils import * # Or list specific utils: is_nan_or_empty, make_datetime, etc.
 
@@ -99,6 +106,7 @@ __all__ = [
     'check_cvm_headers_changed',
     'write_cvm_headers_mappings',
     'get_cvm_file_metadata', # Useful for external analysis
+    'load_cvm_headers_table',
 
     # Processing/IO (Expose cautiously)
     'read_cvm_history_file',
@@ -106,9 +114,44 @@ __all__ = [
     # 'apply_converters', # Maybe too internal?
     # 'get_expression_and_converters', # Maybe too internal?
 
+    # Partitioned Dataset
+    'CVMDatasetWriter',
+    'read_cvm_dataset',
+    'list_cvm_dataset_partitions',
+    'CVMDatasetIndex',
+    'read_cvm_fund_series',
+
+    # Row-level Delta Detection
+    'CVMRowFingerprints',
+
+    # Database Bulk Loader
+    'CVMDatabaseLoader',
+
+    # Catalog Database
+    'CVMCatalog',
+
+    # Register History (SCD)
+    'CVMRegisterHistory',
+    'compact_register_snapshots',
+    'insert_register_snapshot',
+    'register_as_of',
+
+    # Instrumentation
+    'INSTRUMENTATION',
+    'Instrumentation',
+    'LoggingSink',
+    'MemorySink',
+    'collect_cvm_metrics',
+
     # Converters Module
     'converters',
 
+    # Analytics Module
+    'analytics',
+
+    # Synthetic Data Module
+    'synthetic',
+
     # Utility functions (if any are public)
     'is_nan_or_empty', # Example public utility
     # Add other public utils from .utils if needed
@@ -122,9 +165,7 @@ __all__ = [
     'TARGET_ENCODING',
     'HEADERS_FILE', # Expose paths
     'HEADER_MAPPINGS_FILE',
+    'HEADERS_CACHE_FOLDER',
 ]
 
 print("fbpyutils_finance.cvm package initialized successfully.")
-
-# Cleanup temporary variable
-del _initialization_error
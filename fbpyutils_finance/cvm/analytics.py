@@ -0,0 +1,210 @@
+'''
+Vectorized analytics over processed CVM daily fund positions (IF_POSITION / DIARIO_FI).
+
+Every function takes the whole fund universe at once, as returned by `read_cvm_history_file`
+or `read_cvm_dataset`, and computes per-fund metrics with grouped NumPy/pandas operations
+over data sorted by (fund_id, position_date). No function loops over funds.
+'''
+
+import numpy as np
+import pandas as pd
+from typing import Tuple
+
+# --- Constantes ---
+FUND_COLUMN = 'fund_id'
+DATE_COLUMN = 'position_date'
+QUOTA_COLUMN = 'quota_value'
+NET_WORTH_COLUMN = 'net_worth_value'
+CAPTURE_COLUMN = 'daily_capture_value'
+REDEMPTION_COLUMN = 'daily_redemption_value'
+NUMERIC_COLUMNS = [QUOTA_COLUMN, NET_WORTH_COLUMN, CAPTURE_COLUMN, REDEMPTION_COLUMN]
+
+TRADING_DAYS_PER_YEAR = 252
+DEFAULT_VOLATILITY_WINDOW = 21 # About one month of trading days
+
+# --- Funções de Análise ---
+
+def prepare_fund_positions(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalizes daily fund positions for the analytics functions.
+
+    Keeps the fund, date and value columns, converts values to float64 and dates to datetime64,
+    drops rows without fund or date, keeps the last row of duplicated (fund_id, position_date)
+    pairs and sorts by fund and date.
+
+    Args:
+        data (pd.DataFrame): Processed DIARIO_FI positions. Must contain fund_id and position_date;
+            missing value columns are created empty.
+
+    Returns:
+        pd.DataFrame: The normalized positions with a default RangeIndex.
+
+    Raises:
+        ValueError: If fund_id or position_date are missing.
+    """
+    missing_cols = [c for c in (FUND_COLUMN, DATE_COLUMN) if c not in data.columns]
+    if missing_cols:
+        raise ValueError(f"Fund positions must contain the columns: {missing_cols}")
+
+    positions = pd.DataFrame({
+        FUND_COLUMN: data[FUND_COLUMN].astype(object),
+        DATE_COLUMN: pd.to_datetime(data[DATE_COLUMN], errors='coerce'),
+    })
+    for col in NUMERIC_COLUMNS:
+        values = pd.to_numeric(data[col], errors='coerce') if col in data.columns else pd.Series(np.nan, index=data.index)
+        positions[col] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    positions = positions[positions[FUND_COLUMN].notna() & positions[DATE_COLUMN].notna()]
+    positions = positions.sort_values([FUND_COLUMN, DATE_COLUMN], kind='stable')
+    positions = positions.drop_duplicates([FUND_COLUMN, DATE_COLUMN], keep='last')
+    return positions.reset_index(drop=True)
+
+
+def _group_bounds(fund_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns, for rows sorted by fund, the start index of every group and each row's group start."""
+    n = len(fund_ids)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, fund_ids[1:] != fund_ids[:-1]])
+    row_starts = np.repeat(starts, np.diff(np.r_[starts, n]))
+    return starts, row_starts
+
+
+def _rolling_std(values: np.ndarray, row_starts: np.ndarray, window: int) -> np.ndarray:
+    """Sample standard deviation over a trailing window that does not cross group boundaries."""
+    # Grouped rolling keeps each fund's running sums apart: global cumulative sums would carry
+    # the rounding error of a fund with large values into the windows of every later fund
+    rolling = pd.Series(values).groupby(row_starts, sort=False).rolling(window, min_periods=window).std()
+    return rolling.droplevel(0).sort_index().to_numpy(dtype=np.float64)
+
+
+def compute_daily_metrics(
+    data: pd.DataFrame,
+    window: int = DEFAULT_VOLATILITY_WINDOW,
+    periods_per_year: int = TRADING_DAYS_PER_YEAR
+) -> pd.DataFrame:
+    """
+    Computes per-day metrics for every fund.
+
+    Args:
+        data (pd.DataFrame): Processed DIARIO_FI positions (see prepare_fund_positions).
+        window (int, optional): Window, in observations, of the rolling volatility. Defaults to 21.
+        periods_per_year (int, optional): Observations per year used to annualize volatility. Defaults to 252.
+
+    Returns:
+        pd.DataFrame: The normalized positions plus the columns:
+            - daily_return: quota_value change from the fund's previous observation.
+            - rolling_volatility: annualized standard deviation of the last `window` daily returns.
+            - drawdown: quota_value relative to its running maximum, minus 1 (<= 0).
+            - net_flow: daily_capture_value minus daily_redemption_value.
+    """
+    positions = prepare_fund_positions(data)
+    fund_ids = positions[FUND_COLUMN].to_numpy()
+    starts, row_starts = _group_bounds(fund_ids)
+    quota = positions[QUOTA_COLUMN].to_numpy()
+
+    previous = np.r_[np.nan, quota[:-1]] if len(quota) else quota
+    previous[starts] = np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+        daily_return = quota / previous - 1.0
+    daily_return[~np.isfinite(daily_return)] = np.nan
+
+    running_max = positions.groupby(FUND_COLUMN, sort=False)[QUOTA_COLUMN].cummax().to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drawdown = quota / running_max - 1.0
+
+    positions['daily_return'] = daily_return
+    positions['rolling_volatility'] = _rolling_std(daily_return, row_starts, window) * np.sqrt(periods_per_year)
+    positions['drawdown'] = drawdown
+    positions['net_flow'] = np.nan_to_num(positions[CAPTURE_COLUMN].to_numpy()) - np.nan_to_num(positions[REDEMPTION_COLUMN].to_numpy())
+    return positions
+
+
+def compute_monthly_returns(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes monthly returns and net flows for every fund.
+
+    The monthly return compares the last quota_value of a month with the last quota_value of the
+    fund's previous month with data.
+
+    Args:
+        data (pd.DataFrame): Processed DIARIO_FI positions (see prepare_fund_positions).
+
+    Returns:
+        pd.DataFrame: One row per (fund_id, period) with the columns period ('YYYY-MM'), quota_value
+            (last of the month), net_worth_value (last of the month), net_flow (sum of the month)
+            and monthly_return.
+    """
+    positions = prepare_fund_positions(data)
+    positions['period'] = positions[DATE_COLUMN].dt.strftime('%Y-%m')
+    positions['net_flow'] = np.nan_to_num(positions[CAPTURE_COLUMN].to_numpy()) - np.nan_to_num(positions[REDEMPTION_COLUMN].to_numpy())
+
+    grouped = positions.groupby([FUND_COLUMN, 'period'], sort=True)
+    monthly = grouped[[QUOTA_COLUMN, NET_WORTH_COLUMN]].last()
+    monthly['net_flow'] = grouped['net_flow'].sum()
+    monthly = monthly.reset_index()
+
+    previous = monthly.groupby(FUND_COLUMN, sort=False)[QUOTA_COLUMN].shift(1)
+    monthly['monthly_return'] = (monthly[QUOTA_COLUMN] / previous - 1.0).replace([np.inf, -np.inf], np.nan)
+    return monthly
+
+
+def compute_fund_metrics(
+    data: pd.DataFrame,
+    window: int = DEFAULT_VOLATILITY_WINDOW,
+    periods_per_year: int = TRADING_DAYS_PER_YEAR
+) -> pd.DataFrame:
+    """
+    Computes summary metrics for every fund over the whole period in the data.
+
+    Args:
+        data (pd.DataFrame): Processed DIARIO_FI positions (see prepare_fund_positions).
+        window (int, optional): Window of the rolling volatility (see compute_daily_metrics). Defaults to 21.
+        periods_per_year (int, optional): Observations per year used to annualize. Defaults to 252.
+
+    Returns:
+        pd.DataFrame: One row per fund_id with the columns:
+            - start_date, end_date, observations
+            - total_return: last quota_value over first quota_value, minus 1.
+            - annualized_return: total_return compounded to periods_per_year observations.
+            - volatility: annualized standard deviation of all daily returns.
+            - last_rolling_volatility: rolling volatility at the last observation.
+            - max_drawdown: worst drawdown in the period (<= 0).
+            - net_flow: sum of subscriptions minus redemptions.
+            - net_worth_start, net_worth_end: first and last net_worth_value.
+            - equity_growth: net_worth_end over net_worth_start, minus 1.
+            - organic_growth: net_flow over net_worth_start (growth explained by flows).
+    """
+    daily = compute_daily_metrics(data, window=window, periods_per_year=periods_per_year)
+    grouped = daily.groupby(FUND_COLUMN, sort=False)
+
+    metrics = grouped.agg(
+        start_date=(DATE_COLUMN, 'first'),
+        end_date=(DATE_COLUMN, 'last'),
+        observations=(DATE_COLUMN, 'size'),
+        quota_start=(QUOTA_COLUMN, 'first'),
+        quota_end=(QUOTA_COLUMN, 'last'),
+        volatility=('daily_return', 'std'),
+        return_count=('daily_return', 'count'),
+        max_drawdown=('drawdown', 'min'),
+        net_flow=('net_flow', 'sum'),
+        net_worth_start=(NET_WORTH_COLUMN, 'first'),
+        net_worth_end=(NET_WORTH_COLUMN, 'last'),
+    )
+    # Taken by position: 'last' would skip a NaN volatility at the last observation
+    starts, _ = _group_bounds(daily[FUND_COLUMN].to_numpy())
+    metrics['last_rolling_volatility'] = daily['rolling_volatility'].to_numpy()[np.r_[starts[1:], len(daily)] - 1]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        metrics['total_return'] = metrics['quota_end'] / metrics['quota_start'] - 1.0
+        metrics['annualized_return'] = np.power(1.0 + metrics['total_return'], periods_per_year / metrics['return_count']) - 1.0
+        metrics['equity_growth'] = metrics['net_worth_end'] / metrics['net_worth_start'] - 1.0
+        metrics['organic_growth'] = metrics['net_flow'] / metrics['net_worth_start']
+    metrics['volatility'] = metrics['volatility'] * np.sqrt(periods_per_year)
+    metrics = metrics.replace([np.inf, -np.inf], np.nan)
+
+    return metrics[[
+        'start_date', 'end_date', 'observations', 'total_return', 'annualized_return', 'volatility',
+        'last_rolling_volatility', 'max_drawdown', 'net_flow', 'net_worth_start', 'net_worth_end',
+        'equity_growth', 'organic_growth',
+    ]].reset_index()
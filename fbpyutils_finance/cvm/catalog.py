@@ -0,0 +1,141 @@
+'''
+Thread-safe access to the CVM catalog database.
+
+The catalog is a SQLite database shared by catalog updates (downloads), processing and the pool
+workers. CVMCatalog opens one connection per thread, all in WAL mode, so readers never block the
+writer, and each connection waits up to `timeout` seconds for the write lock instead of failing.
+Multi-statement writes run in transaction(), which takes the write lock up front (BEGIN IMMEDIATE)
+to avoid deadlocks when two threads upgrade from read to write.
+'''
+
+import logging
+import sqlite3
+import threading
+import contextlib
+from typing import Iterator, List, Union
+
+logger = logging.getLogger(__name__)
+
+# --- Constantes ---
+DEFAULT_TIMEOUT = 30 # Seconds waiting for the write lock
+CATALOG_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL', # Safe with WAL; only the last transactions may be lost on power failure
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-32768', # 32 MiB page cache
+    'PRAGMA foreign_keys=ON',
+]
+
+# --- Funções de Conexão ---
+
+def connect_catalog(db_path: str, timeout: float = DEFAULT_TIMEOUT, check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    Opens a catalog database connection with the catalog pragmas applied.
+
+    Args:
+        db_path (str): Path to the catalog database file.
+        timeout (float, optional): Seconds to wait for locks. Defaults to 30.
+        check_same_thread (bool, optional): Forbid use from other threads (sqlite3 default). Defaults to True.
+
+    Returns:
+        sqlite3.Connection: The open connection.
+    """
+    connection = sqlite3.connect(db_path, timeout=timeout, check_same_thread=check_same_thread)
+    for pragma in CATALOG_PRAGMAS:
+        try:
+            connection.execute(pragma)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not apply '{pragma}' to catalog {db_path}: {e}")
+    return connection
+
+
+class CVMCatalog:
+    """
+    Per-thread connections to the catalog database.
+
+    connection() returns the calling thread's connection, opening it on first use. close() closes
+    the connections of every thread.
+    """
+
+    def __init__(self, db_path: str, timeout: float = DEFAULT_TIMEOUT):
+        """
+        Args:
+            db_path (str): Path to the catalog database file.
+            timeout (float, optional): Seconds to wait for locks. Defaults to 30.
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the calling thread.
+
+        Raises:
+            sqlite3.Error: If the database cannot be opened.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # Connections are only used by their thread; check_same_thread=False lets close() run anywhere
+            connection = connect_catalog(self.db_path, self.timeout, check_same_thread=False)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Runs a block in a write transaction of the calling thread's connection.
+
+        The write lock is taken when the block starts. The transaction is committed when the block
+        exits and rolled back if it raises. Nested use joins the transaction of the outer block.
+        An implicit transaction left open on the connection (statements run without commit) is
+        committed first, so the block's outcome never depends on it.
+
+        Yields:
+            sqlite3.Cursor: A cursor of the thread's connection.
+        """
+        connection = self.connection()
+        depth = getattr(self._local, 'transaction_depth', 0)
+        if depth:
+            self._local.transaction_depth = depth + 1
+            try:
+                yield connection.cursor()
+            finally:
+                self._local.transaction_depth = depth
+            return
+        if connection.in_transaction:
+            connection.commit()
+        connection.execute('BEGIN IMMEDIATE')
+        self._local.transaction_depth = 1
+        try:
+            yield connection.cursor()
+        except BaseException:
+            connection.rollback()
+            raise
+        else:
+            connection.commit()
+        finally:
+            self._local.transaction_depth = 0
+
+    def close(self):
+        """Closes the connections of every thread."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Error closing catalog connection to {self.db_path}: {e}")
+        self._local = threading.local()
+
+
+CatalogSource = Union[sqlite3.Connection, str, CVMCatalog]
+
+
+def resolve_catalog_connection(catalog: CatalogSource) -> sqlite3.Connection:
+    """Returns the connection to use for a catalog given as a connection or a CVMCatalog (calling thread's connection)."""
+    return catalog.connection() if isinstance(catalog, CVMCatalog) else catalog
@@ -249,4 +249,25 @@ def as_string_id(value: Any) -> Optional[str]:
         # Use regex for efficient removal of multiple characters
         return re.sub(r'[./-]', '', str(value))
 
+# --- Aliases used by the header mapping files ---
+# The mappings reference the converters as as_string, as_boolean and as_integer.
+as_string = as_str
+as_boolean = as_bool
+as_integer = as_int
+
+# --- Nullable dtypes produced by each converter (see processing.apply_converters) ---
+CONVERTER_DTYPES = {
+    'as_int': 'Int64',
+    'as_integer': 'Int64',
+    'as_float': 'Float64',
+    'as_bool': 'boolean',
+    'as_boolean': 'boolean',
+    'as_str': 'string',
+    'as_string': 'string',
+    'as_string_id': 'string',
+    'clean_cnpj': 'string',
+    'as_date': 'datetime64[ns]',
+    'as_datetime': 'datetime64[ns]',
+}
+
 # --- Add more specific converters as needed based on CVM data fields ---
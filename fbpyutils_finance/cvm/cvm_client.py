@@ -1,20 +1,30 @@
 import os
+import logging
 import sqlite3
 import pandas as pd
 from datetime import datetime
-from typing import Optional, List, Dict, Tuple, Any
+from multiprocessing import Pool
+from typing import Optional, List, Dict, Tuple, Any, Callable, Union
 
 # Import necessary components from the project structure
 import fbpyutils_finance as FI
-import fbpyutils.file as FU
 from fbpyutils.debug import debug_info
 
 # Import functions from the new submodules within the cvm package
 from .remote import get_remote_files_list, update_cvm_history_file
-from .file_io import read_cvm_history_file
+from .file_io import read_cvm_history_file, index_history_folder
+from .dataset import CVMDatasetWriter, read_cvm_dataset, read_cvm_fund_series, list_cvm_dataset_partitions
+from .converters import as_string_id
+from .utils import timelapse
+from .delta import CVMRowFingerprints
+from .register_history import CVMRegisterHistory
 # headers.py functions are usually used *before* initializing CVM or passed in,
 # but check_cvm_headers_changed might be useful internally if needed.
-from .headers import check_cvm_headers_changed
+from .headers import check_cvm_headers_changed, CVMHeaderCache
+from .instrumentation import INSTRUMENTATION, MemorySink
+from .catalog import CVMCatalog, CatalogSource
+
+logger = logging.getLogger(__name__)
 
 # --- Constantes Globais (Podem ser movidas para um config.py se crescerem) ---
 # Defined here for clarity, but could be imported from __init__ or config
@@ -23,6 +33,54 @@ URL_IF_REGISTER_HIST = "http://dados.cvm.gov.br/dados/FI/CAD/DADOS/HIST"
 URL_IF_DAILY = "http://dados.cvm.gov.br/dados/FI/DOC/INF_DIARIO/DADOS"
 URL_IF_DAILY_HIST = "http://dados.cvm.gov.br/dados/FI/DOC/INF_DIARIO/DADOS/HIST"
 
+# --- Process Pool Workers ---
+# Header mappings are sent once per worker process (pool initializer) instead of once per file.
+_WORKER_HEADERS_DF: Optional[pd.DataFrame] = None
+_WORKER_HEADER_CACHE: Optional[CVMHeaderCache] = None
+_WORKER_METRICS: Optional[MemorySink] = None
+
+
+def _init_process_worker(
+    headers_df: pd.DataFrame,
+    header_cache_catalog: Optional[CatalogSource] = None,
+    forward_metrics: Optional[bool] = None
+):
+    """
+    Stores the header mappings in the worker process and opens its header metadata cache.
+
+    With forward_metrics set (pool workers), the worker's instrumentation sinks are replaced: events
+    are collected and returned with each task result when True, and dropped when False.
+    """
+    global _WORKER_HEADERS_DF, _WORKER_HEADER_CACHE, _WORKER_METRICS
+    _WORKER_HEADERS_DF = headers_df
+    _WORKER_HEADER_CACHE = CVMHeaderCache(header_cache_catalog) if header_cache_catalog is not None else None
+    if forward_metrics is not None:
+        _WORKER_METRICS = MemorySink() if forward_metrics else None
+        INSTRUMENTATION.sinks = [_WORKER_METRICS] if forward_metrics else []
+
+
+def _process_cvm_file(task: Tuple[str, str, str, bool]) -> Tuple[str, str, str, Optional[Tuple[str, str, pd.DataFrame, List[str]]], Optional[str], List[Dict[str, Any]]]:
+    """
+    Processes a single CVM file inside a worker process.
+
+    Args:
+        task (Tuple[str, str, str, bool]): (group_kind, group_name, cvm_file, check_header).
+
+    Returns:
+        Tuple: (group_kind, group_name, cvm_file, result, error, events), where result is the tuple returned
+               by read_cvm_history_file (or None on failure), error is the error message (or None) and
+               events are the instrumentation events to replay in the parent process.
+    """
+    group_kind, group_name, cvm_file, check_header = task
+    result, error = None, None
+    try:
+        result = read_cvm_history_file(cvm_file, _WORKER_HEADERS_DF, apply_conversions=True, check_header=check_header,
+                                       header_cache=_WORKER_HEADER_CACHE)
+    except Exception as e:
+        error = str(e)
+    events = _WORKER_METRICS.drain() if _WORKER_METRICS is not None else []
+    return group_kind, group_name, cvm_file, result, error, events
+
 # --- Classe Principal CVM ---
 
 class CVM:
@@ -59,13 +117,13 @@ class CVM:
         if not os.path.exists(history_folder):
             try:
                 os.makedirs(history_folder, exist_ok=True) # exist_ok=True avoids error if dir exists
-                print(f"Ensured history folder exists: {history_folder}")
+                logger.info(f"Ensured history folder exists: {history_folder}")
             except OSError as e:
-                print(f"Error creating history folder {history_folder}: {e}")
+                logger.error(f"Error creating history folder {history_folder}: {e}")
                 raise # Re-raise error if folder creation fails
         return history_folder
 
-    def __init__(self, headers_df: pd.DataFrame, catalog_db_path: Optional[str] = None, history_folder: Optional[str] = None):
+    def __init__(self, headers_df: pd.DataFrame, catalog_db_path: Optional[str] = None, history_folder: Optional[str] = None, dataset_folder: Optional[str] = None):
         """
         Initializes the CVM client.
 
@@ -75,6 +133,9 @@ class CVM:
                 If None, defaults to 'catalog.db' within USER_APP_FOLDER. Defaults to None.
             history_folder (Optional[str], optional): Path to the folder for storing downloaded CVM files.
                 If None, uses the default from check_history_folder. Defaults to None.
+            dataset_folder (Optional[str], optional): Path to the partitioned dataset of processed data.
+                If None, defaults to a subfolder 'dataset' within USER_APP_FOLDER (created on first write).
+                Defaults to None.
 
         Raises:
             ValueError: If the headers_df is None or empty.
@@ -90,26 +151,39 @@ class CVM:
         self.catalog_db_path = db_path_base
 
         try:
-            self.CATALOG = sqlite3.connect(self.catalog_db_path)
-            # Enable Write-Ahead Logging for better concurrency, if appropriate
-            # self.CATALOG.execute("PRAGMA journal_mode=WAL;")
-            print(f"Connected to catalog database: {self.catalog_db_path}")
+            # One WAL connection per thread (see catalog.py), so updates and processing can share the catalog
+            self.CATALOG_DB = CVMCatalog(self.catalog_db_path)
+            self.CATALOG.execute("SELECT 1")
+            logger.info(f"Connected to catalog database: {self.catalog_db_path}")
         except sqlite3.Error as e:
-             print(f"FATAL: Failed to connect to catalog database at {self.catalog_db_path}: {e}")
+             logger.critical(f"Failed to connect to catalog database at {self.catalog_db_path}: {e}")
              raise ConnectionError(f"Could not connect to database: {e}") from e
 
 
         self.HISTORY_FOLDER = CVM.check_history_folder(history_folder)
-        print(f"Using history folder: {self.HISTORY_FOLDER}")
+        logger.info(f"Using history folder: {self.HISTORY_FOLDER}")
+
+        self.DATASET_FOLDER = dataset_folder or os.path.join(FI.USER_APP_FOLDER, 'dataset')
 
         # Initialize tables if they don't exist
         self._initialize_catalog_tables()
 
+        # Header metadata of downloaded files, kept in the catalog across sessions
+        self.HEADER_CACHE = CVMHeaderCache(self.CATALOG_DB)
+        # Row fingerprints used by process_pending(delta=True)
+        self.ROW_FINGERPRINTS = CVMRowFingerprints(self.CATALOG_DB)
+
+
+    @property
+    def CATALOG(self) -> sqlite3.Connection:
+        """The catalog database connection of the calling thread."""
+        return self.CATALOG_DB.connection()
+
 
     def _initialize_catalog_tables(self):
         """Creates the necessary tables in the catalog database if they don't exist."""
         if not FI.is_valid_db_connection(self.CATALOG):
-             print("Error: Cannot initialize tables, database connection is not valid.")
+             logger.error("Cannot initialize tables, database connection is not valid.")
              return
         try:
             cursor = self.CATALOG.cursor()
@@ -134,41 +208,64 @@ class CVM:
             cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_journal_kind_name ON {self.CATALOG_JOURNAL_TABLE} (kind, name);")
             cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_journal_process_active ON {self.CATALOG_JOURNAL_TABLE} (process, active);")
             cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_journal_url ON {self.CATALOG_JOURNAL_TABLE} (url);") # Index on PK
+            # The remote files staging table is a per-connection TEMP table (see _stage_remote_files)
+            self.CATALOG.commit()
+            logger.info("Catalog tables initialized successfully.")
+        except sqlite3.Error as e:
+            logger.error(f"Error initializing catalog tables: {e}")
+            self.CATALOG.rollback() # Rollback changes on error
+            # Decide if this should be fatal - probably yes
+            raise RuntimeError(f"Failed to initialize database tables: {e}") from e
 
-            # Create remote files staging table (used temporarily during update)
-            cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS {self.REMOTE_FILES_TABLE} (
+
+    def close(self):
+        """Closes the catalog database connections of every thread."""
+        if getattr(self, 'CATALOG_DB', None) is not None:
+            self.CATALOG_DB.close()
+            logger.info(f"Closed catalog database connections: {self.catalog_db_path}")
+
+
+    def __del__(self):
+        """Closes the database connections upon object destruction."""
+        try:
+            self.close()
+        except Exception as e:
+            # Avoid raising errors in __del__
+            logger.error(f"Error closing catalog database during object deletion: {e}")
+
+
+    def _stage_remote_files(self, cursor: sqlite3.Cursor, remote_files: pd.DataFrame) -> int:
+        """
+        Loads the remote file listing into the staging table of the cursor's connection.
+
+        The staging table is a TEMP table: private to the connection (so concurrent updates in other
+        threads never see it), created once and emptied on every run.
+
+        Returns:
+            int: Number of staged rows.
+        """
+        columns = ['sequence', 'href', 'name', 'last_modified', 'size', 'history', 'url', 'kind']
+        cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS {self.REMOTE_FILES_TABLE} (
                 sequence INTEGER,
                 href TEXT,
                 name TEXT,
                 last_modified TEXT,
                 size INTEGER,
                 history INTEGER,
-                url TEXT,
+                url TEXT PRIMARY KEY,
                 kind TEXT
             );
-            """)
-            self.CATALOG.commit()
-            print("Catalog tables initialized successfully.")
-        except sqlite3.Error as e:
-            print(f"Error initializing catalog tables: {e}")
-            self.CATALOG.rollback() # Rollback changes on error
-            # Decide if this should be fatal - probably yes
-            raise RuntimeError(f"Failed to initialize database tables: {e}") from e
-
-
-    def __del__(self):
-        """Closes the database connection upon object destruction."""
-        if hasattr(self, 'CATALOG') and self.CATALOG:
-            try:
-                # Optional: Commit any final changes? Usually done explicitly.
-                # self.CATALOG.commit()
-                self.CATALOG.close()
-                print(f"Closed catalog database connection: {self.catalog_db_path}")
-            except sqlite3.Error as e:
-                # Avoid raising errors in __del__
-                print(f"Error closing catalog database during object deletion: {e}")
-        self.CATALOG = None
+        """)
+        cursor.execute(f"DELETE FROM temp.{self.REMOTE_FILES_TABLE};")
+
+        staged = remote_files.reindex(columns=columns).astype(object)
+        staged = staged.where(staged.notna(), None)
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO temp.{self.REMOTE_FILES_TABLE} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            staged.itertuples(index=False, name=None)
+        )
+        return len(staged)
 
 
     def get_cvm_catalog(self) -> Optional[pd.DataFrame]:
@@ -180,14 +277,14 @@ class CVM:
                                     doesn't exist or an error occurs. Converts integer booleans back.
         """
         if not FI.is_valid_db_connection(self.CATALOG):
-             print("Error: Catalog database connection is not valid.")
+             logger.error("Catalog database connection is not valid.")
              return None
         try:
             # Check if table exists first
             cursor = self.CATALOG.cursor()
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?;", (self.CATALOG_JOURNAL_TABLE,))
             if cursor.fetchone() is None:
-                print(f"Catalog table '{self.CATALOG_JOURNAL_TABLE}' does not exist.")
+                logger.info(f"Catalog table '{self.CATALOG_JOURNAL_TABLE}' does not exist.")
                 # Return empty DataFrame with expected columns?
                 # Define expected columns based on _initialize_catalog_tables
                 cols = ['sequence', 'href', 'name', 'last_modified', 'size', 'history', 'url', 'kind', 'last_download', 'last_updated', 'process', 'active']
@@ -203,7 +300,7 @@ class CVM:
             return df
 
         except (sqlite3.Error, pd.io.sql.DatabaseError) as e:
-            print(f"Error retrieving CVM catalog: {e}")
+            logger.error(f"Error retrieving CVM catalog: {e}")
             return None
 
 
@@ -233,69 +330,74 @@ class CVM:
 
         try:
             step = "FETCHING REMOTE FILE LISTS"
-            if_remote_files = pd.concat([
-                get_remote_files_list('IF_REGISTER', URL_IF_REGISTER, URL_IF_REGISTER_HIST),
-                get_remote_files_list('IF_POSITION', URL_IF_DAILY, URL_IF_DAILY_HIST)
-            ], ignore_index=True)
+            with INSTRUMENTATION.stage('listing'):
+                if_remote_files = pd.concat([
+                    get_remote_files_list('IF_REGISTER', URL_IF_REGISTER, URL_IF_REGISTER_HIST),
+                    get_remote_files_list('IF_POSITION', URL_IF_DAILY, URL_IF_DAILY_HIST)
+                ], ignore_index=True)
 
             if if_remote_files.empty:
-                print("Warning: No remote files found or fetched. Catalog update skipped.")
+                logger.warning("No remote files found or fetched. Catalog update skipped.")
                 return [], [], []
 
             # Convert boolean 'history' to integer for SQLite compatibility
             if 'history' in if_remote_files.columns:
                  if_remote_files['history'] = if_remote_files['history'].astype(int)
 
-            # Store remote files temporarily for comparison (overwrite existing)
-            if_remote_files.to_sql(self.REMOTE_FILES_TABLE, con=self.CATALOG, if_exists='replace', index=False)
-            print(f"Stored {len(if_remote_files)} remote file entries in staging table.")
-
-            step = "UPDATING CATALOG JOURNAL (MERGE LOGIC)"
-            cursor = self.CATALOG.cursor()
-
-            # 1. Deactivate entries in journal not present remotely anymore
-            deactivate_sql = f"""
-                UPDATE {self.CATALOG_JOURNAL_TABLE}
-                SET active = 0, process = 0
-                WHERE active = 1 AND url NOT IN (SELECT url FROM {self.REMOTE_FILES_TABLE});
-            """
-            cursor.execute(deactivate_sql)
-            deactivated_count = cursor.rowcount
-            if deactivated_count > 0:
-                 print(f"Deactivated {deactivated_count} entries in catalog no longer present remotely.")
-                 db_ops.append((deactivate_sql, deactivated_count))
-
-
-            # 2. Insert new entries from remote list or update existing ones
-            # Using INSERT OR REPLACE based on URL primary key simplifies the merge
-            # Need to handle date comparison carefully in SQLite (use ISO strings)
-            merge_sql = f"""
-                INSERT OR REPLACE INTO {self.CATALOG_JOURNAL_TABLE} (
-                    sequence, href, name, last_modified, size, history, url, kind,
-                    last_download, last_updated, process, active
-                )
-                SELECT
-                    r.sequence, r.href, r.name, r.last_modified, r.size, r.history, r.url, r.kind,
-                    -- Keep existing download/update times if replacing
-                    COALESCE(j.last_download, NULL),
-                    COALESCE(j.last_updated, NULL),
-                    -- Determine if processing is needed (compare ISO strings)
-                    CASE
-                        WHEN r.last_modified IS NULL THEN 0 -- Cannot compare if remote date missing
-                        WHEN j.last_download IS NULL THEN 1 -- Never downloaded
-                        WHEN r.last_modified > j.last_download THEN 1 -- Remote is newer (string comparison works for ISO format)
-                        ELSE 0 -- Already downloaded and up-to-date
-                    END,
-                    1 -- Mark as active
-                FROM {self.REMOTE_FILES_TABLE} r
-                LEFT JOIN {self.CATALOG_JOURNAL_TABLE} j ON r.url = j.url;
-            """
-            cursor.execute(merge_sql)
-            merged_count = cursor.rowcount # Note: INSERT OR REPLACE counts affected rows
-            print(f"Merged/Updated catalog journal based on remote files (affected rows: {merged_count}).")
-            # This count isn't super informative for INSERT OR REPLACE, skip adding to db_ops for now
-
-            self.CATALOG.commit() # Commit merge changes
+            # Staging and merge run in one write transaction, so concurrent readers see the journal before or after it
+            with self.CATALOG_DB.transaction() as cursor:
+                # Store remote files temporarily for comparison
+                with INSTRUMENTATION.stage('catalog_write', table=self.REMOTE_FILES_TABLE) as metrics:
+                    metrics['rows'] = self._stage_remote_files(cursor, if_remote_files)
+                logger.info(f"Stored {len(if_remote_files)} remote file entries in staging table.")
+
+                step = "UPDATING CATALOG JOURNAL (MERGE LOGIC)"
+                # 1. Deactivate entries in journal not present remotely anymore
+                deactivate_sql = f"""
+                    UPDATE {self.CATALOG_JOURNAL_TABLE}
+                    SET active = 0, process = 0
+                    WHERE active = 1 AND url NOT IN (SELECT url FROM temp.{self.REMOTE_FILES_TABLE});
+                """
+                cursor.execute(deactivate_sql)
+                deactivated_count = cursor.rowcount
+                if deactivated_count > 0:
+                     logger.info(f"Deactivated {deactivated_count} entries in catalog no longer present remotely.")
+                     db_ops.append((deactivate_sql, deactivated_count))
+
+
+                # 2. Insert new entries from remote list or update existing ones
+                # Using INSERT OR REPLACE based on URL primary key simplifies the merge
+                # Need to handle date comparison carefully in SQLite (use ISO strings)
+                merge_sql = f"""
+                    INSERT OR REPLACE INTO {self.CATALOG_JOURNAL_TABLE} (
+                        sequence, href, name, last_modified, size, history, url, kind,
+                        last_download, last_updated, process, active
+                    )
+                    SELECT
+                        r.sequence, r.href, r.name, r.last_modified, r.size, r.history, r.url, r.kind,
+                        -- Keep existing download/update times if replacing
+                        COALESCE(j.last_download, NULL),
+                        COALESCE(j.last_updated, NULL),
+                        -- Determine if processing is needed (compare ISO strings)
+                        CASE
+                            WHEN r.last_modified IS NULL THEN 0 -- Cannot compare if remote date missing
+                            WHEN j.last_download IS NULL THEN 1 -- Never downloaded
+                            WHEN r.last_modified > j.last_download THEN 1 -- Remote is newer (string comparison works for ISO format)
+                            ELSE 0 -- Already downloaded and up-to-date
+                        END,
+                        1 -- Mark as active
+                    FROM temp.{self.REMOTE_FILES_TABLE} r
+                    LEFT JOIN {self.CATALOG_JOURNAL_TABLE} j ON r.url = j.url;
+                """
+                with INSTRUMENTATION.stage('catalog_write', table=self.CATALOG_JOURNAL_TABLE) as metrics:
+                    cursor.execute(merge_sql)
+                    merged_count = cursor.rowcount # Note: INSERT OR REPLACE counts affected rows
+                    metrics['rows'] = merged_count
+                logger.info(f"Merged/Updated catalog journal based on remote files (affected rows: {merged_count}).")
+                # This count isn't super informative for INSERT OR REPLACE, skip adding to db_ops for now
+
+                # Empty the staging table before committing
+                cursor.execute(f"DELETE FROM temp.{self.REMOTE_FILES_TABLE};")
 
 
             step = "IDENTIFYING FILES TO DOWNLOAD"
@@ -311,33 +413,29 @@ class CVM:
 
             metadata_to_process = files_to_process_df.to_dict(orient='records')
             if not metadata_to_process:
-                print("Catalog is up-to-date. No files need downloading.")
-                # Clean up staging table
-                cursor.execute(f"DROP TABLE IF EXISTS {self.REMOTE_FILES_TABLE};")
-                self.CATALOG.commit()
+                logger.info("Catalog is up-to-date. No files need downloading.")
                 return [], [], db_ops
 
-            print(f"Found {len(metadata_to_process)} files needing download/update.")
+            logger.info(f"Found {len(metadata_to_process)} files needing download/update.")
 
 
             step = "DOWNLOADING AND PROCESSING FILES"
             all_results = []
             # Consider parallel processing here if beneficial and safe (beware of DB writes)
             # For simplicity, processing sequentially first
+            download_start = datetime.now()
             for meta in metadata_to_process:
                 meta['history_folder'] = self.HISTORY_FOLDER # Ensure history folder is in metadata
                 # Call the download function (from remote.py)
                 download_results = update_cvm_history_file(meta)
                 all_results.extend(download_results) # Collect results from download attempts
                 processed_metadata.append(meta) # Track which metadata was processed
+            logger.info(f"Downloaded {len(processed_metadata)} files in {timelapse(download_start)} minutes.")
 
 
             step = 'CONSOLIDATING DOWNLOAD RESULTS'
             if not all_results:
-                 print("No download results generated.")
-                 # Clean up staging table
-                 cursor.execute(f"DROP TABLE IF EXISTS {self.REMOTE_FILES_TABLE};")
-                 self.CATALOG.commit()
+                 logger.info("No download results generated.")
                  return [], processed_metadata, db_ops # Return empty summary
 
             # Create DataFrame from results for easier aggregation
@@ -381,17 +479,14 @@ class CVM:
                          process = ?
                      WHERE url = ? AND process = 1 AND active = 1;
                  """
-                 cursor.executemany(update_sql, successful_updates)
-                 updated_count = cursor.rowcount
-                 print(f"Updated download status for {updated_count} successfully processed files in catalog.")
+                 with INSTRUMENTATION.stage('catalog_write', table=self.CATALOG_JOURNAL_TABLE) as metrics, \
+                      self.CATALOG_DB.transaction() as cursor:
+                      cursor.executemany(update_sql, successful_updates)
+                      updated_count = cursor.rowcount
+                      metrics['rows'] = len(successful_updates)
+                 logger.info(f"Updated download status for {updated_count} successfully processed files in catalog.")
                  db_ops.append((update_sql + " (batch)", updated_count)) # Record operation (template)
 
-            self.CATALOG.commit() # Commit final status updates
-
-            # Clean up staging table
-            cursor.execute(f"DROP TABLE IF EXISTS {self.REMOTE_FILES_TABLE};")
-            self.CATALOG.commit()
-
             return update_summary, processed_metadata, db_ops
 
         except Exception as E:
@@ -400,18 +495,9 @@ class CVM:
                  self.CATALOG.rollback() # Rollback any uncommitted changes on error
             raise ValueError(f'Failed to update CVM catalog at step {step}: {E} ({info})')
         finally:
-            # Ensure staging table is dropped even if errors occurred mid-process
-            try:
-                if FI.is_valid_db_connection(self.CATALOG):
-                    cursor = self.CATALOG.cursor()
-                    cursor.execute(f"DROP TABLE IF EXISTS {self.REMOTE_FILES_TABLE};")
-                    self.CATALOG.commit()
-            except sqlite3.Error as drop_err:
-                 print(f"Warning: Failed to drop staging table {self.REMOTE_FILES_TABLE}: {drop_err}")
-
             # Ensure main connection is still valid after potential errors
             if not FI.is_valid_db_connection(self.CATALOG):
-                 print("Warning: Catalog DB connection became invalid during update.")
+                 logger.warning("Catalog DB connection became invalid during update.")
 
 
     def get_cvm_files_to_process(self, kind: Optional[str] = None, history: Optional[bool] = None) -> List[Tuple[str, str, bool, Tuple[str, ...]]]:
@@ -464,9 +550,13 @@ class CVM:
             files_to_process_df = pd.read_sql(query, con=self.CATALOG, params=params)
 
             if files_to_process_df.empty:
-                print("No CVM files found in catalog needing data processing.")
+                logger.info("No CVM files found in catalog needing data processing.")
                 return []
 
+            step = 'INDEXING HISTORY FOLDER'
+            # Walk the history folder once and resolve every group with a dict lookup
+            history_index = index_history_folder(self.HISTORY_FOLDER)
+
             step = 'FINDING ACTUAL FILES IN HISTORY FOLDER'
             result = []
             for record in files_to_process_df.to_dict(orient='records'):
@@ -474,25 +564,17 @@ class CVM:
                 file_name = record['name'] # This is the base name (e.g., inf_diario_fi_YYYYMM)
                 file_history = bool(record['history']) # Convert back to bool
 
-                # Construct search pattern based on how files are saved by write_target_file
-                # Pattern: kind.name.* (or more specific if needed)
-                # Ensure case-insensitivity if OS filesystem might be case-sensitive
-                search_pattern = f"{file_kind.lower()}.{file_name.lower()}.*"
-                try:
-                    # Use fbpyutils find function
-                    found_files = FU.find(self.HISTORY_FOLDER, search_pattern)
-                    if found_files:
-                        # Sort files for consistent order (e.g., if multiple parts from zip)
-                        result.append((file_kind, file_name, file_history, tuple(sorted(found_files))))
-                    else:
-                        # This indicates an inconsistency: catalog says process, but file missing
-                        print(f"CRITICAL WARNING: Catalog indicates file group '{file_name}' (Kind: {file_kind}, History: {file_history}) needs processing, but no files found in {self.HISTORY_FOLDER} matching pattern '{search_pattern}'. Check download integrity or catalog status.")
-                        # Optionally: Mark this entry as errored in the catalog?
-                except Exception as find_err:
-                     print(f"Error searching for files for group {file_name} (Kind: {file_kind}): {find_err}")
-
-
-            print(f"Found {len(result)} CVM file groups needing data processing.")
+                # Files are saved by write_target_file as kind.name.* (see index_history_folder)
+                found_files = history_index.get((file_kind.lower(), file_name.lower()))
+                if found_files:
+                    result.append((file_kind, file_name, file_history, tuple(found_files)))
+                else:
+                    # This indicates an inconsistency: catalog says process, but file missing
+                    logger.error(f"Catalog indicates file group '{file_name}' (Kind: {file_kind}, History: {file_history}) needs processing, but no files found in {self.HISTORY_FOLDER} matching pattern '{file_kind.lower()}.{file_name.lower()}.*'. Check download integrity or catalog status.")
+                    # Optionally: Mark this entry as errored in the catalog?
+
+
+            logger.info(f"Found {len(result)} CVM file groups needing data processing.")
             return result
 
         except (sqlite3.Error, pd.io.sql.DatabaseError) as e:
@@ -500,7 +582,7 @@ class CVM:
             raise ValueError(f'Failed to get CVM files to process from catalog at step {step}: {e} ({info})')
 
 
-    def get_cvm_file_data(self, cvm_file_path: str, check_header: bool = False) -> Tuple[str, str, pd.DataFrame, List[str]]:
+    def get_cvm_file_data(self, cvm_file_path: str, check_header: bool = False, nullable_dtypes: bool = False) -> Tuple[str, str, pd.DataFrame, List[str]]:
         """
         Reads and processes data from a single downloaded CVM file using stored header mappings.
 
@@ -508,6 +590,8 @@ class CVM:
             cvm_file_path (str): The full path to the downloaded CVM file in the history folder.
             check_header (bool, optional): Verify if the file header matches known mappings before processing.
                                            Defaults to False.
+            nullable_dtypes (bool, optional): Return pandas nullable dtypes (Int64, Float64, boolean,
+                string, datetime64) instead of object columns. Defaults to False.
 
         Returns:
             Tuple[str, str, pd.DataFrame, List[str]]: Result from file_io.read_cvm_history_file:
@@ -529,7 +613,9 @@ class CVM:
             source_file=cvm_file_path,
             headers_df=self.HEADERS_DF,
             apply_conversions=True, # Typically want converted data
-            check_header=check_header
+            check_header=check_header,
+            header_cache=self.HEADER_CACHE,
+            nullable_dtypes=nullable_dtypes
         )
 
 
@@ -553,7 +639,7 @@ class CVM:
              raise ConnectionError("Catalog database connection is not valid.")
 
         if not processed_files_info:
-            print("No processed files provided to mark as updated.")
+            logger.info("No processed files provided to mark as updated.")
             return True # Nothing to do, considered successful
 
         try:
@@ -573,20 +659,240 @@ class CVM:
             # Prepare data for executemany: list of (update_time_str, kind, name) tuples
             update_data = [(update_time_str, kind, name) for kind, name in processed_files_info]
 
-            cursor = self.CATALOG.cursor()
-            cursor.executemany(update_sql, update_data)
-            updated_count = cursor.rowcount
-            self.CATALOG.commit()
+            with INSTRUMENTATION.stage('catalog_write', table=self.CATALOG_JOURNAL_TABLE) as metrics, \
+                 self.CATALOG_DB.transaction() as cursor:
+                cursor.executemany(update_sql, update_data)
+                updated_count = cursor.rowcount
+                metrics['rows'] = len(update_data)
 
-            print(f"Marked {updated_count} file groups as updated (data processed) in the catalog.")
+            logger.info(f"Marked {updated_count} file groups as updated (data processed) in the catalog.")
             # Check if updated_count matches len(processed_files_info) for verification
             if updated_count != len(processed_files_info):
                  # This could happen if a file group had multiple entries (e.g. from zip) but only one needs update marker
                  # Or if the WHERE clause didn't match (e.g., active=0 or last_download is NULL)
-                 print(f"Warning: Attempted to mark {len(processed_files_info)} groups, but updated {updated_count} rows in catalog. This might be expected or indicate an issue.")
+                 logger.warning(f"Attempted to mark {len(processed_files_info)} groups, but updated {updated_count} rows in catalog. This might be expected or indicate an issue.")
 
             return True
         except sqlite3.Error as e:
             info = debug_info(e)
             self.CATALOG.rollback()
             raise ValueError(f'Failed to mark CVM files as updated in catalog at step {step}: {e} ({info})')
+
+
+    def process_pending(
+        self,
+        workers: Optional[int] = None,
+        sink: Optional[Callable[[str, str, str, pd.DataFrame, List[str]], Any]] = None,
+        kind: Optional[str] = None,
+        history: Optional[bool] = None,
+        check_header: bool = False,
+        batch_size: int = 10,
+        delta: bool = False
+    ) -> List[Tuple[str, str]]:
+        """
+        Processes all pending CVM file groups, fanning file parsing out to a process pool.
+
+        Files from get_cvm_files_to_process are parsed in parallel (read_cvm_history_file) and each
+        result is streamed, as soon as it is ready, to the sink in this process. When every file
+        of a group has been parsed and written, the group is queued to be marked as updated;
+        mark_cvm_files_updated is called every `batch_size` finished groups. Groups with any failed
+        file are not marked and will be returned again by get_cvm_files_to_process.
+
+        Args:
+            workers (Optional[int], optional): Number of worker processes. If None, uses os.cpu_count().
+                With 1 worker the files are processed sequentially in this process. Defaults to None.
+            sink (Optional[Callable], optional): Called as sink(cvm_file, kind, sub_kind, data, partition_cols)
+                for every processed file. If None, writes to the dataset in DATASET_FOLDER with a
+                CVMDatasetWriter in 'overwrite' mode ('upsert' mode with delta). Defaults to None.
+            kind (Optional[str], optional): Filter by data kind (e.g., 'IF_POSITION'). Defaults to None (all kinds).
+            history (Optional[bool], optional): Filter by history flag. Defaults to None (both).
+            check_header (bool, optional): Verify file headers against known mappings. Defaults to False.
+            batch_size (int, optional): Number of finished groups per mark_cvm_files_updated call. Defaults to 10.
+            delta (bool, optional): Send to the sink only the rows inserted or changed since the last run,
+                for kinds tracked by CVMRowFingerprints (DIARIO_FI). The sink must upsert the rows on
+                (fund_id, position_date), e.g. a CVMDatasetWriter in 'upsert' mode or a
+                CVMDatabaseLoader. Row fingerprints are committed after the sink succeeds, on full
+                runs too, so a delta run after a full one only sends the changes. Defaults to False.
+
+        Returns:
+            List[Tuple[str, str]]: The (kind, name) of the file groups successfully processed.
+
+        Raises:
+            RuntimeError: If the client has no header mappings.
+            ValueError: If delta is combined with a dataset writer not in 'upsert' mode.
+        """
+        if self.HEADERS_DF is None or self.HEADERS_DF.empty:
+             raise RuntimeError("CVM client was not properly initialized with headers_df.")
+
+        if sink is None:
+            sink = CVMDatasetWriter(self.DATASET_FOLDER, mode='upsert' if delta else 'overwrite')
+        elif delta and getattr(sink, 'mode', 'upsert') != 'upsert':
+            raise ValueError(f"delta=True sends only the changed rows, which a sink in '{sink.mode}' mode would not "
+                             "merge with the stored ones. Use a sink in 'upsert' mode.")
+        workers = max(1, workers or os.cpu_count() or 1)
+
+        groups = self.get_cvm_files_to_process(kind=kind, history=history)
+        if not groups:
+            return []
+
+        tasks = [(file_kind, file_name, cvm_file, check_header)
+                 for file_kind, file_name, _, files in groups for cvm_file in files]
+        remaining = {(file_kind, file_name): len(files) for file_kind, file_name, _, files in groups}
+        failed = set()
+        pending_marks = []
+        processed_groups = []
+
+        def consume(results):
+            for group_kind, group_name, cvm_file, result, error, events in results:
+                INSTRUMENTATION.replay(events)
+                group = (group_kind, group_name)
+                if error is None and group not in failed:
+                    try:
+                        data_kind, data_sub_kind, data, partition_cols = result
+                        if delta:
+                            data, fingerprints = self.ROW_FINGERPRINTS.diff(data_kind, data_sub_kind, data)
+                        else:
+                            fingerprints = self.ROW_FINGERPRINTS.fingerprint(data_kind, data_sub_kind, data)
+                        if not delta or fingerprints is None or not data.empty:
+                            with INSTRUMENTATION.stage('sink_write', file=os.path.basename(cvm_file), sub_kind=data_sub_kind) as metrics:
+                                sink(cvm_file, data_kind, data_sub_kind, data, partition_cols)
+                                metrics['rows'] = len(data)
+                        self.ROW_FINGERPRINTS.commit(data_kind, data_sub_kind, fingerprints)
+                    except Exception as e:
+                        error = f"Sink failed: {e}"
+                if error is not None:
+                    logger.error(f"Error processing file {cvm_file} of group '{group_name}' (Kind: {group_kind}): {error}")
+                    INSTRUMENTATION.count('files_failed', kind=group_kind)
+                    failed.add(group)
+                else:
+                    INSTRUMENTATION.count('files_processed', kind=group_kind)
+
+                remaining[group] -= 1
+                if remaining[group] == 0 and group not in failed:
+                    pending_marks.append(group)
+                    if len(pending_marks) >= batch_size:
+                        self.mark_cvm_files_updated(pending_marks)
+                        processed_groups.extend(pending_marks)
+                        pending_marks.clear()
+
+        start_time = datetime.now()
+        logger.info(f"Processing {len(tasks)} CVM files from {len(groups)} groups with {workers} worker(s).")
+        if workers == 1 or len(tasks) == 1:
+            _init_process_worker(self.HEADERS_DF, self.CATALOG_DB)
+            consume(_process_cvm_file(task) for task in tasks)
+        else:
+            with Pool(min(workers, len(tasks)), initializer=_init_process_worker,
+                      initargs=(self.HEADERS_DF, self.catalog_db_path, INSTRUMENTATION.enabled)) as p:
+                consume(p.imap_unordered(_process_cvm_file, tasks))
+
+        if pending_marks:
+            self.mark_cvm_files_updated(pending_marks)
+            processed_groups.extend(pending_marks)
+
+        if failed:
+            logger.warning(f"{len(failed)} CVM file groups failed and were not marked as updated.")
+        logger.info(f"Processed {len(processed_groups)} of {len(groups)} CVM file groups in {timelapse(start_time)} minutes.")
+        return processed_groups
+
+
+    def update_cvm_dataset(self, kind: Optional[str] = None, history: Optional[bool] = None, mode: str = 'overwrite', workers: Optional[int] = 1) -> List[Tuple[str, str]]:
+        """
+        Processes pending CVM file groups into the partitioned dataset and marks them as updated.
+
+        File groups are taken from get_cvm_files_to_process, each file is processed and written
+        under DATASET_FOLDER using its partition columns (see process_pending).
+        A group is marked as updated (mark_cvm_files_updated) only if all of its files succeed.
+
+        Args:
+            kind (Optional[str], optional): Filter by data kind (e.g., 'IF_POSITION'). Defaults to None (all kinds).
+            history (Optional[bool], optional): Filter by history flag. Defaults to None (both).
+            mode (str, optional): Dataset write mode, 'append', 'overwrite' or 'upsert'. With 'overwrite'
+                the partitions touched by a reprocessed group replace the previously stored ones.
+                Defaults to 'overwrite'.
+            workers (Optional[int], optional): Number of worker processes; None uses os.cpu_count().
+                Defaults to 1 (sequential).
+
+        Returns:
+            List[Tuple[str, str]]: The (kind, name) of the file groups successfully processed.
+        """
+        writer = CVMDatasetWriter(self.DATASET_FOLDER, mode=mode)
+        processed_groups = self.process_pending(workers=workers, sink=writer, kind=kind, history=history)
+        logger.info(f"Processed {len(processed_groups)} CVM file groups into dataset: {self.DATASET_FOLDER}")
+        return processed_groups
+
+
+    def read_cvm_dataset(self, filters: Optional[Dict[str, Any]] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Reads processed data from the dataset, loading only the partitions selected by the filters.
+
+        Args:
+            filters (Optional[Dict[str, Any]], optional): Partition filters by column (kind, sub_kind,
+                year, period, period_date), each an allowed value or a collection of allowed values.
+                Defaults to None (all partitions).
+            columns (Optional[List[str]], optional): Data columns to load. Defaults to None (all columns).
+
+        Returns:
+            pd.DataFrame: The selected processed data.
+        """
+        return read_cvm_dataset(self.DATASET_FOLDER, filters=filters, columns=columns)
+
+
+    def get_fund_series(
+        self,
+        cnpj: str,
+        start: Optional[Any] = None,
+        end: Optional[Any] = None,
+        fields: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Returns the daily position series (DIARIO_FI) of one fund from the processed dataset.
+
+        Uses the fund row-range index maintained by CVMDatasetWriter, so only the row groups
+        holding the fund are read. The dataset must have been built with update_cvm_dataset.
+
+        Args:
+            cnpj (str): The fund CNPJ, formatted or digits only.
+            start (Optional[Any], optional): First position date (date or ISO string). Defaults to None.
+            end (Optional[Any], optional): Last position date (date or ISO string). Defaults to None.
+            fields (Optional[List[str]], optional): Data fields to return besides fund_id and
+                position_date (e.g. ['quota_value', 'net_worth_value']). Defaults to None (all fields).
+
+        Returns:
+            pd.DataFrame: The fund's rows sorted by position_date. Empty DataFrame if the fund is not found.
+
+        Raises:
+            ValueError: If cnpj is empty.
+        """
+        fund_id = as_string_id(cnpj)
+        if not fund_id:
+            raise ValueError("A fund CNPJ must be provided.")
+        return read_cvm_fund_series(self.DATASET_FOLDER, fund_id, start=start, end=end, columns=fields, sub_kind='DIARIO_FI')
+
+
+    def update_register_history(self, history_file: Optional[str] = None) -> CVMRegisterHistory:
+        """
+        Compacts the CAD_FI register snapshots of the processed dataset into the register history.
+
+        Only snapshot dates not yet in the history are read, one partition at a time, so daily runs
+        after update_cvm_dataset add just the new snapshots. Snapshots older than the ones already
+        compacted are inserted in place.
+
+        Args:
+            history_file (Optional[str], optional): Path of the Parquet register history.
+                Defaults to 'cad_fi_history.parquet' within USER_APP_FOLDER.
+
+        Returns:
+            CVMRegisterHistory: The updated history (see CVMRegisterHistory.as_of).
+        """
+        register = CVMRegisterHistory(history_file or os.path.join(FI.USER_APP_FOLDER, 'cad_fi_history.parquet'))
+        filters = {'kind': 'IF_REGISTER', 'sub_kind': 'CAD_FI'}
+        known_dates = set(register.snapshot_dates)
+        snapshot_dates = sorted({values['period_date'] for _, values in list_cvm_dataset_partitions(self.DATASET_FOLDER, filters)
+                                 if 'period_date' in values and pd.Timestamp(values['period_date']) not in known_dates})
+
+        for snapshot_date in snapshot_dates:
+            data = read_cvm_dataset(self.DATASET_FOLDER, filters={**filters, 'period_date': snapshot_date})
+            register.add_snapshot(data, snapshot_date)
+        register.save()
+        logger.info(f"Added {len(snapshot_dates)} CAD_FI snapshots to register history: {register.HISTORY_FILE}")
+        return register
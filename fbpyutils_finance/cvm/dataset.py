@@ -0,0 +1,534 @@
+'''
+Partitioned columnar storage for processed CVM data.
+
+Processed frames returned by `read_cvm_history_file` are persisted as Parquet parts under a
+hive-style directory layout built from their partition columns, e.g.:
+
+    <dataset_folder>/kind=IF_POSITION/sub_kind=DIARIO_FI/year=2023/period=2023-12/<part>.parquet
+    <dataset_folder>/kind=IF_REGISTER/sub_kind=CAD_FI/year=2023/period=2023-12/period_date=2023-12-31/<part>.parquet
+
+Partition values are stored only in the directory names, so readers can prune whole
+directories before opening any file.
+
+Parts are written sorted by fund (fund_id, then position_date) and an index of the row range
+of every fund in every part is kept in a SQLite file at the dataset root, so a single fund's
+series is read from the few row groups that hold it (see read_cvm_fund_series).
+'''
+
+import logging
+import os
+import uuid
+import shutil
+import sqlite3
+import numpy as np
+import pandas as pd
+from typing import Optional, List, Dict, Tuple, Any, Iterable, Union
+
+import fbpyutils_finance as FI
+
+try:
+    import pyarrow # noqa: F401 - Parquet engine used by pandas
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None # type: ignore
+    pq = None # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# --- Constantes ---
+PART_FILE_EXT = '.parquet'
+NULL_PARTITION_VALUE = '__null__' # Directory value used for rows with a missing partition value
+WRITE_MODES = ('append', 'overwrite', 'upsert')
+INDEX_FILE_NAME = '_fund_index.db' # Fund row-range index, at the dataset root
+INDEX_COLUMN = 'fund_id'
+INDEX_DATE_COLUMN = 'position_date'
+INDEX_ROW_GROUP_SIZE = 16384 # Rows per Parquet row group, the unit read by indexed lookups
+UPSERT_KEY_COLUMNS = [INDEX_COLUMN, INDEX_DATE_COLUMN] # Row key of the 'upsert' write mode
+
+PartitionFilters = Dict[str, Union[str, Iterable[str]]]
+
+# --- Funções de Dataset ---
+
+def check_dataset_folder(dataset_folder: Optional[str] = None) -> str:
+    """
+    Resolves the dataset folder and creates it if it doesn't exist.
+
+    Args:
+        dataset_folder (Optional[str], optional): The path to the dataset folder.
+            If None, defaults to a subfolder 'dataset' within USER_APP_FOLDER. Defaults to None.
+
+    Returns:
+        str: The validated or created dataset folder path.
+    """
+    dataset_folder = dataset_folder or os.path.join(FI.USER_APP_FOLDER, 'dataset')
+    os.makedirs(dataset_folder, exist_ok=True)
+    return dataset_folder
+
+
+def _partition_value(value: Any) -> str:
+    """Converts a partition value to the string used in directory names."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)) or value == '':
+        return NULL_PARTITION_VALUE
+    return str(value).replace(os.path.sep, '_')
+
+
+def build_partition_path(dataset_folder: str, partition_values: List[Tuple[str, Any]]) -> str:
+    """
+    Builds the directory path of a partition from its (column, value) pairs.
+
+    Args:
+        dataset_folder (str): The root folder of the dataset.
+        partition_values (List[Tuple[str, Any]]): Ordered (column, value) pairs.
+
+    Returns:
+        str: The partition directory path (e.g. '<root>/kind=IF_POSITION/sub_kind=DIARIO_FI').
+    """
+    return os.path.join(dataset_folder, *[f"{col}={_partition_value(value)}" for col, value in partition_values])
+
+
+def _matches_filter(value: str, allowed: Union[str, Iterable[str]]) -> bool:
+    """Checks a directory partition value against a filter value or collection of values."""
+    if isinstance(allowed, str) or not isinstance(allowed, Iterable):
+        return value == _partition_value(allowed)
+    return value in {_partition_value(a) for a in allowed}
+
+
+def list_cvm_dataset_partitions(dataset_folder: str, filters: Optional[PartitionFilters] = None) -> List[Tuple[str, Dict[str, str]]]:
+    """
+    Lists the partition directories of a dataset that satisfy the given filters.
+
+    Directories are pruned level by level, so partitions excluded by a filter are never scanned.
+
+    Args:
+        dataset_folder (str): The root folder of the dataset.
+        filters (Optional[PartitionFilters], optional): Mapping of partition column to an allowed
+            value or collection of allowed values (e.g. {'sub_kind': 'DIARIO_FI', 'year': ['2022', '2023']}).
+            Defaults to None (all partitions).
+
+    Returns:
+        List[Tuple[str, Dict[str, str]]]: A list of (partition_path, partition_values) tuples for
+            every directory that directly contains Parquet parts.
+    """
+    filters = filters or {}
+    partitions = []
+    if not os.path.isdir(dataset_folder):
+        return partitions
+
+    pending = [(dataset_folder, {})]
+    while pending:
+        folder, values = pending.pop()
+        has_parts = False
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir() and '=' in entry.name:
+                    col, value = entry.name.split('=', 1)
+                    if col in filters and not _matches_filter(value, filters[col]):
+                        continue
+                    pending.append((entry.path, {**values, col: value}))
+                elif entry.is_file() and entry.name.endswith(PART_FILE_EXT):
+                    has_parts = True
+        # Only report leaves that are deep enough to have been checked against every filter
+        if has_parts and all(col in values for col in filters):
+            partitions.append((folder, values))
+
+    return sorted(partitions)
+
+
+def read_cvm_dataset(
+    dataset_folder: str,
+    filters: Optional[PartitionFilters] = None,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Reads processed CVM data from a partitioned dataset, loading only the partitions a query needs.
+
+    Args:
+        dataset_folder (str): The root folder of the dataset.
+        filters (Optional[PartitionFilters], optional): Partition filters, see list_cvm_dataset_partitions.
+            Defaults to None (all partitions).
+        columns (Optional[List[str]], optional): Data columns to load. Partition columns are always
+            included. Defaults to None (all columns).
+
+    Returns:
+        pd.DataFrame: The concatenated data of the selected partitions, with partition columns
+                      (as strings) placed first. Empty DataFrame if no partition matches.
+
+    Raises:
+        ImportError: If no Parquet engine (pyarrow) is available.
+    """
+    if pyarrow is None:
+        raise ImportError(f"The 'pyarrow' library is required to read CVM datasets. {FI.PARQUET_EXTRA_HINT}")
+
+    frames = []
+    for partition_path, partition_values in list_cvm_dataset_partitions(dataset_folder, filters):
+        data_columns = [c for c in columns if c not in partition_values] if columns is not None else None
+        for part_file in sorted(f for f in os.listdir(partition_path) if f.endswith(PART_FILE_EXT)):
+            part = pd.read_parquet(os.path.join(partition_path, part_file), columns=data_columns)
+            for col, value in partition_values.items():
+                part[col] = None if value == NULL_PARTITION_VALUE else value
+            frames.append(part[list(partition_values) + [c for c in part.columns if c not in partition_values]])
+
+    if not frames:
+        return pd.DataFrame(columns=columns or [])
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def _partition_values_from_path(dataset_folder: str, partition_path: str) -> Dict[str, str]:
+    """Parses the (column, value) pairs of a partition directory path relative to the dataset root."""
+    relative = os.path.relpath(partition_path, dataset_folder)
+    return dict(d.split('=', 1) for d in relative.split(os.path.sep) if '=' in d)
+
+
+class CVMDatasetIndex:
+    """
+    On-disk index of the row ranges held by each fund in each dataset part.
+
+    Entries are (part_file, kind, sub_kind, fund_id, row_start, row_end, min_date, max_date), where
+    part_file is relative to the dataset root and [row_start, row_end) is the fund's contiguous
+    row range in the part (parts are written sorted by fund).
+    """
+
+    INDEX_TABLE = 'cvm_dataset_fund_index'
+
+    def __init__(self, dataset_folder: str):
+        """
+        Opens (or creates) the index of a dataset.
+
+        Args:
+            dataset_folder (str): The root folder of the dataset.
+        """
+        self.dataset_folder = dataset_folder
+        os.makedirs(dataset_folder, exist_ok=True)
+        self.CONNECTION = sqlite3.connect(os.path.join(dataset_folder, INDEX_FILE_NAME), timeout=30)
+        self.CONNECTION.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.INDEX_TABLE} (
+                part_file TEXT NOT NULL,
+                kind TEXT,
+                sub_kind TEXT,
+                fund_id TEXT NOT NULL,
+                row_start INTEGER NOT NULL,
+                row_end INTEGER NOT NULL,
+                min_date TEXT,
+                max_date TEXT
+            );
+        """)
+        self.CONNECTION.execute(f"CREATE INDEX IF NOT EXISTS idx_fund_index_fund ON {self.INDEX_TABLE} (fund_id, sub_kind);")
+        self.CONNECTION.execute(f"CREATE INDEX IF NOT EXISTS idx_fund_index_part ON {self.INDEX_TABLE} (part_file);")
+        self.CONNECTION.commit()
+
+    def add_part(self, part_file: str, kind: Optional[str], sub_kind: Optional[str], data: pd.DataFrame):
+        """
+        Indexes the fund row ranges of a written part.
+
+        Args:
+            part_file (str): Path of the part file.
+            kind (Optional[str]): The kind partition value of the part.
+            sub_kind (Optional[str]): The sub-kind partition value of the part.
+            data (pd.DataFrame): The rows written to the part, in file order, sorted by INDEX_COLUMN.
+        """
+        if data.empty or INDEX_COLUMN not in data.columns:
+            return
+        fund_ids = data[INDEX_COLUMN].astype(str).to_numpy()
+        starts = np.flatnonzero(np.r_[True, fund_ids[1:] != fund_ids[:-1]])
+        ends = np.r_[starts[1:], len(fund_ids)]
+
+        if INDEX_DATE_COLUMN in data.columns:
+            dates = pd.to_datetime(data[INDEX_DATE_COLUMN], errors='coerce').reset_index(drop=True)
+            bounds = dates.groupby(fund_ids, sort=False).agg(['min', 'max'])
+            min_dates = [None if pd.isna(d) else d.strftime('%Y-%m-%d') for d in bounds['min']]
+            max_dates = [None if pd.isna(d) else d.strftime('%Y-%m-%d') for d in bounds['max']]
+        else:
+            min_dates = max_dates = [None] * len(starts)
+
+        relative = os.path.relpath(part_file, self.dataset_folder)
+        self.CONNECTION.executemany(
+            f"INSERT INTO {self.INDEX_TABLE} (part_file, kind, sub_kind, fund_id, row_start, row_end, min_date, max_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((relative, kind, sub_kind, fund_ids[start], int(start), int(end), min_date, max_date)
+             for start, end, min_date, max_date in zip(starts, ends, min_dates, max_dates))
+        )
+        self.CONNECTION.commit()
+
+    def remove_parts(self, part_files: List[str]):
+        """Removes the entries of deleted part files."""
+        if not part_files:
+            return
+        self.CONNECTION.executemany(
+            f"DELETE FROM {self.INDEX_TABLE} WHERE part_file = ?",
+            ((os.path.relpath(f, self.dataset_folder),) for f in part_files)
+        )
+        self.CONNECTION.commit()
+
+    def lookup(
+        self,
+        fund_id: str,
+        sub_kind: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None
+    ) -> List[Tuple[str, int, int]]:
+        """
+        Finds the parts and row ranges holding a fund's data.
+
+        Args:
+            fund_id (str): The fund identifier (CNPJ digits).
+            sub_kind (Optional[str], optional): Restrict to a sub-kind (e.g. 'DIARIO_FI'). Defaults to None.
+            start (Optional[str], optional): ISO date; skip ranges that end before it. Defaults to None.
+            end (Optional[str], optional): ISO date; skip ranges that start after it. Defaults to None.
+
+        Returns:
+            List[Tuple[str, int, int]]: (part_file path, row_start, row_end) tuples, ordered by part file.
+        """
+        query = f"SELECT part_file, row_start, row_end FROM {self.INDEX_TABLE} WHERE fund_id = ?"
+        params = [fund_id]
+        if sub_kind is not None:
+            query += " AND sub_kind = ?"
+            params.append(sub_kind)
+        if start is not None:
+            query += " AND (max_date IS NULL OR max_date >= ?)"
+            params.append(start)
+        if end is not None:
+            query += " AND (min_date IS NULL OR min_date <= ?)"
+            params.append(end)
+        rows = self.CONNECTION.execute(query + " ORDER BY part_file, row_start", params).fetchall()
+        return [(os.path.join(self.dataset_folder, part_file), row_start, row_end) for part_file, row_start, row_end in rows]
+
+    def close(self):
+        """Closes the index database connection."""
+        if self.CONNECTION is not None:
+            self.CONNECTION.close()
+            self.CONNECTION = None
+
+
+def _read_part_rows(part_file: str, row_start: int, row_end: int, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Reads rows [row_start, row_end) of a Parquet part, loading only the row groups that hold them."""
+    parquet_file = pq.ParquetFile(part_file)
+    offsets = np.cumsum([0] + [parquet_file.metadata.row_group(i).num_rows for i in range(parquet_file.num_row_groups)])
+    row_groups = [i for i in range(parquet_file.num_row_groups) if offsets[i] < row_end and offsets[i + 1] > row_start]
+    if not row_groups:
+        return pd.DataFrame(columns=columns or [])
+    if columns is not None:
+        columns = [c for c in columns if c in parquet_file.schema_arrow.names]
+    data = parquet_file.read_row_groups(row_groups, columns=columns).to_pandas()
+    first_row = offsets[row_groups[0]]
+    return data.iloc[row_start - first_row:row_end - first_row].copy()
+
+
+def read_cvm_fund_series(
+    dataset_folder: str,
+    fund_id: str,
+    start: Optional[Any] = None,
+    end: Optional[Any] = None,
+    columns: Optional[List[str]] = None,
+    sub_kind: Optional[str] = 'DIARIO_FI'
+) -> pd.DataFrame:
+    """
+    Reads one fund's rows from a dataset using the fund row-range index.
+
+    Only the row groups holding the fund are read from the parts listed in the index, instead of
+    scanning every partition.
+
+    Args:
+        dataset_folder (str): The root folder of the dataset.
+        fund_id (str): The fund identifier (CNPJ digits, as stored in 'fund_id').
+        start (Optional[Any], optional): First position date to return (date or ISO string). Defaults to None.
+        end (Optional[Any], optional): Last position date to return (date or ISO string). Defaults to None.
+        columns (Optional[List[str]], optional): Data columns to load besides fund_id and position_date.
+            Defaults to None (all columns).
+        sub_kind (Optional[str], optional): The sub-kind to read. Defaults to 'DIARIO_FI'.
+
+    Returns:
+        pd.DataFrame: The fund's rows, with partition columns first, sorted by position_date when
+                      present. Empty DataFrame if the fund is not indexed.
+
+    Raises:
+        ImportError: If pyarrow is not available.
+    """
+    if pyarrow is None:
+        raise ImportError(f"The 'pyarrow' library is required to read CVM datasets. {FI.PARQUET_EXTRA_HINT}")
+    if not os.path.exists(os.path.join(dataset_folder, INDEX_FILE_NAME)):
+        return pd.DataFrame(columns=columns or [])
+
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    data_columns = list(dict.fromkeys([INDEX_COLUMN, INDEX_DATE_COLUMN] + columns)) if columns is not None else None
+
+    index = CVMDatasetIndex(dataset_folder)
+    try:
+        entries = index.lookup(fund_id, sub_kind=sub_kind,
+                               start=start.strftime('%Y-%m-%d') if start is not None else None,
+                               end=end.strftime('%Y-%m-%d') if end is not None else None)
+    finally:
+        index.close()
+
+    frames = []
+    for part_file, row_start, row_end in entries:
+        if not os.path.exists(part_file):
+            logger.warning(f"Indexed part not found, skipping: {part_file}")
+            continue
+        rows = _read_part_rows(part_file, row_start, row_end, data_columns)
+        partition_values = _partition_values_from_path(dataset_folder, os.path.dirname(part_file))
+        for col, value in partition_values.items():
+            rows[col] = None if value == NULL_PARTITION_VALUE else value
+        frames.append(rows[list(partition_values) + [c for c in rows.columns if c not in partition_values]])
+
+    if not frames:
+        return pd.DataFrame(columns=columns or [])
+
+    series = pd.concat(frames, ignore_index=True)
+    if INDEX_DATE_COLUMN in series.columns:
+        dates = pd.to_datetime(series[INDEX_DATE_COLUMN], errors='coerce')
+        mask = pd.Series(True, index=series.index)
+        if start is not None:
+            mask &= dates >= start
+        if end is not None:
+            mask &= dates <= end
+        series = series[mask].assign(_sort_date=dates[mask]).sort_values('_sort_date', kind='stable').drop(columns='_sort_date')
+    return series.reset_index(drop=True)
+
+
+class CVMDatasetWriter:
+    """
+    Persists processed CVM frames into a partitioned Parquet dataset.
+
+    Supports two write modes:
+        - 'append': every write adds new parts to the partitions it touches.
+        - 'overwrite': the first write to a partition during the writer's lifetime removes the
+          parts already stored there; later writes to the same partition append to it. This
+          replaces whole partitions when a file group is reprocessed while allowing several
+          files of the same group to share a partition.
+        - 'upsert': written rows replace the stored rows of the partition with the same
+          UPSERT_KEY_COLUMNS and the partition is rewritten; used to apply row deltas. Data without
+          the key columns is written as in 'overwrite' mode.
+    """
+
+    def __init__(self, dataset_folder: Optional[str] = None, mode: str = 'append', build_index: bool = True):
+        """
+        Initializes the dataset writer.
+
+        Args:
+            dataset_folder (Optional[str], optional): The root folder of the dataset.
+                If None, uses the default from check_dataset_folder. Defaults to None.
+            mode (str, optional): Write mode, 'append', 'overwrite' or 'upsert'. Defaults to 'append'.
+            build_index (bool, optional): Sort parts by fund and maintain the fund row-range index
+                used by read_cvm_fund_series. Defaults to True.
+
+        Raises:
+            ValueError: If the mode is invalid.
+            ImportError: If no Parquet engine (pyarrow) is available.
+        """
+        if mode not in WRITE_MODES:
+            raise ValueError(f"Invalid write mode '{mode}'. Expected one of: {', '.join(WRITE_MODES)}.")
+        if pyarrow is None:
+            raise ImportError(f"The 'pyarrow' library is required to write CVM datasets. {FI.PARQUET_EXTRA_HINT}")
+        self.mode = mode
+        self.dataset_folder = check_dataset_folder(dataset_folder)
+        self._cleared_partitions = set()
+        self.index = CVMDatasetIndex(self.dataset_folder) if build_index else None
+
+    def _clear_partition(self, partition_path: str):
+        """Removes existing parts from a partition, once per writer lifetime (not in append mode)."""
+        if self.mode == 'append' or partition_path in self._cleared_partitions:
+            return
+        removed = []
+        if os.path.isdir(partition_path):
+            for f in os.listdir(partition_path):
+                if f.endswith(PART_FILE_EXT):
+                    os.remove(os.path.join(partition_path, f))
+                    removed.append(os.path.join(partition_path, f))
+        if self.index is not None:
+            self.index.remove_parts(removed)
+        self._cleared_partitions.add(partition_path)
+
+    @staticmethod
+    def _merge_stored(partition_path: str, part: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+        """Merges a part with the rows stored in its partition, the part replacing rows with the same key (upsert mode)."""
+        stored_files = sorted(os.path.join(partition_path, f) for f in os.listdir(partition_path)
+                              if f.endswith(PART_FILE_EXT)) if os.path.isdir(partition_path) else []
+        if not stored_files:
+            return part, []
+        stored = pd.concat([pd.read_parquet(f) for f in stored_files], ignore_index=True)
+        if all(c in stored.columns for c in UPSERT_KEY_COLUMNS):
+            keys = pd.MultiIndex.from_frame(part[UPSERT_KEY_COLUMNS].astype(str))
+            stored = stored[~pd.MultiIndex.from_frame(stored[UPSERT_KEY_COLUMNS].astype(str)).isin(keys)]
+        return pd.concat([stored, part], ignore_index=True), stored_files
+
+    def write(self, data: pd.DataFrame, partition_cols: List[str], part_name: str) -> List[str]:
+        """
+        Writes a processed frame into the dataset, one part per partition it spans.
+
+        Args:
+            data (pd.DataFrame): The processed data (as returned by read_cvm_history_file).
+            partition_cols (List[str]): The partition columns, in directory order.
+            part_name (str): Base name for the written parts (usually the source file name).
+
+        Returns:
+            List[str]: Paths of the Parquet parts written. Empty list if data is empty.
+
+        Raises:
+            ValueError: If a partition column is missing from the data.
+        """
+        if data is None or data.empty:
+            logger.warning(f"No data to write for part '{part_name}'.")
+            return []
+
+        missing_cols = [c for c in partition_cols if c not in data.columns]
+        if missing_cols:
+            raise ValueError(f"Partition columns missing from data for part '{part_name}': {missing_cols}")
+
+        data_cols = [c for c in data.columns if c not in partition_cols]
+        written = []
+        groups = data.groupby(partition_cols, dropna=False, sort=False) if partition_cols else [((), data)]
+        for keys, part in groups:
+            keys = keys if isinstance(keys, tuple) else (keys,)
+            partition_path = build_partition_path(self.dataset_folder, list(zip(partition_cols, keys)))
+            part = part[data_cols]
+            replaced = []
+            if self.mode == 'upsert' and all(c in part.columns for c in UPSERT_KEY_COLUMNS):
+                part, replaced = self._merge_stored(partition_path, part)
+            else:
+                self._clear_partition(partition_path)
+            os.makedirs(partition_path, exist_ok=True)
+
+            k = 0
+            while os.path.exists(part_file := os.path.join(partition_path, f"{part_name}.{str(k).zfill(4)}{PART_FILE_EXT}")):
+                k += 1
+
+            if self.index is not None and INDEX_COLUMN in part.columns:
+                sort_cols = [INDEX_COLUMN] + ([INDEX_DATE_COLUMN] if INDEX_DATE_COLUMN in part.columns else [])
+                part = part.sort_values(sort_cols, kind='stable')
+
+            # Write to a temporary file first so readers never see partial parts
+            temp_file = os.path.join(partition_path, f".{uuid.uuid4().hex}.tmp")
+            try:
+                part.to_parquet(temp_file, index=False, row_group_size=INDEX_ROW_GROUP_SIZE)
+                shutil.move(temp_file, part_file)
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+            written.append(part_file)
+            # The merged part holds the replaced parts' rows: drop them only once it is in place
+            for f in replaced:
+                os.remove(f)
+
+            if self.index is not None:
+                self.index.remove_parts(replaced)
+                partition_values = dict(zip(partition_cols, keys))
+                self.index.add_part(part_file, partition_values.get('kind'), partition_values.get('sub_kind'), part)
+
+        return written
+
+    def __call__(self, cvm_file: str, kind: str, sub_kind: str, data: pd.DataFrame, partition_cols: List[str]) -> List[str]:
+        """
+        Sink interface used by CVM.process_pending: writes the data of one processed CVM file.
+
+        Args:
+            cvm_file (str): Path of the processed source file. Its base name is used as part name.
+            kind (str): The kind of the processed data (unused, already in the partition columns).
+            sub_kind (str): The sub-kind of the processed data (unused, already in the partition columns).
+            data (pd.DataFrame): The processed data.
+            partition_cols (List[str]): The partition columns.
+
+        Returns:
+            List[str]: Paths of the Parquet parts written.
+        """
+        return self.write(data, partition_cols, os.path.splitext(os.path.basename(cvm_file))[0])
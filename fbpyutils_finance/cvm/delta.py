@@ -0,0 +1,159 @@
+'''
+Row-level delta detection for republished CVM files.
+
+CVM republishes the current month's `inf_diario_fi_YYYYMM` file every day, so reprocessing it
+re-emits the whole month. CVMRowFingerprints keeps one fingerprint per (fund_id, position_date)
+in the catalog database and filters a processed frame down to the rows that are new or whose
+content changed since the fingerprints were last committed.
+'''
+
+import sqlite3
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+
+from .utils import hash_string
+from .catalog import CatalogSource, connect_catalog, resolve_catalog_connection
+
+# --- Constantes ---
+# Natural key of the rows tracked per (kind, sub_kind). Other kinds are passed through unchanged.
+DELTA_KEY_COLUMNS = {
+    ('IF_POSITION', 'DIARIO_FI'): ['fund_id', 'position_date'],
+}
+
+# --- Funções de Delta ---
+
+def _combine_fingerprints(fingerprints: pd.Series) -> int:
+    """Combines the fingerprints of rows sharing a key into one, independently of row order."""
+    return int(hash_string(','.join(sorted(map(str, fingerprints))))[:16], 16) - (1 << 63)
+
+
+class CVMRowFingerprints:
+    """
+    Persistent per-row fingerprints of processed CVM data, stored in the catalog database.
+
+    Rows are identified by the DELTA_KEY_COLUMNS of their (kind, sub_kind) and fingerprinted with
+    a hash of all their processed columns. diff() returns only inserted or changed rows together
+    with their new fingerprints; commit() stores those fingerprints once the rows were consumed.
+    Rows that disappear from a republished file are not reported.
+    """
+
+    FINGERPRINTS_TABLE = 'cvm_if_row_fingerprints'
+
+    def __init__(self, catalog: CatalogSource):
+        """
+        Initializes the fingerprint store, creating its table if needed.
+
+        Args:
+            catalog (CatalogSource): An open catalog database connection, a CVMCatalog (each thread
+                uses its own connection), or the path to the catalog database file.
+        """
+        self._catalog = connect_catalog(catalog) if isinstance(catalog, str) else catalog
+        self.CATALOG.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.FINGERPRINTS_TABLE} (
+                kind TEXT NOT NULL,
+                sub_kind TEXT NOT NULL,
+                fund_id TEXT NOT NULL,
+                position_date TEXT NOT NULL,
+                fingerprint INTEGER,
+                PRIMARY KEY (kind, sub_kind, position_date, fund_id)
+            );
+        """)
+        self.CATALOG.commit()
+
+    @property
+    def CATALOG(self) -> sqlite3.Connection:
+        """The catalog connection of the calling thread."""
+        return resolve_catalog_connection(self._catalog)
+
+    @staticmethod
+    def _fingerprints(data: pd.DataFrame, key_columns: list) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Returns the string keys of every row and one signed 64-bit fingerprint per distinct key."""
+        keys = data[key_columns].astype(str).reset_index(drop=True)
+        keys.columns = ['fund_id', 'position_date']
+        row_hashes = pd.util.hash_pandas_object(data, index=False).to_numpy()
+
+        fingerprints = keys.assign(fingerprint=row_hashes.view(np.int64))
+        duplicated = fingerprints.duplicated(['fund_id', 'position_date'], keep=False)
+        if duplicated.any():
+            combined = (fingerprints[duplicated].groupby(['fund_id', 'position_date'], sort=False)['fingerprint']
+                        .agg(_combine_fingerprints).reset_index())
+            fingerprints = pd.concat([fingerprints[~duplicated], combined], ignore_index=True)
+        return keys, fingerprints
+
+    def fingerprint(self, kind: str, sub_kind: str, data: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """
+        Fingerprints all rows of processed data, for runs that consume every row (see commit()).
+
+        Args:
+            kind (str): The kind of the data (e.g., 'IF_POSITION').
+            sub_kind (str): The sub-kind of the data (e.g., 'DIARIO_FI').
+            data (pd.DataFrame): The processed data (as returned by read_cvm_history_file).
+
+        Returns:
+            Optional[pd.DataFrame]: The fingerprints to pass to commit(), or None for kinds without
+                delta keys or data missing their key columns.
+        """
+        key_columns = DELTA_KEY_COLUMNS.get((kind, sub_kind))
+        if key_columns is None or data is None or data.empty or any(c not in data.columns for c in key_columns):
+            return None
+        return self._fingerprints(data, key_columns)[1]
+
+    def diff(self, kind: str, sub_kind: str, data: pd.DataFrame) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+        """
+        Filters processed data down to the rows inserted or changed since the last commit.
+
+        Args:
+            kind (str): The kind of the data (e.g., 'IF_POSITION').
+            sub_kind (str): The sub-kind of the data (e.g., 'DIARIO_FI').
+            data (pd.DataFrame): The processed data (as returned by read_cvm_history_file).
+
+        Returns:
+            Tuple[pd.DataFrame, Optional[pd.DataFrame]]: The new or changed rows and the fingerprints
+                to pass to commit(). For kinds without delta keys, data is returned unchanged and the
+                fingerprints are None.
+
+        Raises:
+            ValueError: If a key column is missing from the data.
+        """
+        key_columns = DELTA_KEY_COLUMNS.get((kind, sub_kind))
+        if key_columns is None or data is None or data.empty:
+            return data, None
+
+        missing_cols = [c for c in key_columns if c not in data.columns]
+        if missing_cols:
+            raise ValueError(f"Delta key columns missing from {kind}/{sub_kind} data: {missing_cols}")
+
+        keys, fingerprints = self._fingerprints(data, key_columns)
+        stored = pd.read_sql(
+            f"""SELECT fund_id, position_date, fingerprint AS stored_fingerprint FROM {self.FINGERPRINTS_TABLE}
+                WHERE kind = ? AND sub_kind = ? AND position_date BETWEEN ? AND ?""",
+            con=self.CATALOG,
+            params=(kind, sub_kind, fingerprints['position_date'].min(), fingerprints['position_date'].max())
+        ).astype({'stored_fingerprint': 'Int64'})
+
+        merged = fingerprints.merge(stored, on=['fund_id', 'position_date'], how='left')
+        changed = merged['stored_fingerprint'].ne(merged['fingerprint']).fillna(True).astype(bool)
+        changed_fingerprints = merged.loc[changed, ['fund_id', 'position_date', 'fingerprint']].reset_index(drop=True)
+
+        changed_keys = pd.MultiIndex.from_frame(changed_fingerprints[['fund_id', 'position_date']])
+        rows = pd.MultiIndex.from_frame(keys).isin(changed_keys)
+        return data[rows], changed_fingerprints
+
+    def commit(self, kind: str, sub_kind: str, fingerprints: Optional[pd.DataFrame]):
+        """
+        Stores the fingerprints returned by diff(), after the delta rows were consumed.
+
+        Args:
+            kind (str): The kind of the data.
+            sub_kind (str): The sub-kind of the data.
+            fingerprints (Optional[pd.DataFrame]): Fingerprints returned by diff(). None or empty is a no-op.
+        """
+        if fingerprints is None or fingerprints.empty:
+            return
+        self.CATALOG.executemany(
+            f"INSERT OR REPLACE INTO {self.FINGERPRINTS_TABLE} (kind, sub_kind, fund_id, position_date, fingerprint) VALUES (?, ?, ?, ?, ?)",
+            ((kind, sub_kind, fund_id, position_date, int(fingerprint))
+             for fund_id, position_date, fingerprint in fingerprints.itertuples(index=False, name=None))
+        )
+        self.CATALOG.commit()
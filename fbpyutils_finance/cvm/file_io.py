@@ -1,5 +1,6 @@
 import os
 import csv
+import logging
 import sqlite3
 import pandas as pd
 from datetime import datetime
@@ -7,16 +8,31 @@ from typing import Dict, Optional, Tuple, List, Any
 import re # Added import re
 
 import fbpyutils.file as FU
+import fbpyutils_finance as FI
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None # type: ignore
+    pa_csv = None # type: ignore
 from fbpyutils.debug import debug_info
 from .utils import hash_string, is_nan_or_empty
 # Import necessary functions from other new modules
 # Need to import headers functions used here
-from .headers import check_cvm_headers_changed, get_cvm_file_metadata
+from .headers import check_cvm_headers_changed, get_cvm_file_metadata, CVMHeaderCache
 # Need to import processing functions used here
-from .processing import get_expression_and_converters, apply_expressions, apply_converters
+from .processing import get_expression_and_converters, get_converter_dtypes, get_source_columns, apply_expressions, apply_converters
+from .instrumentation import INSTRUMENTATION
+
+logger = logging.getLogger(__name__)
 
 # --- Constantes ---
 TARGET_ENCODING = 'utf-8'
+CSV_ENGINES = ('pyarrow', 'c')
+# Default missing value markers of pandas.read_csv, so both engines agree
+CSV_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                 '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
 
 # --- Funções de I/O de Arquivo ---
 
@@ -78,18 +94,203 @@ def write_target_file(data: str, metadata: Dict[str, Any], target_folder: str, i
         os.makedirs(os.path.dirname(target_file), exist_ok=True) # Ensure directory exists
         with open(target_file, 'w', encoding=encoding) as f: # Use 'w' for text mode
             f.write(data)
-        print(f"Successfully wrote file: {target_file}")
+        logger.debug(f"Successfully wrote file: {target_file}")
         return target_file
     except IOError as e:
-        print(f"Error writing file {target_file}: {e}")
+        logger.error(f"Error writing file {target_file}: {e}")
         raise # Re-raise the exception
 
 
+def index_history_folder(history_folder: str) -> Dict[Tuple[str, str], List[str]]:
+    """
+    Indexes the files in the history folder by (kind, name), walking the folder only once.
+
+    Files are expected to be named as built by build_target_file_name: 'kind.name.ext' or
+    'kind.name.index.ext' (files extracted from archives).
+
+    Args:
+        history_folder (str): The folder containing the downloaded CVM files.
+
+    Returns:
+        Dict[Tuple[str, str], List[str]]: Mapping of (kind, name), both lowercase, to the sorted
+            list of full paths of the files of that group.
+    """
+    index: Dict[Tuple[str, str], List[str]] = {}
+    for root, _, files in os.walk(history_folder):
+        for file_name in files:
+            parts = file_name.split('.')
+            if len(parts) < 3:
+                continue # Not a file written by write_target_file
+            key = (parts[0].lower(), parts[1].lower())
+            index.setdefault(key, []).append(os.path.join(root, file_name))
+
+    for file_paths in index.values():
+        file_paths.sort()
+    return index
+
+
+def _read_cvm_csv_c(source_file: str, usecols: Optional[List[str]]) -> pd.DataFrame:
+    """Reads a CVM history file with the pandas C reader. Short rows are padded with missing values."""
+    # Specify low_memory=False for potentially mixed type columns
+    return pd.read_csv(source_file, sep=';', encoding=TARGET_ENCODING, dtype=str, quoting=csv.QUOTE_NONE, low_memory=False, on_bad_lines='warn',
+                       usecols=usecols)
+
+
+def _read_cvm_csv_pyarrow(source_file: str, usecols: Optional[List[str]]) -> Optional[pd.DataFrame]:
+    """
+    Reads a CVM history file with the pyarrow CSV reader, with the same options as the pandas reader.
+
+    pyarrow can only skip rows with a wrong number of fields, while the C reader pads short rows
+    (and, with usecols, keeps long ones). The read stops at the first such row and None is
+    returned: the caller reads the file with the C reader instead.
+    """
+    ragged_rows = []
+
+    def handle_bad_line(row):
+        ragged_rows.append(row)
+        return 'error'
+
+    if not usecols:
+        # Every column is typed as text up front: inferring and casting back would lose leading zeros
+        with open(source_file, 'r', encoding=TARGET_ENCODING) as f:
+            usecols = f.readline().rstrip('\r\n').split(';')
+    try:
+        table = pa_csv.read_csv(
+            source_file,
+            read_options=pa_csv.ReadOptions(encoding=TARGET_ENCODING),
+            parse_options=pa_csv.ParseOptions(delimiter=';', quote_char=False, invalid_row_handler=handle_bad_line),
+            convert_options=pa_csv.ConvertOptions(include_columns=usecols, column_types={c: pa.string() for c in usecols},
+                                                  strings_can_be_null=True, null_values=CSV_NA_VALUES),
+        )
+    except pa.ArrowInvalid:
+        if ragged_rows:
+            row = ragged_rows[0]
+            logger.info(f"{source_file} has a row with {row.actual_columns} fields instead of {row.expected_columns}, "
+                        f"reading it with the 'c' engine: {row.text[:200]}")
+            return None
+        raise
+    return table.to_pandas()
+
+
+def read_cvm_csv(source_file: str, usecols: Optional[List[str]] = None, engine: Optional[str] = None) -> pd.DataFrame:
+    """
+    Reads a CVM history file (';' delimited, TARGET_ENCODING, no quoting) as string columns.
+
+    Args:
+        source_file (str): Path to the CVM history file.
+        usecols (Optional[List[str]], optional): Source columns to read, as named in the file header
+            (see processing.get_source_columns). Defaults to None (all columns).
+        engine (Optional[str], optional): 'pyarrow' or 'c'. Defaults to 'pyarrow' when installed, else 'c'.
+            Both engines give the same frame: pyarrow falls back to 'c' for files with rows of a
+            wrong number of fields, which 'c' pads or skips with a warning.
+
+    Returns:
+        pd.DataFrame: The raw file data with lower-case column names. Empty fields are missing values.
+
+    Raises:
+        ValueError: If the engine is invalid or unavailable, or the file cannot be parsed.
+    """
+    engine = engine or ('pyarrow' if pa_csv is not None else 'c')
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"Invalid CSV engine: {engine}. Use one of {CSV_ENGINES}.")
+    if engine == 'pyarrow' and pa_csv is None:
+        raise ValueError(f"The 'pyarrow' CSV engine requires the pyarrow package. {FI.PARQUET_EXTRA_HINT}")
+
+    try:
+        if_data = _read_cvm_csv_pyarrow(source_file, usecols) if engine == 'pyarrow' else None
+        if if_data is None:
+            if_data = _read_cvm_csv_c(source_file, usecols)
+    except Exception as read_err:
+        raise ValueError(f"Failed to read CSV {source_file}: {read_err}")
+    if_data.columns = [c.lower() for c in if_data.columns] # Normalize column names immediately
+    return if_data
+
+
+def compute_cvm_partitions(cvm_if_data: pd.DataFrame, kind: str, sub_kind: str, source_file: str) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Adds the partitioning columns (kind, sub_kind, year, period, period_date) to processed CVM data.
+
+    Period info comes from position_date or start_date when available, or from the file name
+    date for CAD_FI files.
+
+    Args:
+        cvm_if_data (pd.DataFrame): The processed data. Partition columns are added in place.
+        kind (str): The kind of the data (e.g., 'IF_POSITION').
+        sub_kind (str): The sub-kind of the data (e.g., 'DIARIO_FI').
+        source_file (str): Path of the source file, used for CAD_FI period info and warnings.
+
+    Returns:
+        Tuple[pd.DataFrame, List[str]]: The data with partition columns first, and the partition columns.
+    """
+    # Store original columns before adding partitioning ones
+    cvm_if_data_cols = list(cvm_if_data.columns)
+
+    cvm_if_data['kind'] = kind
+    cvm_if_data['sub_kind'] = sub_kind
+
+    partition_cols = ['kind', 'sub_kind'] # Base partition columns
+
+    # Safely access columns for period calculation
+    if 'position_date' in cvm_if_data.columns and not cvm_if_data['position_date'].isnull().all():
+        try:
+            # Ensure it's datetime before formatting
+            pos_date_dt = pd.to_datetime(cvm_if_data['position_date'], errors='coerce')
+            cvm_if_data['year'] = pos_date_dt.dt.strftime('%Y')
+            cvm_if_data['period'] = pos_date_dt.dt.strftime('%Y-%m')
+            partition_cols.extend(['year', 'period'])
+        except Exception as e:
+            logger.warning(f"Could not compute period info from 'position_date' in {source_file}: {e}")
+    elif 'start_date' in cvm_if_data.columns and not cvm_if_data['start_date'].isnull().all():
+        try:
+            start_date_dt = pd.to_datetime(cvm_if_data['start_date'], errors='coerce')
+            cvm_if_data['year'] = start_date_dt.dt.strftime('%Y')
+            cvm_if_data['period'] = start_date_dt.dt.strftime('%Y-%m')
+            partition_cols.extend(['year', 'period'])
+        except Exception as e:
+            logger.warning(f"Could not compute period info from 'start_date' in {source_file}: {e}")
+    elif sub_kind == 'CAD_FI': # Special handling for CAD_FI based on filename date
+        try:
+            file_name = os.path.basename(source_file)
+            # Expected format: kind.inf_cadastral_fi_YYYYMMDD.csv or kind.cad_fi.csv
+            parts = file_name.split('.')
+            date_part_str = None
+            if len(parts) >= 3 and parts[1].startswith('inf_cadastral_fi_'):
+                date_part_str = parts[1].split('_')[-1] # YYYYMMDD
+                date_format = '%Y%m%d'
+            elif len(parts) >= 2 and parts[1] == 'cad_fi': # Current file, use today's date
+                date_part_str = datetime.now().strftime('%Y%m%d')
+                date_format = '%Y%m%d'
+
+            if date_part_str:
+                period_date = pd.to_datetime(date_part_str, format=date_format)
+                cvm_if_data['year'] = period_date.strftime("%Y")
+                cvm_if_data['period'] = period_date.strftime("%Y-%m")
+                cvm_if_data['period_date'] = period_date.strftime('%Y-%m-%d')
+                partition_cols.extend(['year', 'period', 'period_date'])
+            else:
+                logger.warning(f"Could not extract date from filename for CAD_FI: {file_name}")
+
+        except Exception as e:
+            logger.warning(f"Error computing period info for CAD_FI file {source_file}: {e}")
+    # else: # No date column found for period calculation
+    #     print(f"Warning: No suitable date column found for period calculation in {source_file}")
+
+    # Ensure all potential partition columns exist before selecting
+    final_cols = []
+    for col in partition_cols + cvm_if_data_cols:
+        if col in cvm_if_data.columns and col not in final_cols:
+            final_cols.append(col)
+
+    return cvm_if_data[final_cols], partition_cols
+
+
 def read_cvm_history_file(
     source_file: str,
     headers_df: pd.DataFrame,
     apply_conversions: bool = True,
-    check_header: bool = False
+    check_header: bool = False,
+    header_cache: Optional[CVMHeaderCache] = None,
+    nullable_dtypes: bool = False
 ) -> Tuple[str, str, pd.DataFrame, List[str]]:
     """
     Reads and processes a single CVM history data file based on predefined headers and mappings.
@@ -99,6 +300,10 @@ def read_cvm_history_file(
         headers_df (pd.DataFrame): DataFrame containing the header mappings (loaded from HEADERS_FILE).
         apply_conversions (bool, optional): Whether to apply data type conversions defined in mappings. Defaults to True.
         check_header (bool, optional): Whether to verify if the file's header matches known mappings. Defaults to False.
+        header_cache (Optional[CVMHeaderCache], optional): Header metadata cache. When given, the file
+            header is only read and hashed if the file changed since it was last cached. Defaults to None.
+        nullable_dtypes (bool, optional): Return pandas nullable dtypes (Int64, Float64, boolean, string,
+            datetime64) instead of object columns with None and date objects. Defaults to False.
 
     Returns:
         Tuple[str, str, pd.DataFrame, List[str]]: A tuple containing:
@@ -118,19 +323,24 @@ def read_cvm_history_file(
         if not os.path.exists(source_file):
             raise FileNotFoundError(f"Source file not found: {source_file}")
 
-        step = 'CHECK FILE HEADER'
-        if check_header:
-            # Pass the existing headers DataFrame to avoid reloading it
-            changed_hashes = check_cvm_headers_changed([source_file], headers_df)
-            if changed_hashes:
-                raise ValueError(f'Header changed for file {source_file}! Hashes: {changed_hashes}')
-
         step = 'GETTING METADATA FROM SOURCE FILE'
-        kind, sub_kind, _, header_hash = get_cvm_file_metadata(source_file)
+        # Metadata is read once and reused by the header check below
+        metadata = header_cache.lookup(source_file) if header_cache is not None else None
+        if metadata is None:
+            metadata = get_cvm_file_metadata(source_file)
+            if header_cache is not None:
+                header_cache.store(source_file, metadata)
+        kind, sub_kind, header_line, header_hash = metadata
 
         if not header_hash:
             raise ValueError(f"Header hash not found for file: {source_file}")
 
+        step = 'CHECK FILE HEADER'
+        if check_header:
+            hash_col = next((c for c in headers_df.columns if c.lower() == 'hash'), None)
+            if hash_col is None or header_hash not in set(headers_df[hash_col].dropna()):
+                raise ValueError(f'Header changed for file {source_file}! Hashes: {{{header_hash!r}}}')
+
         step = 'FILTERING HEADER MAPPINGS'
         mappings = headers_df[headers_df['Hash'] == header_hash].to_dict('records')
         if not mappings:
@@ -144,14 +354,12 @@ def read_cvm_history_file(
             raise ValueError(f'No converters found for hash {header_hash}, but apply_converters is True. Check mappings for file {source_file}.')
 
         step = 'READING DATA FROM SOURCE FILE'
-        try:
-            # Specify low_memory=False for potentially mixed type columns
-            if_data = pd.read_csv(source_file, sep=';', encoding=TARGET_ENCODING, dtype=str, quoting=csv.QUOTE_NONE, low_memory=False, on_bad_lines='warn')
-        except Exception as read_err:
-            raise ValueError(f"Failed to read CSV {source_file}: {read_err}")
+        with INSTRUMENTATION.stage('read_csv', file=os.path.basename(source_file), sub_kind=sub_kind) as metrics:
+            if_data = read_cvm_csv(source_file, usecols=get_source_columns(header_line.split(';'), expressions) or None)
+            metrics.update(rows=len(if_data), bytes=os.path.getsize(source_file))
 
         if if_data.empty:
-            print(f"Warning: File {source_file} is empty.")
+            logger.warning(f"File {source_file} is empty.")
             # Return empty DataFrame matching expected structure
             # Determine expected columns from mappings
             expected_cols = [m['Target_Field'].lower() for m in mappings if m.get('Target_Field')]
@@ -160,77 +368,28 @@ def read_cvm_history_file(
             empty_df = pd.DataFrame(columns=all_expected_cols)
             return kind, sub_kind, empty_df, partition_cols
 
-        if_data.columns = [c.lower() for c in if_data.columns] # Normalize column names immediately
-
         step = 'APPLYING DATA EXPRESSIONS'
-        cvm_if_data = apply_expressions(if_data, expressions=expressions)
+        with INSTRUMENTATION.stage('apply_expressions', file=os.path.basename(source_file), sub_kind=sub_kind) as metrics:
+            cvm_if_data = apply_expressions(if_data, expressions=expressions)
+            metrics['rows'] = len(cvm_if_data)
 
         if apply_conversions:
             step = 'APPLYING DATA TYPES CONVERSIONS'
-            cvm_if_data = apply_converters(cvm_if_data.copy(), data_converters) # Use copy to avoid SettingWithCopyWarning
-
-        # Store original columns before adding partitioning ones
-        cvm_if_data_cols = list(cvm_if_data.columns)
-
-        cvm_if_data['kind'] = kind
-        cvm_if_data['sub_kind'] = sub_kind
+            with INSTRUMENTATION.stage('apply_converters', file=os.path.basename(source_file), sub_kind=sub_kind) as metrics:
+                cvm_if_data = apply_converters(cvm_if_data.copy(), data_converters, # Use copy to avoid SettingWithCopyWarning
+                                               nullable_dtypes=nullable_dtypes,
+                                               dtypes=get_converter_dtypes(mappings) if nullable_dtypes else None)
+                metrics['rows'] = len(cvm_if_data)
 
         step = 'COMPUTING PERIOD INFO'
-        partition_cols = ['kind', 'sub_kind'] # Base partition columns
-
-        # Safely access columns for period calculation
-        if 'position_date' in cvm_if_data.columns and not cvm_if_data['position_date'].isnull().all():
-            try:
-                # Ensure it's datetime before formatting
-                pos_date_dt = pd.to_datetime(cvm_if_data['position_date'], errors='coerce')
-                cvm_if_data['year'] = pos_date_dt.dt.strftime('%Y')
-                cvm_if_data['period'] = pos_date_dt.dt.strftime('%Y-%m')
-                partition_cols.extend(['year', 'period'])
-            except Exception as e:
-                print(f"Warning: Could not compute period info from 'position_date' in {source_file}: {e}")
-        elif 'start_date' in cvm_if_data.columns and not cvm_if_data['start_date'].isnull().all():
-            try:
-                start_date_dt = pd.to_datetime(cvm_if_data['start_date'], errors='coerce')
-                cvm_if_data['year'] = start_date_dt.dt.strftime('%Y')
-                cvm_if_data['period'] = start_date_dt.dt.strftime('%Y-%m')
-                partition_cols.extend(['year', 'period'])
-            except Exception as e:
-                print(f"Warning: Could not compute period info from 'start_date' in {source_file}: {e}")
-        elif sub_kind == 'CAD_FI': # Special handling for CAD_FI based on filename date
-            try:
-                file_name = os.path.basename(source_file)
-                # Expected format: kind.inf_cadastral_fi_YYYYMMDD.csv or kind.cad_fi.csv
-                parts = file_name.split('.')
-                date_part_str = None
-                if len(parts) >= 3 and parts[1].startswith('inf_cadastral_fi_'):
-                    date_part_str = parts[1].split('_')[-1] # YYYYMMDD
-                    date_format = '%Y%m%d'
-                elif len(parts) >= 2 and parts[1] == 'cad_fi': # Current file, use today's date
-                    date_part_str = datetime.now().strftime('%Y%m%d')
-                    date_format = '%Y%m%d'
-
-                if date_part_str:
-                    period_date = pd.to_datetime(date_part_str, format=date_format)
-                    cvm_if_data['year'] = period_date.strftime("%Y")
-                    cvm_if_data['period'] = period_date.strftime("%Y-%m")
-                    cvm_if_data['period_date'] = period_date.strftime('%Y-%m-%d')
-                    partition_cols.extend(['year', 'period', 'period_date'])
-                else:
-                    print(f"Warning: Could not extract date from filename for CAD_FI: {file_name}")
-
-            except Exception as e:
-                print(f"Warning: Error computing period info for CAD_FI file {source_file}: {e}")
-        # else: # No date column found for period calculation
-        #     print(f"Warning: No suitable date column found for period calculation in {source_file}")
-
-        # Ensure all potential partition columns exist before selecting
-        final_cols = []
-        for col in partition_cols + cvm_if_data_cols:
-            if col in cvm_if_data.columns and col not in final_cols:
-                final_cols.append(col)
+        with INSTRUMENTATION.stage('compute_partitions', file=os.path.basename(source_file), sub_kind=sub_kind) as metrics:
+            cvm_if_data, partition_cols = compute_cvm_partitions(cvm_if_data, kind, sub_kind, source_file)
+            metrics['rows'] = len(cvm_if_data)
 
         step = 'SELECTING DATA TO RETURN'
-        return kind, sub_kind, cvm_if_data[final_cols], partition_cols
+        if nullable_dtypes:
+            cvm_if_data = cvm_if_data.astype({col: 'string' for col in partition_cols})
+        return kind, sub_kind, cvm_if_data, partition_cols
 
     except Exception as E:
         info = debug_info(E)
@@ -1,24 +1,102 @@
 import os
+import uuid
+import logging
+import pickle
+import hashlib
 import sqlite3
 import pandas as pd
 import re # Added import re
-from typing import List, Tuple, Dict, Set, Any
+from typing import List, Tuple, Dict, Set, Any, Optional, Union
 
 import fbpyutils.file as FU
 from fbpyutils.debug import debug_info
 from .utils import hash_string, is_nan_or_empty
+from .instrumentation import INSTRUMENTATION
+from .catalog import CatalogSource, connect_catalog, resolve_catalog_connection
 # Need get_expression_and_converters for the logic in get_cvm_updated_headers
 # This creates a potential circular dependency if processing also imports headers.
 # Consider refactoring if this becomes an issue. Maybe move get_expression_and_converters to utils?
 # For now, keep it here as it was in the original structure implicitly.
 from .processing import get_expression_and_converters
 
+logger = logging.getLogger(__name__)
+
 # --- Constantes ---
 # Header file paths are typically loaded from the main __init__.py
 # and passed to functions or classes that need them.
+HEADERS_SHEET_NAME = 'IF_HEADERS'
+HEADERS_CACHE_VERSION = 1 # Bump to invalidate every binary header cache after a format change
 
 # --- Funções de Cabeçalho ---
 
+def _file_sha256(file_path: str) -> str:
+    """Computes the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_cvm_headers_table(xlsx_file: str, cache_folder: Optional[str] = None, sheet_name: str = HEADERS_SHEET_NAME) -> pd.DataFrame:
+    """
+    Loads a header table from its Excel file, using a binary (pickle) cache when it is up to date.
+
+    The cache stores the source file's size, modification time and SHA-256 hash. It is used
+    directly when size and mtime match; otherwise the source hash is compared, so a touched
+    but unchanged file does not trigger a new Excel parse.
+
+    Args:
+        xlsx_file (str): Path to the Excel header file (HEADERS_FILE or HEADER_MAPPINGS_FILE).
+        cache_folder (Optional[str], optional): Folder for the binary cache. If None, the table is
+            always read from the Excel file. Defaults to None.
+        sheet_name (str, optional): The sheet to read. Defaults to HEADERS_SHEET_NAME.
+
+    Returns:
+        pd.DataFrame: The header table.
+
+    Raises:
+        FileNotFoundError: If xlsx_file does not exist.
+    """
+    if not os.path.exists(xlsx_file):
+        raise FileNotFoundError(f"CVM header file not found at: {xlsx_file}")
+    if cache_folder is None:
+        return pd.read_excel(xlsx_file, sheet_name=sheet_name)
+
+    stat = os.stat(xlsx_file)
+    cache_file = os.path.join(cache_folder, f"{os.path.splitext(os.path.basename(xlsx_file))[0]}.{sheet_name.lower()}.pkl")
+
+    cached = None
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get('version') != HEADERS_CACHE_VERSION:
+                cached = None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable header cache {cache_file}: {e}")
+            cached = None
+
+    if cached is not None and (cached['size'], cached['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+        return cached['data']
+
+    file_hash = _file_sha256(xlsx_file)
+    data = cached['data'] if cached is not None and cached['hash'] == file_hash else pd.read_excel(xlsx_file, sheet_name=sheet_name)
+
+    try:
+        os.makedirs(cache_folder, exist_ok=True)
+        # Written to a temporary file first so concurrent readers never see a partial cache
+        temp_file = os.path.join(cache_folder, f".{uuid.uuid4().hex}.tmp")
+        with open(temp_file, 'wb') as f:
+            pickle.dump({'version': HEADERS_CACHE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                         'hash': file_hash, 'data': data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, cache_file)
+    except Exception as e:
+        logger.warning(f"Failed to write header cache {cache_file}: {e}")
+
+    return data
+
+
 def get_cvm_file_metadata(cvm_file_path: str) -> Tuple[str, str, str, str]:
     """
     Analyzes a CVM file path to extract metadata: kind, sub-kind, header line, and header hash.
@@ -39,6 +117,12 @@ def get_cvm_file_metadata(cvm_file_path: str) -> Tuple[str, str, str, str]:
         ValueError: If the filename format is unexpected and kind/sub-kind cannot be determined.
         UnicodeDecodeError: If the file cannot be decoded using UTF-8.
     """
+    with INSTRUMENTATION.stage('header_hash', file=os.path.basename(cvm_file_path)):
+        return _read_cvm_file_metadata(cvm_file_path)
+
+
+def _read_cvm_file_metadata(cvm_file_path: str) -> Tuple[str, str, str, str]:
+    """Reads the header line of a CVM file and derives its metadata (see get_cvm_file_metadata)."""
     if not os.path.exists(cvm_file_path):
         raise FileNotFoundError(f"CVM file not found: {cvm_file_path}")
 
@@ -48,7 +132,7 @@ def get_cvm_file_metadata(cvm_file_path: str) -> Tuple[str, str, str, str]:
             with open(cvm_file_path, 'r', encoding='utf-8') as f:
                 header_line = f.readline().strip() # Read first line and remove trailing newline
         except UnicodeDecodeError:
-            print(f"Warning: Decoding {cvm_file_path} as utf-8 failed, trying iso-8859-1.")
+            logger.warning(f"Decoding {cvm_file_path} as utf-8 failed, trying iso-8859-1.")
             with open(cvm_file_path, 'r', encoding='iso-8859-1') as f:
                 header_line = f.readline().strip()
 
@@ -82,7 +166,7 @@ def get_cvm_file_metadata(cvm_file_path: str) -> Tuple[str, str, str, str]:
     # Add more rules here if other sub_kinds exist based on filename patterns
     else:
          # Fallback or raise error if pattern is unknown
-         print(f"Warning: Unknown sub_kind pattern in filename: {file_name}. Using '{metadata_part.upper()}' as sub_kind.")
+         logger.warning(f"Unknown sub_kind pattern in filename: {file_name}. Using '{metadata_part.upper()}' as sub_kind.")
          sub_kind = metadata_part.upper()
          # Alternatively: raise ValueError(f"Cannot determine sub_kind from filename part: {metadata_part}")
 
@@ -94,10 +178,115 @@ def get_cvm_file_metadata(cvm_file_path: str) -> Tuple[str, str, str, str]:
     return kind, sub_kind, header_line, header_hash
 
 
+class CVMHeaderCache:
+    """
+    Persistent cache of CVM file header metadata (kind, sub-kind, header line and hash).
+
+    Entries are stored in the catalog database and keyed by the file's absolute path, size and
+    modification time, so a file is only opened and hashed again after it changes on disk.
+    """
+
+    CACHE_TABLE = 'cvm_if_header_cache'
+
+    def __init__(self, catalog: CatalogSource):
+        """
+        Initializes the cache, creating its table if needed.
+
+        Args:
+            catalog (CatalogSource): An open catalog database connection, a CVMCatalog (each thread
+                uses its own connection), or the path to the catalog database file (a connection
+                owned by the cache is opened).
+        """
+        self._owns_connection = isinstance(catalog, str)
+        self._catalog = connect_catalog(catalog) if self._owns_connection else catalog
+        self.CATALOG.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.CACHE_TABLE} (
+                path TEXT PRIMARY KEY NOT NULL,
+                size INTEGER,
+                mtime_ns INTEGER,
+                kind TEXT,
+                sub_kind TEXT,
+                header TEXT,
+                hash TEXT
+            );
+        """)
+        self.CATALOG.commit()
+
+    @property
+    def CATALOG(self) -> Optional[sqlite3.Connection]:
+        """The catalog connection of the calling thread."""
+        return resolve_catalog_connection(self._catalog) if self._catalog is not None else None
+
+    @staticmethod
+    def _file_key(cvm_file_path: str) -> Tuple[str, int, int]:
+        """Returns the (absolute path, size, mtime_ns) key of a file."""
+        stat = os.stat(cvm_file_path)
+        return os.path.abspath(cvm_file_path), stat.st_size, stat.st_mtime_ns
+
+    def lookup(self, cvm_file_path: str) -> Optional[Tuple[str, str, str, str]]:
+        """
+        Returns the cached metadata of a file, or None if missing or stale.
+
+        Raises:
+            FileNotFoundError: If the cvm_file_path does not exist.
+        """
+        if not os.path.exists(cvm_file_path):
+            raise FileNotFoundError(f"CVM file not found: {cvm_file_path}")
+        row = self.CATALOG.execute(
+            f"SELECT kind, sub_kind, header, hash FROM {self.CACHE_TABLE} WHERE path = ? AND size = ? AND mtime_ns = ?",
+            self._file_key(cvm_file_path)
+        ).fetchone()
+        INSTRUMENTATION.count('header_cache_hits' if row else 'header_cache_misses')
+        return tuple(row) if row else None
+
+    def store(self, cvm_file_path: str, metadata: Tuple[str, str, str, str], commit: bool = True):
+        """Stores the metadata of a file, replacing any previous entry for its path."""
+        self.CATALOG.execute(
+            f"INSERT OR REPLACE INTO {self.CACHE_TABLE} (path, size, mtime_ns, kind, sub_kind, header, hash) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (*self._file_key(cvm_file_path), *metadata)
+        )
+        if commit:
+            self.CATALOG.commit()
+
+    def get(self, cvm_file_path: str, commit: bool = True) -> Tuple[str, str, str, str]:
+        """
+        Returns the metadata of a file from the cache, computing and storing it on a miss.
+
+        Args:
+            cvm_file_path (str): The full path to the CVM file.
+            commit (bool, optional): Commit a new entry immediately. Pass False when looking up
+                many files and call commit() once at the end. Defaults to True.
+
+        Returns:
+            Tuple[str, str, str, str]: (kind, sub_kind, header_line, header_hash), as get_cvm_file_metadata.
+        """
+        metadata = self.lookup(cvm_file_path)
+        if metadata is None:
+            metadata = get_cvm_file_metadata(cvm_file_path)
+            self.store(cvm_file_path, metadata, commit=commit)
+        return metadata
+
+    def commit(self):
+        """Commits pending cache entries."""
+        self.CATALOG.commit()
+
+    def close(self):
+        """Closes the database connection if it is owned by the cache."""
+        if self._owns_connection and self._catalog is not None:
+            self._catalog.close()
+            self._catalog = None
+
+
+def _get_file_metadata(cvm_file_path: str, cache: Optional[CVMHeaderCache]) -> Tuple[str, str, str, str]:
+    """Gets file metadata through the cache when one is provided."""
+    return cache.get(cvm_file_path, commit=False) if cache is not None else get_cvm_file_metadata(cvm_file_path)
+
+
 def get_cvm_updated_headers(
     cvm_files: List[str],
     header_mappings_df: pd.DataFrame,
-    current_headers_df: pd.DataFrame
+    current_headers_df: pd.DataFrame,
+    cache: Optional[CVMHeaderCache] = None
     ) -> List[Dict[str, Any]]:
     """
     Compares headers from CVM files against existing mappings and identifies new/changed headers.
@@ -108,6 +297,8 @@ def get_cvm_updated_headers(
         cvm_files (List[str]): List of paths to CVM files to analyze.
         header_mappings_df (pd.DataFrame): DataFrame loaded from HEADER_MAPPINGS_FILE.
         current_headers_df (pd.DataFrame): DataFrame loaded from HEADERS_FILE (current state).
+        cache (Optional[CVMHeaderCache], optional): Header metadata cache used to avoid re-reading
+            unchanged files. Defaults to None (read every file).
 
     Returns:
         List[Dict[str, Any]]: A list of dictionaries, each representing a complete header mapping row
@@ -124,7 +315,7 @@ def get_cvm_updated_headers(
         if cvm_files is None or not isinstance(cvm_files, list):
             # Allow empty list, just return current headers
             if not cvm_files:
-                 print("Warning: Empty cvm_files list provided to get_cvm_updated_headers.")
+                 logger.warning("Empty cvm_files list provided to get_cvm_updated_headers.")
                  return current_headers_df.to_dict('records') if not current_headers_df.empty else []
             else:
                  raise ValueError("cvm_files must be a list.")
@@ -167,18 +358,20 @@ def get_cvm_updated_headers(
         processed_files_count = 0
         for cvm_file_path in cvm_files:
             try:
-                kind, sub_kind, header, header_hash = get_cvm_file_metadata(cvm_file_path)
+                kind, sub_kind, header, header_hash = _get_file_metadata(cvm_file_path, cache)
                 if_source_headers.add((kind, sub_kind, header, header_hash))
                 processed_files_count += 1
             except FileNotFoundError:
-                 print(f"Warning: File not found, skipping: {cvm_file_path}")
+                 logger.warning(f"File not found, skipping: {cvm_file_path}")
             except (ValueError, IOError, UnicodeDecodeError) as e:
-                 print(f"Warning: Skipping file due to metadata extraction error: {cvm_file_path} - {e}")
+                 logger.warning(f"Skipping file due to metadata extraction error: {cvm_file_path} - {e}")
             except Exception as e:
-                print(f"Warning: Unexpected error processing file, skipping: {cvm_file_path} - {e}")
+                logger.warning(f"Unexpected error processing file, skipping: {cvm_file_path} - {e}")
+        if cache is not None:
+            cache.commit()
 
         if not if_source_headers:
-             print("Warning: No valid headers extracted from the provided CVM files.")
+             logger.warning("No valid headers extracted from the provided CVM files.")
              # Return current mappings if no new headers found
              return current_headers_df.to_dict('records') if not current_headers_df.empty else []
 
@@ -199,10 +392,10 @@ def get_cvm_updated_headers(
 
         for kind, sub_kind, header, header_hash in if_source_headers:
             if header_hash not in existing_hashes:
-                print(f"New header hash detected: {header_hash} for Kind={kind}, SubKind={sub_kind}")
+                logger.info(f"New header hash detected: {header_hash} for Kind={kind}, SubKind={sub_kind}")
                 # Find the appropriate template mapping based on Kind
                 if kind not in header_template_map:
-                    print(f"Warning: No header mapping template found for Kind='{kind}'. Cannot process hash {header_hash}.")
+                    logger.warning(f"No header mapping template found for Kind='{kind}'. Cannot process hash {header_hash}.")
                     continue
 
                 header_template = header_template_map[kind]
@@ -256,7 +449,7 @@ def get_cvm_updated_headers(
                 for field_in_file in source_fields_in_file:
                     if field_in_file not in mapped_source_fields_for_this_hash:
                         current_order += 1
-                        print(f"  -> Found unmapped source field: '{field_in_file}' in hash {header_hash}. Adding with Order={current_order}.")
+                        logger.debug(f"Found unmapped source field: '{field_in_file}' in hash {header_hash}. Adding with Order={current_order}.")
                         unmapped_entry = {
                             'Kind': kind,
                             'Sub_Kind': sub_kind,
@@ -287,7 +480,7 @@ def get_cvm_updated_headers(
         raise ValueError(f'Failed to get updated CVM headers at step {step}: {E} ({info})')
 
 
-def check_cvm_headers_changed(cvm_files: List[str], current_headers_df: pd.DataFrame) -> Set[str]:
+def check_cvm_headers_changed(cvm_files: List[str], current_headers_df: pd.DataFrame, cache: Optional[CVMHeaderCache] = None) -> Set[str]:
     """
     Checks if any headers in the provided CVM files are new compared to the current headers.
 
@@ -295,6 +488,8 @@ def check_cvm_headers_changed(cvm_files: List[str], current_headers_df: pd.DataF
         cvm_files (List[str]): List of paths to CVM files to check.
         current_headers_df (pd.DataFrame): DataFrame of the currently known headers (from HEADERS_FILE).
                                            Can be None or empty.
+        cache (Optional[CVMHeaderCache], optional): Header metadata cache used to avoid re-reading
+            unchanged files. Defaults to None (read every file).
 
     Returns:
         Set[str]: A set containing the hashes of any new headers found. Empty set if no changes.
@@ -316,29 +511,31 @@ def check_cvm_headers_changed(cvm_files: List[str], current_headers_df: pd.DataF
         source_header_hashes: Set[str] = set()
         processed_files_count = 0
         if not cvm_files: # Handle empty input list
-             print("Warning: Empty cvm_files list provided for header check.")
+             logger.warning("Empty cvm_files list provided for header check.")
              return set()
 
         for cvm_file_path in cvm_files:
              try:
-                 _, _, _, header_hash = get_cvm_file_metadata(cvm_file_path)
+                 _, _, _, header_hash = _get_file_metadata(cvm_file_path, cache)
                  source_header_hashes.add(header_hash)
                  processed_files_count += 1
              except FileNotFoundError:
-                 print(f"Warning: File not found, skipping check: {cvm_file_path}")
+                 logger.warning(f"File not found, skipping check: {cvm_file_path}")
              except (ValueError, IOError, UnicodeDecodeError) as e:
-                 print(f"Warning: Skipping file check due to metadata error: {cvm_file_path} - {e}")
+                 logger.warning(f"Skipping file check due to metadata error: {cvm_file_path} - {e}")
              except Exception as e:
-                 print(f"Warning: Unexpected error processing file, skipping check: {cvm_file_path} - {e}")
+                 logger.warning(f"Unexpected error processing file, skipping check: {cvm_file_path} - {e}")
+        if cache is not None:
+            cache.commit()
 
         if processed_files_count == 0:
-             print("Warning: No CVM files could be processed for header check.")
+             logger.warning("No CVM files could be processed for header check.")
              return set()
 
         step = 'COMPARING HASHES'
         new_hashes = source_header_hashes - existing_hashes
         if new_hashes:
-             print(f"Detected new header hashes: {new_hashes}")
+             logger.info(f"Detected new header hashes: {new_hashes}")
 
         return new_hashes
 
@@ -365,13 +562,13 @@ def write_cvm_headers_mappings(mappings: List[Dict[str, Any]], file_path: str) -
     try:
         df_to_write = None
         if not mappings:
-            print("No mappings provided to write.")
+            logger.info("No mappings provided to write.")
             # Decide if overwriting with empty is desired or should return False
             if os.path.exists(file_path):
-                 print(f"Skipping write to {file_path} as mappings list is empty and file exists.")
+                 logger.info(f"Skipping write to {file_path} as mappings list is empty and file exists.")
                  return False
             else:
-                 print(f"Writing empty DataFrame to {file_path} as mappings list is empty and file does not exist.")
+                 logger.info(f"Writing empty DataFrame to {file_path} as mappings list is empty and file does not exist.")
                  # Create an empty DataFrame with expected columns
                  expected_cols = ['Hash', 'Kind', 'Sub_Kind', 'Order', 'Target_Field', 'Source_Field',
                                   'Transformation1', 'Transformation2', 'Transformation3', 'Converter', 'Is_New', 'Header']
@@ -409,7 +606,7 @@ def write_cvm_headers_mappings(mappings: List[Dict[str, Any]], file_path: str) -
                 header=True,
                 engine='openpyxl' # Explicitly specify engine
             )
-            print(f"Successfully wrote header mappings to: {file_path}")
+            logger.info(f"Successfully wrote header mappings to: {file_path}")
             return True
         else:
              # This case should only be hit if mappings was empty and file existed
@@ -0,0 +1,238 @@
+'''
+Stage-level instrumentation for the CVM pipeline.
+
+The pipeline reports timers and counters to the process-wide INSTRUMENTATION object, which fans
+every event out to its sinks. A sink is any callable taking the event dict: a plain callback,
+a LoggingSink or a MemorySink collector. Without sinks, instrumentation is a no-op.
+
+Events are dicts with the keys:
+    - type: 'stage' or 'counter'.
+    - name: The stage or counter name (e.g., 'download', 'read_csv').
+    - seconds: Elapsed time of a stage (None for counters).
+    - value: Counter increment (None for stages).
+    - status: 'ok' or 'error' for stages.
+    - metrics: Measures recorded during a stage (e.g., {'bytes': 1024, 'rows': 10}).
+    - labels: Identification of the event (e.g., {'url': ...}).
+    - timestamp: Event time (epoch seconds) and pid: Emitting process.
+
+Typical use:
+    with collect_cvm_metrics() as metrics:
+        cvm.update_cvm_catalog()
+        cvm.process_pending()
+    print(metrics.summary())
+'''
+
+import os
+import time
+import logging
+import contextlib
+import pandas as pd
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# --- Constantes ---
+LOGGER_NAME = 'fbpyutils_finance.cvm'
+
+# --- Classes de Instrumentação ---
+
+class Instrumentation:
+    """
+    Timers and counters dispatched to pluggable sinks.
+    """
+
+    def __init__(self, sinks: Optional[List[Callable[[Dict[str, Any]], Any]]] = None):
+        """
+        Args:
+            sinks (Optional[List[Callable]], optional): Callables receiving every event dict. Defaults to None.
+        """
+        self.sinks: List[Callable[[Dict[str, Any]], Any]] = list(sinks or [])
+
+    @property
+    def enabled(self) -> bool:
+        """True when at least one sink is registered."""
+        return bool(self.sinks)
+
+    def add_sink(self, sink: Callable[[Dict[str, Any]], Any]):
+        """Registers a sink."""
+        if sink not in self.sinks:
+            self.sinks.append(sink)
+
+    def remove_sink(self, sink: Callable[[Dict[str, Any]], Any]):
+        """Unregisters a sink. Unknown sinks are ignored."""
+        if sink in self.sinks:
+            self.sinks.remove(sink)
+
+    def emit(self, event: Dict[str, Any]):
+        """
+        Sends an event to every sink. Sink failures are reported and never interrupt the pipeline.
+
+        Args:
+            event (Dict[str, Any]): The event dict.
+        """
+        for sink in list(self.sinks):
+            try:
+                sink(event)
+            except Exception as e:
+                logging.getLogger(LOGGER_NAME).warning(f"Instrumentation sink {sink!r} failed: {e}")
+
+    def replay(self, events: List[Dict[str, Any]]):
+        """Emits events recorded elsewhere (e.g., in a worker process), keeping their original pid and timestamp."""
+        for event in events or []:
+            self.emit(event)
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **labels) -> Iterator[Dict[str, Any]]:
+        """
+        Times a pipeline stage.
+
+        Yields a metrics dict the stage can fill (e.g., metrics['rows'] = len(data)). One 'stage'
+        event is emitted when the block exits, with status 'error' if it raised.
+
+        Args:
+            name (str): The stage name.
+            **labels: Identification of the stage (e.g., file=..., url=...).
+
+        Yields:
+            Dict[str, Any]: The stage metrics.
+        """
+        metrics: Dict[str, Any] = {}
+        if not self.sinks:
+            yield metrics
+            return
+
+        status = 'ok'
+        start = time.perf_counter()
+        try:
+            yield metrics
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            self.emit({
+                'type': 'stage', 'name': name, 'seconds': time.perf_counter() - start, 'value': None,
+                'status': status, 'metrics': metrics, 'labels': labels, 'timestamp': time.time(), 'pid': os.getpid(),
+            })
+
+    def count(self, name: str, value: float = 1, **labels):
+        """
+        Increments a counter.
+
+        Args:
+            name (str): The counter name.
+            value (float, optional): The increment. Defaults to 1.
+            **labels: Identification of the counter.
+        """
+        if not self.sinks:
+            return
+        self.emit({
+            'type': 'counter', 'name': name, 'seconds': None, 'value': value,
+            'status': None, 'metrics': {}, 'labels': labels, 'timestamp': time.time(), 'pid': os.getpid(),
+        })
+
+
+class LoggingSink:
+    """
+    Writes every event to a logger, one line per event. The event dict is attached as `cvm_event`.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        """
+        Args:
+            logger (Optional[logging.Logger], optional): Target logger. Defaults to the 'fbpyutils_finance.cvm' logger.
+            level (int, optional): Log level. Defaults to logging.INFO.
+        """
+        self.logger = logger or logging.getLogger(LOGGER_NAME)
+        self.level = level
+
+    def __call__(self, event: Dict[str, Any]):
+        details = ' '.join(f"{k}={v}" for k, v in {**event['labels'], **event['metrics']}.items())
+        if event['type'] == 'stage':
+            message = f"stage={event['name']} status={event['status']} seconds={event['seconds']:.4f} {details}"
+        else:
+            message = f"counter={event['name']} value={event['value']} {details}"
+        self.logger.log(self.level, message.strip(), extra={'cvm_event': event})
+
+
+class MemorySink:
+    """
+    Collects events in memory, with a per-stage summary.
+    """
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+
+    def __call__(self, event: Dict[str, Any]):
+        self.events.append(event)
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Returns the collected events and clears the collector."""
+        events, self.events = self.events, []
+        return events
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the collected events as a DataFrame, with metrics and labels as columns.
+
+        Returns:
+            pd.DataFrame: One row per event.
+        """
+        rows = [{**e['labels'], **e['metrics'], **{k: v for k, v in e.items() if k not in ('labels', 'metrics')}}
+                for e in self.events]
+        return pd.DataFrame(rows)
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Aggregates the collected events per (type, name).
+
+        Returns:
+            pd.DataFrame: Columns type, name, events, errors, seconds (total), mean_seconds, max_seconds,
+                value (counter total), and the totals of the 'rows' and 'bytes' metrics with their
+                per-second throughput (rows_per_s, bytes_per_s) when recorded.
+        """
+        frame = self.to_frame()
+        if frame.empty:
+            return pd.DataFrame(columns=['type', 'name', 'events', 'errors', 'seconds', 'mean_seconds', 'max_seconds', 'value'])
+
+        frame['error'] = frame['status'].eq('error')
+        frame['seconds'] = pd.to_numeric(frame['seconds'], errors='coerce')
+        frame['value'] = pd.to_numeric(frame['value'], errors='coerce')
+        aggregations = {
+            'events': ('name', 'size'),
+            'errors': ('error', 'sum'),
+            'seconds': ('seconds', 'sum'),
+            'mean_seconds': ('seconds', 'mean'),
+            'max_seconds': ('seconds', 'max'),
+            'value': ('value', 'sum'),
+        }
+        for metric in ('rows', 'bytes'):
+            if metric in frame.columns:
+                aggregations[metric] = (metric, 'sum')
+
+        summary = frame.groupby(['type', 'name'], sort=False).agg(**aggregations).reset_index()
+        for metric in ('rows', 'bytes'):
+            if metric in summary.columns:
+                summary[f"{metric}_per_s"] = (summary[metric] / summary['seconds']).where(summary['seconds'] > 0)
+        return summary
+
+# --- Instância Global ---
+
+INSTRUMENTATION = Instrumentation()
+
+
+@contextlib.contextmanager
+def collect_cvm_metrics(instrumentation: Optional[Instrumentation] = None) -> Iterator[MemorySink]:
+    """
+    Collects the events of the enclosed block in a MemorySink.
+
+    Args:
+        instrumentation (Optional[Instrumentation], optional): Defaults to the global INSTRUMENTATION.
+
+    Yields:
+        MemorySink: The collector, still readable after the block exits.
+    """
+    instrumentation = instrumentation or INSTRUMENTATION
+    sink = MemorySink()
+    instrumentation.add_sink(sink)
+    try:
+        yield sink
+    finally:
+        instrumentation.remove_sink(sink)
@@ -0,0 +1,283 @@
+'''
+Bulk loading of processed CVM frames into DB-API 2.0 connections.
+
+CVMDatabaseLoader writes frames returned by `read_cvm_history_file` / `CVM.get_cvm_file_data`
+(or received as a `CVM.process_pending` sink) with large `executemany` batches inside a single
+transaction per frame, upserting on the natural key of each kind of data. SQLite connections
+get PRAGMA tuning and automatic column additions.
+'''
+
+import logging
+import sys
+import sqlite3
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+
+import fbpyutils_finance as FI
+from fbpyutils.debug import debug_info
+
+logger = logging.getLogger(__name__)
+
+# --- Constantes ---
+# Natural keys used to upsert rows, per (kind, sub_kind)
+NATURAL_KEYS = {
+    ('IF_POSITION', 'DIARIO_FI'): ['fund_id', 'position_date'],
+    ('IF_REGISTER', 'CAD_FI'): ['fund_id', 'period_date'],
+}
+# Default target tables, per (kind, sub_kind)
+TABLE_NAMES = {
+    ('IF_POSITION', 'DIARIO_FI'): 'cvm_if_position_daily',
+    ('IF_REGISTER', 'CAD_FI'): 'cvm_if_register',
+}
+DEFAULT_BATCH_SIZE = 50000
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-262144', # 256 MiB page cache
+]
+# Dialects known to support INSERT ... ON CONFLICT (...) DO UPDATE
+ON_CONFLICT_DIALECTS = ('sqlite', 'postgresql')
+
+# --- Funções de Carga ---
+
+def _connection_paramstyle(connection: Any) -> str:
+    """Returns the DB-API paramstyle of the driver module that owns a connection."""
+    module = sys.modules.get(type(connection).__module__.split('.')[0])
+    return getattr(module, 'paramstyle', 'qmark')
+
+
+def _connection_dialect(connection: Any) -> str:
+    """Guesses the SQL dialect of a connection from its driver module."""
+    if isinstance(connection, sqlite3.Connection):
+        return 'sqlite'
+    module_name = type(connection).__module__.split('.')[0].lower()
+    if module_name in ('psycopg', 'psycopg2', 'pg8000', 'asyncpg'):
+        return 'postgresql'
+    return module_name
+
+
+def _quote(name: str) -> str:
+    """Quotes an SQL identifier."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _placeholders(paramstyle: str, columns: List[str]) -> List[str]:
+    """Builds one bind placeholder per column in the given DB-API paramstyle."""
+    if paramstyle == 'qmark':
+        return ['?'] * len(columns)
+    if paramstyle in ('format', 'pyformat'):
+        return ['%s'] * len(columns)
+    if paramstyle == 'numeric':
+        return [f':{i}' for i in range(1, len(columns) + 1)]
+    if paramstyle == 'named':
+        return [f':p{i}' for i in range(len(columns))]
+    raise ValueError(f"Unsupported DB-API paramstyle: {paramstyle}")
+
+
+def _sql_type(dtype: Any, dialect: str) -> str:
+    """Maps a pandas dtype to a column type for CREATE TABLE."""
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'INTEGER' if dialect == 'sqlite' else 'BOOLEAN'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER' if dialect == 'sqlite' else 'BIGINT'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL' if dialect == 'sqlite' else 'DOUBLE PRECISION'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'TEXT' if dialect == 'sqlite' else 'TIMESTAMP'
+    return 'TEXT'
+
+
+def _column_values(series: pd.Series, dialect: str) -> List[Any]:
+    """Converts a column to a list of plain Python values accepted by DB-API drivers (None for missing)."""
+    missing = series.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        if dialect == 'sqlite':
+            is_date = bool((series.dropna() == series.dropna().dt.normalize()).all())
+            values = series.dt.strftime('%Y-%m-%d' if is_date else '%Y-%m-%d %H:%M:%S').to_numpy(dtype=object)
+        else:
+            values = np.array(series.dt.to_pydatetime(), dtype=object)
+    elif dialect == 'sqlite' and series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) in ('date', 'datetime'):
+        # sqlite3 default date adapters are deprecated; store ISO strings
+        values = series.map(lambda v: v.isoformat(sep=' ') if hasattr(v, 'hour') else v.isoformat(), na_action='ignore').to_numpy(dtype=object)
+    else:
+        # astype(object) turns NumPy and nullable scalars into Python ints/floats/bools
+        values = series.astype(object).to_numpy()
+    values[missing] = None
+    return values.tolist()
+
+
+class CVMDatabaseLoader:
+    """
+    Bulk loader of processed CVM frames into any DB-API 2.0 connection.
+
+    Each frame is written in a single transaction with executemany batches of a prepared
+    INSERT statement. Rows are upserted on NATURAL_KEYS: with INSERT ... ON CONFLICT DO UPDATE
+    on SQLite and PostgreSQL, and with DELETE + INSERT of the batch keys on other databases.
+    Can be used as the sink of CVM.process_pending.
+    """
+
+    def __init__(
+        self,
+        connection: Any,
+        table_names: Optional[Dict[Tuple[str, str], str]] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        create_tables: bool = True,
+        tune_sqlite: bool = True,
+        paramstyle: Optional[str] = None,
+        dialect: Optional[str] = None
+    ):
+        """
+        Initializes the loader.
+
+        Args:
+            connection (Any): An open DB-API 2.0 connection.
+            table_names (Optional[Dict[Tuple[str, str], str]], optional): Target table per (kind, sub_kind),
+                merged over TABLE_NAMES. Defaults to None.
+            batch_size (int, optional): Rows per executemany call. Defaults to DEFAULT_BATCH_SIZE.
+            create_tables (bool, optional): Create missing tables (with the natural key as primary key)
+                and, on SQLite, add missing columns. Defaults to True.
+            tune_sqlite (bool, optional): Apply SQLITE_PRAGMAS to SQLite connections. Defaults to True.
+            paramstyle (Optional[str], optional): DB-API paramstyle. Defaults to the driver's paramstyle.
+            dialect (Optional[str], optional): SQL dialect ('sqlite', 'postgresql', ...). Defaults to a
+                guess from the driver.
+
+        Raises:
+            ValueError: If the connection is not valid or the batch size is not positive.
+        """
+        if not FI.is_valid_db_connection(connection) or not hasattr(connection, 'cursor'):
+            raise ValueError("A valid DB-API connection must be provided.")
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer.")
+
+        self.CONNECTION = connection
+        self.table_names = {**TABLE_NAMES, **(table_names or {})}
+        self.batch_size = batch_size
+        self.create_tables = create_tables
+        self.paramstyle = paramstyle or _connection_paramstyle(connection)
+        self.dialect = dialect or _connection_dialect(connection)
+        self._known_columns: Dict[str, List[str]] = {}
+
+        if tune_sqlite and self.dialect == 'sqlite':
+            for pragma in SQLITE_PRAGMAS:
+                try:
+                    self.CONNECTION.execute(pragma)
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not apply '{pragma}': {e}")
+
+    def table_name(self, kind: str, sub_kind: str) -> str:
+        """Returns the target table of a (kind, sub_kind)."""
+        return self.table_names.get((kind, sub_kind), f"cvm_{kind}_{sub_kind}".lower())
+
+    def _ensure_table(self, cursor: Any, table: str, data: pd.DataFrame, keys: List[str]):
+        """Creates the target table, or adds missing columns on SQLite."""
+        if table not in self._known_columns:
+            column_defs = [f'{_quote(c)} {_sql_type(data[c].dtype, self.dialect)}' for c in data.columns]
+            primary_key = f', PRIMARY KEY ({", ".join(_quote(k) for k in keys)})' if keys else ''
+            cursor.execute(f'CREATE TABLE IF NOT EXISTS {table} ({", ".join(column_defs)}{primary_key})')
+            if self.dialect == 'sqlite':
+                self._known_columns[table] = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})').fetchall()]
+            else:
+                self._known_columns[table] = list(data.columns)
+
+        if self.dialect == 'sqlite':
+            for c in data.columns:
+                if c not in self._known_columns[table]:
+                    cursor.execute(f'ALTER TABLE {table} ADD COLUMN {_quote(c)} {_sql_type(data[c].dtype, self.dialect)}')
+                    self._known_columns[table].append(c)
+
+    def _statements(self, table: str, columns: List[str], keys: List[str]) -> Tuple[Optional[str], str]:
+        """Builds the (optional) delete and the insert/upsert statements of a load."""
+        quoted = [_quote(c) for c in columns]
+        insert = f'INSERT INTO {table} ({", ".join(quoted)}) VALUES ({", ".join(_placeholders(self.paramstyle, columns))})'
+        if not keys:
+            return None, insert
+        if self.dialect in ON_CONFLICT_DIALECTS:
+            updates = [f'{_quote(c)} = excluded.{_quote(c)}' for c in columns if c not in keys]
+            action = f'DO UPDATE SET {", ".join(updates)}' if updates else 'DO NOTHING'
+            return None, f'{insert} ON CONFLICT ({", ".join(_quote(k) for k in keys)}) {action}'
+        key_filter = ' AND '.join(f'{_quote(k)} = {p}' for k, p in zip(keys, _placeholders(self.paramstyle, keys)))
+        return f'DELETE FROM {table} WHERE {key_filter}', insert
+
+    def _bind(self, row: Tuple) -> Any:
+        """Adapts a row of values to the paramstyle (dict for 'named')."""
+        return {f'p{i}': v for i, v in enumerate(row)} if self.paramstyle == 'named' else row
+
+    def load(self, kind: str, sub_kind: str, data: pd.DataFrame, table: Optional[str] = None) -> int:
+        """
+        Upserts a processed frame into its target table in a single transaction.
+
+        Args:
+            kind (str): The kind of the data (e.g., 'IF_POSITION').
+            sub_kind (str): The sub-kind of the data (e.g., 'DIARIO_FI').
+            data (pd.DataFrame): The processed data.
+            table (Optional[str], optional): Target table. Defaults to table_name(kind, sub_kind).
+
+        Returns:
+            int: Number of rows written.
+
+        Raises:
+            ValueError: If a natural key column is missing or the load fails (the transaction is rolled back).
+        """
+        if data is None or data.empty:
+            return 0
+
+        table = table or self.table_name(kind, sub_kind)
+        keys = NATURAL_KEYS.get((kind, sub_kind), [])
+        missing_cols = [k for k in keys if k not in data.columns]
+        if missing_cols:
+            raise ValueError(f"Natural key columns missing from {kind}/{sub_kind} data: {missing_cols}")
+
+        if keys:
+            null_keys = data[keys].isna().any(axis=1)
+            if null_keys.any():
+                logger.warning(f"Skipping {int(null_keys.sum())} rows with missing natural key for table {table}.")
+                data = data[~null_keys]
+            # Last row wins for keys repeated inside the frame
+            data = data.drop_duplicates(keys, keep='last')
+
+        columns = list(data.columns)
+        rows = list(zip(*[_column_values(data[c], self.dialect) for c in columns]))
+        key_positions = [columns.index(k) for k in keys]
+
+        step = 'STARTING'
+        cursor = self.CONNECTION.cursor()
+        try:
+            if self.create_tables:
+                step = 'CREATING TABLE'
+                self._ensure_table(cursor, table, data, keys)
+
+            delete_sql, insert_sql = self._statements(table, columns, keys)
+            step = 'WRITING ROWS'
+            for i in range(0, len(rows), self.batch_size):
+                batch = rows[i:i + self.batch_size]
+                if delete_sql:
+                    cursor.executemany(delete_sql, [self._bind(tuple(row[p] for p in key_positions)) for row in batch])
+                cursor.executemany(insert_sql, [self._bind(row) for row in batch])
+
+            step = 'COMMITTING'
+            self.CONNECTION.commit()
+            return len(rows)
+        except Exception as e:
+            self.CONNECTION.rollback()
+            info = debug_info(e)
+            raise ValueError(f"Failed loading {kind}/{sub_kind} data into {table} at step {step}: {e} ({info})")
+        finally:
+            cursor.close()
+
+    def __call__(self, cvm_file: str, kind: str, sub_kind: str, data: pd.DataFrame, partition_cols: List[str]) -> int:
+        """
+        Sink interface used by CVM.process_pending: loads the data of one processed CVM file.
+
+        Args:
+            cvm_file (str): Path of the processed source file (unused).
+            kind (str): The kind of the processed data.
+            sub_kind (str): The sub-kind of the processed data.
+            data (pd.DataFrame): The processed data.
+            partition_cols (List[str]): The partition columns (loaded as regular columns).
+
+        Returns:
+            int: Number of rows written.
+        """
+        return self.load(kind, sub_kind, data)
@@ -1,3 +1,4 @@
+import logging
 import sqlite3
 import pandas as pd
 import re # Added import re
@@ -10,6 +11,8 @@ from .utils import is_nan_or_empty
 # or are explicitly imported/defined. For safety, explicitly import them if needed.
 from .converters import * # Import all from converters
 
+logger = logging.getLogger(__name__)
+
 # --- Funções de Processamento de Dados ---
 
 def get_expression_and_converters(mappings: List[Dict[str, Any]]) -> Tuple[List[str], Dict[str, Callable]]:
@@ -73,7 +76,7 @@ def get_expression_and_converters(mappings: List[Dict[str, Any]]) -> Tuple[List[
                      raise TypeError(f"Converter string '{converter_str}' did not evaluate to a callable function.")
                 converters[target_field_lower] = converter_func
             except Exception as e:
-                print(f"Warning: Could not evaluate converter '{converter_str}' for field '{target_field}'. Using default (identity). Error: {e}")
+                logger.warning(f"Could not evaluate converter '{converter_str}' for field '{target_field}'. Using default (identity). Error: {e}")
                 # Fallback to a function that returns the original value
                 converters[target_field_lower] = lambda x: x # Identity function
         else:
@@ -83,6 +86,76 @@ def get_expression_and_converters(mappings: List[Dict[str, Any]]) -> Tuple[List[
     return expressions, converters
 
 
+# Nullable dtype for each value type reported by pd.api.types.infer_dtype
+INFERRED_NULLABLE_DTYPES = {
+    'integer': 'Int64',
+    'floating': 'Float64',
+    'mixed-integer-float': 'Float64',
+    'decimal': 'Float64',
+    'boolean': 'boolean',
+    'string': 'string',
+    'empty': 'string',
+    'date': 'datetime64[ns]',
+    'datetime': 'datetime64[ns]',
+    'datetime64': 'datetime64[ns]',
+}
+
+
+def get_source_columns(header_columns: List[str], expressions: List[str]) -> List[str]:
+    """
+    Selects the source file columns referenced by the compiled mapping expressions.
+
+    A column is kept when its lower-case name appears as an identifier in any expression, including
+    columns used only inside transformations. Columns no mapping refers to can be skipped on read.
+
+    Args:
+        header_columns (List[str]): Column names of the source file header, as in the file.
+        expressions (List[str]): Expressions returned by get_expression_and_converters.
+
+    Returns:
+        List[str]: The referenced header columns, in file order.
+    """
+    identifiers = set(re.findall(r'\w+', ' '.join(expressions).lower()))
+    return [c for c in dict.fromkeys(header_columns) if c.strip().lower() in identifiers]
+
+
+def get_converter_dtypes(mappings: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Derives the nullable dtype of each target field from the converter named in its mapping.
+
+    Args:
+        mappings (List[Dict[str, Any]]): A list of mapping dictionaries for a specific header hash.
+
+    Returns:
+        Dict[str, str]: Dictionary mapping target field names (lowercase) to nullable dtypes
+                        (e.g. 'Int64', 'Float64', 'boolean', 'string', 'datetime64[ns]').
+                        Fields whose converter is unknown are omitted.
+    """
+    dtypes = {}
+    for m in mappings:
+        target_field = m.get('Target_Field')
+        converter_str = m.get('Converter')
+        if not target_field or is_nan_or_empty(converter_str):
+            continue
+        match = re.search(r'\b(' + '|'.join(CONVERTER_DTYPES) + r')\b', str(converter_str))
+        if match:
+            dtypes[target_field.lower()] = CONVERTER_DTYPES[match.group(1)]
+    return dtypes
+
+
+def _as_nullable_dtype(series: pd.Series, dtype: Optional[str] = None) -> pd.Series:
+    """Casts a series to a pandas nullable dtype, given or inferred from its values."""
+    if dtype is None:
+        if isinstance(series.dtype, pd.api.extensions.ExtensionDtype) or pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return series
+        dtype = INFERRED_NULLABLE_DTYPES.get(pd.api.types.infer_dtype(series, skipna=True))
+        if dtype is None:
+            return series # Mixed values, keep as is
+    if dtype.startswith('datetime64'):
+        return pd.to_datetime(series, errors='coerce')
+    return series.astype(dtype)
+
+
 def apply_expressions(data: pd.DataFrame, expressions: List[str]) -> pd.DataFrame:
     """
     Applies SQL expressions to a DataFrame using an in-memory SQLite database.
@@ -101,7 +174,7 @@ def apply_expressions(data: pd.DataFrame, expressions: List[str]) -> pd.DataFram
     """
     query = "" # Initialize query string for error reporting
     if data.empty:
-        print("Warning: Input DataFrame is empty in apply_expressions. Returning empty DataFrame.")
+        logger.warning("Input DataFrame is empty in apply_expressions. Returning empty DataFrame.")
         # Try to determine columns from expressions if possible
         expected_cols = []
         for expr in expressions:
@@ -136,7 +209,12 @@ def apply_expressions(data: pd.DataFrame, expressions: List[str]) -> pd.DataFram
             STAGE.close()
 
 
-def apply_converters(data: pd.DataFrame, converters: Dict[str, Callable]) -> pd.DataFrame:
+def apply_converters(
+    data: pd.DataFrame,
+    converters: Dict[str, Callable],
+    nullable_dtypes: bool = False,
+    dtypes: Optional[Dict[str, str]] = None
+) -> pd.DataFrame:
     """
     Applies converter functions to the columns of a DataFrame.
 
@@ -144,15 +222,23 @@ def apply_converters(data: pd.DataFrame, converters: Dict[str, Callable]) -> pd.
         data (pd.DataFrame): The input DataFrame.
         converters (Dict[str, Callable]): Dictionary mapping column names (lowercase)
                                           to converter functions.
+        nullable_dtypes (bool, optional): Return pandas nullable dtypes (Int64, Float64, boolean,
+            string, datetime64) with missing values as pd.NA/NaT, instead of object columns
+            filled with None. Defaults to False.
+        dtypes (Optional[Dict[str, str]], optional): Nullable dtype per column (see
+            get_converter_dtypes), used when nullable_dtypes is True. Columns not listed get the
+            dtype of their converter (CONVERTER_DTYPES) or, for other converters, one inferred
+            from their values. Defaults to None.
 
     Returns:
-        pd.DataFrame: The DataFrame with converters applied. NaN/NaT values are replaced with None.
+        pd.DataFrame: The DataFrame with converters applied. NaN/NaT values are replaced with None,
+                      unless nullable_dtypes is True.
 
     Raises:
         ValueError: If applying a converter fails for a column.
     """
     if data.empty:
-        print("Warning: Input DataFrame is empty in apply_converters. Returning empty DataFrame.")
+        logger.warning("Input DataFrame is empty in apply_converters. Returning empty DataFrame.")
         return data
 
     converted_data = data.copy() # Work on a copy
@@ -176,6 +262,18 @@ def apply_converters(data: pd.DataFrame, converters: Dict[str, Callable]) -> pd.
              # print(f"Warning: Converter defined for non-existent column '{col_name}'.")
 
 
+    if nullable_dtypes:
+        dtypes = dtypes or {}
+        for col in converted_data.columns:
+            # Without an explicit dtype, use the one of the column's converter (as_int gives float64
+            # values when there are missing ones, which inference would take as Float64)
+            dtype = dtypes.get(col) or CONVERTER_DTYPES.get(getattr(converters.get(col), '__name__', None))
+            try:
+                converted_data[col] = _as_nullable_dtype(converted_data[col], dtype)
+            except Exception as e:
+                logger.warning(f"Could not cast column '{col}' to a nullable dtype: {e}. Keeping {converted_data[col].dtype}.")
+        return converted_data
+
     # Replace pandas NaNs/NaTs with Python None for database compatibility or general use
     # Using fillna(None) can be tricky with mixed types or non-nullable types.
     # A more robust approach is often to convert columns to object type first if Nones are needed,
@@ -202,7 +300,7 @@ def apply_converters(data: pd.DataFrame, converters: Dict[str, Callable]) -> pd.
                     converted_data[col] = converted_data[col].fillna(value=None)
 
     except Exception as fill_e:
-         print(f"Warning: Error during final NA -> None conversion: {fill_e}. Returning data with potential NAs.")
+         logger.warning(f"Error during final NA -> None conversion: {fill_e}. Returning data with potential NAs.")
 
 
     return converted_data
@@ -0,0 +1,319 @@
+'''
+SCD (slowly changing dimension) compaction of CAD_FI fund register snapshots.
+
+CVM publishes the whole fund register every day (`inf_cadastral_fi_YYYYMMDD`), and read_cvm_history_file
+tags each snapshot with its period_date, so successive snapshots are mostly repeated rows. The
+functions below turn snapshots into a validity-interval table with one row per fund version:
+
+    - valid_from: First snapshot date of the version.
+    - valid_to: First snapshot date at which the fund changed or was missing (exclusive);
+      NaT while the version is current.
+    - row_hash: Hash of the version's register values.
+
+A fund's state at any date is then found with register_as_of().
+'''
+
+import logging
+import os
+import json
+import uuid
+import numpy as np
+import pandas as pd
+from typing import Iterable, List, Optional, Union
+
+import fbpyutils_finance as FI
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None # type: ignore
+    pq = None # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# --- Constantes ---
+REGISTER_KEY_COLUMNS = ['fund_id']
+SNAPSHOT_DATE_COLUMN = 'period_date'
+VALID_FROM, VALID_TO, ROW_HASH = 'valid_from', 'valid_to', 'row_hash'
+# Partition columns describe the snapshot, not the fund, and are not versioned
+EXCLUDED_COLUMNS = ['kind', 'sub_kind', 'year', 'period', 'period_date']
+SNAPSHOT_DATES_METADATA_KEY = b'cvm_snapshot_dates'
+
+DateLike = Union[str, pd.Timestamp, np.datetime64]
+
+# --- Funções de Compactação ---
+
+def _prepare_snapshots(data: pd.DataFrame, key_columns: List[str], date_column: str) -> pd.DataFrame:
+    """Keeps one row per (key, snapshot date) with the snapshot date as datetime and the row hash of its values."""
+    missing_cols = [c for c in key_columns + [date_column] if c not in data.columns]
+    if missing_cols:
+        raise ValueError(f"Register snapshots must contain the columns: {missing_cols}")
+
+    frame = data.dropna(subset=key_columns + [date_column])
+    frame = frame.assign(**{date_column: pd.to_datetime(frame[date_column])})
+    frame = frame.drop_duplicates(key_columns + [date_column], keep='last')
+
+    reserved = set(key_columns) | set(EXCLUDED_COLUMNS) | {date_column, VALID_FROM, VALID_TO, ROW_HASH}
+    value_columns = sorted(c for c in frame.columns if c not in reserved)
+    # Values are hashed as text, so inferred dtypes varying between snapshots do not create versions
+    hashes = (pd.util.hash_pandas_object(frame[value_columns].astype('string'), index=False).to_numpy().view(np.int64)
+              if value_columns else np.zeros(len(frame), dtype=np.int64))
+    frame = frame[key_columns + value_columns + [date_column]].assign(**{ROW_HASH: hashes})
+    return frame.reset_index(drop=True)
+
+
+def compact_register_snapshots(
+    data: pd.DataFrame,
+    key_columns: Optional[List[str]] = None,
+    date_column: str = SNAPSHOT_DATE_COLUMN,
+    snapshot_dates: Optional[Iterable[DateLike]] = None
+) -> pd.DataFrame:
+    """
+    Compacts register snapshots into one row per fund version with validity intervals.
+
+    A new version starts when a fund first appears, when its values change from the previous
+    snapshot, or when it reappears after missing from a snapshot.
+
+    Args:
+        data (pd.DataFrame): Processed CAD_FI rows of one or more snapshots (as returned by
+            read_cvm_history_file or read_cvm_dataset).
+        key_columns (Optional[List[str]], optional): Columns identifying a fund. Defaults to ['fund_id'].
+        date_column (str, optional): Column with the snapshot date. Defaults to 'period_date'.
+        snapshot_dates (Optional[Iterable[DateLike]], optional): All published snapshot dates, when some
+            snapshot has no rows in data. Defaults to the dates found in data.
+
+    Returns:
+        pd.DataFrame: Key columns, register values, valid_from, valid_to (exclusive, NaT when current)
+            and row_hash, sorted by key and valid_from.
+
+    Raises:
+        ValueError: If key or date columns are missing.
+    """
+    key_columns = key_columns or REGISTER_KEY_COLUMNS
+    snapshots = _prepare_snapshots(data, key_columns, date_column)
+    snapshots = snapshots.sort_values(key_columns + [date_column], kind='stable').reset_index(drop=True)
+
+    known_dates = set(snapshots[date_column]) | {pd.Timestamp(d) for d in snapshot_dates or []}
+    dates = np.array(sorted(known_dates), dtype='datetime64[ns]')
+    n = len(snapshots)
+    if n == 0:
+        return snapshots.drop(columns=[date_column]).assign(**{VALID_FROM: pd.Series(dtype='datetime64[ns]'),
+                                                               VALID_TO: pd.Series(dtype='datetime64[ns]')})
+
+    date_pos = np.searchsorted(dates, snapshots[date_column].to_numpy(dtype='datetime64[ns]'))
+    hashes = snapshots[ROW_HASH].to_numpy()
+    new_version = np.ones(n, dtype=bool)
+    same_key = np.ones(n - 1, dtype=bool)
+    for col in key_columns:
+        values = snapshots[col].to_numpy()
+        same_key &= values[1:] == values[:-1]
+    new_version[1:] = ~same_key | (hashes[1:] != hashes[:-1]) | (date_pos[1:] != date_pos[:-1] + 1)
+
+    starts = np.flatnonzero(new_version)
+    ends = np.r_[starts[1:], n] - 1
+    next_pos = date_pos[ends] + 1
+    valid_to = np.where(next_pos < len(dates), dates[np.minimum(next_pos, len(dates) - 1)], np.datetime64('NaT'))
+
+    versions = snapshots.iloc[starts].drop(columns=[date_column]).reset_index(drop=True)
+    versions[VALID_FROM] = snapshots[date_column].to_numpy()[starts]
+    versions[VALID_TO] = pd.to_datetime(valid_to)
+    return versions[[c for c in versions.columns if c != ROW_HASH] + [ROW_HASH]]
+
+
+def insert_register_snapshot(
+    history: pd.DataFrame,
+    snapshot: pd.DataFrame,
+    snapshot_date: DateLike,
+    snapshot_dates: Iterable[DateLike],
+    key_columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Merges one snapshot into a compacted history, at any position in time.
+
+    Snapshots usually arrive in date order, closing or extending the current versions, but a
+    snapshot between two already compacted ones splits the versions spanning its date.
+
+    Args:
+        history (pd.DataFrame): A history returned by compact_register_snapshots or this function.
+        snapshot (pd.DataFrame): Processed CAD_FI rows of the new snapshot.
+        snapshot_date (DateLike): The date of the new snapshot.
+        snapshot_dates (Iterable[DateLike]): Dates of the snapshots already compacted in history.
+        key_columns (Optional[List[str]], optional): Columns identifying a fund. Defaults to ['fund_id'].
+
+    Returns:
+        pd.DataFrame: The updated history, equal to compacting all snapshots at once.
+
+    Raises:
+        ValueError: If the snapshot date was already compacted, or key columns are missing.
+    """
+    key_columns = key_columns or REGISTER_KEY_COLUMNS
+    d = pd.Timestamp(snapshot_date)
+    known = sorted({pd.Timestamp(x) for x in snapshot_dates})
+    if d in known:
+        raise ValueError(f"Register snapshot of {d.date()} was already compacted.")
+    prev = max((x for x in known if x < d), default=None)
+    nxt = min((x for x in known if x > d), default=None)
+
+    snap = _prepare_snapshots(snapshot.assign(**{SNAPSHOT_DATE_COLUMN: d}), key_columns, SNAPSHOT_DATE_COLUMN)
+    history = history.reset_index(drop=True)
+
+    def active_at(moment):
+        if moment is None:
+            return pd.Series(False, index=history.index)
+        return (history[VALID_FROM] <= moment) & (history[VALID_TO].isna() | (history[VALID_TO] > moment))
+
+    def versions(mask, prefix):
+        selected = history.loc[mask, key_columns + [ROW_HASH]].astype({ROW_HASH: 'Int64'})
+        return selected.rename(columns={ROW_HASH: f"{prefix}_hash"}).rename_axis(f"{prefix}_row").reset_index()
+
+    # One row per fund: its version active at the previous and next snapshots, and its new row
+    current = snap[key_columns + [ROW_HASH]].astype({ROW_HASH: 'Int64'}).rename(columns={ROW_HASH: 's_hash'})
+    funds = (versions(active_at(prev), 'a')
+             .merge(versions(active_at(nxt), 'b'), on=key_columns, how='outer')
+             .merge(current.rename_axis('s_row').reset_index(), on=key_columns, how='outer'))
+
+    has_a, has_b, present = funds['a_row'].notna(), funds['b_row'].notna(), funds['s_row'].notna()
+    spans = has_a & has_b & funds['a_row'].eq(funds['b_row']).fillna(False).astype(bool)
+    same_a = present & has_a & funds['s_hash'].eq(funds['a_hash']).fillna(False).astype(bool)
+    same_b = present & has_b & funds['s_hash'].eq(funds['b_hash']).fillna(False).astype(bool)
+
+    close_a = has_a & ~same_a            # Version before d ends at d
+    split = spans & ~same_a              # ... and resumes at the next snapshot
+    extend_b = present & ~same_a & has_b & ~spans & same_b # Version after d starts at d
+    new = present & ~same_a & ~extend_b  # New version from d to the next snapshot
+
+    updated = history.copy()
+    resumed = history.loc[funds.loc[split, 'a_row'].astype(int)].assign(**{VALID_FROM: nxt})
+    updated.loc[funds.loc[close_a, 'a_row'].astype(int), VALID_TO] = d
+    updated.loc[funds.loc[extend_b, 'b_row'].astype(int), VALID_FROM] = d
+
+    added = snap.loc[funds.loc[new, 's_row'].astype(int)].drop(columns=[SNAPSHOT_DATE_COLUMN])
+    added[VALID_FROM] = d
+    added[VALID_TO] = nxt if nxt is not None else pd.NaT
+
+    result = pd.concat([updated, resumed, added], ignore_index=True)
+    result[VALID_FROM] = pd.to_datetime(result[VALID_FROM])
+    result[VALID_TO] = pd.to_datetime(result[VALID_TO])
+    result = result.sort_values(key_columns + [VALID_FROM], kind='stable').reset_index(drop=True)
+    return result[[c for c in result.columns if c not in (VALID_FROM, VALID_TO, ROW_HASH)] + [VALID_FROM, VALID_TO, ROW_HASH]]
+
+
+def register_as_of(history: pd.DataFrame, date: DateLike) -> pd.DataFrame:
+    """
+    Returns the fund register as it was published at a date.
+
+    Args:
+        history (pd.DataFrame): A compacted register history.
+        date (DateLike): The date. Between two snapshots, the earlier snapshot applies.
+
+    Returns:
+        pd.DataFrame: The versions valid at the date, one per fund.
+    """
+    moment = pd.Timestamp(date)
+    mask = (history[VALID_FROM] <= moment) & (history[VALID_TO].isna() | (history[VALID_TO] > moment))
+    return history[mask].reset_index(drop=True)
+
+# --- Classe de Histórico Persistente ---
+
+class CVMRegisterHistory:
+    """
+    Persistent compacted CAD_FI register history, stored as a single Parquet file.
+
+    Snapshots can be added in any order. The file keeps the compacted snapshot dates in its schema
+    metadata. Instances are also process_pending sinks: IF_REGISTER/CAD_FI data is added, other
+    kinds are ignored. Call save() after adding snapshots.
+    """
+
+    def __init__(self, history_file: str, key_columns: Optional[List[str]] = None):
+        """
+        Loads the history file if it exists.
+
+        Args:
+            history_file (str): Path of the Parquet history file.
+            key_columns (Optional[List[str]], optional): Columns identifying a fund. Defaults to ['fund_id'].
+
+        Raises:
+            ImportError: If pyarrow is not available.
+        """
+        if pq is None:
+            raise ImportError(f"The 'pyarrow' library is required to store the CVM register history. {FI.PARQUET_EXTRA_HINT}")
+        self.HISTORY_FILE = history_file
+        self.KEY_COLUMNS = key_columns or REGISTER_KEY_COLUMNS
+        self.history: Optional[pd.DataFrame] = None
+        self.snapshot_dates: List[pd.Timestamp] = []
+        self.dirty = False
+
+        if os.path.exists(history_file):
+            table = pq.read_table(history_file)
+            metadata = table.schema.metadata or {}
+            self.snapshot_dates = [pd.Timestamp(d) for d in json.loads(metadata.get(SNAPSHOT_DATES_METADATA_KEY, b'[]'))]
+            self.history = table.to_pandas()
+
+    def add_snapshot(self, data: pd.DataFrame, snapshot_date: Optional[DateLike] = None) -> bool:
+        """
+        Adds a register snapshot to the history.
+
+        Args:
+            data (pd.DataFrame): Processed CAD_FI rows of one snapshot.
+            snapshot_date (Optional[DateLike], optional): The snapshot date. Defaults to the single
+                period_date of data.
+
+        Returns:
+            bool: True if added, False if the snapshot date was already in the history.
+
+        Raises:
+            ValueError: If the snapshot date cannot be determined.
+        """
+        if snapshot_date is None:
+            dates = data[SNAPSHOT_DATE_COLUMN].dropna().unique() if SNAPSHOT_DATE_COLUMN in data.columns else []
+            if len(dates) != 1:
+                raise ValueError(f"Register snapshot must have exactly one {SNAPSHOT_DATE_COLUMN}, found {len(dates)}.")
+            snapshot_date = dates[0]
+        d = pd.Timestamp(snapshot_date)
+        if d in self.snapshot_dates:
+            logger.warning(f"Register snapshot of {d.date()} is already in the history. Skipped.")
+            return False
+
+        if self.history is None:
+            self.history = compact_register_snapshots(data.assign(**{SNAPSHOT_DATE_COLUMN: d}), self.KEY_COLUMNS)
+        else:
+            self.history = insert_register_snapshot(self.history, data, d, self.snapshot_dates, self.KEY_COLUMNS)
+        self.snapshot_dates = sorted(self.snapshot_dates + [d])
+        self.dirty = True
+        return True
+
+    def as_of(self, date: DateLike) -> pd.DataFrame:
+        """Returns the register valid at a date (see register_as_of)."""
+        if self.history is None:
+            return pd.DataFrame()
+        return register_as_of(self.history, date)
+
+    def save(self):
+        """Writes the history file atomically, if it changed."""
+        if not self.dirty or self.history is None:
+            return
+        folder = os.path.dirname(os.path.abspath(self.HISTORY_FILE))
+        os.makedirs(folder, exist_ok=True)
+        table = pa.Table.from_pandas(self.history, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[SNAPSHOT_DATES_METADATA_KEY] = json.dumps([d.strftime('%Y-%m-%d') for d in self.snapshot_dates]).encode()
+        temp_file = os.path.join(folder, f".{uuid.uuid4().hex}.tmp")
+        try:
+            pq.write_table(table.replace_schema_metadata(metadata), temp_file)
+            os.replace(temp_file, self.HISTORY_FILE)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        self.dirty = False
+
+    def __call__(self, cvm_file: str, kind: str, sub_kind: str, data: pd.DataFrame, partition_cols: List[str]) -> bool:
+        """
+        Sink interface used by CVM.process_pending: adds a processed CAD_FI file as a snapshot.
+
+        Returns:
+            bool: True if the data was added to the history.
+        """
+        if (kind, sub_kind) != ('IF_REGISTER', 'CAD_FI') or data is None or data.empty:
+            return False
+        return self.add_snapshot(data)
@@ -1,6 +1,7 @@
 import os
 import re
 import io
+import logging
 import requests
 import bs4
 import pandas as pd
@@ -9,19 +10,22 @@ from datetime import datetime
 from urllib import request, error as urllib_error # Import specific error
 from typing import Optional, Dict, List, Tuple, Any
 
+logger = logging.getLogger(__name__)
+
 # Assuming fbpyutils.file has magic attribute correctly configured
 # If not, python-magic needs to be installed and imported directly
 try:
     import magic
 except ImportError:
     magic = None # type: ignore
-    print("Warning: 'python-magic' library not found. MIME type detection will be limited.")
+    logger.warning("'python-magic' library not found. MIME type detection will be limited.")
 
 
 from fbpyutils.debug import debug_info
 # Import necessary functions from other modules
 from .utils import get_value_by_index_if_exists, make_number_type, make_datetime, make_str_datetime, replace_all, is_nan_or_empty
 from .file_io import write_target_file # write_target_file moved to file_io.py
+from .instrumentation import INSTRUMENTATION
 
 # --- Constantes ---
 SOURCE_ENCODING, TARGET_ENCODING = 'iso-8859-1', 'utf-8'
@@ -47,12 +51,14 @@ def get_url_paths(url: str, params: Optional[Dict] = None) -> pd.DataFrame:
         requests.exceptions.RequestException: If the HTTP request fails.
     """
     params = params or {}
-    print(f"Fetching directory listing from: {url}")
+    logger.info(f"Fetching directory listing from: {url}")
     try:
-        response = requests.get(url, params=params, timeout=60) # Added timeout
-        response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
+        with INSTRUMENTATION.stage('listing_fetch', url=url) as metrics:
+            response = requests.get(url, params=params, timeout=60) # Added timeout
+            response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
+            metrics['bytes'] = len(response.text)
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching URL {url}: {e}")
+        logger.error(f"Error fetching URL {url}: {e}")
         # Decide whether to raise or return empty DataFrame
         # Raising might be better to signal failure clearly
         raise
@@ -67,7 +73,7 @@ def get_url_paths(url: str, params: Optional[Dict] = None) -> pd.DataFrame:
         links = pre_tags[0].find_all('a')
     else:
         # Fallback: look for links directly within the body if no <pre> found
-        print(f"Warning: No <pre> tag found at {url}. Searching body for links.")
+        logger.warning(f"No <pre> tag found at {url}. Searching body for links.")
         links = soup.body.find_all('a') if soup.body else []
 
 
@@ -132,7 +138,7 @@ def get_url_paths(url: str, params: Optional[Dict] = None) -> pd.DataFrame:
 
     headers = ['sequence', 'href', 'name', 'last_modified', 'size']
     if not directory_data:
-         print(f"Warning: No valid file/directory links extracted from {url}")
+         logger.warning(f"No valid file/directory links extracted from {url}")
          return pd.DataFrame(columns=headers) # Return empty DataFrame with correct columns
 
     directory_df = pd.DataFrame(directory_data, columns=headers)
@@ -163,7 +169,7 @@ def get_remote_files_list(kind: str, current_url: str, history_url: str) -> pd.D
             current_dir['history'] = False
             current_dir['url_base'] = current_url # Store base URL for later construction
     except requests.exceptions.RequestException as e:
-         print(f"Warning: Failed to fetch current directory listing for {kind} from {current_url}: {e}")
+         logger.warning(f"Failed to fetch current directory listing for {kind} from {current_url}: {e}")
          # Continue, current_dir remains empty
 
     try:
@@ -172,11 +178,11 @@ def get_remote_files_list(kind: str, current_url: str, history_url: str) -> pd.D
             history_dir['history'] = True
             history_dir['url_base'] = history_url # Store base URL
     except requests.exceptions.RequestException as e:
-        print(f"Warning: Failed to fetch history directory listing for {kind} from {history_url}: {e}")
+        logger.warning(f"Failed to fetch history directory listing for {kind} from {history_url}: {e}")
         # Continue, history_dir remains empty
 
     if current_dir.empty and history_dir.empty:
-        print(f"Warning: Could not fetch any file listings for kind '{kind}'.")
+        logger.warning(f"Could not fetch any file listings for kind '{kind}'.")
         return pd.DataFrame() # Return empty if both failed
 
     # Concatenate, handling potential empty DataFrames
@@ -187,7 +193,7 @@ def get_remote_files_list(kind: str, current_url: str, history_url: str) -> pd.D
     files_dir = files_dir.dropna(subset=['size', 'last_modified']).copy()
 
     if files_dir.empty:
-        print(f"Warning: No valid files with size and modification date found for kind '{kind}'.")
+        logger.warning(f"No valid files with size and modification date found for kind '{kind}'.")
         return files_dir # Return early if no valid files found
 
     files_dir['kind'] = kind
@@ -221,6 +227,7 @@ def update_cvm_history_file(if_metadata: Dict[str, Any]) -> List[Tuple[str, Dict
             Status codes: 'SUCCESS', 'ERROR', 'SKIP'.
             updated_metadata includes 'last_download' and 'history_file' on success.
     """
+    global magic # Disabled module-wide below if python-magic fails
     results = []
     should_download = False
     url = if_metadata.get('url')
@@ -249,11 +256,11 @@ def update_cvm_history_file(if_metadata: Dict[str, Any]) -> List[Tuple[str, Dict
         if last_download_str and not is_nan_or_empty(last_download_str):
              last_download_dt = pd.to_datetime(last_download_str, errors='coerce')
              if pd.isna(last_download_dt):
-                  print(f"Warning: Could not parse last_download date '{last_download_str}' for {url}. Will force download.")
+                  logger.warning(f"Could not parse last_download date '{last_download_str}' for {url}. Will force download.")
                   last_download_dt = None # Treat as never downloaded if parse fails
 
     except Exception as e:
-        print(f"Warning: Date parsing error for {url}: {e}. Proceeding cautiously.")
+        logger.warning(f"Date parsing error for {url}: {e}. Proceeding cautiously.")
         # If dates can't be parsed, download if last_download is missing/invalid
         if last_download_dt is None:
              should_download = True
@@ -263,12 +270,12 @@ def update_cvm_history_file(if_metadata: Dict[str, Any]) -> List[Tuple[str, Dict
     if not should_download: # Only check if not already forced by parse error
         if last_download_dt is None:
             should_download = True
-            print(f"Scheduling download for {url}: Never downloaded.")
+            logger.debug(f"Scheduling download for {url}: Never downloaded.")
         elif last_modified_dt > last_download_dt:
             should_download = True
-            print(f"Scheduling download for {url}: Remote is newer ({last_modified_dt} > {last_download_dt}).")
+            logger.debug(f"Scheduling download for {url}: Remote is newer ({last_modified_dt} > {last_download_dt}).")
         else:
-             print(f"Skipping download for {url}: Already up-to-date (Local: {last_download_dt}, Remote: {last_modified_dt}).")
+             logger.debug(f"Skipping download for {url}: Already up-to-date (Local: {last_download_dt}, Remote: {last_modified_dt}).")
 
 
     if not should_download:
@@ -277,18 +284,20 @@ def update_cvm_history_file(if_metadata: Dict[str, Any]) -> List[Tuple[str, Dict
 
     # --- Proceed with download ---
     try:
-        print(f"Attempting download: {url}")
+        logger.debug(f"Attempting download: {url}")
         # Use urllib.request for potential compatibility, add user-agent
         headers = {'User-Agent': 'Mozilla/5.0'}
         req = request.Request(url, headers=headers)
-        with request.urlopen(req, timeout=180) as response: # Increased timeout
+        with INSTRUMENTATION.stage('download', url=url, kind=if_metadata.get('kind')) as metrics, \
+             request.urlopen(req, timeout=180) as response: # Increased timeout
             if response.status != 200:
                  raise urllib_error.HTTPError(url, response.status, "Failed to download", response.headers, None)
             data = response.read()
             content_type_header = response.info().get('Content-Type', '').lower()
+            metrics['bytes'] = len(data)
 
         download_time_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        print(f"Downloaded {len(data)} bytes from {url}")
+        logger.debug(f"Downloaded {len(data)} bytes from {url}")
 
         # --- Identify file type ---
         mime_type_main = None
@@ -296,9 +305,9 @@ def update_cvm_history_file(if_metadata: Dict[str, Any]) -> List[Tuple[str, Dict
             try:
                 mime_type = magic.from_buffer(data, mime=True)
                 mime_type_main = mime_type.split(';')[0].strip()
-                print(f"Detected MIME type (magic): {mime_type} for {url}")
+                logger.debug(f"Detected MIME type (magic): {mime_type} for {url}")
             except Exception as magic_err:
-                 print(f"Warning: python-magic failed for {url}: {magic_err}. Falling back on Content-Type/extension.")
+                 logger.warning(f"python-magic failed for {url}: {magic_err}. Falling back on Content-Type/extension.")
                  magic = None # Disable magic if it errors once
 
         if mime_type_main is None:
@@ -309,7 +318,7 @@ def update_cvm_history_file(if_metadata: Dict[str, Any]) -> List[Tuple[str, Dict
                   mime_type_main = 'text/plain' # Treat as text
              else:
                   # Assume text as a last resort, but warn
-                  print(f"Warning: Could not determine MIME type for {url} (Content-Type: {content_type_header}). Assuming text.")
+                  logger.warning(f"Could not determine MIME type for {url} (Content-Type: {content_type_header}). Assuming text.")
                   mime_type_main = 'text/plain'
 
 
@@ -318,20 +327,20 @@ def update_cvm_history_file(if_metadata: Dict[str, Any]) -> List[Tuple[str, Dict
         zip_mime_types = ('application/zip', 'application/x-zip-compressed')
 
         if any(pattern in mime_type_main for pattern in zip_mime_types):
-            print(f"Processing as ZIP file: {url}")
+            logger.debug(f"Processing as ZIP file: {url}")
             try:
                 with ZipFile(io.BytesIO(data)) as zip_file:
                     if not zip_file.namelist():
-                         print(f"Warning: ZIP file is empty: {url}")
+                         logger.warning(f"ZIP file is empty: {url}")
                          results.append(('ERROR', if_metadata, f'Downloaded ZIP file is empty: {url}'))
                          return results
 
                     for k, filename_in_zip in enumerate(zip_file.namelist()):
-                        print(f"Extracting {filename_in_zip} from {if_metadata['href']}")
+                        logger.debug(f"Extracting {filename_in_zip} from {if_metadata['href']}")
                         try:
                             file_content = zip_file.read(filename_in_zip)
                         except Exception as read_zip_e:
-                             print(f"ERROR reading {filename_in_zip} from zip {url}: {read_zip_e}")
+                             logger.error(f"Error reading {filename_in_zip} from zip {url}: {read_zip_e}")
                              results.append(('ERROR', if_metadata, f'Failed reading {filename_in_zip} from {if_metadata["href"]}: {read_zip_e}'))
                              continue # Skip this file within the zip
 
@@ -340,11 +349,11 @@ def update_cvm_history_file(if_metadata: Dict[str, Any]) -> List[Tuple[str, Dict
                         try:
                             decoded_content = file_content.decode(SOURCE_ENCODING)
                         except UnicodeDecodeError:
-                             print(f"Warning: Failed to decode {filename_in_zip} with {SOURCE_ENCODING}, trying {TARGET_ENCODING}.")
+                             logger.warning(f"Failed to decode {filename_in_zip} with {SOURCE_ENCODING}, trying {TARGET_ENCODING}.")
                              try:
                                  decoded_content = file_content.decode(TARGET_ENCODING)
                              except UnicodeDecodeError as ude:
-                                 print(f"ERROR: Could not decode {filename_in_zip} with known encodings. Skipping file. Error: {ude}")
+                                 logger.error(f"Could not decode {filename_in_zip} with known encodings. Skipping file. Error: {ude}")
                                  results.append(('ERROR', if_metadata, f'Failed to decode {filename_in_zip} inside {if_metadata["href"]}'))
                                  continue # Skip this file within the zip
 
@@ -362,31 +371,32 @@ def update_cvm_history_file(if_metadata: Dict[str, Any]) -> List[Tuple[str, Dict
                             # Add original filename from zip for context
                             file_specific_metadata['original_zip_filename'] = filename_in_zip
                             results.append(('SUCCESS', file_specific_metadata, f'{target_file_path} written from {filename_in_zip} in {url}'))
+                            INSTRUMENTATION.count('files_written', kind=if_metadata.get('kind'))
                         except IOError as write_e:
-                             print(f"ERROR writing extracted file {filename_in_zip} from {url}: {write_e}")
+                             logger.error(f"Error writing extracted file {filename_in_zip} from {url}: {write_e}")
                              results.append(('ERROR', if_metadata, f'Failed writing extracted file {filename_in_zip}: {write_e}'))
                              # Continue to next file in zip
 
             except BadZipFile:
-                 print(f"ERROR: File downloaded from {url} is not a valid ZIP file.")
+                 logger.error(f"File downloaded from {url} is not a valid ZIP file.")
                  results.append(('ERROR', if_metadata, f'Invalid ZIP file downloaded from {url}'))
             except Exception as zip_e:
-                 print(f"ERROR processing ZIP file {url}: {zip_e}")
+                 logger.error(f"Error processing ZIP file {url}: {zip_e}")
                  info = debug_info(zip_e)
                  results.append(('ERROR', if_metadata, f'Failure processing zip file: {zip_e} ({info}) for url:{url}'))
 
         # Check if it's likely a text file
         elif any(pattern in mime_type_main for pattern in text_mime_patterns):
-            print(f"Processing as text file: {url}")
+            logger.debug(f"Processing as text file: {url}")
             decoded_content = None
             try:
                 decoded_content = data.decode(SOURCE_ENCODING)
             except UnicodeDecodeError:
-                print(f"Warning: Failed to decode {if_metadata['href']} with {SOURCE_ENCODING}, trying {TARGET_ENCODING}.")
+                logger.warning(f"Failed to decode {if_metadata['href']} with {SOURCE_ENCODING}, trying {TARGET_ENCODING}.")
                 try:
                     decoded_content = data.decode(TARGET_ENCODING)
                 except UnicodeDecodeError as ude:
-                    print(f"ERROR: Could not decode {if_metadata['href']} with known encodings. Skipping file. Error: {ude}")
+                    logger.error(f"Could not decode {if_metadata['href']} with known encodings. Skipping file. Error: {ude}")
                     results.append(('ERROR', if_metadata, f'Failed to decode {if_metadata["href"]}'))
                     return results # Stop processing this URL if decoding fails
 
@@ -397,13 +407,14 @@ def update_cvm_history_file(if_metadata: Dict[str, Any]) -> List[Tuple[str, Dict
                 if_metadata['last_download'] = download_time_str
                 if_metadata['history_file'] = os.path.basename(target_file_path)
                 results.append(('SUCCESS', if_metadata, f'{target_file_path} written from {url}'))
+                INSTRUMENTATION.count('files_written', kind=if_metadata.get('kind'))
             except IOError as write_e:
-                 print(f"ERROR writing text file from {url}: {write_e}")
+                 logger.error(f"Error writing text file from {url}: {write_e}")
                  results.append(('ERROR', if_metadata, f'Failed writing text file: {write_e}'))
 
         else:
             # Handle unknown/unsupported types - maybe save raw bytes?
-            print(f"ERROR: Unknown or unsupported MIME type: {mime_type_main} for url: {url}")
+            logger.error(f"Unknown or unsupported MIME type: {mime_type_main} for url: {url}")
             # Option: Save raw bytes with a generic extension like .bin
             # try:
             #     target_file = build_target_file_name(if_metadata, if_metadata['history_folder'], file_ext='bin')
@@ -416,11 +427,11 @@ def update_cvm_history_file(if_metadata: Dict[str, Any]) -> List[Tuple[str, Dict
 
 
     except (urllib_error.URLError, urllib_error.HTTPError) as e:
-        print(f"ERROR: Network/HTTP error downloading {url}: {e}")
+        logger.error(f"Network/HTTP error downloading {url}: {e}")
         info = debug_info(e)
         results.append(('ERROR', if_metadata, f'Network/HTTP error: {e} ({info}) for url:{url}'))
     except Exception as e:
-        print(f"ERROR: Unexpected error processing {url}: {e}")
+        logger.error(f"Unexpected error processing {url}: {e}")
         info = debug_info(e)
         results.append(('ERROR', if_metadata, f'Failure processing remote data: {e} ({info}) for url:{url}'))
 
@@ -0,0 +1,219 @@
+'''
+Synthetic CVM data files for benchmarks and tests.
+
+Generates fake `inf_diario_fi` (IF_POSITION / DIARIO_FI) and `inf_cadastral_fi` (IF_REGISTER / CAD_FI)
+files whose header lines reproduce layouts registered in the header mappings (if_headers_v4.xlsx),
+so their header hashes resolve to real mappings in read_cvm_history_file. Values are random but
+deterministic for a given seed and use the number and date formats expected by the converters.
+'''
+
+import os
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple, List
+
+from .utils import hash_string
+
+# --- Constantes ---
+CSV_SEPARATOR = ';'
+FUND_TYPE = 'FI'
+FUND_SITUATION = 'EM FUNCIONAMENTO NORMAL'
+FUND_CLASS = 'Fundo de Renda Fixa'
+TARGET_AUDIENCE = 'Qualificado'
+FLAG_FIELDS = ('FUNDO_COTAS', 'FUNDO_EXCLUSIVO', 'TRIB_LPRAZO', 'INVEST_QUALIF', 'ENTID_INVEST')
+
+# --- Funções de Geração ---
+
+def _default_headers_df() -> pd.DataFrame:
+    """Returns the package header mappings (HEADERS), loaded on first use."""
+    from fbpyutils_finance import cvm
+    return cvm.HEADERS
+
+
+def get_cvm_header_layout(
+    kind: str,
+    sub_kind: str,
+    headers_df: Optional[pd.DataFrame] = None,
+    header_hash: Optional[str] = None
+) -> Tuple[str, str]:
+    """
+    Rebuilds the header line of a registered CVM file layout.
+
+    The header line is made of the distinct source fields of the layout, in mapping order. The
+    result is checked against the registered hash.
+
+    Args:
+        kind (str): The kind of the layout (e.g., 'IF_POSITION').
+        sub_kind (str): The sub-kind of the layout (e.g., 'DIARIO_FI').
+        headers_df (Optional[pd.DataFrame], optional): Header mappings. Defaults to the package HEADERS.
+        header_hash (Optional[str], optional): The layout to use. Defaults to the layout of (kind, sub_kind)
+            with the most source fields.
+
+    Returns:
+        Tuple[str, str]: (header_hash, header_line).
+
+    Raises:
+        ValueError: If no layout matches or the rebuilt header does not reproduce the hash.
+    """
+    headers_df = headers_df if headers_df is not None else _default_headers_df()
+    layouts = headers_df[(headers_df['Kind'] == kind) & (headers_df['Sub_Kind'] == sub_kind)]
+    if header_hash is not None:
+        layouts = layouts[layouts['Hash'] == header_hash]
+    if layouts.empty:
+        raise ValueError(f"No header layout found for {kind}/{sub_kind}" + (f" with hash {header_hash}." if header_hash else "."))
+
+    if header_hash is None:
+        header_hash = layouts.dropna(subset=['Source_Field']).groupby('Hash')['Source_Field'].nunique().idxmax()
+        layouts = layouts[layouts['Hash'] == header_hash]
+
+    source_fields = layouts.sort_values('Order')['Source_Field'].dropna()
+    header_line = CSV_SEPARATOR.join(dict.fromkeys(f for f in source_fields if str(f).strip()))
+    if hash_string(CSV_SEPARATOR.join([kind, sub_kind, header_line])) != header_hash:
+        raise ValueError(f"Rebuilt header of layout {header_hash} does not reproduce its hash.")
+    return header_hash, header_line
+
+
+def make_cnpjs(count: int, seed: int = 0) -> List[str]:
+    """
+    Generates formatted CNPJs ('XX.XXX.XXX/0001-XX') with valid check digits.
+
+    Args:
+        count (int): Number of CNPJs.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        List[str]: Distinct formatted CNPJs.
+    """
+    rng = np.random.default_rng(seed)
+    roots = rng.choice(10 ** 8, size=count, replace=False)
+    digits = np.zeros((count, 14), dtype=np.int64)
+    for i in range(8):
+        digits[:, 7 - i] = (roots // 10 ** i) % 10
+    digits[:, 11] = 1 # Branch 0001
+
+    for position, weights in ((12, [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]), (13, [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])):
+        remainder = (digits[:, :position] @ np.array(weights)) % 11
+        digits[:, position] = np.where(remainder < 2, 0, 11 - remainder)
+
+    plain = [''.join(map(str, row)) for row in digits]
+    return [f"{c[:2]}.{c[2:5]}.{c[5:8]}/{c[8:12]}-{c[12:]}" for c in plain]
+
+
+def _field_values(field: str, base: pd.DataFrame, rng: np.random.Generator) -> pd.Series:
+    """Generates a column for a source field, from the base values or by field name pattern."""
+    n = len(base)
+    if field in base.columns:
+        return base[field]
+    if field == 'TP_FUNDO':
+        return pd.Series(FUND_TYPE, index=base.index)
+    if field.startswith('CNPJ') or field.startswith('CPF_CNPJ'):
+        return pd.Series(make_cnpjs(n, seed=int(rng.integers(1 << 31))), index=base.index)
+    if field.startswith('DT_'):
+        days = rng.integers(0, 365 * 20, n)
+        return pd.Series((pd.Timestamp('2000-01-01') + pd.to_timedelta(days, unit='D')).strftime('%Y-%m-%d'), index=base.index)
+    if field.startswith('VL_') or field.startswith('TAXA'):
+        return pd.Series(np.round(rng.uniform(0, 1e6, n), 2), index=base.index)
+    if field in FLAG_FIELDS:
+        return pd.Series(rng.choice(['S', 'N'], n), index=base.index)
+    if field == 'SIT':
+        return pd.Series(FUND_SITUATION, index=base.index)
+    if field == 'CLASSE':
+        return pd.Series(FUND_CLASS, index=base.index)
+    if field == 'PUBLICO_ALVO':
+        return pd.Series(TARGET_AUDIENCE, index=base.index)
+    if field == 'CD_CVM':
+        return pd.Series(rng.integers(1, 10 ** 6, n), index=base.index)
+    return pd.Series([f"{field} {i}" for i in range(n)], index=base.index)
+
+
+def _write_layout(data: pd.DataFrame, header_line: str, file_path: str, encoding: str) -> str:
+    """Writes generated data with the layout columns, ';' separator and ',' as decimal mark."""
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    data[header_line.split(CSV_SEPARATOR)].to_csv(file_path, sep=CSV_SEPARATOR, index=False, decimal=',', encoding=encoding)
+    return file_path
+
+
+def generate_diario_fi(
+    file_path: str,
+    period: str,
+    funds: int = 1000,
+    seed: int = 0,
+    headers_df: Optional[pd.DataFrame] = None,
+    header_hash: Optional[str] = None,
+    encoding: str = 'utf-8'
+) -> str:
+    """
+    Generates a synthetic daily position file (inf_diario_fi) for one month.
+
+    Every fund has one row per business day of the month, with a random-walk quota and
+    consistent net worth, flows and shareholders.
+
+    Args:
+        file_path (str): Path of the file to write. Use the history naming
+            ('if_position.inf_diario_fi_YYYYMM.csv') to read it with read_cvm_history_file.
+        period (str): The month, as 'YYYYMM'.
+        funds (int, optional): Number of funds. Defaults to 1000.
+        seed (int, optional): Random seed; the same seed yields the same funds across periods. Defaults to 0.
+        headers_df (Optional[pd.DataFrame], optional): Header mappings. Defaults to the package HEADERS.
+        header_hash (Optional[str], optional): Layout to reproduce. Defaults to the widest DIARIO_FI layout.
+        encoding (str, optional): File encoding. Defaults to 'utf-8'.
+
+    Returns:
+        str: The written file path.
+    """
+    _, header_line = get_cvm_header_layout('IF_POSITION', 'DIARIO_FI', headers_df, header_hash)
+    rng = np.random.default_rng([seed, int(period)])
+    days = pd.bdate_range(pd.Timestamp(f"{period}01"), pd.Timestamp(f"{period}01") + pd.offsets.MonthEnd(0))
+    cnpjs = np.array(make_cnpjs(funds, seed=seed))
+
+    n_days = len(days)
+    returns = rng.normal(0.0004, 0.005, (funds, n_days))
+    quota = rng.uniform(1, 100, (funds, 1)) * np.cumprod(1 + returns, axis=1)
+    shares = rng.uniform(1e4, 1e7, (funds, 1)) * np.ones((1, n_days))
+    net_worth = quota * shares
+
+    base = pd.DataFrame({
+        'CNPJ_FUNDO': np.repeat(cnpjs, n_days),
+        'DT_COMPTC': np.tile(days.strftime('%Y-%m-%d'), funds),
+        'VL_QUOTA': np.round(quota.ravel(), 8),
+        'VL_PATRIM_LIQ': np.round(net_worth.ravel(), 2),
+        'VL_TOTAL': np.round(net_worth.ravel() * rng.uniform(1.0, 1.05, funds * n_days), 2),
+        'CAPTC_DIA': np.round(rng.exponential(1e4, funds * n_days), 2),
+        'RESG_DIA': np.round(rng.exponential(1e4, funds * n_days), 2),
+        'NR_COTST': rng.integers(1, 5000, funds * n_days),
+    })
+    data = pd.DataFrame({field: _field_values(field, base, rng) for field in header_line.split(CSV_SEPARATOR)})
+    return _write_layout(data, header_line, file_path, encoding)
+
+
+def generate_cadastral_fi(
+    file_path: str,
+    funds: int = 1000,
+    seed: int = 0,
+    headers_df: Optional[pd.DataFrame] = None,
+    header_hash: Optional[str] = None,
+    encoding: str = 'utf-8'
+) -> str:
+    """
+    Generates a synthetic fund register file (inf_cadastral_fi / cad_fi).
+
+    Args:
+        file_path (str): Path of the file to write. Use the history naming
+            ('if_register.inf_cadastral_fi_YYYYMMDD.csv') to read it with read_cvm_history_file.
+        funds (int, optional): Number of funds. Defaults to 1000.
+        seed (int, optional): Random seed; the same seed yields the funds of generate_diario_fi. Defaults to 0.
+        headers_df (Optional[pd.DataFrame], optional): Header mappings. Defaults to the package HEADERS.
+        header_hash (Optional[str], optional): Layout to reproduce. Defaults to the widest CAD_FI layout.
+        encoding (str, optional): File encoding. Defaults to 'utf-8'.
+
+    Returns:
+        str: The written file path.
+    """
+    _, header_line = get_cvm_header_layout('IF_REGISTER', 'CAD_FI', headers_df, header_hash)
+    rng = np.random.default_rng([seed, funds])
+    base = pd.DataFrame({
+        'CNPJ_FUNDO': make_cnpjs(funds, seed=seed),
+        'DENOM_SOCIAL': [f"FUNDO SINTETICO {i} FI RENDA FIXA" for i in range(funds)],
+    })
+    data = pd.DataFrame({field: _field_values(field, base, rng) for field in header_line.split(CSV_SEPARATOR)})
+    return _write_layout(data, header_line, file_path, encoding)
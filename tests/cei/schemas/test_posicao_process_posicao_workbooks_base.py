@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+from unittest import mock
+
+from fbpyutils_finance.cei.schemas import (
+    process_posicao_workbooks,
+    process_schema_posicao_acoes,
+    process_schema_posicao_etf,
+    process_schema_posicao_emprestimo_ativos,
+)
+
+SHEETS = {
+    'Ações': [
+        ['Código de Negociação', 'Produto', 'Instituição', 'Conta', 'Código ISIN / Distribuição', 'Tipo', 'Escriturador', 'Quantidade', 'Quantidade Disponível', 'Quantidade Indisponível', 'Motivo', 'Preço de Fechamento', 'Valor Atualizado'],
+        ['XYZW4', 'Empresa XYZ', 'Broker', '123456', 'BRXYZ1234567', 'Ação', 'EscrituradorX', '100', '80', '20', '', '10.5', '1050'],
+    ],
+    'ETF': [
+        ['Código de Negociação', 'Produto', 'Instituição', 'Conta', 'Código ISIN / Distribuição', 'Tipo', 'Quantidade', 'Quantidade Disponível', 'Quantidade Indisponível', 'Motivo', 'Preço de Fechamento', 'Valor Atualizado'],
+        ['BOVA11', 'ETF Ibovespa', 'Broker', '123456', 'BRBOVA000000', 'ETF', '10', '10', '0', '', '100.0', '1000'],
+    ],
+    'Empréstimos': [
+        ['Produto', 'Instituição', 'Conta', 'Natureza', 'Número de Contrato', 'Modalidade', 'OPA', 'Liquidação antecipada', 'Taxa', 'Comissão', 'Data de registro', 'Data de vencimento', 'Quantidade', 'Preço de Fechamento', 'Valor Atualizado'],
+        ['Empresa XYZ', 'Broker', '123456', 'Doador', 'C1', 'Voluntário', 'Não', 'Não', '1.5', '0.5', '01/01/2025', '01/12/2025', '100', '10.5', '1050'],
+    ],
+}
+
+@pytest.fixture
+def workbook():
+    with mock.patch('fbpyutils.xlsx.ExcelWorkbook') as mock_excel:
+        mock_excel.return_value.sheet_names = list(SHEETS)
+        mock_excel.return_value.read_sheet.side_effect = lambda name: SHEETS[name]
+        yield mock_excel
+
+def test_process_posicao_workbooks_opens_each_file_once(workbook):
+    files = ['/data/posicao-2025-01-01.xlsx', '/data/posicao-2025-01-02.xlsx']
+    result = process_posicao_workbooks(files)
+
+    assert workbook.call_count == len(files)
+    # Each sheet is read once per file, whatever the number of schemas
+    assert workbook.return_value.read_sheet.call_count == len(files) * len(SHEETS)
+    assert len(result['posicao_acoes']) == 2
+    assert len(result['posicao_etf']) == 2
+    assert len(result['posicao_emprestimo_ativos']) == 2
+    assert result['posicao_renda_fixa'].empty and 'valor_atualizado_mtm' in result['posicao_renda_fixa'].columns
+
+def test_process_posicao_workbooks_matches_schema_processors(workbook):
+    files = ['/data/posicao-2025-01-01.xlsx']
+    result = process_posicao_workbooks(files, ['posicao_acoes', 'posicao_etf', 'posicao_emprestimo_ativos'])
+
+    pd.testing.assert_frame_equal(result['posicao_acoes'], process_schema_posicao_acoes(files))
+    pd.testing.assert_frame_equal(result['posicao_etf'], process_schema_posicao_etf(files))
+    pd.testing.assert_frame_equal(result['posicao_emprestimo_ativos'], process_schema_posicao_emprestimo_ativos(files))
+
+def test_process_posicao_workbooks_skips_other_files(workbook):
+    result = process_posicao_workbooks(['/data/negociacao-2025-01-01.xlsx'], ['posicao_etf'])
+    assert workbook.call_count == 0
+    assert result['posicao_etf'].empty
+
+def test_process_posicao_workbooks_rejects_unknown_schema():
+    with pytest.raises(ValueError):
+        process_posicao_workbooks([], ['posicao_opcoes'])
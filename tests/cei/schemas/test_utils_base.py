@@ -1,6 +1,11 @@
 import pytest
+import pandas as pd
 from datetime import date
-from fbpyutils_finance.cei.schemas.utils import deal_double_spaces, extract_file_info, extract_product_id
+from fbpyutils_finance.cei.schemas.utils import (
+    deal_double_spaces, extract_file_info, extract_product_id,
+    _str_to_date, _str_to_number, _series_str_to_date, _series_str_to_number,
+    deal_double_spaces_series, extract_product_id_series,
+)
 
 def test_deal_double_spaces_removes_extra_spaces():
     assert deal_double_spaces("A  B   C") == "A B C"
@@ -41,3 +46,29 @@ def test_extract_product_id_no_separator():
 
 def test_extract_product_id_non_string():
     assert extract_product_id(12345) == ""
+
+PRODUCTS = pd.Series([
+    "Tesouro Selic 2025", "Empresa XYZ - XYZW4", "Futuro - ABCZ9", "XYZW4", "Some Product",
+    "  ABCD3 - Empresa ABC  ", "Fundo - Classe - Outro", "Futuro WINJ25", "BRL - XY", "", None, 12345,
+])
+
+def test_series_helpers_match_scalar_versions():
+    text = pd.Series(["A  B   C", "NoDoubleSpaces", "  Leading and  trailing  ", None, 10])
+    assert deal_double_spaces_series(text).tolist() == [deal_double_spaces(x) for x in text]
+    assert extract_product_id_series(PRODUCTS).tolist() == [extract_product_id(x) for x in PRODUCTS]
+    assert extract_product_id_series(pd.Series([1, 2])).tolist() == ["", ""]
+
+    dates = pd.Series(["01/01/2025", "-", "31/12/2024", "5/3/2023"])
+    expected = pd.to_datetime(dates.apply(_str_to_date))
+    pd.testing.assert_series_equal(_series_str_to_date(dates), expected)
+
+    numbers = pd.Series(["1.234,56", "-", "10", "0,5"])
+    expected = numbers.apply(_str_to_number).astype(float)
+    pd.testing.assert_series_equal(_series_str_to_number(numbers), expected)
+
+def test_series_helpers_invalid_values():
+    with pytest.raises(ValueError):
+        _series_str_to_date(pd.Series(["01/01/2025", "None"]))
+    assert _series_str_to_date(pd.Series(["None"]), errors="coerce").isna().all()
+    with pytest.raises(ValueError):
+        _series_str_to_number(pd.Series(["abc"]))
@@ -0,0 +1,86 @@
+import zipfile
+import pandas as pd
+import pytest
+from unittest import mock
+
+from fbpyutils_finance.cei.schemas.xlsx_reader import XlsxReader, read_sheet_frame, read_sheet_frames
+
+NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+RNS = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+
+WORKBOOK = f'''<?xml version="1.0" encoding="UTF-8"?>
+<workbook {NS} {RNS}><sheets>
+<sheet name="Negociação" sheetId="1" r:id="rId1"/>
+<sheet name="ETF" sheetId="2" r:id="rId2"/>
+</sheets></workbook>'''
+
+RELS = '''<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="worksheet" Target="/xl/worksheets/sheet2.xml"/>
+</Relationships>'''
+
+SHARED_STRINGS = f'''<?xml version="1.0" encoding="UTF-8"?>
+<sst {NS}><si><t>Data do Negócio</t></si><si><t>Quantidade</t></si><si><t>Preço</t></si>
+<si><r><t>Código de </t></r><r><t>Negociação</t></r></si><si><t xml:space="preserve">  XYZW4 </t></si>
+<si><t>Produto</t></si></sst>'''
+
+STYLES = f'''<?xml version="1.0" encoding="UTF-8"?>
+<styleSheet {NS}><numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy"/></numFmts>
+<cellXfs count="3"><xf numFmtId="0"/><xf numFmtId="164"/><xf numFmtId="4"/></cellXfs></styleSheet>'''
+
+SHEET1 = f'''<?xml version="1.0" encoding="UTF-8"?>
+<worksheet {NS}><sheetData>
+<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c><c r="C1" t="s"><v>2</v></c><c r="D1" t="s"><v>3</v></c></row>
+<row r="2"><c r="A2" t="inlineStr"><is><t>01/01/2025</t></is></c><c r="B2"><v>100</v></c><c r="C2" s="2"><v>10.5</v></c><c r="D2" t="s"><v>4</v></c></row>
+<row r="4"><c r="A4" s="1"><v>45658</v></c><c r="C4" t="b"><v>1</v></c></row>
+</sheetData></worksheet>'''
+
+SHEET2 = f'''<?xml version="1.0" encoding="UTF-8"?>
+<worksheet {NS}><sheetData><row r="1"><c r="A1" t="s"><v>5</v></c></row></sheetData></worksheet>'''
+
+@pytest.fixture
+def xlsx_file(tmp_path):
+    path = tmp_path / 'negociacao-2025-01-01.xlsx'
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('xl/workbook.xml', WORKBOOK)
+        zf.writestr('xl/_rels/workbook.xml.rels', RELS)
+        zf.writestr('xl/sharedStrings.xml', SHARED_STRINGS)
+        zf.writestr('xl/styles.xml', STYLES)
+        zf.writestr('xl/worksheets/sheet1.xml', SHEET1)
+        zf.writestr('xl/worksheets/sheet2.xml', SHEET2)
+    return str(path)
+
+def test_iter_rows_converts_values_like_openpyxl(xlsx_file):
+    with XlsxReader(xlsx_file) as reader:
+        assert reader.sheet_names == ['Negociação', 'ETF']
+        rows = list(reader.iter_rows(0))
+    assert rows[1] == ('01/01/2025', 100, 10.5, '  XYZW4 ')
+    assert rows[2] == (None, None, None, None)
+    assert rows[3] == (pd.Timestamp('2025-01-01').to_pydatetime(), None, True, None)
+
+def test_read_sheet_frame_matches_excel_workbook_strings(xlsx_file):
+    with XlsxReader(xlsx_file) as reader:
+        rows = list(reader.iter_rows(0))
+    xl_table = [[str(c).strip() for c in row] for row in rows]
+    expected = pd.DataFrame(xl_table[1:], columns=xl_table[0])
+
+    result = read_sheet_frame(xlsx_file, 0)
+    pd.testing.assert_frame_equal(result, expected)
+    assert result.iloc[0]['Código de Negociação'] == 'XYZW4'
+    assert result.iloc[2]['Data do Negócio'] == '2025-01-01 00:00:00'
+    assert result.iloc[1]['Quantidade'] == 'None'
+
+def test_read_sheet_frames_reads_existing_sheets(xlsx_file):
+    frames = read_sheet_frames(xlsx_file, ['ETF', 'BDR'])
+    assert list(frames) == ['ETF']
+    assert list(frames['ETF'].columns) == ['Produto'] and frames['ETF'].empty
+    with pytest.raises(ValueError):
+        read_sheet_frame(xlsx_file, 'BDR')
+
+def test_read_sheet_frame_falls_back_to_excel_workbook():
+    with mock.patch('fbpyutils.xlsx.ExcelWorkbook') as mock_excel:
+        mock_excel.return_value.read_sheet_by_index.return_value = [(' A ', 'B'), (1, None)]
+        result = read_sheet_frame('legacy.xls', 0)
+    assert list(result.columns) == ['A', 'B']
+    assert result.iloc[0].tolist() == ['1', 'None']
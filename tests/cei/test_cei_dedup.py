@@ -0,0 +1,44 @@
+from datetime import date
+
+import pandas as pd
+
+from fbpyutils_finance.cei.dedup import deduplicate_rows
+
+def _rows(produto, data_referencia, quantidades):
+    return pd.DataFrame({
+        "codigo_produto": [produto] * len(quantidades),
+        "quantidade": quantidades,
+        "arquivo_origem": "movimentacao",
+        "data_referencia": data_referencia,
+    })
+
+def test_deduplicate_rows_keeps_most_recent_export():
+    first = _rows("XYZW4", date(2023, 6, 30), [10, 20, 30])
+    second = _rows("XYZW4", date(2023, 12, 31), [20, 30, 40])
+    result = deduplicate_rows(pd.concat([first, second], ignore_index=True))
+
+    assert result["quantidade"].tolist() == [10, 20, 30, 40]
+    assert result["data_referencia"].tolist() == [date(2023, 6, 30)] + [date(2023, 12, 31)] * 3
+
+def test_deduplicate_rows_keeps_repeated_rows_of_one_export():
+    first = _rows("XYZW4", date(2023, 6, 30), [10, 10])
+    second = _rows("XYZW4", date(2023, 12, 31), [10, 10, 10])
+    data = pd.concat([first, second], ignore_index=True)
+
+    assert deduplicate_rows(first) is first
+    result = deduplicate_rows(data)
+    assert len(result) == 3 and set(result["data_referencia"]) == {date(2023, 12, 31)}
+
+def test_deduplicate_rows_snapshots_keep_each_date():
+    data = pd.concat([
+        _rows("BOVA11", date(2024, 1, 31), [10]),
+        _rows("BOVA11", date(2024, 2, 29), [10]),
+        _rows("BOVA11", date(2024, 2, 29), [10]).assign(arquivo_origem="posicao_etf_2"),
+    ], ignore_index=True)
+    result = deduplicate_rows(data, snapshot=True)
+    assert result["data_referencia"].tolist() == [date(2024, 1, 31), date(2024, 2, 29)]
+
+def test_deduplicate_rows_without_date_column():
+    data = pd.DataFrame({"file": ["a", "a"]})
+    assert deduplicate_rows(data) is data
+    assert deduplicate_rows(None) is None
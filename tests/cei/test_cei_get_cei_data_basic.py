@@ -1,60 +1,65 @@
 import pandas as pd
 import pytest
 from unittest.mock import MagicMock
-from fbpyutils_finance.cei import get_cei_data
+import fbpyutils_finance.cei as cei
+from fbpyutils_finance.cei import get_cei_data, _chunk_files
+
+FILES = {
+    "movimentacao-*.xlsx": ["movimentacao-1.xlsx", "movimentacao-2.xlsx", "movimentacao-3.xlsx"],
+    "negociacao-*.xlsx": [],
+    "posicao-*.xlsx": ["posicao-1.xlsx", "posicao-2.xlsx"],
+}
 
 @pytest.fixture(autouse=True)
 def mock_all_dependencies(mocker):
     """
-    Fixture to mock FU.find and all schema processors.
+    Fixture to mock FU.find, file sizes and the schema processors.
     """
-    # Mock FU.find to always return a list of fake files
-    mocker.patch("fbpyutils_finance.cei.FU.find", return_value=["file1.xlsx", "file2.xlsx"])
-
-    # Mock all schema processors to return a simple DataFrame
-    df = pd.DataFrame({"x": [1], "y": [2]})
-    processors = [
-        "process_schema_movimentacao",
-        "process_schema_eventos_provisionados",
-        "process_schema_negociacao",
-        "process_schema_posicao_acoes",
-        "process_schema_posicao_emprestimo_ativos",
-        "process_schema_posicao_etf",
-        "process_schema_posicao_fundos_investimento",
-        "process_schema_posicao_tesouro_direto",
-        "process_schema_posicao_renda_fixa",
+    mocker.patch("fbpyutils_finance.cei.FU.find", side_effect=lambda folder, mask: FILES[mask])
+    # Every file has 3 bytes, so chunk_bytes=6 gives chunks of two files
+    mocker.patch("fbpyutils_finance.cei.os.path.getsize", return_value=3)
+
+    calls = []
+    def processor(input_files):
+        calls.append(tuple(input_files))
+        return pd.DataFrame({"file": input_files})
+
+    def posicao(input_files, schemas):
+        calls.append(tuple(input_files))
+        return {schema: pd.DataFrame({"file": input_files, "schema": schema}) for schema in schemas}
+
+    mocker.patch("fbpyutils_finance.cei.process_posicao_workbooks", side_effect=posicao)
+    mocker.patch("fbpyutils_finance.cei._OPERATIONS", (
+        ("movimentacao", "movimentacao-*.xlsx", processor, True),
+        ("negociacao", "negociacao-*.xlsx", MagicMock(return_value=pd.DataFrame()), True),
+        ("eventos_provisionados", "eventos-*.xlsx", processor, False),
+        ("posicao_acoes", "posicao-*.xlsx", processor, True),
+        ("posicao_etf", "posicao-*.xlsx", processor, True),
+    ))
+    return calls
+
+def test_chunk_files_groups_small_files_in_order(mocker):
+    mocker.patch("fbpyutils_finance.cei.os.path.getsize", side_effect=lambda f: {"a": 5, "b": 1, "c": 1, "d": 20, "e": 1}[f])
+    assert _chunk_files(["a", "b", "c", "d", "e"], 6) == [
+        (0, ("a", "b"), 6),
+        (2, ("c",), 1),
+        (3, ("d",), 20),
+        (4, ("e",), 1),
     ]
-    for proc_name in processors:
-        mocker.patch(f"fbpyutils_finance.cei.{proc_name}", return_value=df)
-    # Patch local references imported directly in __init__.py
-    mocker.patch("fbpyutils_finance.cei.process_schema_movimentacao", return_value=df)
-    mocker.patch("fbpyutils_finance.cei.process_schema_eventos_provisionados", return_value=df)
-    mocker.patch("fbpyutils_finance.cei.process_schema_negociacao", return_value=df)
-    mocker.patch("fbpyutils_finance.cei.process_schema_posicao_acoes", return_value=df)
-    mocker.patch("fbpyutils_finance.cei.process_schema_posicao_emprestimo_ativos", return_value=df)
-    mocker.patch("fbpyutils_finance.cei.process_schema_posicao_etf", return_value=df)
-    mocker.patch("fbpyutils_finance.cei.process_schema_posicao_fundos_investimento", return_value=df)
-    mocker.patch("fbpyutils_finance.cei.process_schema_posicao_tesouro_direto", return_value=df)
-    mocker.patch("fbpyutils_finance.cei.process_schema_posicao_renda_fixa", return_value=df)
-
-def test_get_cei_data_sequential(mocker):
+
+def test_get_cei_data_sequential(mock_all_dependencies):
     """
-    Test get_cei_data returns expected list of tuples when parallelize=False.
+    Test get_cei_data merges the chunks of every enabled operation in file order.
     """
-    fake_results = [
-        ("movimentacao", 1, pd.DataFrame({"x": [1]})),
-        ("negociacao", 2, pd.DataFrame({"y": [2, 3]})),
-    ]
-    # Mock _process_operation to return fake results for each call
-    mocker.patch("fbpyutils_finance.cei._process_operation", side_effect=fake_results * 5)
-
-    results = get_cei_data("some_folder", parallelize=False)
-
-    assert isinstance(results, list)
-    # Since _OPERATIONS has 9 enabled operations
-    assert len(results) == 9
-    for item in results:
-        op_name, rows, data = item
-        assert isinstance(op_name, str)
-        assert isinstance(rows, int)
-        assert isinstance(data, pd.DataFrame)
+    results = get_cei_data("some_folder", parallelize=False, chunk_bytes=6)
+
+    assert [op for op, _, _ in results] == ["movimentacao", "negociacao", "posicao_acoes", "posicao_etf"]
+    movimentacao = results[0][2]
+    assert results[0][1] == 3
+    assert list(movimentacao["file"]) == FILES["movimentacao-*.xlsx"]
+    # Operations without files keep the processor's empty result
+    assert results[1][1] == 0 and results[1][2].empty
+    # Posicao schemas share the same work units: each posicao file is processed once
+    assert list(results[2][2]["file"]) == FILES["posicao-*.xlsx"] and set(results[3][2]["schema"]) == {"posicao_etf"}
+    assert sorted(mock_all_dependencies) == [("movimentacao-1.xlsx", "movimentacao-2.xlsx"), ("movimentacao-3.xlsx",),
+                                             ("posicao-1.xlsx", "posicao-2.xlsx")]
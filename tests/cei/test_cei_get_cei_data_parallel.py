@@ -5,38 +5,29 @@ from fbpyutils_finance.cei import get_cei_data
 
 def test_get_cei_data_parallelized(mocker):
     """
-    Test get_cei_data with parallelize=True uses multiprocessing and returns expected data.
+    Test get_cei_data with parallelize=True schedules work units dynamically and merges them in file order.
     """
-    fake_results = [
-        ("movimentacao", 1, pd.DataFrame({"a": [1]})),
-        ("negociacao", 2, pd.DataFrame({"b": [2, 3]})),
-    ]
+    files = ["movimentacao-1.xlsx", "movimentacao-2.xlsx", "movimentacao-3.xlsx"]
+    mocker.patch("fbpyutils_finance.cei.FU.find", side_effect=lambda folder, mask: files if mask.startswith("movimentacao") else [])
+    mocker.patch("fbpyutils_finance.cei.os.path.getsize", side_effect=lambda f: 10 * (files.index(f) + 1))
+    processor = lambda input_files: pd.DataFrame({"file": input_files})
+    mocker.patch("fbpyutils_finance.cei._OPERATIONS", (("movimentacao", "movimentacao-*.xlsx", processor, True),))
 
-    # Mock Pool context manager and its map method
-    mock_pool = mocker.MagicMock()
-    mock_pool.__enter__.return_value.map.return_value = fake_results
-    mocker.patch("fbpyutils_finance.cei.Pool", return_value=mock_pool)
+    # Run the units in the mocked pool, returning them in scheduling order
+    scheduled = []
+    def imap_unordered(function, units, chunksize=1):
+        scheduled.extend(units)
+        return [function(unit) for unit in units]
 
-    # Also mock os.cpu_count to be >1 to enable parallelism
+    mock_pool = mocker.MagicMock()
+    mock_pool.__enter__.return_value.imap_unordered.side_effect = imap_unordered
+    pool = mocker.patch("fbpyutils_finance.cei.Pool", return_value=mock_pool)
     mocker.patch("fbpyutils_finance.cei.os.cpu_count", return_value=4)
 
-    # Mock FU.find to avoid filesystem access
-    mocker.patch("fbpyutils_finance.cei.FU.find", return_value=["file.xlsx"])
-
-    # Mock all schema processors to avoid real processing
-    for proc_name in [
-        "process_schema_movimentacao",
-        "process_schema_eventos_provisionados",
-        "process_schema_negociacao",
-        "process_schema_posicao_acoes",
-        "process_schema_posicao_emprestimo_ativos",
-        "process_schema_posicao_etf",
-        "process_schema_posicao_fundos_investimento",
-        "process_schema_posicao_tesouro_direto",
-        "process_schema_posicao_renda_fixa",
-    ]:
-        mocker.patch(f"fbpyutils_finance.cei.schemas.{proc_name}", return_value=pd.DataFrame())
-
-    results = get_cei_data("folder", parallelize=True)
+    results = get_cei_data("folder", parallelize=True, chunk_bytes=1)
 
-    assert results == fake_results
+    pool.assert_called_once_with(3)
+    # One unit per file, largest first
+    assert [unit[3] for unit in scheduled] == [(f,) for f in reversed(files)]
+    assert results[0][0] == "movimentacao" and results[0][1] == 3
+    assert list(results[0][2]["file"]) == files
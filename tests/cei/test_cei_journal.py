@@ -0,0 +1,98 @@
+import os
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from fbpyutils_finance.cei import get_cei_data
+from fbpyutils_finance.cei.journal import CEIJournal
+
+@pytest.fixture
+def cei_folder(tmp_path):
+    folder = tmp_path / "cei"
+    folder.mkdir()
+    for name in ["movimentacao-2024-01-31.xlsx", "movimentacao-2024-02-29.xlsx"]:
+        (folder / name).write_bytes(name.encode())
+    return folder
+
+@pytest.fixture
+def processor_calls(mocker, cei_folder):
+    calls = []
+    def processor(input_files):
+        calls.append(tuple(os.path.basename(f) for f in input_files))
+        return pd.DataFrame({"file": [os.path.basename(f) for f in input_files], "rows": [1] * len(input_files)})
+
+    mocker.patch("fbpyutils_finance.cei.FU.find",
+                 side_effect=lambda folder, mask: sorted(str(f) for f in cei_folder.glob(mask)))
+    mocker.patch("fbpyutils_finance.cei._OPERATIONS", (
+        ("movimentacao", "movimentacao-*.xlsx", processor, True),
+    ))
+    return calls
+
+def test_journal_lookup_and_store(tmp_path, cei_folder):
+    journal = CEIJournal(str(tmp_path / "journal"))
+    input_file = str(cei_folder / "movimentacao-2024-01-31.xlsx")
+    assert journal.lookup(input_file, ["movimentacao"]) == {}
+
+    journal.store(input_file, "movimentacao", pd.DataFrame({"a": [1, 2]}))
+    journal.store(input_file, "posicao_etf", None)
+    cached = journal.lookup(input_file, ["movimentacao", "posicao_etf"])
+    pd.testing.assert_frame_equal(cached["movimentacao"], pd.DataFrame({"a": [1, 2]}))
+    assert cached["posicao_etf"] is None
+
+    # A new mtime with the same content keeps the result; new content does not
+    os.utime(input_file, ns=(0, 0))
+    assert "movimentacao" in journal.lookup(input_file, ["movimentacao"])
+    with open(input_file, "ab") as f:
+        f.write(b"changed")
+    assert journal.lookup(input_file, ["movimentacao"]) == {}
+
+    journal.clear()
+    assert journal.lookup(input_file, ["posicao_etf"]) == {}
+    journal.close()
+
+def test_get_cei_data_parses_only_new_files(tmp_path, cei_folder, processor_calls):
+    journal_folder = str(tmp_path / "journal")
+    first = get_cei_data(str(cei_folder), parallelize=False, journal=journal_folder)
+    assert sorted(processor_calls) == [("movimentacao-2024-01-31.xlsx",), ("movimentacao-2024-02-29.xlsx",)]
+
+    (cei_folder / "movimentacao-2024-03-31.xlsx").write_bytes(b"march")
+    processor_calls.clear()
+    second = get_cei_data(str(cei_folder), parallelize=False, journal=journal_folder)
+
+    assert processor_calls == [("movimentacao-2024-03-31.xlsx",)]
+    assert second[0][1] == 3
+    assert list(second[0][2]["file"]) == list(first[0][2]["file"]) + ["movimentacao-2024-03-31.xlsx"]
+
+def test_get_cei_data_does_not_journal_failed_files(tmp_path, cei_folder, mocker):
+    calls = []
+    def processor(input_files):
+        calls.extend(os.path.basename(f) for f in input_files)
+        # Processors log and skip unreadable files, returning an empty frame
+        ok = [os.path.basename(f) for f in input_files if "02-29" not in f]
+        return pd.DataFrame({"file": ok, "rows": [1] * len(ok)})
+
+    mocker.patch("fbpyutils_finance.cei.FU.find",
+                 side_effect=lambda folder, mask: sorted(str(f) for f in cei_folder.glob(mask)))
+    mocker.patch("fbpyutils_finance.cei._OPERATIONS", (
+        ("movimentacao", "movimentacao-*.xlsx", processor, True),
+    ))
+    journal_folder = str(tmp_path / "journal")
+    first = get_cei_data(str(cei_folder), parallelize=False, journal=journal_folder)
+    assert first[0][1] == 1
+
+    calls.clear()
+    second = get_cei_data(str(cei_folder), parallelize=False, journal=journal_folder)
+    assert calls == ["movimentacao-2024-02-29.xlsx"]
+    assert list(second[0][2]["file"]) == ["movimentacao-2024-01-31.xlsx"]
+
+def test_journal_store_removes_temp_file_on_failure(tmp_path, cei_folder, mocker):
+    journal = CEIJournal(str(tmp_path / "journal"))
+    def to_parquet(self, path, **kwargs):
+        open(path, "wb").close()
+        raise OSError("disk full")
+    mocker.patch.object(pd.DataFrame, "to_parquet", to_parquet)
+    with pytest.raises(OSError):
+        journal.store(str(cei_folder / "movimentacao-2024-01-31.xlsx"), "movimentacao", pd.DataFrame({"a": [1]}))
+    assert not [f for _, _, files in os.walk(tmp_path / "journal") for f in files if f.endswith(".tmp")]
+    journal.close()
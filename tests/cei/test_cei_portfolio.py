@@ -0,0 +1,83 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fbpyutils_finance.cei.portfolio import build_ledger, replay_positions, current_positions
+
+def _trades(rows):
+    return pd.DataFrame([{
+        "data_negocio": pd.Timestamp(d), "movimentacao": mov, "conta": "123", "codigo_produto": ticker,
+        "quantidade": qty, "preco_unitario": price, "valor_operacao": qty * price,
+    } for d, mov, ticker, qty, price in rows])
+
+def _movements(rows):
+    return pd.DataFrame([{
+        "data_movimentacao": pd.Timestamp(d), "movimentacao": mov, "conta": "123", "codigo_produto": ticker,
+        "quantidade": qty, "preco_unitario": None, "valor_operacao": value,
+    } for d, mov, ticker, qty, value in rows])
+
+NEGOCIACAO = _trades([
+    (date(2023, 1, 10), "Compra", "XYZW4", 100, 10.0),
+    (date(2023, 2, 10), "Compra", "XYZW4F", 50, 16.0),
+    (date(2023, 3, 10), "Venda", "XYZW4", 30, 20.0),
+    (date(2023, 5, 10), "Venda", "XYZW4", 240, 9.0),
+    (date(2023, 6, 10), "Compra", "XYZW4", 10, 8.0),
+])
+MOVIMENTACAO = _movements([
+    (date(2023, 4, 10), "Desdobro", "XYZW4", 120, None),
+    (date(2023, 4, 10), "Transferência - Liquidação", "XYZW4", 50, 800.0),
+])
+
+def test_build_ledger_maps_events():
+    ledger = build_ledger(NEGOCIACAO, MOVIMENTACAO)
+    assert len(ledger) == 6
+    assert set(ledger["codigo_produto"]) == {"XYZW4"}
+    assert ledger["evento"].tolist() == ["BUY", "BUY", "SELL", "SELL", "BUY", "SPLIT"]
+    assert build_ledger().empty
+
+def test_replay_positions_average_cost():
+    series, checkpoint = replay_positions(build_ledger(NEGOCIACAO, MOVIMENTACAO))
+
+    assert series["posicao"].tolist() == [100, 150, 120, 240, 0, 10]
+    np.testing.assert_allclose(series["custo_total"], [1000, 1800, 1440, 1440, 0, 80])
+    np.testing.assert_allclose(series["preco_medio"][:4], [10, 12, 12, 6])
+    assert np.isnan(series["preco_medio"][4]) and series["preco_medio"][5] == 8
+    assert checkpoint.to_dict("records") == [{
+        "conta": "123", "codigo_produto": "XYZW4", "data": pd.Timestamp(2023, 6, 10),
+        "posicao": 10.0, "custo_total": 80.0,
+    }]
+
+def test_replay_positions_from_checkpoint():
+    ledger = build_ledger(NEGOCIACAO, MOVIMENTACAO)
+    full, _ = replay_positions(ledger)
+    first = ledger[ledger["data"] <= pd.Timestamp(2023, 3, 10)]
+    _, checkpoint = replay_positions(first)
+    rest, _ = replay_positions(ledger, checkpoint)
+
+    assert len(rest) == 3
+    pd.testing.assert_frame_equal(rest, full.iloc[3:].reset_index(drop=True))
+
+def test_current_positions_as_of():
+    series, _ = replay_positions(build_ledger(NEGOCIACAO, MOVIMENTACAO))
+    positions = current_positions(series, as_of=pd.Timestamp(2023, 4, 30))
+    assert positions[["codigo_produto", "posicao", "preco_medio"]].values.tolist() == [["XYZW4", 240, 6]]
+    assert current_positions(series, as_of=pd.Timestamp(2023, 5, 31)).empty
+
+def test_replay_positions_missing_columns():
+    with pytest.raises(ValueError):
+        replay_positions(pd.DataFrame({"conta": []}))
+
+def test_replay_positions_many_partial_sells():
+    rows = [(date(2023, 1, 2), "Compra", "XYZW4", 1000, 10.0)]
+    # Each sell keeps 1/1000 of the cost: the cumulative growth goes far below the float64 range
+    days = pd.bdate_range("2023-01-03", periods=300)
+    for sell_day, buy_day in zip(days[::2], days[1::2]):
+        rows += [(sell_day, "Venda", "XYZW4", 999, 11.0), (buy_day, "Compra", "XYZW4", 999, 10.0)]
+    series, checkpoint = replay_positions(build_ledger(_trades(rows)))
+
+    assert np.isfinite(series["custo_total"]).all()
+    np.testing.assert_allclose(series["preco_medio"], 10.0)
+    assert checkpoint["posicao"].iloc[0] == 1000
+    assert checkpoint["custo_total"].iloc[0] == pytest.approx(10000.0)
@@ -0,0 +1,57 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fbpyutils_finance import rate_daily_to_annual
+from fbpyutils_finance.cei.returns import build_cash_flows, xirr
+
+def _flows(conta, produto, rows):
+    return pd.DataFrame([
+        {"conta": conta, "codigo_produto": produto, "data": pd.Timestamp(d), "valor": v} for d, v in rows
+    ])
+
+def test_xirr_single_period():
+    flows = _flows("123", "XYZW4", [(date(2023, 1, 1), -1000.0), (date(2023, 12, 27), 1100.0)])
+    result = xirr(flows)
+    assert result["taxa_anual"].iloc[0] == pytest.approx(0.10, abs=1e-9)
+    assert result["taxa_anual"].iloc[0] == pytest.approx(rate_daily_to_annual(result["taxa_diaria"].iloc[0]))
+
+def test_xirr_many_groups():
+    flows = pd.concat([
+        _flows("123", "XYZW4", [(date(2023, 1, 1), -1000.0), (date(2023, 12, 27), 1100.0)]),
+        _flows("123", "ABCD3", [(date(2022, 1, 10), -500.0), (date(2022, 7, 1), -300.0),
+                                (date(2023, 3, 15), 120.0), (date(2024, 2, 1), 900.0)]),
+        _flows("456", "XYZW4", [(date(2023, 1, 1), -1000.0), (date(2023, 6, 1), -10.0)]),
+    ], ignore_index=True)
+    result = xirr(flows)
+
+    assert result[["conta", "codigo_produto"]].values.tolist() == [["123", "XYZW4"], ["123", "ABCD3"], ["456", "XYZW4"]]
+    daily = result["taxa_diaria"].iloc[1]
+    abcd = flows[flows["codigo_produto"] == "ABCD3"]
+    days = (abcd["data"] - abcd["data"].min()).dt.days.to_numpy()
+    assert np.sum(abcd["valor"].to_numpy() / (1 + daily) ** days) == pytest.approx(0, abs=1e-6)
+    assert np.isnan(result["taxa_anual"].iloc[2])
+
+def test_build_cash_flows_signs():
+    negociacao = pd.DataFrame({
+        "data_negocio": [pd.Timestamp(2023, 1, 2), pd.Timestamp(2023, 2, 2)],
+        "movimentacao": ["Compra", "Venda"], "conta": "123", "codigo_produto": ["XYZW4F", "XYZW4"],
+        "quantidade": [10, 5], "preco_unitario": [10.0, 12.0], "valor_operacao": [100.0, 60.0],
+    })
+    movimentacao = pd.DataFrame({
+        "data_movimentacao": [pd.Timestamp(2023, 3, 1), pd.Timestamp(2023, 3, 1)],
+        "movimentacao": ["Dividendo", "Transferência - Liquidação"], "conta": "123",
+        "codigo_produto": "XYZW4", "quantidade": [5, 5], "valor_operacao": [2.5, 60.0],
+    })
+    terminal = pd.DataFrame({"conta": ["123"], "codigo_produto": ["XYZW4"], "valor": [65.0]})
+    flows = build_cash_flows(negociacao, movimentacao, terminal, as_of=pd.Timestamp(2023, 6, 30))
+
+    assert flows["valor"].tolist() == [-100.0, 60.0, 2.5, 65.0]
+    assert set(flows["codigo_produto"]) == {"XYZW4"}
+    assert len(xirr(flows)) == 1
+
+def test_xirr_missing_columns():
+    with pytest.raises(ValueError):
+        xirr(pd.DataFrame({"data": [], "valor": []}))
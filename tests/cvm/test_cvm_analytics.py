@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fbpyutils_finance.cvm import analytics
+
+def _positions():
+    rng = np.random.default_rng(42)
+    dates = pd.bdate_range('2023-01-02', periods=60)
+    frames = []
+    for fund in ['A', 'B', 'C']:
+        quota = 1.0 * np.cumprod(1 + rng.normal(0.0005, 0.01, len(dates)))
+        frames.append(pd.DataFrame({
+            'fund_id': fund,
+            'position_date': dates.date,
+            'quota_value': quota,
+            'net_worth_value': quota * 1000,
+            'daily_capture_value': 10.0,
+            'daily_redemption_value': 4.0,
+        }))
+    # Shuffled, as rows come from several files
+    return pd.concat(frames, ignore_index=True).sample(frac=1, random_state=1)
+
+def test_daily_metrics_match_per_fund_pandas():
+    data = _positions()
+    daily = analytics.compute_daily_metrics(data, window=5)
+    for fund, expected in data.sort_values('position_date').groupby('fund_id'):
+        result = daily[daily['fund_id'] == fund]
+        returns = expected['quota_value'].pct_change()
+        np.testing.assert_allclose(result['daily_return'], returns, equal_nan=True)
+        np.testing.assert_allclose(result['rolling_volatility'], returns.rolling(5).std() * np.sqrt(252), equal_nan=True, rtol=1e-6)
+        np.testing.assert_allclose(result['drawdown'], expected['quota_value'] / expected['quota_value'].cummax() - 1)
+    assert (daily['net_flow'] == 6.0).all()
+
+def test_rolling_volatility_funds_of_different_scale():
+    dates = pd.bdate_range('2023-01-02', periods=40)
+    rng = np.random.default_rng(7)
+    big = np.cumprod(1 + rng.normal(0.0, 0.01, len(dates)))
+    big[10] = 1e9 # A quota outlier gives returns around 1e9 in fund A
+    small = np.cumprod(1 + rng.normal(0.0, 0.01, len(dates)))
+    data = pd.concat([
+        pd.DataFrame({'fund_id': 'A', 'position_date': dates, 'quota_value': big}),
+        pd.DataFrame({'fund_id': 'B', 'position_date': dates, 'quota_value': small}),
+    ], ignore_index=True)
+    daily = analytics.compute_daily_metrics(data, window=5)
+    result = daily[daily['fund_id'] == 'B']
+    expected = pd.Series(small).pct_change().rolling(5).std() * np.sqrt(252)
+    assert (result['rolling_volatility'].dropna() > 0).all()
+    np.testing.assert_allclose(result['rolling_volatility'], expected, equal_nan=True, rtol=1e-9)
+
+def test_fund_metrics_summary():
+    data = _positions()
+    metrics = analytics.compute_fund_metrics(data).set_index('fund_id')
+    a = data[data['fund_id'] == 'A'].sort_values('position_date')
+    assert metrics.loc['A', 'observations'] == 60
+    assert metrics.loc['A', 'total_return'] == pytest.approx(a['quota_value'].iloc[-1] / a['quota_value'].iloc[0] - 1)
+    assert metrics.loc['A', 'volatility'] == pytest.approx(a['quota_value'].pct_change().std() * np.sqrt(252))
+    assert metrics.loc['A', 'net_flow'] == pytest.approx(60 * 6.0)
+    assert metrics.loc['A', 'max_drawdown'] <= 0
+
+def test_monthly_returns():
+    data = pd.DataFrame({
+        'fund_id': ['A'] * 4,
+        'position_date': ['2023-01-30', '2023-01-31', '2023-02-27', '2023-02-28'],
+        'quota_value': [1.0, 1.1, 1.2, 1.21],
+        'daily_capture_value': [1.0, 2.0, 0.0, 0.0],
+        'daily_redemption_value': [0.0, 0.0, 5.0, 0.0],
+    })
+    monthly = analytics.compute_monthly_returns(data)
+    assert list(monthly['period']) == ['2023-01', '2023-02']
+    assert np.isnan(monthly['monthly_return'].iloc[0])
+    assert monthly['monthly_return'].iloc[1] == pytest.approx(1.21 / 1.1 - 1)
+    assert list(monthly['net_flow']) == [3.0, -5.0]
+
+def test_prepare_requires_key_columns():
+    with pytest.raises(ValueError):
+        analytics.prepare_fund_positions(pd.DataFrame({'fund_id': ['A']}))
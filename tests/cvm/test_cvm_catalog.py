@@ -0,0 +1,115 @@
+import sqlite3
+import threading
+
+import pandas as pd
+import pytest
+
+from fbpyutils_finance.cvm.catalog import CVMCatalog, connect_catalog
+from fbpyutils_finance.cvm.cvm_client import CVM
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = CVMCatalog(str(tmp_path / 'catalog.db'))
+    yield catalog
+    catalog.close()
+
+def test_connect_catalog_enables_wal(tmp_path):
+    connection = connect_catalog(str(tmp_path / 'catalog.db'))
+    assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    connection.close()
+
+def test_connection_per_thread(catalog):
+    main = catalog.connection()
+    assert catalog.connection() is main
+    others = []
+    thread = threading.Thread(target=lambda: others.append(catalog.connection()))
+    thread.start()
+    thread.join()
+    assert others[0] is not main
+
+    catalog.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        main.execute('SELECT 1')
+    assert catalog.connection() is not main
+
+def test_transaction_commits_or_rolls_back(catalog):
+    catalog.connection().execute('CREATE TABLE t (x INTEGER)')
+    with catalog.transaction() as cursor:
+        cursor.execute('INSERT INTO t VALUES (1)')
+    with pytest.raises(RuntimeError):
+        with catalog.transaction() as cursor:
+            cursor.execute('INSERT INTO t VALUES (2)')
+            raise RuntimeError('abort')
+    assert catalog.connection().execute('SELECT x FROM t').fetchall() == [(1,)]
+
+def test_transaction_does_not_join_implicit_transactions(catalog, tmp_path):
+    connection = catalog.connection()
+    connection.execute('CREATE TABLE t (x INTEGER)')
+    connection.commit()
+    # Left open by a write without commit, as CVMHeaderCache.store(commit=False) does
+    connection.execute('INSERT INTO t VALUES (1)')
+    with catalog.transaction() as cursor:
+        cursor.execute('INSERT INTO t VALUES (2)')
+    with sqlite3.connect(str(tmp_path / 'catalog.db')) as other:
+        assert other.execute('SELECT x FROM t ORDER BY x').fetchall() == [(1,), (2,)]
+
+    connection.execute('INSERT INTO t VALUES (3)')
+    with pytest.raises(RuntimeError):
+        with catalog.transaction() as cursor:
+            cursor.execute('INSERT INTO t VALUES (4)')
+            with catalog.transaction() as nested:
+                nested.execute('INSERT INTO t VALUES (5)')
+            raise RuntimeError('abort')
+    assert connection.execute('SELECT x FROM t ORDER BY x').fetchall() == [(1,), (2,), (3,)]
+    assert not connection.in_transaction
+
+def test_concurrent_writers_wait_for_lock(catalog):
+    catalog.connection().execute('CREATE TABLE t (x INTEGER)')
+    errors = []
+
+    def write(start):
+        try:
+            for i in range(start, start + 50):
+                with catalog.transaction() as cursor:
+                    cursor.execute('INSERT INTO t VALUES (?)', (i,))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(n * 100,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert catalog.connection().execute('SELECT COUNT(*) FROM t').fetchone()[0] == 200
+
+def test_update_cvm_catalog_stages_and_merges(tmp_path, monkeypatch):
+    import fbpyutils_finance.cvm.cvm_client as cvm_client_mod
+    client = CVM(headers_df=pd.DataFrame({'Hash': ['dummy']}), catalog_db_path=str(tmp_path / 'catalog.db'),
+                 history_folder=str(tmp_path / 'history'))
+
+    def remote_files(kind, current_url, history_url):
+        return pd.DataFrame([{'sequence': 0, 'href': f'{kind.lower()}.csv', 'name': kind.lower(), 'last_modified': '2024-01-01 10:00:00',
+                              'size': 10, 'history': False, 'url': f'http://cvm/{kind.lower()}.csv', 'kind': kind}])
+    monkeypatch.setattr(cvm_client_mod, 'get_remote_files_list', remote_files)
+
+    def download(meta):
+        meta['last_download'] = '2024-01-02 00:00:00'
+        return [('SUCCESS', meta, 'ok')]
+    monkeypatch.setattr(cvm_client_mod, 'update_cvm_history_file', download)
+
+    summary, processed, _ = client.update_cvm_catalog()
+    assert len(summary) == 2 and len(processed) == 2
+
+    # Readable from another thread while this one keeps its own connection
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(client.get_cvm_catalog()))
+    thread.start()
+    thread.join()
+    assert sorted(seen[0]['url']) == ['http://cvm/if_position.csv', 'http://cvm/if_register.csv']
+    assert not seen[0]['process'].any()
+    assert client.CATALOG.execute(f'SELECT COUNT(*) FROM temp.{CVM.REMOTE_FILES_TABLE}').fetchone()[0] == 0
+
+    # A second run finds nothing to download
+    assert client.update_cvm_catalog() == ([], [], [])
+    client.close()
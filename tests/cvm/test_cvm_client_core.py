@@ -90,3 +90,46 @@ def test_get_cvm_file_data_with_mock(headers_df, tmp_path, monkeypatch):
     result = client.get_cvm_file_data(str(dummy_path))
     assert isinstance(result, tuple)
     assert len(result) == 4
+
+def test_process_pending_streams_to_sink_and_marks_in_batches(cvm_client, monkeypatch):
+    import fbpyutils_finance.cvm.cvm_client as cvm_client_mod
+    groups = [
+        ('IF_POSITION', 'inf_diario_fi_202311', False, ('a.csv', 'b.csv')),
+        ('IF_POSITION', 'inf_diario_fi_202312', False, ('c.csv',)),
+        ('IF_POSITION', 'inf_diario_fi_202401', False, ('bad.csv',)),
+    ]
+    monkeypatch.setattr(cvm_client, 'get_cvm_files_to_process', lambda kind=None, history=None: groups)
+
+    def fake_read(cvm_file, headers_df, **kwargs):
+        if cvm_file == 'bad.csv':
+            raise ValueError('broken file')
+        return ('IF_POSITION', 'DIARIO_FI', pd.DataFrame({'x': [1]}), ['kind', 'sub_kind'])
+    monkeypatch.setattr(cvm_client_mod, 'read_cvm_history_file', fake_read)
+
+    mark_calls = []
+    monkeypatch.setattr(cvm_client, 'mark_cvm_files_updated', lambda groups: mark_calls.append(list(groups)) or True)
+
+    received = []
+    processed = cvm_client.process_pending(workers=1, sink=lambda f, k, sk, data, parts: received.append(f), batch_size=1)
+
+    assert sorted(received) == ['a.csv', 'b.csv', 'c.csv']
+    assert processed == [('IF_POSITION', 'inf_diario_fi_202311'), ('IF_POSITION', 'inf_diario_fi_202312')]
+    # One call per finished group when batch_size=1; the failed group is never marked
+    assert mark_calls == [[('IF_POSITION', 'inf_diario_fi_202311')], [('IF_POSITION', 'inf_diario_fi_202312')]]
+
+def test_process_pending_nothing_to_do(cvm_client):
+    assert cvm_client.process_pending(workers=1, sink=lambda *args: None) == []
+
+def test_get_cvm_files_to_process_uses_history_index(headers_df, tmp_path):
+    history = tmp_path / "history"
+    client = CVM(headers_df=headers_df, catalog_db_path=str(tmp_path / "db.db"), history_folder=str(history))
+    client.CATALOG.executemany(
+        "INSERT INTO cvm_if_catalog_journal (href, name, history, url, kind, last_download, active) VALUES (?, ?, 0, ?, 'IF_POSITION', '2024-01-01 00:00:00', 1)",
+        [("inf_diario_fi_202312.csv", "inf_diario_fi_202312", "u1"), ("inf_diario_fi_202401.csv", "inf_diario_fi_202401", "u2")]
+    )
+    client.CATALOG.commit()
+    (history / "if_position.inf_diario_fi_202312.csv").write_text("x", encoding="utf-8")
+
+    result = client.get_cvm_files_to_process()
+    # Only the group with a downloaded file is returned
+    assert result == [("IF_POSITION", "inf_diario_fi_202312", False, (str(history / "if_position.inf_diario_fi_202312.csv"),))]
@@ -0,0 +1,133 @@
+import os
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from fbpyutils_finance.cvm import dataset
+from fbpyutils_finance.cvm.cvm_client import CVM
+
+PARTITION_COLS = ['kind', 'sub_kind', 'year', 'period']
+
+def _position_frame(period, values):
+    return pd.DataFrame({
+        'kind': 'IF_POSITION',
+        'sub_kind': 'DIARIO_FI',
+        'year': period[:4],
+        'period': period,
+        'fund_id': [f'{i:014d}' for i in range(len(values))],
+        'quota_value': values,
+    })
+
+def test_build_partition_path():
+    path = dataset.build_partition_path('/root', [('kind', 'IF_POSITION'), ('year', None)])
+    assert path == os.path.join('/root', 'kind=IF_POSITION', f'year={dataset.NULL_PARTITION_VALUE}')
+
+def test_write_and_read_with_partition_pruning(tmp_path):
+    writer = dataset.CVMDatasetWriter(str(tmp_path), mode='append')
+    writer.write(_position_frame('2023-11', [1.0, 2.0]), PARTITION_COLS, 'if_position.inf_diario_fi_202311')
+    writer.write(_position_frame('2023-12', [3.0]), PARTITION_COLS, 'if_position.inf_diario_fi_202312')
+
+    partitions = dataset.list_cvm_dataset_partitions(str(tmp_path), {'period': '2023-12'})
+    assert len(partitions) == 1
+    assert partitions[0][1]['period'] == '2023-12'
+
+    df = dataset.read_cvm_dataset(str(tmp_path), filters={'period': ['2023-12']})
+    assert len(df) == 1
+    assert list(df.columns[:4]) == PARTITION_COLS
+    assert df['quota_value'].iloc[0] == 3.0
+
+    assert len(dataset.read_cvm_dataset(str(tmp_path))) == 3
+
+def test_append_mode_adds_parts(tmp_path):
+    writer = dataset.CVMDatasetWriter(str(tmp_path), mode='append')
+    writer.write(_position_frame('2023-12', [1.0]), PARTITION_COLS, 'part')
+    writer.write(_position_frame('2023-12', [2.0]), PARTITION_COLS, 'part')
+    assert len(dataset.read_cvm_dataset(str(tmp_path))) == 2
+
+def test_overwrite_mode_replaces_partition_once(tmp_path):
+    dataset.CVMDatasetWriter(str(tmp_path), mode='append').write(_position_frame('2023-12', [1.0, 2.0]), PARTITION_COLS, 'old')
+
+    writer = dataset.CVMDatasetWriter(str(tmp_path), mode='overwrite')
+    writer.write(_position_frame('2023-12', [5.0]), PARTITION_COLS, 'new')
+    # A second write in the same session appends to the already replaced partition
+    writer.write(_position_frame('2023-12', [6.0]), PARTITION_COLS, 'new')
+
+    df = dataset.read_cvm_dataset(str(tmp_path))
+    assert sorted(df['quota_value']) == [5.0, 6.0]
+
+def test_invalid_mode(tmp_path):
+    with pytest.raises(ValueError):
+        dataset.CVMDatasetWriter(str(tmp_path), mode='merge')
+
+def test_read_missing_dataset_returns_empty(tmp_path):
+    df = dataset.read_cvm_dataset(str(tmp_path / 'missing'))
+    assert df.empty
+
+def test_update_cvm_dataset_marks_groups(tmp_path, monkeypatch):
+    headers_df = pd.DataFrame({'Hash': ['dummy'], 'Target_Field': ['field'], 'Source_Field': ['field']})
+    client = CVM(headers_df=headers_df, catalog_db_path=str(tmp_path / 'db.db'),
+                 history_folder=str(tmp_path / 'history'), dataset_folder=str(tmp_path / 'dataset'))
+
+    source = str(tmp_path / 'history' / 'if_position.inf_diario_fi_202312.csv')
+    monkeypatch.setattr(client, 'get_cvm_files_to_process',
+                        lambda kind=None, history=None: [('IF_POSITION', 'inf_diario_fi_202312', False, (source,))])
+    import fbpyutils_finance.cvm.cvm_client as cvm_client_mod
+    monkeypatch.setattr(cvm_client_mod, 'read_cvm_history_file',
+                        lambda f, df, **kwargs: ('IF_POSITION', 'DIARIO_FI', _position_frame('2023-12', [1.0]), PARTITION_COLS))
+    marked = []
+    monkeypatch.setattr(client, 'mark_cvm_files_updated', lambda groups: marked.extend(groups) or True)
+
+    processed = client.update_cvm_dataset()
+    assert processed == [('IF_POSITION', 'inf_diario_fi_202312')]
+    assert marked == processed
+    assert len(client.read_cvm_dataset(filters={'sub_kind': 'DIARIO_FI'})) == 1
+
+def _series_frame(period, rows):
+    df = pd.DataFrame(rows, columns=['fund_id', 'position_date', 'quota_value'])
+    return df.assign(kind='IF_POSITION', sub_kind='DIARIO_FI', year=period[:4], period=period)
+
+def test_fund_series_reads_indexed_row_ranges(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset, 'INDEX_ROW_GROUP_SIZE', 2)
+    writer = dataset.CVMDatasetWriter(str(tmp_path), mode='overwrite')
+    writer.write(_series_frame('2023-11', [('B', '2023-11-30', 20.0), ('A', '2023-11-30', 10.0), ('C', '2023-11-30', 30.0)]),
+                 PARTITION_COLS, 'nov')
+    writer.write(_series_frame('2023-12', [('A', '2023-12-01', 11.0), ('B', '2023-12-01', 21.0), ('A', '2023-12-04', 12.0)]),
+                 PARTITION_COLS, 'dec')
+
+    series = dataset.read_cvm_fund_series(str(tmp_path), 'A', columns=['quota_value'])
+    assert list(series['quota_value']) == [10.0, 11.0, 12.0]
+    assert set(series['fund_id']) == {'A'}
+    assert list(series['period']) == ['2023-11', '2023-12', '2023-12']
+
+    series = dataset.read_cvm_fund_series(str(tmp_path), 'A', start='2023-12-02')
+    assert list(series['quota_value']) == [12.0]
+    assert dataset.read_cvm_fund_series(str(tmp_path), 'Z').empty
+
+def test_fund_index_follows_overwritten_partitions(tmp_path):
+    dataset.CVMDatasetWriter(str(tmp_path), mode='overwrite').write(
+        _series_frame('2023-12', [('A', '2023-12-01', 1.0)]), PARTITION_COLS, 'dec')
+    dataset.CVMDatasetWriter(str(tmp_path), mode='overwrite').write(
+        _series_frame('2023-12', [('A', '2023-12-01', 2.0)]), PARTITION_COLS, 'dec')
+    series = dataset.read_cvm_fund_series(str(tmp_path), 'A')
+    assert list(series['quota_value']) == [2.0]
+
+def test_upsert_mode_replaces_rows_by_key(tmp_path):
+    writer = dataset.CVMDatasetWriter(str(tmp_path), mode='upsert')
+    writer.write(_series_frame('2023-12', [('A', '2023-12-01', 1.0), ('B', '2023-12-01', 2.0)]), PARTITION_COLS, 'dec')
+    writer.write(_series_frame('2023-12', [('A', '2023-12-01', 3.0), ('A', '2023-12-04', 4.0)]), PARTITION_COLS, 'dec')
+
+    df = dataset.read_cvm_dataset(str(tmp_path)).sort_values(['fund_id', 'position_date'])
+    assert df[['fund_id', 'quota_value']].values.tolist() == [['A', 3.0], ['A', 4.0], ['B', 2.0]]
+    assert len(os.listdir(tmp_path / 'kind=IF_POSITION' / 'sub_kind=DIARIO_FI' / 'year=2023' / 'period=2023-12')) == 1
+    series = dataset.read_cvm_fund_series(str(tmp_path), 'A')
+    assert list(series['quota_value']) == [3.0, 4.0]
+
+def test_get_fund_series_normalizes_cnpj(tmp_path):
+    headers_df = pd.DataFrame({'Hash': ['dummy'], 'Target_Field': ['field'], 'Source_Field': ['field']})
+    client = CVM(headers_df=headers_df, catalog_db_path=str(tmp_path / 'db.db'),
+                 history_folder=str(tmp_path / 'history'), dataset_folder=str(tmp_path / 'dataset'))
+    dataset.CVMDatasetWriter(client.DATASET_FOLDER).write(
+        _series_frame('2023-12', [('00000000000191', '2023-12-01', 1.0)]), PARTITION_COLS, 'dec')
+    series = client.get_fund_series('00.000.000/0001-91', fields=['quota_value'])
+    assert list(series['quota_value']) == [1.0]
@@ -0,0 +1,49 @@
+import sqlite3
+import pandas as pd
+
+from fbpyutils_finance.cvm.delta import CVMRowFingerprints
+
+def _position_frame(rows):
+    return pd.DataFrame(rows, columns=['fund_id', 'position_date', 'quota_value'])
+
+def test_diff_emits_only_new_and_changed_rows():
+    store = CVMRowFingerprints(sqlite3.connect(':memory:'))
+    first = _position_frame([('A', '2023-12-01', 1.0), ('B', '2023-12-01', 2.0)])
+
+    delta, fingerprints = store.diff('IF_POSITION', 'DIARIO_FI', first)
+    assert len(delta) == 2
+    store.commit('IF_POSITION', 'DIARIO_FI', fingerprints)
+
+    republished = _position_frame([('A', '2023-12-01', 1.0), ('B', '2023-12-01', 2.5), ('A', '2023-12-04', 1.1)])
+    delta, fingerprints = store.diff('IF_POSITION', 'DIARIO_FI', republished)
+    assert sorted(map(tuple, delta.values.tolist())) == [('A', '2023-12-04', 1.1), ('B', '2023-12-01', 2.5)]
+    store.commit('IF_POSITION', 'DIARIO_FI', fingerprints)
+
+    delta, fingerprints = store.diff('IF_POSITION', 'DIARIO_FI', republished)
+    assert delta.empty
+    assert fingerprints.empty
+
+def test_diff_without_commit_keeps_rows_pending():
+    store = CVMRowFingerprints(sqlite3.connect(':memory:'))
+    data = _position_frame([('A', '2023-12-01', 1.0)])
+    store.diff('IF_POSITION', 'DIARIO_FI', data)
+    delta, _ = store.diff('IF_POSITION', 'DIARIO_FI', data)
+    assert len(delta) == 1
+
+def test_diff_combines_duplicated_keys():
+    store = CVMRowFingerprints(sqlite3.connect(':memory:'))
+    data = _position_frame([('A', '2023-12-01', 1.0), ('A', '2023-12-01', 2.0)])
+    delta, fingerprints = store.diff('IF_POSITION', 'DIARIO_FI', data)
+    assert len(delta) == 2
+    assert len(fingerprints) == 1
+    store.commit('IF_POSITION', 'DIARIO_FI', fingerprints)
+    # Same rows in another order are unchanged
+    delta, _ = store.diff('IF_POSITION', 'DIARIO_FI', data.iloc[::-1])
+    assert delta.empty
+
+def test_diff_passes_through_untracked_kinds():
+    store = CVMRowFingerprints(sqlite3.connect(':memory:'))
+    data = pd.DataFrame({'fund_id': ['A']})
+    delta, fingerprints = store.diff('IF_REGISTER', 'CAD_FI', data)
+    assert delta is data
+    assert fingerprints is None
@@ -62,3 +62,52 @@ def test_read_cvm_history_file_file_not_found(headers_df):
     with pytest.raises(ValueError) as excinfo:
         file_io.read_cvm_history_file("nonexistent.csv", headers_df)
     assert "Source file not found" in str(excinfo.value)
+
+def test_index_history_folder_groups_by_kind_and_name(tmp_path):
+    for name in ["if_position.inf_diario_fi_202312.csv",
+                 "if_position.inf_diario_fi_2020.0001.csv",
+                 "if_position.inf_diario_fi_2020.0000.csv",
+                 "README"]:
+        (tmp_path / name).write_text("x", encoding="utf-8")
+    index = file_io.index_history_folder(str(tmp_path))
+    assert index[("if_position", "inf_diario_fi_202312")] == [str(tmp_path / "if_position.inf_diario_fi_202312.csv")]
+    assert index[("if_position", "inf_diario_fi_2020")] == [
+        str(tmp_path / "if_position.inf_diario_fi_2020.0000.csv"),
+        str(tmp_path / "if_position.inf_diario_fi_2020.0001.csv"),
+    ]
+    assert len(index) == 2
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_read_cvm_csv_usecols_keeps_text(tmp_path, engine):
+    if engine == "pyarrow":
+        pytest.importorskip("pyarrow")
+    file_path = tmp_path / "if_position.inf_diario_fi_202312.csv"
+    file_path.write_text('CNPJ_FUNDO;NOME;NR_COTST\n00.000.000/0001-91;FUNDO "A";0012\n11.111.111/0001-11;;NA\n', encoding="utf-8")
+
+    df = file_io.read_cvm_csv(str(file_path), usecols=['CNPJ_FUNDO', 'NR_COTST'], engine=engine)
+    assert list(df.columns) == ['cnpj_fundo', 'nr_cotst']
+    assert df['nr_cotst'].iloc[0] == '0012'
+    assert pd.isna(df['nr_cotst'].iloc[1])
+
+    df = file_io.read_cvm_csv(str(file_path), engine=engine)
+    assert df['nome'].iloc[0] == 'FUNDO "A"'
+    assert pd.isna(df['nome'].iloc[1])
+
+@pytest.mark.parametrize("content", [
+    'A;B;C\n1;2;3\n4;5\n10;11;12\n', # Short row
+    'A;B;C\n1;2;3\n6;7;8;9\n10;11;12\n', # Long row
+    'A;B;C\n1;2;3\n4;5\n6;7;8;9\n10;11;12\n',
+])
+@pytest.mark.parametrize("usecols", [None, ['A', 'C']])
+def test_read_cvm_csv_engines_agree_on_ragged_rows(tmp_path, content, usecols):
+    pytest.importorskip("pyarrow")
+    file_path = tmp_path / "if_position.inf_diario_fi_202312.csv"
+    file_path.write_text(content, encoding="utf-8")
+
+    expected = file_io.read_cvm_csv(str(file_path), usecols=usecols, engine='c')
+    pd.testing.assert_frame_equal(file_io.read_cvm_csv(str(file_path), usecols=usecols, engine='pyarrow'), expected)
+    assert expected['a'].tolist()[-1] == '10'
+
+def test_read_cvm_csv_invalid_engine(dummy_csv_file):
+    with pytest.raises(ValueError):
+        file_io.read_cvm_csv(dummy_csv_file, engine='python')
@@ -45,3 +45,51 @@ def test_write_cvm_headers_mappings(tmp_path):
     success = headers.write_cvm_headers_mappings(mappings, str(file_path))
     assert success
     assert os.path.exists(file_path)
+
+def test_header_cache_reuses_entries_until_file_changes(tmp_path, monkeypatch):
+    file_path = tmp_path / "if_register.cad_fi.csv"
+    file_path.write_text("col1;col2\n1;2", encoding="utf-8")
+    cache = headers.CVMHeaderCache(str(tmp_path / "catalog.db"))
+
+    calls = []
+    real_metadata = headers.get_cvm_file_metadata
+    monkeypatch.setattr(headers, "get_cvm_file_metadata", lambda f: calls.append(f) or real_metadata(f))
+
+    first = cache.get(str(file_path))
+    assert cache.get(str(file_path)) == first
+    assert len(calls) == 1
+
+    file_path.write_text("col1;col2;col3\n1;2;3", encoding="utf-8")
+    os.utime(file_path, ns=(0, 0))
+    changed = cache.get(str(file_path))
+    assert len(calls) == 2
+    assert changed[3] != first[3]
+
+    assert headers.check_cvm_headers_changed([str(file_path)], pd.DataFrame({'Hash': []}), cache=cache) == {changed[3]}
+    assert len(calls) == 2
+    cache.close()
+
+def test_load_cvm_headers_table_uses_binary_cache(tmp_path, monkeypatch):
+    xlsx_file = tmp_path / "if_headers.xlsx"
+    xlsx_file.write_bytes(b"v1")
+    reads = []
+    monkeypatch.setattr(headers.pd, "read_excel",
+                        lambda f, sheet_name=None: reads.append(f) or pd.DataFrame({'Hash': [open(f, 'rb').read().decode()]}))
+    cache_folder = str(tmp_path / "cache")
+
+    assert headers.load_cvm_headers_table(str(xlsx_file), cache_folder=cache_folder)['Hash'][0] == 'v1'
+    assert headers.load_cvm_headers_table(str(xlsx_file), cache_folder=cache_folder)['Hash'][0] == 'v1'
+    assert len(reads) == 1
+
+    # Touched but unchanged content: hash matches, no new Excel parse
+    os.utime(xlsx_file, ns=(0, 0))
+    headers.load_cvm_headers_table(str(xlsx_file), cache_folder=cache_folder)
+    assert len(reads) == 1
+
+    xlsx_file.write_bytes(b"v2")
+    assert headers.load_cvm_headers_table(str(xlsx_file), cache_folder=cache_folder)['Hash'][0] == 'v2'
+    assert len(reads) == 2
+
+def test_load_cvm_headers_table_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        headers.load_cvm_headers_table(str(tmp_path / "missing.xlsx"))
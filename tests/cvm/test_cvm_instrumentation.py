@@ -0,0 +1,68 @@
+import logging
+import pandas as pd
+import pytest
+
+from fbpyutils_finance.cvm import file_io
+from fbpyutils_finance.cvm.instrumentation import Instrumentation, LoggingSink, MemorySink, collect_cvm_metrics
+from fbpyutils_finance.cvm.utils import hash_string
+
+def test_stage_and_counter_events():
+    sink = MemorySink()
+    instrumentation = Instrumentation([sink])
+    with instrumentation.stage('download', url='http://x') as metrics:
+        metrics['bytes'] = 2048
+    with pytest.raises(RuntimeError):
+        with instrumentation.stage('download', url='http://y'):
+            raise RuntimeError('boom')
+    instrumentation.count('files_written', 2)
+
+    stage = sink.events[0]
+    assert stage['type'] == 'stage' and stage['status'] == 'ok'
+    assert stage['labels'] == {'url': 'http://x'} and stage['metrics'] == {'bytes': 2048}
+    assert sink.events[1]['status'] == 'error'
+
+    summary = sink.summary().set_index('name')
+    assert summary.loc['download', 'events'] == 2
+    assert summary.loc['download', 'errors'] == 1
+    assert summary.loc['download', 'bytes'] == 2048
+    assert summary.loc['files_written', 'value'] == 2
+
+def test_no_sinks_is_noop_and_failing_sinks_are_isolated():
+    instrumentation = Instrumentation()
+    with instrumentation.stage('x') as metrics:
+        metrics['rows'] = 1
+    assert not instrumentation.enabled
+
+    received = []
+    def failing(event):
+        raise ValueError('sink down')
+    instrumentation.add_sink(failing)
+    instrumentation.add_sink(received.append)
+    instrumentation.count('c')
+    assert len(received) == 1
+
+def test_logging_sink(caplog):
+    instrumentation = Instrumentation([LoggingSink()])
+    with caplog.at_level(logging.INFO, logger='fbpyutils_finance.cvm'):
+        with instrumentation.stage('read_csv', file='a.csv') as metrics:
+            metrics['rows'] = 3
+    assert 'stage=read_csv status=ok' in caplog.text
+    assert 'rows=3' in caplog.text
+    assert caplog.records[0].cvm_event['name'] == 'read_csv'
+
+def test_read_cvm_history_file_reports_stages(tmp_path):
+    header = 'CNPJ_FUNDO;DT_COMPTC;VL_QUOTA'
+    headers_df = pd.DataFrame({
+        'Hash': hash_string(f'IF_POSITION;DIARIO_FI;{header}'),
+        'Source_Field': ['CNPJ_FUNDO', 'DT_COMPTC', 'VL_QUOTA'],
+        'Target_Field': ['fund_id', 'position_date', 'quota_value'],
+        'Converter': ['as_string_id', 'as_date', 'as_float'],
+    })
+    csv_path = tmp_path / 'if_position.inf_diario_fi_202312.csv'
+    csv_path.write_text(f'{header}\n00.000.000/0001-91;2023-12-01;1,5\n', encoding='utf-8')
+
+    with collect_cvm_metrics() as metrics:
+        file_io.read_cvm_history_file(str(csv_path), headers_df)
+    stages = [e['name'] for e in metrics.events if e['type'] == 'stage']
+    assert stages == ['header_hash', 'read_csv', 'apply_expressions', 'apply_converters', 'compute_partitions']
+    assert metrics.events[1]['metrics']['rows'] == 1
@@ -0,0 +1,50 @@
+import datetime
+import sqlite3
+import pandas as pd
+import pytest
+
+from fbpyutils_finance.cvm.loader import CVMDatabaseLoader
+
+def _positions(values, dates=('2023-12-01', '2023-12-04')):
+    return pd.DataFrame({
+        'fund_id': ['A', 'A'],
+        'position_date': [datetime.date.fromisoformat(d) for d in dates],
+        'quota_value': values,
+        'shareholders': pd.array([10, None], dtype='Int64'),
+    })
+
+def test_load_upserts_on_natural_key():
+    conn = sqlite3.connect(':memory:')
+    loader = CVMDatabaseLoader(conn, batch_size=1)
+    assert loader.load('IF_POSITION', 'DIARIO_FI', _positions([1.0, 2.0])) == 2
+    assert loader.load('IF_POSITION', 'DIARIO_FI', _positions([1.5, 3.0], dates=('2023-12-04', '2023-12-05'))) == 2
+
+    rows = conn.execute('SELECT position_date, quota_value, shareholders FROM cvm_if_position_daily ORDER BY position_date').fetchall()
+    assert rows == [('2023-12-01', 1.0, 10), ('2023-12-04', 1.5, 10), ('2023-12-05', 3.0, None)]
+
+def test_load_adds_new_columns_and_skips_null_keys():
+    conn = sqlite3.connect(':memory:')
+    loader = CVMDatabaseLoader(conn)
+    loader.load('IF_POSITION', 'DIARIO_FI', _positions([1.0, 2.0]))
+    data = _positions([1.0, 2.0]).assign(net_worth_value=[5.0, None])
+    data.loc[1, 'fund_id'] = None
+    assert loader.load('IF_POSITION', 'DIARIO_FI', data) == 1
+    assert conn.execute('SELECT net_worth_value FROM cvm_if_position_daily WHERE position_date = ?', ('2023-12-01',)).fetchone() == (5.0,)
+
+def test_load_delete_insert_fallback():
+    conn = sqlite3.connect(':memory:')
+    loader = CVMDatabaseLoader(conn, dialect='other', tune_sqlite=False)
+    conn.execute('CREATE TABLE cvm_if_position_daily (fund_id TEXT, position_date TEXT, quota_value REAL, shareholders INTEGER)')
+    loader.load('IF_POSITION', 'DIARIO_FI', _positions([1.0, 2.0]))
+    loader.load('IF_POSITION', 'DIARIO_FI', _positions([1.5, 2.5]))
+    assert conn.execute('SELECT COUNT(*), SUM(quota_value) FROM cvm_if_position_daily').fetchone() == (2, 4.0)
+
+def test_load_rolls_back_on_failure():
+    conn = sqlite3.connect(':memory:')
+    loader = CVMDatabaseLoader(conn, create_tables=False)
+    with pytest.raises(ValueError):
+        loader.load('IF_POSITION', 'DIARIO_FI', _positions([1.0, 2.0]))
+
+def test_invalid_connection():
+    with pytest.raises(ValueError):
+        CVMDatabaseLoader(object())
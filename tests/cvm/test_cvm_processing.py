@@ -42,3 +42,48 @@ def test_apply_converters_empty():
     convs = {'field': lambda x: x}
     result = processing.apply_converters(df, convs)
     assert isinstance(result, pd.DataFrame)
+
+def test_get_converter_dtypes():
+    mappings = [
+        {'Target_Field': 'Quota_Value', 'Converter': 'lambda x: as_float(x)'},
+        {'Target_Field': 'shareholders', 'Converter': 'lambda x: as_integer(x)'},
+        {'Target_Field': 'fund_name', 'Converter': 'lambda x: as_string(x)'},
+        {'Target_Field': 'position_date', 'Converter': 'as_date'},
+        {'Target_Field': 'other', 'Converter': None},
+    ]
+    assert processing.get_converter_dtypes(mappings) == {
+        'quota_value': 'Float64', 'shareholders': 'Int64', 'fund_name': 'string', 'position_date': 'datetime64[ns]'
+    }
+
+def test_apply_converters_nullable_dtypes():
+    df = pd.DataFrame({
+        'total': ['1,5', None],
+        'shareholders': ['10', ''],
+        'is_exclusive': ['S', None],
+        'fund_name': ['Fund', None],
+        'position_date': ['2023-12-01', None],
+        'empty': [None, None],
+    })
+    convs = {
+        'total': processing.as_float, 'shareholders': processing.as_integer, 'is_exclusive': processing.as_boolean,
+        'fund_name': processing.as_string, 'position_date': processing.as_date, 'empty': processing.as_float,
+    }
+    result = processing.apply_converters(df, convs, nullable_dtypes=True, dtypes={'empty': 'Float64'})
+    assert str(result['total'].dtype) == 'Float64'
+    assert str(result['shareholders'].dtype) == 'Int64'
+    assert str(result['is_exclusive'].dtype) == 'boolean'
+    assert str(result['fund_name'].dtype) == 'string'
+    assert pd.api.types.is_datetime64_any_dtype(result['position_date'])
+    assert str(result['empty'].dtype) == 'Float64'
+    assert not (result.dtypes == object).any()
+    assert result['shareholders'].iloc[0] == 10
+    assert result['shareholders'].isna().iloc[1]
+
+def test_get_source_columns_keeps_referenced_columns():
+    mappings = [
+        {'Target_Field': 'fund_id', 'Source_Field': 'CNPJ_FUNDO', 'Converter': 'as_str'},
+        {'Target_Field': 'quota', 'Source_Field': 'VL_QUOTA', 'Transformation1': 'COALESCE($X, "vl_quota_ant")', 'Converter': 'as_float'},
+    ]
+    exprs, _ = processing.get_expression_and_converters(mappings)
+    header = ['TP_FUNDO', 'CNPJ_FUNDO', 'VL_QUOTA', 'VL_QUOTA_ANT', 'NR_COTST']
+    assert processing.get_source_columns(header, exprs) == ['CNPJ_FUNDO', 'VL_QUOTA', 'VL_QUOTA_ANT']
@@ -0,0 +1,97 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+from fbpyutils_finance.cvm import register_history as rh
+
+DATES = ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05']
+
+# Fund A changes on day 3, fund B is missing on day 2, fund C appears on day 4
+SNAPSHOTS = {
+    '2024-01-01': [('A', 'NORMAL', 1.0), ('B', 'NORMAL', 2.0)],
+    '2024-01-02': [('A', 'NORMAL', 1.0)],
+    '2024-01-03': [('A', 'CANCELADA', 1.0), ('B', 'NORMAL', 2.0)],
+    '2024-01-04': [('A', 'CANCELADA', 1.0), ('B', 'NORMAL', 2.0), ('C', 'NORMAL', None)],
+    '2024-01-05': [('A', 'CANCELADA', 1.0), ('B', 'NORMAL', 2.0), ('C', 'NORMAL', None)],
+}
+
+def _snapshot(date):
+    return pd.DataFrame(SNAPSHOTS[date], columns=['fund_id', 'situation', 'fee']).assign(
+        kind='IF_REGISTER', sub_kind='CAD_FI', period_date=date)
+
+def _all_snapshots(dates=DATES):
+    return pd.concat([_snapshot(d) for d in dates], ignore_index=True)
+
+def _intervals(history):
+    return sorted((r.fund_id, r.situation, str(r.valid_from.date()), None if pd.isna(r.valid_to) else str(r.valid_to.date()))
+                  for r in history.itertuples())
+
+def test_compact_register_snapshots_builds_validity_intervals():
+    history = rh.compact_register_snapshots(_all_snapshots())
+    assert _intervals(history) == [
+        ('A', 'CANCELADA', '2024-01-03', None),
+        ('A', 'NORMAL', '2024-01-01', '2024-01-03'),
+        ('B', 'NORMAL', '2024-01-01', '2024-01-02'),
+        ('B', 'NORMAL', '2024-01-03', None),
+        ('C', 'NORMAL', '2024-01-04', None),
+    ]
+    assert 'period_date' not in history.columns and 'kind' not in history.columns
+
+def test_compact_register_snapshots_requires_key():
+    with pytest.raises(ValueError):
+        rh.compact_register_snapshots(_all_snapshots().drop(columns=['fund_id']))
+
+@pytest.mark.parametrize('order', list(itertools.permutations(DATES))[::17])
+def test_insert_register_snapshot_matches_full_compaction(order):
+    history = rh.compact_register_snapshots(_snapshot(order[0]))
+    known = [order[0]]
+    for date in order[1:]:
+        history = rh.insert_register_snapshot(history, _snapshot(date), date, known)
+        known.append(date)
+    expected = rh.compact_register_snapshots(_all_snapshots())
+    assert _intervals(history) == _intervals(expected)
+    assert sorted(history['row_hash']) == sorted(expected['row_hash'])
+
+def test_insert_register_snapshot_rejects_known_date():
+    history = rh.compact_register_snapshots(_snapshot(DATES[0]))
+    with pytest.raises(ValueError):
+        rh.insert_register_snapshot(history, _snapshot(DATES[0]), DATES[0], [DATES[0]])
+
+def test_register_as_of_returns_published_register():
+    history = rh.compact_register_snapshots(_all_snapshots())
+    on_day_2 = rh.register_as_of(history, '2024-01-02')
+    assert list(on_day_2['fund_id']) == ['A']
+    between = rh.register_as_of(history, '2024-01-03 12:00')
+    assert dict(zip(between['fund_id'], between['situation'])) == {'A': 'CANCELADA', 'B': 'NORMAL'}
+    assert rh.register_as_of(history, '2023-12-31').empty
+
+def test_register_history_file_round_trip(tmp_path, caplog):
+    pytest.importorskip('pyarrow')
+    history_file = str(tmp_path / 'cad_fi_history.parquet')
+    register = rh.CVMRegisterHistory(history_file)
+    for date in ['2024-01-03', '2024-01-01', '2024-01-05']:
+        assert register(f'if_register.inf_cadastral_fi_{date}.csv', 'IF_REGISTER', 'CAD_FI', _snapshot(date), [])
+    assert not register('x.csv', 'IF_POSITION', 'DIARIO_FI', _snapshot(DATES[0]), [])
+    register.save()
+
+    reloaded = rh.CVMRegisterHistory(history_file)
+    assert reloaded.snapshot_dates == [pd.Timestamp(d) for d in ['2024-01-01', '2024-01-03', '2024-01-05']]
+    assert not reloaded.add_snapshot(_snapshot('2024-01-03'))
+    assert 'already in the history' in caplog.text
+    for date in ['2024-01-02', '2024-01-04']:
+        reloaded.add_snapshot(_snapshot(date))
+    assert _intervals(reloaded.history) == _intervals(rh.compact_register_snapshots(_all_snapshots()))
+
+def test_register_history_save_removes_temp_file_on_failure(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    register = rh.CVMRegisterHistory(str(tmp_path / 'cad_fi_history.parquet'))
+    register.add_snapshot(_snapshot(DATES[0]))
+    def write_table(table, where):
+        open(where, 'wb').close()
+        raise OSError('disk full')
+    monkeypatch.setattr(rh.pq, 'write_table', write_table)
+    with pytest.raises(OSError):
+        register.save()
+    assert list(tmp_path.iterdir()) == []
+    assert register.dirty
@@ -0,0 +1,149 @@
+import pandas as pd
+import pytest
+
+import logging
+import sqlite3
+
+from fbpyutils_finance.cvm import synthetic
+from fbpyutils_finance.cvm.cvm_client import CVM
+from fbpyutils_finance.cvm.instrumentation import collect_cvm_metrics
+from fbpyutils_finance.cvm.file_io import read_cvm_history_file
+from fbpyutils_finance.cvm.utils import hash_string
+
+DIARIO_FIELDS = [
+    ('TP_FUNDO', 'fund_type', 'as_str'),
+    ('CNPJ_FUNDO', 'fund_id', 'as_string_id'),
+    ('DT_COMPTC', 'position_date', 'as_date'),
+    ('VL_QUOTA', 'quota_value', 'as_float'),
+    ('VL_PATRIM_LIQ', 'net_worth_value', 'as_float'),
+    ('NR_COTST', 'shareholders', 'as_int'),
+]
+
+def _layout(kind, sub_kind, fields):
+    header_hash = hash_string(';'.join([kind, sub_kind, ';'.join(f[0] for f in fields)]))
+    return pd.DataFrame([
+        {'Kind': kind, 'Sub_Kind': sub_kind, 'Hash': header_hash, 'Order': i,
+         'Source_Field': source, 'Target_Field': target, 'Converter': converter}
+        for i, (source, target, converter) in enumerate(fields)
+    ])
+
+@pytest.fixture
+def headers_df():
+    return pd.concat([
+        _layout('IF_POSITION', 'DIARIO_FI', DIARIO_FIELDS),
+        _layout('IF_POSITION', 'DIARIO_FI', DIARIO_FIELDS[1:]),
+        _layout('IF_REGISTER', 'CAD_FI', [('CNPJ_FUNDO', 'fund_id', 'as_string_id'), ('DT_REG', 'register_date', 'as_date'),
+                                          ('SIT', 'situation', 'as_str')]),
+    ], ignore_index=True)
+
+def test_header_layout_picks_widest_and_checks_hash(headers_df):
+    header_hash, header_line = synthetic.get_cvm_header_layout('IF_POSITION', 'DIARIO_FI', headers_df)
+    assert header_line == 'TP_FUNDO;CNPJ_FUNDO;DT_COMPTC;VL_QUOTA;VL_PATRIM_LIQ;NR_COTST'
+    assert header_hash == headers_df['Hash'].iloc[0]
+
+    with pytest.raises(ValueError):
+        synthetic.get_cvm_header_layout('IF_POSITION', 'DIARIO_FI', headers_df, header_hash='missing')
+    headers_df.loc[0, 'Source_Field'] = 'OTHER'
+    with pytest.raises(ValueError):
+        synthetic.get_cvm_header_layout('IF_POSITION', 'DIARIO_FI', headers_df, header_hash=header_hash)
+
+def test_make_cnpjs_have_valid_check_digits():
+    cnpjs = synthetic.make_cnpjs(50, seed=1)
+    assert len(set(cnpjs)) == 50
+    for cnpj in cnpjs:
+        digits = [int(c) for c in cnpj if c.isdigit()]
+        for position, weights in ((12, [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]), (13, [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])):
+            remainder = sum(d * w for d, w in zip(digits, weights)) % 11
+            assert digits[position] == (0 if remainder < 2 else 11 - remainder)
+
+def test_generated_diario_fi_resolves_mappings(tmp_path, headers_df):
+    file_path = synthetic.generate_diario_fi(str(tmp_path / 'if_position.inf_diario_fi_202312.csv'), '202312', funds=3, headers_df=headers_df)
+    kind, sub_kind, data, partition_cols = read_cvm_history_file(file_path, headers_df, check_header=True)
+
+    assert (kind, sub_kind) == ('IF_POSITION', 'DIARIO_FI')
+    assert len(data) == 3 * len(pd.bdate_range('2023-12-01', '2023-12-31'))
+    assert set(data['period']) == {'2023-12'}
+    assert data['quota_value'].notna().all() and (data['quota_value'] > 0).all()
+    assert data['shareholders'].map(lambda v: isinstance(v, int)).all()
+
+def test_generated_cadastral_fi_is_deterministic(tmp_path, headers_df):
+    first = synthetic.generate_cadastral_fi(str(tmp_path / 'a' / 'if_register.inf_cadastral_fi_20231201.csv'), funds=5, seed=7, headers_df=headers_df)
+    second = synthetic.generate_cadastral_fi(str(tmp_path / 'b' / 'if_register.inf_cadastral_fi_20231201.csv'), funds=5, seed=7, headers_df=headers_df)
+    with open(first) as f1, open(second) as f2:
+        assert f1.read() == f2.read()
+
+    _, sub_kind, data, _ = read_cvm_history_file(first, headers_df)
+    assert sub_kind == 'CAD_FI'
+    assert list(data['situation'].unique()) == [synthetic.FUND_SITUATION]
+    assert set(data['period_date']) == {'2023-12-01'}
+
+def test_process_pending_with_worker_pool(tmp_path, headers_df, monkeypatch, caplog):
+    history = tmp_path / 'history'
+    months = ['202311', '202312', '202401']
+    files = [synthetic.generate_diario_fi(str(history / f'if_position.inf_diario_fi_{m}.csv'), m, funds=3, headers_df=headers_df)
+             for m in months]
+    groups = [('IF_POSITION', f'inf_diario_fi_{m}', False, (f,)) for m, f in zip(months, files)]
+    client = CVM(headers_df=headers_df, catalog_db_path=str(tmp_path / 'catalog.db'), history_folder=str(history))
+    monkeypatch.setattr(client, 'get_cvm_files_to_process', lambda kind=None, history=None: groups)
+
+    received = {}
+    with collect_cvm_metrics() as metrics, caplog.at_level(logging.INFO, logger='fbpyutils_finance.cvm'):
+        processed = client.process_pending(workers=2, sink=lambda f, k, sk, data, parts: received.update({f: data}))
+
+    assert sorted(processed) == [(g[0], g[1]) for g in groups]
+    assert sorted(received) == sorted(files)
+    for m, f in zip(months, files):
+        start = pd.Period(f'{m[:4]}-{m[4:]}', freq='M')
+        assert len(received[f]) == 3 * len(pd.bdate_range(start.start_time, start.end_time))
+        assert set(received[f]['period']) == {str(start)}
+
+    # Stage events of the workers are forwarded to the parent process
+    events = metrics.to_frame()
+    read_files = set(events.loc[events['name'] == 'read_csv', 'file'])
+    assert read_files == {f.split('/')[-1] for f in files}
+    # Each worker caches header metadata in the catalog through its own connection
+    with sqlite3.connect(str(tmp_path / 'catalog.db')) as con:
+        assert con.execute('SELECT COUNT(*) FROM cvm_if_header_cache').fetchone()[0] == len(files)
+    # Progress goes to the package logger, with the elapsed time of the run
+    assert any(r.name == 'fbpyutils_finance.cvm.cvm_client' and 'Processed 3 of 3 CVM file groups in' in r.message
+               for r in caplog.records)
+
+def test_process_pending_delta_upserts_changed_rows(tmp_path, headers_df, monkeypatch):
+    pytest.importorskip("pyarrow")
+    history = tmp_path / 'history'
+    cvm_file = synthetic.generate_diario_fi(str(history / 'if_position.inf_diario_fi_202312.csv'), '202312', funds=3, headers_df=headers_df)
+    group = ('IF_POSITION', 'inf_diario_fi_202312', False, (cvm_file,))
+    client = CVM(headers_df=headers_df, catalog_db_path=str(tmp_path / 'catalog.db'), history_folder=str(history),
+                 dataset_folder=str(tmp_path / 'dataset'))
+    monkeypatch.setattr(client, 'get_cvm_files_to_process', lambda kind=None, history=None: [group])
+
+    # A full run stores the row fingerprints too
+    expected_rows = 3 * len(pd.bdate_range('2023-12-01', '2023-12-31'))
+    assert client.process_pending(workers=1) == [group[:2]]
+    assert len(client.read_cvm_dataset()) == expected_rows
+
+    # Republished with one changed quota: only that row is sent, and it replaces the stored one
+    with open(cvm_file, encoding='iso-8859-1') as f:
+        lines = f.read().splitlines()
+    fields = lines[1].split(';')
+    fields[3] = '99,5'
+    lines[1] = ';'.join(fields)
+    with open(cvm_file, 'w', encoding='iso-8859-1') as f:
+        f.write('\n'.join(lines) + '\n')
+    with collect_cvm_metrics() as metrics:
+        assert client.process_pending(workers=1, delta=True) == [group[:2]]
+    events = metrics.to_frame()
+    assert events.loc[events['name'] == 'sink_write', 'rows'].tolist() == [1]
+
+    data = client.read_cvm_dataset()
+    assert len(data) == expected_rows
+    assert not data.duplicated(['fund_id', 'position_date']).any()
+    changed = data[data['quota_value'] == 99.5]
+    assert len(changed) == 1
+    assert changed[['fund_id', 'position_date']].astype(str).values.tolist() == [[fields[1].replace('.', '').replace('/', '').replace('-', ''), fields[2]]]
+
+    for mode in ('overwrite', 'append'):
+        sink = lambda *args: None
+        sink.mode = mode
+        with pytest.raises(ValueError):
+            client.process_pending(workers=1, sink=sink, delta=True)
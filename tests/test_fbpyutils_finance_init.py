@@ -6,6 +6,7 @@ import os
 import sys
 import pytest
 import pandas as pd
+import numpy as np
 from unittest.mock import patch, MagicMock
 
 # Add project root to path to allow importing fbpyutils_finance
@@ -20,6 +21,7 @@ from fbpyutils_finance import (
     rate_annual_to_monthly,
     rate_annual_to_daily,
     rate_daily_to_annual,
+    convert_rate,
     stock_return_rate,
     stock_adjusted_return_rate,
     stock_adjusted_price,
@@ -94,6 +96,44 @@ def test_rate_daily_to_annual_zero_rate():
     """Test converting a zero daily rate to annual."""
     assert rate_daily_to_annual(0.0) == 0.0
 
+# --- Tests for convert_rate ---
+
+def test_convert_rate_matches_scalar_functions():
+    """Test convert_rate with the default 30/360 convention against the scalar functions."""
+    cases = [
+        ('daily', 'monthly', rate_daily_to_monthly, 0.001),
+        ('monthly', 'daily', rate_monthly_to_daily, 0.01),
+        ('monthly', 'annual', rate_monthly_to_annual, 0.01),
+        ('annual', 'monthly', rate_annual_to_monthly, 0.12),
+        ('annual', 'daily', rate_annual_to_daily, 0.10),
+        ('daily', 'annual', rate_daily_to_annual, 0.0005),
+    ]
+    for from_period, to_period, func, rate in cases:
+        assert abs(convert_rate(rate, from_period, to_period) - func(rate)) < PRECISION
+    assert isinstance(convert_rate(0.01, 'monthly', 'annual'), float)
+
+def test_convert_rate_arrays_and_series():
+    """Test convert_rate over NumPy arrays and pandas Series with other conventions."""
+    rates = np.array([0.0, 0.1375, 0.05])
+    daily = convert_rate(rates, 'annual', 'daily', convention='business/252')
+    assert isinstance(daily, np.ndarray)
+    assert np.allclose(daily, (1 + rates) ** (1 / 252) - 1, rtol=0, atol=PRECISION)
+
+    series = pd.Series(daily, index=['a', 'b', 'c'])
+    annual = convert_rate(series, 'daily', 'annual', convention='business/252')
+    assert isinstance(annual, pd.Series) and list(annual.index) == ['a', 'b', 'c']
+    assert np.allclose(annual.to_numpy(), rates, rtol=0, atol=PRECISION)
+
+    calendar = convert_rate([0.12], 'annual', 'daily', convention='actual/365')
+    assert abs(calendar[0] - (1.12 ** (1 / 365) - 1)) < PRECISION
+
+def test_convert_rate_invalid_arguments():
+    """Test convert_rate with an invalid period or convention."""
+    with pytest.raises(ValueError):
+        convert_rate(0.01, 'weekly', 'annual')
+    with pytest.raises(ValueError):
+        convert_rate(0.01, 'daily', 'annual', convention='30/365')
+
 # --- Tests for stock_return_rate ---
 
 def test_stock_return_rate_positive_return():
@@ -389,6 +429,42 @@ def test_get_investment_table_basic(sample_dataframe):
     # Check if total investment value matches input
     assert abs(result_df['Investment Value'].sum() - investment_amount) < PRECISION
 
+def test_get_investment_table_does_not_modify_input():
+    """Test get_investment_table leaves the caller's DataFrame untouched."""
+    df = pd.DataFrame({
+        'Ticker': ['AAPL', 'GOOG', 'MSFT', 'BAD'],
+        'Price': ['150.0', 2800.0, 300.0, 'n/a'],
+        'Quantity': [10, 2, 5, 1],
+        'Average Price': [140.0, 2700.0, 310.0, 1.0]
+    })
+    original = df.copy()
+    result_df = get_investment_table(df, 1000.0)
+    pd.testing.assert_frame_equal(df, original)
+    assert result_df['Ticker'].tolist() == ['GOOG', 'AAPL', 'MSFT']
+
+def test_get_investment_table_result_is_independent(sample_dataframe):
+    """Test the result can be changed without SettingWithCopyWarning."""
+    result_df = get_investment_table(sample_dataframe, 1000.0)
+    # Not a selection of an internal frame, which pandas tracks to warn on later assignments
+    assert result_df._is_copy is None
+    with pd.option_context('mode.chained_assignment', 'raise'):
+        result_df['Total'] = result_df['Price'] * result_df['Quantity']
+        result_df.loc[0, 'Quantity to Buy'] = 0.0
+    assert result_df.loc[0, 'Quantity to Buy'] == 0.0
+
+def test_get_investment_table_small_profit_loss():
+    """Test the adjusted profit/loss of assets with abs(Profit/Loss) below 1 (no digits)."""
+    data = {
+        'Ticker': ['A', 'B'],
+        'Price': [10.5, 10.0],
+        'Quantity': [1, 1],
+        'Average Price': [10.0, 10.0] # A P/L = 0.5, B P/L = 0
+    }
+    # Adjusted P/L: A = 1 + 0.5 = 1.5, B = 2 + 0 = 2.0
+    result_df = get_investment_table(pd.DataFrame(data), 350.0)
+    assert abs(result_df['Investment Value'].iloc[0] - 150.0) < PRECISION
+    assert abs(result_df['Investment Value'].iloc[1] - 200.0) < PRECISION
+
 def test_get_investment_table_missing_columns():
     """Test get_investment_table when required columns are missing."""
     df = pd.DataFrame({'Ticker': ['A'], 'Price': [10]})